@@ -304,6 +304,8 @@ OCR_CONFIG = {
     "languages": os.getenv("OCR_LANGUAGES", "por+eng").split("+"),
     "tesseract_config": os.getenv("TESSERACT_CONFIG", "--oem 3 --psm 6"),
     "confidence_threshold": float(os.getenv("OCR_CONFIDENCE_THRESHOLD", "0.7")),
+    # Pré-processamento muda o texto reconhecido: desligado por padrão, como no backend
+    "preprocess": os.getenv("ENABLE_OCR_PREPROCESSING", "false").lower() == "true",
 }
 
 # STT Configuration
@@ -332,6 +334,14 @@ VECTOR_DB_CONFIG = {
     "collection_name": os.getenv("VECTOR_COLLECTION_NAME", "omnisia_docs"),
     "top_k": int(os.getenv("VECTOR_TOP_K", "5")),
     "similarity_threshold": float(os.getenv("VECTOR_SIMILARITY_THRESHOLD", "0.7")),
+    # Índice FAISS local: flat, hnsw, ivf_flat, ivf_pq
+    "index_type": os.getenv("VECTOR_INDEX_TYPE", "flat"),
+    "train_threshold": int(os.getenv("VECTOR_TRAIN_THRESHOLD", "50000")),
+    "nlist": int(os.getenv("VECTOR_IVF_NLIST", "0")),
+    "nprobe": int(os.getenv("VECTOR_IVF_NPROBE", "16")),
+    "pq_m": int(os.getenv("VECTOR_PQ_M", "16")),
+    "hnsw_m": int(os.getenv("VECTOR_HNSW_M", "32")),
+    "ef_search": int(os.getenv("VECTOR_HNSW_EF_SEARCH", "64")),
 }
 
 # ============================================================================
@@ -1,18 +1,46 @@
 """Processamento de imagens com CLIP."""
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import List
+
+import numpy as np
 from PIL import Image
 import torch
 from transformers import CLIPProcessor, CLIPModel
 
 
+def _open_rgb(image_path: Path) -> Image.Image:
+    with Image.open(image_path) as image:
+        return image.convert("RGB")
+
+
 class CLIPEncoder:
-    def __init__(self, model_name: str = "openai/clip-vit-base-patch32"):
+    def __init__(
+        self,
+        model_name: str = "openai/clip-vit-base-patch32",
+        batch_size: int = 32,
+        workers: int = 4,
+        int8: bool = False,
+    ):
         self.processor = CLIPProcessor.from_pretrained(model_name)
-        self.model = CLIPModel.from_pretrained(model_name)
+        self.model = CLIPModel.from_pretrained(model_name).eval()
+        if int8:
+            # Pesos das camadas Linear em int8 (CPU); vetores no mesmo espaço do fp32
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.batch_size = batch_size
+        self.workers = workers
+
+    def encode_batch(self, image_paths: List[Path]) -> np.ndarray:
+        """Embeddings normalizados (L2) de várias imagens, decodificadas em paralelo."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            images = list(pool.map(_open_rgb, image_paths))
+        vectors = []
+        for start in range(0, len(images), self.batch_size):
+            inputs = self.processor(images=images[start:start + self.batch_size], return_tensors="pt")
+            with torch.inference_mode():
+                vectors.append(self.model.get_image_features(**inputs).numpy())
+        vectors = np.vstack(vectors).astype("float32")
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
 
     def encode(self, image_path: Path) -> torch.Tensor:
-        image = Image.open(image_path)
-        inputs = self.processor(images=image, return_tensors="pt")
-        with torch.no_grad():
-            emb = self.model.get_image_features(**inputs)
-        return emb
+        return torch.from_numpy(self.encode_batch([image_path]))
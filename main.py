@@ -41,6 +41,7 @@ from config import (
     FRONTEND_HOST,
     FRONTEND_PORT,
     JUPYTER_CONFIG,
+    OCR_CONFIG,
     validate_config,
 )
 
@@ -309,6 +310,64 @@ def train(
         console.print(f"[red]❌ Erro durante treinamento: {e}[/red]")
 
 
+@app.command("ocr-batch")
+def ocr_batch(
+    source: str = typer.Argument(..., help="Pasta, padrão glob ou arquivo ZIP/TAR de imagens"),
+    output: str = typer.Option(
+        "", "--output", "-o", help="Manifesto de saída (.jsonl ou .parquet)"
+    ),
+    language: str = typer.Option(
+        "+".join(OCR_CONFIG["languages"]), "--language", "-l", help="Idiomas do OCR"
+    ),
+    workers: int = typer.Option(0, "--workers", "-w", help="Workers de OCR (0 = núcleos)"),
+    preprocess: bool = typer.Option(
+        OCR_CONFIG["preprocess"], "--preprocess/--no-preprocess", help="Pré-processar imagens"
+    ),
+    boxes: bool = typer.Option(False, "--boxes", help="Incluir caixas das palavras"),
+):
+    """🔍 OCR em lote de imagens / Batch image OCR"""
+    try:
+        from omnisia_web.backend.services.batch_ocr import describe_source, run_batch_ocr
+        from omnisia_web.backend.services.image_preprocess import preprocess_array
+        from omnisia_web.backend.services.tesseract_pool import TesseractPool
+
+        describe_source(source)
+        name = Path(source).name.split(".")[0]
+        if not output and (not name or any(c in name for c in "*?[")):
+            name = "ocr_batch"
+        manifest = Path(output) if output else Path(f"{name}_ocr.jsonl")
+
+        console.print(f"[bold green]🔍 OCR em lote:[/bold green] {source}")
+        console.print(f"[cyan]📄 Manifesto:[/cyan] {manifest}")
+
+        pool = TesseractPool(workers or None, OCR_CONFIG["tesseract_config"])
+        with console.status("Processando imagens...") as status:
+            summary = run_batch_ocr(
+                source,
+                manifest,
+                language,
+                pool,
+                preprocess=preprocess_array if preprocess else None,
+                with_boxes=boxes,
+                progress=lambda fraction, message: status.update(f"Processando: {message}"),
+            )
+        pool.shutdown()
+
+        console.print(
+            f"[bold green]✅ {summary['images']} imagens ({summary['failed']} falhas) "
+            f"em {summary['seconds']}s[/bold green]"
+        )
+        console.print(
+            f"[cyan]⚡ Vazão:[/cyan] {summary['pages_per_second']} páginas/s "
+            f"com {summary['workers']} workers ({summary['backend']})"
+        )
+
+    except ImportError as e:
+        console.print(f"[red]❌ Erro de importação: {e}[/red]")
+    except Exception as e:
+        console.print(f"[red]❌ Erro no OCR em lote: {e}[/red]")
+
+
 @app.command()
 def chat():
     """💬 Iniciar chat interativo / Start interactive chat"""
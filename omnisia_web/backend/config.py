@@ -9,12 +9,18 @@ UPLOAD_DIR = DATA_DIR / os.getenv("UPLOAD_DIR", "uploads").replace("data/", "")
 MODELS_DIR = DATA_DIR / os.getenv("MODELS_DIR", "models").replace("data/", "")
 DATASETS_DIR = DATA_DIR / os.getenv("DATASETS_DIR", "datasets").replace("data/", "")
 LOGS_DIR = BASE_DIR / os.getenv("LOGS_DIR", "logs")
+VECTOR_STORE_DIR = DATA_DIR / os.getenv("VECTOR_STORE_DIR", "vector_store").replace(
+    "data/", ""
+)
+JOBS_DIR = DATA_DIR / os.getenv("JOBS_DIR", "jobs").replace("data/", "")
 
 # Cria diretórios se não existirem
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 MODELS_DIR.mkdir(parents=True, exist_ok=True)
 DATASETS_DIR.mkdir(parents=True, exist_ok=True)
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
+VECTOR_STORE_DIR.mkdir(parents=True, exist_ok=True)
+JOBS_DIR.mkdir(parents=True, exist_ok=True)
 
 # Configurações da API
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
@@ -25,6 +31,10 @@ API_RETRY_ATTEMPTS = int(os.getenv("API_RETRY_ATTEMPTS", "3"))
 # Configurações de upload
 MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "100"))
 MAX_FILE_SIZE = MAX_FILE_SIZE_MB * 1024 * 1024  # Converte para bytes
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # bytes
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", "86400"))  # segundos
+FILE_CATALOG_DB = DATA_DIR / os.getenv("FILE_CATALOG_DB", "file_catalog.db").replace("data/", "")
+FILE_CATALOG_POLL_INTERVAL = float(os.getenv("FILE_CATALOG_POLL_INTERVAL", "60"))  # sem watchdog
 ALLOWED_EXTENSIONS = set(
     os.getenv(
         "SUPPORTED_FILE_EXTENSIONS",
@@ -42,16 +52,115 @@ SUPPORTED_MODELS = DEFAULT_MODELS_STR.split(",")
 WHISPER_MODELS_STR = os.getenv("WHISPER_MODELS", "tiny,base,small,medium,large")
 WHISPER_MODELS = WHISPER_MODELS_STR.split(",")
 DEFAULT_WHISPER_MODEL = os.getenv("WHISPER_MODEL_SIZE", "base")
+# Modelos Whisper em memória: orçamento (LRU além dele), transcrições
+# simultâneas por modelo e modelos carregados na inicialização
+WHISPER_MEMORY_BUDGET_MB = int(os.getenv("WHISPER_MEMORY_BUDGET_MB", "4096"))
+WHISPER_MODEL_CONCURRENCY = int(os.getenv("WHISPER_MODEL_CONCURRENCY", "1"))
+WHISPER_PRELOAD_MODELS = [
+    m.strip() for m in os.getenv("WHISPER_PRELOAD_MODELS", "").split(",") if m.strip()
+]
+# Backend de inferência do Whisper em CPU: fp32 ou int8 (quantização dinâmica)
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "fp32")
+# Transcrição longa: a partir de quantos segundos o áudio é dividido em janelas
+# (0 = nunca), máximo de processos Whisper (0 = metade dos núcleos; cada um
+# carrega um modelo reservado em WHISPER_MEMORY_BUDGET_MB), tamanho e
+# sobreposição das janelas e nível (dBFS) abaixo do qual o quadro é silêncio
+STT_LONG_FORM_MIN_SECONDS = float(os.getenv("STT_LONG_FORM_MIN_SECONDS", "900"))
+STT_LONG_FORM_WORKERS = int(os.getenv("STT_LONG_FORM_WORKERS", "0")) or max(
+    1, (os.cpu_count() or 1) // 2
+)
+STT_WINDOW_SECONDS = float(os.getenv("STT_WINDOW_SECONDS", "120"))
+STT_WINDOW_OVERLAP_SECONDS = float(os.getenv("STT_WINDOW_OVERLAP_SECONDS", "1.0"))
+STT_VAD_SILENCE_DB = float(os.getenv("STT_VAD_SILENCE_DB", "-40"))
+# Transcrição ao vivo: intervalo entre textos parciais e trecho máximo (s)
+STT_LIVE_STEP_SECONDS = float(os.getenv("STT_LIVE_STEP_SECONDS", "2"))
+STT_LIVE_MAX_SECONDS = float(os.getenv("STT_LIVE_MAX_SECONDS", "20"))
+
+# Ingestão de vídeo em uma passada: quadros por segundo amostrados, limiar de
+# mudança de cena (0 = usar fps fixo) e largura máxima dos quadros
+VIDEO_FRAME_FPS = float(os.getenv("VIDEO_FRAME_FPS", "1.0"))
+VIDEO_SCENE_THRESHOLD = float(os.getenv("VIDEO_SCENE_THRESHOLD", "0"))
+VIDEO_FRAME_MAX_WIDTH = int(os.getenv("VIDEO_FRAME_MAX_WIDTH", "1280"))
 
 # Configurações de OCR
 OCR_LANGUAGES_STR = os.getenv("OCR_LANGUAGES", "por,eng")
 OCR_LANGUAGES = OCR_LANGUAGES_STR.split(",")
 DEFAULT_OCR_LANGUAGE = os.getenv("DEFAULT_OCR_LANGUAGE", "por+eng")
 TESSERACT_CONFIG = os.getenv("TESSERACT_CONFIG", "--oem 3 --psm 6")
+# Ruído, inclinação e limiarização adaptativa em memória antes do Tesseract
+# (desligado por padrão; o cache de OCR guarda o modo junto do resultado)
+ENABLE_OCR_PREPROCESSING = os.getenv("ENABLE_OCR_PREPROCESSING", "false").lower() == "true"
+# OCR de PDFs por página: processos Tesseract (0 = núcleos da CPU), resolução
+# de rasterização e mínimo de caracteres para considerar que a página já tem texto
+OCR_PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", "0")) or os.cpu_count() or 1
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "300"))
+OCR_TEXT_LAYER_MIN_CHARS = int(os.getenv("OCR_TEXT_LAYER_MIN_CHARS", "20"))
+# Threads com engine Tesseract residente para OCR de imagens (0 = núcleos da CPU)
+OCR_ENGINE_WORKERS = int(os.getenv("OCR_ENGINE_WORKERS", "0")) or os.cpu_count() or 1
 
 # Configurações de embeddings
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 DEFAULT_QUERY_LIMIT = int(os.getenv("DEFAULT_QUERY_LIMIT", "5"))
+EMBEDDING_CONFIG = {
+    "model": EMBEDDING_MODEL,
+    "batch_size": int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+    "max_wait_ms": float(os.getenv("EMBEDDING_MAX_WAIT_MS", "10")),
+    "workers": int(os.getenv("EMBEDDING_WORKERS", "2")),
+}
+# Backend de inferência dos embeddings: fp32, int8, onnx ou onnx-int8 (ONNX
+# Runtime); modelos exportados ficam em ONNX_MODELS_DIR
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "fp32")
+ONNX_MODELS_DIR = MODELS_DIR / "onnx"
+
+# Configurações do armazenamento vetorial persistente
+VECTOR_STORE_MMAP = os.getenv("VECTOR_STORE_MMAP", "true").lower() == "true"
+VECTOR_SNAPSHOT_EVERY = int(os.getenv("VECTOR_SNAPSHOT_EVERY", "1000"))  # textos
+VECTOR_SNAPSHOT_INTERVAL = int(os.getenv("VECTOR_SNAPSHOT_INTERVAL", "300"))  # segundos
+
+# Tipo de índice ANN: flat, hnsw, ivf_flat, ivf_pq
+VECTOR_DB_CONFIG = {
+    "index_type": os.getenv("VECTOR_INDEX_TYPE", "flat"),
+    "train_threshold": int(os.getenv("VECTOR_TRAIN_THRESHOLD", "50000")),
+    "sample_size": int(os.getenv("VECTOR_TRAIN_SAMPLE_SIZE", "100000")),
+    "nlist": int(os.getenv("VECTOR_IVF_NLIST", "0")),  # 0 = automático (~4 * sqrt(n))
+    "nprobe": int(os.getenv("VECTOR_IVF_NPROBE", "16")),
+    "pq_m": int(os.getenv("VECTOR_PQ_M", "16")),
+    "pq_bits": int(os.getenv("VECTOR_PQ_BITS", "8")),
+    "hnsw_m": int(os.getenv("VECTOR_HNSW_M", "32")),
+    "ef_construction": int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", "200")),
+    "ef_search": int(os.getenv("VECTOR_HNSW_EF_SEARCH", "64")),
+    # Buscas filtradas que selecionam até este número de vetores calculam a
+    # distância exata só para eles; acima disso, índice + bitmap de ids
+    "filter_exact_max": int(os.getenv("VECTOR_FILTER_EXACT_MAX", "4096")),
+}
+# Tenants com índice próprio (partição física em <índice>/tenants/<tenant>);
+# os demais ficam no índice compartilhado, separados pelos metadados
+VECTOR_TENANT_PARTITIONS = [
+    tenant.strip() for tenant in os.getenv("VECTOR_TENANT_PARTITIONS", "").split(",") if tenant.strip()
+]
+
+# Embeddings de imagem (CLIP): modelo, imagens por lote no modelo e threads
+# de decodificação. O índice de imagens usa produto interno (cosseno)
+CLIP_MODEL = os.getenv("CLIP_MODEL", "openai/clip-vit-base-patch32")
+CLIP_BATCH_SIZE = int(os.getenv("CLIP_BATCH_SIZE", "32"))
+CLIP_DECODE_WORKERS = int(os.getenv("CLIP_DECODE_WORKERS", "4"))
+# Backend de inferência do CLIP em CPU: fp32 ou int8 (quantização dinâmica)
+CLIP_BACKEND = os.getenv("CLIP_BACKEND", "fp32")
+
+# Ingestão (POST /ingest): trechos por tokens do modelo de embeddings, com
+# sobreposição; filas limitadas entre os estágios e workers por estágio
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "64"))  # itens entre estágios
+INGEST_MAX_DOCUMENTS = int(os.getenv("INGEST_MAX_DOCUMENTS", "16"))  # aguardando extração
+INGEST_STAGE_WORKERS = {
+    "extract": int(os.getenv("INGEST_EXTRACT_WORKERS", "2")),
+    "clean": int(os.getenv("INGEST_CLEAN_WORKERS", "2")),
+    "chunk": int(os.getenv("INGEST_CHUNK_WORKERS", "2")),
+    "embed": int(os.getenv("INGEST_EMBED_WORKERS", "2")),
+    "index": 1,  # o índice FAISS aceita uma escrita por vez
+}
+INGEST_TEXT_BLOCK_CHARS = int(os.getenv("INGEST_TEXT_BLOCK_CHARS", "65536"))
 
 # Configurações de LoRA
 LORA_TARGET_MODULES_STR = os.getenv("LORA_TARGET_MODULES", "q_proj,v_proj")
@@ -102,10 +211,50 @@ CSRF_ENABLED = os.getenv("CSRF_ENABLED", "true").lower() == "true"
 CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
 CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
 CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", "100"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))  # vetores
+EMBEDDING_CACHE_DISK = os.getenv("EMBEDDING_CACHE_DISK", "true").lower() == "true"
+# Limite do cache em disco; os vetores usados há mais tempo são removidos
+EMBEDDING_CACHE_DISK_MAX_ITEMS = int(os.getenv("EMBEDDING_CACHE_DISK_MAX_ITEMS", "1000000"))
+# Cache de artefatos derivados (OCR, transcrições, áudio extraído) por hash do conteúdo
+ARTIFACT_CACHE_DIR = DATA_DIR / os.getenv("ARTIFACT_CACHE_DIR", "artifacts").replace("data/", "")
+ARTIFACT_CACHE_MAX_MB = int(os.getenv("ARTIFACT_CACHE_MAX_MB", "10240"))
+ARTIFACT_CACHE_MAX_BYTES = ARTIFACT_CACHE_MAX_MB * 1024 * 1024
 
 # Configurações de performance
 MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "5"))
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "30"))
+# Espera máxima por uma vaga de execução antes de responder 503
+QUEUE_WAIT_TIMEOUT = float(os.getenv("QUEUE_WAIT_TIMEOUT", str(REQUEST_TIMEOUT)))
+
+# Pools por classe de carga: workers executando + queue_size aguardando (429 além disso)
+WORKLOAD_POOLS = {
+    "embedding": {
+        "workers": EMBEDDING_CONFIG["workers"],
+        "queue_size": int(os.getenv("EMBEDDING_QUEUE_SIZE", "256")),
+        "kind": "thread",
+    },
+    "ocr": {
+        "workers": int(os.getenv("OCR_WORKERS", "2")),
+        "queue_size": int(os.getenv("OCR_QUEUE_SIZE", "8")),
+        "kind": "thread",
+    },
+    "stt": {
+        "workers": int(os.getenv("STT_WORKERS", "1")),
+        "queue_size": int(os.getenv("STT_QUEUE_SIZE", "4")),
+        "kind": "thread",
+    },
+}
+
+# Fila de jobs em segundo plano (SQLite + processos worker)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # OCR, transcrição e vídeo
+JOB_TRAINING_WORKERS = int(os.getenv("JOB_TRAINING_WORKERS", "1"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))  # segundos
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "30"))  # segundos x tentativa
+# Prazo renovado pelo worker durante o job; vencido, o job volta à fila
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Intervalo em que workers mortos (OOM, segfault) são detectados e reiniciados
+JOB_SUPERVISE_INTERVAL = float(os.getenv("JOB_SUPERVISE_INTERVAL", "10"))  # segundos
 
 # Configurações de cache de modelos
 HUGGINGFACE_CACHE_DIR = os.getenv("HUGGINGFACE_CACHE_DIR", "data/huggingface_cache")
@@ -144,6 +293,16 @@ def get_logs_path() -> Path:
     return LOGS_DIR
 
 
+def get_vector_store_path() -> Path:
+    """Retorna o caminho do armazenamento vetorial"""
+    return VECTOR_STORE_DIR
+
+
+def get_jobs_path() -> Path:
+    """Retorna o caminho dos jobs (banco da fila e resultados)"""
+    return JOBS_DIR
+
+
 def is_file_allowed(filename: str) -> bool:
     """Verifica se a extensão do arquivo é permitida"""
     return Path(filename).suffix.lower() in ALLOWED_EXTENSIONS
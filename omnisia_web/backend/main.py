@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 from fastapi import FastAPI, HTTPException, Request
@@ -19,8 +20,16 @@ from .config import (
     get_logs_path,
     API_HOST,
     API_PORT,
+    VECTOR_SNAPSHOT_INTERVAL,
+    FILE_CATALOG_POLL_INTERVAL,
+    JOB_SUPERVISE_INTERVAL,
 )
-from .routers import upload, preprocess, train, chat
+from .routers import upload, preprocess, train, chat, jobs, ingest
+from .services import jobs as job_service
+from .services import ocr_service
+from .services import stt_service
+from .services.artifact_cache import artifact_cache
+from .services.workload_pools import WorkloadRejected, pools
 
 
 # Configuração de logging
@@ -46,6 +55,29 @@ def setup_logging():
     return logger
 
 
+async def periodic_vector_snapshot():
+    """Grava snapshots do índice vetorial em intervalos regulares"""
+    logger = logging.getLogger("omnisia")
+    while True:
+        await asyncio.sleep(VECTOR_SNAPSHOT_INTERVAL)
+        try:
+            await asyncio.to_thread(chat.embedding_service.maybe_snapshot)
+            await asyncio.to_thread(chat.image_index.maybe_snapshot)
+        except Exception as e:
+            logger.error(f"Erro no snapshot do índice vetorial: {str(e)}")
+
+
+async def periodic_job_supervision():
+    """Reinicia workers de jobs que morreram e encerra reservas vencidas"""
+    logger = logging.getLogger("omnisia")
+    while True:
+        await asyncio.sleep(JOB_SUPERVISE_INTERVAL)
+        try:
+            await asyncio.to_thread(job_service.supervise_workers)
+        except Exception as e:
+            logger.error(f"Erro na supervisão dos workers de jobs: {str(e)}")
+
+
 # Configuração de startup/shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -59,11 +91,38 @@ async def lifespan(app: FastAPI):
     
     # Inicialização do timestamp de startup
     app.state.start_time = time.time()
+
+    # Snapshots periódicos do índice vetorial
+    snapshot_task = asyncio.create_task(periodic_vector_snapshot())
+
+    # Catálogo de uploads: reconcilia com o disco e acompanha alterações
+    upload.file_catalog.start_watcher(FILE_CATALOG_POLL_INTERVAL)
+    # Hashes de arquivos apagados fora da API
+    await asyncio.to_thread(artifact_cache.prune_hashes)
+
+    # Workers da fila de jobs (OCR, transcrição, vídeo, treinamento)
+    job_service.start_workers()
+    supervision_task = asyncio.create_task(periodic_job_supervision())
+
+    # Modelos Whisper configurados carregam em segundo plano
+    preload_task = asyncio.create_task(asyncio.to_thread(stt_service.preload_models))
     logger.info("✅ Backend inicializado com sucesso")
 
     yield
 
     logger.info("🛑 Encerrando OmnisIA Trainer Web Backend")
+    snapshot_task.cancel()
+    supervision_task.cancel()
+    preload_task.cancel()
+    await asyncio.to_thread(job_service.job_workers.stop)
+    await ingest.ingest_pipeline.stop()
+    upload.file_catalog.stop_watcher()
+    chat.embedding_service.close()
+    chat.image_index.close()
+    pools.shutdown()
+    ocr_service.page_engine.shutdown()
+    ocr_service.tesseract_pool.shutdown()
+    stt_service.long_audio.shutdown()
     logger.info("✅ Backend encerrado com sucesso")
 
 
@@ -124,6 +183,18 @@ async def log_requests(request: Request, call_next):
     return response
 
 
+# Backpressure: fila cheia (429) ou sem vaga a tempo (503)
+@app.exception_handler(WorkloadRejected)
+async def workload_rejected_handler(request: Request, exc: WorkloadRejected):
+    """Responde rejeições dos pools de execução com Retry-After"""
+    logger.warning(f"Carga rejeitada ({exc.workload}): {str(exc)}")
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "workload": exc.workload},
+        headers={"Retry-After": "1"},
+    )
+
+
 # Tratamento global de exceções
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -150,6 +221,8 @@ app.include_router(upload.router, prefix="/upload", tags=["upload"])
 app.include_router(preprocess.router, prefix="/preprocess", tags=["preprocess"])
 app.include_router(train.router, prefix="/train", tags=["train"])
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+app.include_router(ingest.router, prefix="/ingest", tags=["ingest"])
 
 
 # Endpoints principais
@@ -178,6 +251,13 @@ async def health_check():
             if hasattr(app.state, "start_time")
             else 0
         ),
+        "workloads": pools.stats(),
+        "ocr_pages": ocr_service.page_engine.stats(),
+        "ocr_engines": ocr_service.tesseract_pool.stats(),
+        "whisper_models": stt_service.whisper_models.stats(),
+        "stt_long_form": stt_service.long_audio.stats(),
+        "artifact_cache": artifact_cache.stats(),
+        "ingest": ingest.ingest_pipeline.stats(),
     }
 
 
@@ -196,6 +276,7 @@ async def get_info():
             "/preprocess - Processamento (OCR, STT, etc.)",
             "/train - Treinamento de modelos LoRA",
             "/chat - Sistema de chat com contexto",
+            "/ingest - Upload até trechos indexados em uma chamada",
         ],
     }
 
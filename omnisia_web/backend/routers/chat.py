@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, validator, Field
 from ..services.embeddings import EmbeddingService
+from ..services.image_embeddings import image_index
+from ..services.workload_pools import WorkloadRejected, pools
 from ..config import MAX_MESSAGE_LENGTH, DEFAULT_QUERY_LIMIT, CONFIDENCE_THRESHOLDS
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Union
 import logging
+import os
+import time
 
 router = APIRouter()
 logger = logging.getLogger("omnisia.chat")
@@ -12,6 +17,28 @@ logger = logging.getLogger("omnisia.chat")
 embedding_service = EmbeddingService()
 
 
+class SearchFilters(BaseModel):
+    doc_id: Optional[Union[str, List[str]]] = Field(None, description="Documento(s)")
+    source: Optional[Union[str, List[str]]] = Field(None, description="Arquivo(s) de origem")
+    file_type: Optional[Union[str, List[str]]] = Field(
+        None, description="Tipo(s) de arquivo, ex.: pdf, mp3"
+    )
+    tenant: Optional[Union[str, List[str]]] = Field(None, description="Tenant(s)")
+    created_after: Optional[datetime] = Field(None, description="Indexado a partir de")
+    created_before: Optional[datetime] = Field(None, description="Indexado antes de")
+
+    class Config:
+        extra = "forbid"  # Campo desconhecido é erro, não filtro ignorado
+
+    def to_store(self) -> dict:
+        """Filtros no formato do índice (datas em epoch)"""
+        filters = self.dict(exclude_none=True)
+        for name in ("created_after", "created_before"):
+            if name in filters:
+                filters[name] = filters[name].timestamp()
+        return filters
+
+
 class ChatRequest(BaseModel):
     text: str = Field(..., description="Texto da mensagem do usuário")
     context: Optional[List[str]] = Field(
@@ -23,6 +50,9 @@ class ChatRequest(BaseModel):
     embedding_model: Optional[str] = Field(
         None, description="Modelo de embedding a usar"
     )
+    filters: Optional[SearchFilters] = Field(
+        None, description="Restringe a busca por documento, origem, tipo, tenant ou data"
+    )
 
     @validator("text")
     def validate_text(cls, v):
@@ -57,6 +87,8 @@ class ContextRequest(BaseModel):
     texts: List[str] = Field(
         ..., description="Lista de textos para adicionar ao contexto"
     )
+    tenant: Optional[str] = Field(None, description="Tenant dono dos textos")
+    source: Optional[str] = Field(None, description="Origem dos textos")
 
     @validator("texts")
     def validate_texts(cls, v):
@@ -75,19 +107,68 @@ class ContextRequest(BaseModel):
         return [text.strip() for text in v]
 
 
+class ImageIndexRequest(BaseModel):
+    image_paths: List[str] = Field(..., description="Imagens para indexar")
+    doc_ids: Optional[List[str]] = Field(
+        None, description="Documento de cada imagem (padrão: hash do arquivo)"
+    )
+
+    @validator("image_paths")
+    def validate_image_paths(cls, v):
+        if not v:
+            raise ValueError("Lista de imagens não pode estar vazia")
+        if len(v) > 1000:
+            raise ValueError("Máximo de 1000 imagens por vez")
+        missing = [path for path in v if not os.path.isfile(path)]
+        if missing:
+            raise ValueError(f"Imagens não encontradas: {missing[:5]}")
+        return v
+
+    @validator("doc_ids")
+    def validate_doc_ids(cls, v, values):
+        if v is not None and len(v) != len(values.get("image_paths") or []):
+            raise ValueError("doc_ids deve ter um item por imagem")
+        return v
+
+
+class ImageSearchRequest(BaseModel):
+    text: Optional[str] = Field(None, description="Descrição em texto (texto→imagem)")
+    image_path: Optional[str] = Field(None, description="Imagem de consulta (imagem→imagem)")
+    k: int = Field(DEFAULT_QUERY_LIMIT, ge=1, le=100, description="Número de resultados")
+
+    @validator("image_path", always=True)
+    def validate_query(cls, v, values):
+        if bool(v) == bool(values.get("text")):
+            raise ValueError("Informe text ou image_path (apenas um)")
+        if v and not os.path.isfile(v):
+            raise ValueError(f"Imagem não encontrada: {v}")
+        return v
+
+
 @router.post("/", response_model=ChatResponse)
 async def chat(req: ChatRequest):
     """Chat com resposta baseada em contexto"""
     try:
         logger.info(f"Nova mensagem de chat: {req.text[:100]}...")
 
-        # Adiciona contexto extra se fornecido
+        filters = req.filters.to_store() if req.filters else None
+
+        # Adiciona contexto extra se fornecido (no tenant filtrado, se for um só)
         if req.context:
-            embedding_service.add_texts(req.context)
-            logger.info(f"Adicionado contexto extra: {len(req.context)} textos")
+            tenant = filters.get("tenant") if filters else None
+            metadata = (
+                [{"tenant": tenant, "created_at": time.time()} for _ in req.context]
+                if isinstance(tenant, str)
+                else None
+            )
+            added = await embedding_service.aadd_texts(req.context, metadata)
+            logger.info(
+                f"Contexto extra: {added} textos novos de {len(req.context)} enviados"
+            )
 
         # Busca contexto similar
-        similar_texts = embedding_service.query(req.text, k=req.query_limit)
+        hits = await embedding_service.asearch(req.text, k=req.query_limit, filters=filters)
+        similar_texts = [(hit["text"], hit["distance"]) for hit in hits]
 
         # Gera resposta baseada no contexto
         if similar_texts:
@@ -117,8 +198,9 @@ async def chat(req: ChatRequest):
                     "text": text[:200] + "..." if len(text) > 200 else text,
                     "distance": float(dist),
                     "relevance": max(0.0, 1.0 - (dist / 2.0)),
+                    "metadata": hit["metadata"],
                 }
-                for text, dist in similar_texts
+                for (text, dist), hit in zip(similar_texts, hits)
             ]
 
         else:
@@ -140,11 +222,14 @@ async def chat(req: ChatRequest):
             sources=sources,
             metadata={
                 "query_limit": req.query_limit,
-                "total_context_texts": len(embedding_service.texts),
+                "total_context_texts": embedding_service.ntotal,
                 "similar_texts_found": len(similar_texts),
+                "filters": filters,
             },
         )
 
+    except WorkloadRejected:
+        raise
     except Exception as e:
         logger.error(f"Erro no chat: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erro no chat: {str(e)}")
@@ -156,14 +241,21 @@ async def add_context(req: ContextRequest):
     try:
         logger.info(f"Adicionando {len(req.texts)} textos ao contexto")
 
-        embedding_service.add_texts(req.texts)
+        metadata = None
+        if req.tenant or req.source:
+            record = {"tenant": req.tenant, "source": req.source, "created_at": time.time()}
+            metadata = [record for _ in req.texts]
+        added = await embedding_service.aadd_texts(req.texts, metadata)
 
         return {
             "status": "success",
-            "message": f"Adicionados {len(req.texts)} textos ao contexto",
-            "total_texts": len(embedding_service.texts),
-            "new_texts": len(req.texts),
+            "message": f"Adicionados {added} textos ao contexto",
+            "total_texts": embedding_service.ntotal,
+            "new_texts": added,
+            "duplicates": len(req.texts) - added,
         }
+    except WorkloadRejected:
+        raise
     except Exception as e:
         logger.error(f"Erro ao adicionar contexto: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -176,7 +268,7 @@ async def get_context_info():
     """Retorna informações sobre o contexto atual"""
     try:
         return {
-            "total_texts": len(embedding_service.texts),
+            "total_texts": embedding_service.ntotal,
             "index_initialized": embedding_service.index is not None,
             "embedding_model": (
                 embedding_service.model.get_sentence_embedding_dimension()
@@ -188,6 +280,14 @@ async def get_context_info():
                 if embedding_service.index
                 else None
             ),
+            "embedding_backend": embedding_service.backend,
+            "index": embedding_service.store.stats(),
+            "partitions": embedding_service.partition_stats(),
+            "batching": embedding_service.batcher.stats(),
+            "embedding_cache": (
+                embedding_service.cache.stats() if embedding_service.cache else None
+            ),
+            "images": image_index.stats(),
         }
     except Exception as e:
         logger.error(f"Erro ao obter informações: {str(e)}", exc_info=True)
@@ -196,13 +296,81 @@ async def get_context_info():
         )
 
 
+@router.post("/images")
+async def add_images(req: ImageIndexRequest):
+    """Indexa imagens com CLIP (decodificação paralela e lotes no modelo)"""
+    try:
+        logger.info(f"Indexando {len(req.image_paths)} imagens")
+        added = await pools.run(
+            "embedding", image_index.add_images, req.image_paths, req.doc_ids
+        )
+        return {
+            "status": "success",
+            "new_images": added,
+            "duplicates": len(req.image_paths) - added,
+            "total_images": image_index.store.ntotal,
+        }
+    except WorkloadRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao indexar imagens: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro ao indexar imagens: {str(e)}")
+
+
+@router.post("/images/search")
+async def search_images(req: ImageSearchRequest):
+    """Busca imagens por texto ou por outra imagem (score = cosseno)"""
+    try:
+        if req.text:
+            results = await pools.run("embedding", image_index.search_text, req.text, req.k)
+        else:
+            results = await pools.run(
+                "embedding", image_index.search_image, req.image_path, req.k
+            )
+        return {"results": results, "total_images": image_index.store.ntotal}
+    except WorkloadRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Erro na busca de imagens: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro na busca de imagens: {str(e)}")
+
+
+@router.get("/index-benchmark")
+async def benchmark_index(
+    sample_size: int = Query(20000, ge=100, le=50000, description="Vetores do corpus usados"),
+    queries: int = Query(200, ge=1, le=1000, description="Consultas medidas"),
+    k: int = Query(10, ge=1, le=100),
+):
+    """Compara recall@k e latência dos tipos de índice ANN sobre o corpus atual
+
+    Treinar e construir os índices é trabalho de CPU pesado: roda no pool
+    "embedding", sujeito à fila limitada e ao limite global (429/503).
+    """
+    try:
+        results = await pools.run(
+            "embedding", embedding_service.benchmark_index_types, sample_size, queries, k
+        )
+        return {
+            "sample_size": min(sample_size, len(embedding_service.texts)),
+            "queries": queries,
+            "k": k,
+            "results": results,
+        }
+    except WorkloadRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Erro no benchmark de índices: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500, detail=f"Erro no benchmark de índices: {str(e)}"
+        )
+
+
 @router.delete("/context")
 async def clear_context():
     """Limpa todo o contexto armazenado"""
     try:
-        # Reinicializa o serviço de embeddings
-        global embedding_service
-        embedding_service = EmbeddingService()
+        # Remove índice, textos e WAL sem recarregar o modelo
+        embedding_service.clear()
 
         logger.info("Contexto limpo com sucesso")
 
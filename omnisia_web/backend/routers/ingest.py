@@ -0,0 +1,112 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from pathlib import Path
+from typing import Optional
+from ..config import (
+    UPLOAD_DIR,
+    MAX_FILE_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    WHISPER_MODELS,
+    DEFAULT_WHISPER_MODEL,
+    OCR_LANGUAGES,
+    DEFAULT_OCR_LANGUAGE,
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    EMBEDDING_CONFIG,
+    INGEST_QUEUE_SIZE,
+    INGEST_MAX_DOCUMENTS,
+    INGEST_STAGE_WORKERS,
+    INGEST_TEXT_BLOCK_CHARS,
+)
+from ..services.ingest_pipeline import IngestPipeline, document_kind
+from ..services.upload_store import UploadTooLarge, save_upload_file
+from ..services.workload_pools import WorkloadRejected
+from .chat import embedding_service
+from .upload import file_catalog, upload_info, validate_file
+import logging
+
+router = APIRouter()
+logger = logging.getLogger("omnisia.ingest")
+
+# Pipeline único: filas e workers por estágio, iniciados na primeira ingestão
+ingest_pipeline = IngestPipeline(
+    embedding_service,
+    max_tokens=CHUNK_MAX_TOKENS,
+    overlap_tokens=CHUNK_OVERLAP_TOKENS,
+    queue_size=INGEST_QUEUE_SIZE,
+    max_documents=INGEST_MAX_DOCUMENTS,
+    workers=INGEST_STAGE_WORKERS,
+    embed_batch_size=EMBEDDING_CONFIG["batch_size"],
+    text_block_chars=INGEST_TEXT_BLOCK_CHARS,
+)
+
+
+@router.post("/")
+async def ingest_file(
+    file: UploadFile = File(...),
+    ocr_language: str = Query(DEFAULT_OCR_LANGUAGE, description="Idioma do OCR (PDF e imagens)"),
+    language: Optional[str] = Query(None, description="Idioma do áudio (opcional)"),
+    model_size: str = Query(DEFAULT_WHISPER_MODEL, description="Modelo Whisper (áudio e vídeo)"),
+    tenant: Optional[str] = Query(None, description="Tenant dono do documento (filtros e partição)"),
+):
+    """
+    Upload → extração → limpeza → trechos → embeddings → índice em uma chamada.
+    Retorna quando todos os trechos do arquivo estão pesquisáveis em /chat/.
+    """
+    try:
+        filename = validate_file(file)
+        try:
+            document_kind(Path(filename))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not any(lang in ocr_language for lang in OCR_LANGUAGES):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Idioma deve conter um dos suportados: {OCR_LANGUAGES}",
+            )
+        if model_size not in WHISPER_MODELS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Tamanho do modelo deve ser um de: {WHISPER_MODELS}",
+            )
+
+        # Recusa antes de receber o arquivo se o pipeline já estiver cheio
+        ingest_pipeline.check_capacity()
+        saved = await save_upload_file(
+            file, UPLOAD_DIR / filename, MAX_FILE_SIZE, UPLOAD_CHUNK_SIZE
+        )
+        info = upload_info(saved)
+
+        logger.info(f"Iniciando ingestão de {info['name']}")
+        result = await ingest_pipeline.ingest(
+            Path(info["path"]),
+            info["sha256"],
+            {
+                "ocr_language": ocr_language,
+                "language": language,
+                "model_size": model_size,
+                "tenant": tenant,
+            },
+        )
+        file_catalog.set_status(info["name"], "Indexado")
+        info["status"] = "Indexado"
+
+        return {
+            "status": "success",
+            "file": info,
+            **result,
+            "total_texts": embedding_service.ntotal,
+        }
+
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (HTTPException, WorkloadRejected):
+        raise
+    except Exception as e:
+        logger.error(f"Erro na ingestão: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro na ingestão: {str(e)}")
+
+
+@router.get("/stats")
+async def ingest_stats():
+    """Vazão, fila e utilização de cada estágio do pipeline de ingestão"""
+    return ingest_pipeline.stats()
@@ -0,0 +1,102 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field, ValidationError, validator
+from typing import Any, Dict, Optional
+from ..services.jobs import job_queue, job_workers, submit_job
+from ..services.job_queue import JOB_STATUSES
+from ..config import JOB_MAX_ATTEMPTS
+from .preprocess import (
+    BatchOCRRequest,
+    OCRRequest,
+    STTRequest,
+    VideoIngestRequest,
+    VideoRequest,
+)
+from .train import TrainRequest
+import logging
+
+router = APIRouter()
+logger = logging.getLogger("omnisia.jobs")
+
+# Validação dos parâmetros de cada tipo de job
+JOB_REQUEST_MODELS = {
+    "ocr": OCRRequest,
+    "ocr_batch": BatchOCRRequest,
+    "transcribe": STTRequest,
+    "transcribe_video": VideoRequest,
+    "video_ingest": VideoIngestRequest,
+    "train": TrainRequest,
+}
+
+
+class JobRequest(BaseModel):
+    kind: str = Field(
+        ...,
+        description="Tipo do job: ocr, ocr_batch, transcribe, transcribe_video, video_ingest, train",
+    )
+    params: Dict[str, Any] = Field(default_factory=dict, description="Parâmetros do job")
+    priority: int = Field(0, ge=0, le=10, description="Prioridade (maior executa antes)")
+    max_attempts: int = Field(JOB_MAX_ATTEMPTS, ge=1, le=10, description="Tentativas")
+
+    @validator("kind")
+    def validate_kind(cls, v):
+        if v not in JOB_REQUEST_MODELS:
+            raise ValueError(f"Tipo deve ser um de: {list(JOB_REQUEST_MODELS)}")
+        return v
+
+
+@router.post("/", status_code=202)
+async def create_job(req: JobRequest):
+    """Enfileira um job em segundo plano e retorna seu id imediatamente"""
+    try:
+        params = JOB_REQUEST_MODELS[req.kind](**req.params)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=422, detail=f"Parâmetros inválidos para {req.kind}: {str(e)}"
+        )
+
+    try:
+        job = submit_job(req.kind, params.dict(), req.priority, req.max_attempts)
+        return JSONResponse(status_code=202, content=job)
+    except Exception as e:
+        logger.error(f"Erro ao enfileirar job: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro ao enfileirar job: {str(e)}")
+
+
+@router.get("/")
+async def list_jobs(
+    status: Optional[str] = Query(None, description="Filtra por status"),
+    kind: Optional[str] = Query(None, description="Filtra por tipo"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """Lista jobs, mais recentes primeiro"""
+    if status and status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Status deve ser um de: {JOB_STATUSES}")
+    jobs, total = job_queue.list(status=status, kind=kind, limit=limit, offset=offset)
+    return {
+        "jobs": jobs,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "counts": job_queue.counts(),
+        "workers": job_workers.stats(),
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Estado, progresso, ETA e local do resultado de um job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancela um job na fila ou em execução"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
@@ -1,18 +1,26 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, validator, Field
 from pathlib import Path
-from ..services import ocr_service, stt_service, video_service
+from ..services import media_probe, ocr_service, stt_service, video_service
+from ..services.batch_ocr import describe_source
+from ..services.page_ocr import format_page
+from ..services.workload_pools import WorkloadRejected, pools
+from ..services.jobs import submit_job
 from ..config import (
     WHISPER_MODELS,
     DEFAULT_WHISPER_MODEL,
     OCR_LANGUAGES,
     DEFAULT_OCR_LANGUAGE,
+    ENABLE_OCR_PREPROCESSING,
     get_upload_path,
     is_file_allowed,
 )
+import contextlib
+import json
 import os
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
 
 router = APIRouter()
 logger = logging.getLogger("omnisia.preprocess")
@@ -44,12 +52,45 @@ class OCRRequest(BaseModel):
         return v or DEFAULT_OCR_LANGUAGE
 
 
+class BatchOCRRequest(BaseModel):
+    source: str = Field(..., description="Pasta, padrão glob ou arquivo ZIP/TAR de imagens")
+    output_path: Optional[str] = Field(
+        None, description="Manifesto de saída (.jsonl ou .parquet; opcional)"
+    )
+    language: Optional[str] = Field(DEFAULT_OCR_LANGUAGE, description="Idioma para OCR")
+    preprocess: bool = Field(
+        ENABLE_OCR_PREPROCESSING, description="Pré-processa as imagens antes do OCR"
+    )
+    boxes: bool = Field(False, description="Inclui as caixas das palavras no manifesto")
+
+    @validator("source")
+    def validate_source(cls, v):
+        describe_source(v)
+        return v
+
+    @validator("output_path")
+    def validate_output_path(cls, v):
+        if v and Path(v).suffix.lower() not in (".jsonl", ".parquet"):
+            raise ValueError("Manifesto deve ser .jsonl ou .parquet")
+        return v
+
+    @validator("language")
+    def validate_language(cls, v):
+        if v and not any(lang in v for lang in OCR_LANGUAGES):
+            raise ValueError(f"Idioma deve conter um dos suportados: {OCR_LANGUAGES}")
+        return v or DEFAULT_OCR_LANGUAGE
+
+
 class STTRequest(BaseModel):
     audio_path: str = Field(..., description="Caminho do arquivo de áudio")
     model_size: str = Field(
         DEFAULT_WHISPER_MODEL, description="Tamanho do modelo Whisper"
     )
     language: Optional[str] = Field(None, description="Idioma do áudio (opcional)")
+    long_form: Optional[bool] = Field(
+        None,
+        description="Transcreve em janelas paralelas (padrão: automático pela duração)",
+    )
 
     @validator("audio_path")
     def validate_audio_path(cls, v):
@@ -72,7 +113,6 @@ class STTRequest(BaseModel):
 
 class VideoRequest(BaseModel):
     video_path: str = Field(..., description="Caminho do arquivo de vídeo")
-    extract_audio: bool = Field(True, description="Extrair áudio do vídeo")
     model_size: str = Field(
         DEFAULT_WHISPER_MODEL, description="Tamanho do modelo Whisper"
     )
@@ -90,14 +130,62 @@ class VideoRequest(BaseModel):
         return v
 
 
+class VideoIngestRequest(BaseModel):
+    video_path: str = Field(..., description="Caminho do arquivo de vídeo")
+    model_size: str = Field(
+        DEFAULT_WHISPER_MODEL, description="Tamanho do modelo Whisper"
+    )
+    language: Optional[str] = Field(None, description="Idioma do áudio (opcional)")
+    fps: Optional[float] = Field(None, gt=0, description="Quadros por segundo amostrados")
+    scene_threshold: Optional[float] = Field(
+        None, ge=0, le=1, description="Limiar de mudança de cena (0 = fps fixo)"
+    )
+    transcribe: bool = Field(True, description="Transcreve a trilha de áudio")
+    ocr_frames: bool = Field(True, description="Aplica OCR aos quadros amostrados")
+    ocr_language: Optional[str] = Field(
+        DEFAULT_OCR_LANGUAGE, description="Idioma do OCR dos quadros"
+    )
+    embed_frames: bool = Field(
+        False, description="Indexa os quadros no índice de imagens (CLIP)"
+    )
+
+    @validator("video_path")
+    def validate_video_path(cls, v):
+        if not os.path.exists(v):
+            raise ValueError(f"Arquivo de vídeo não encontrado: {v}")
+
+        file_ext = Path(v).suffix.lower()
+        if file_ext not in [".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv"]:
+            raise ValueError("Arquivo deve ser de vídeo (mp4, avi, mov, mkv, wmv, flv)")
+
+        return v
+
+    @validator("model_size")
+    def validate_model_size(cls, v):
+        if v not in WHISPER_MODELS:
+            raise ValueError(f"Tamanho do modelo deve ser um de: {WHISPER_MODELS}")
+        return v
+
+    @validator("ocr_language")
+    def validate_ocr_language(cls, v):
+        if v and not any(lang in v for lang in OCR_LANGUAGES):
+            raise ValueError(f"Idioma deve conter um dos suportados: {OCR_LANGUAGES}")
+        return v or DEFAULT_OCR_LANGUAGE
+
+
 @router.post("/ocr")
-async def ocr_document(req: OCRRequest):
+async def ocr_document(
+    req: OCRRequest,
+    background: bool = Query(False, description="Enfileira como job e retorna o id"),
+):
     """Extrai texto de documento usando OCR"""
     try:
+        if background:
+            return JSONResponse(status_code=202, content=submit_job("ocr", req.dict()))
+
         logger.info(f"Iniciando OCR do arquivo: {req.file_path}")
 
         file_path = Path(req.file_path)
-        file_ext = file_path.suffix.lower()
 
         # Define caminho de saída se não fornecido
         if not req.output_path:
@@ -105,25 +193,7 @@ async def ocr_document(req: OCRRequest):
         else:
             output_path = Path(req.output_path)
 
-        # Processa baseado no tipo de arquivo
-        if file_ext == ".pdf":
-            # Para PDFs, usa ocrmypdf
-            temp_pdf = file_path.parent / f"{file_path.stem}_ocr.pdf"
-            ocr_service.ocr_pdf(file_path, temp_pdf, req.language)
-
-            # Extrai texto do PDF processado
-            text = ocr_service.extract_text_from_pdf(temp_pdf)
-
-            # Remove arquivo temporário
-            if temp_pdf.exists():
-                temp_pdf.unlink()
-        else:
-            # Para imagens, usa pytesseract diretamente
-            text = ocr_service.ocr_image(file_path, req.language)
-
-        # Salva o texto extraído
-        with output_path.open("w", encoding="utf-8") as f:
-            f.write(text)
+        text = await pools.run("ocr", ocr_service.ocr_to_file, file_path, output_path, req.language)
 
         logger.info(f"OCR concluído. Texto salvo em: {output_path}")
 
@@ -135,20 +205,145 @@ async def ocr_document(req: OCRRequest):
             "language": req.language,
         }
 
+    except WorkloadRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Erro no OCR: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro no OCR: {str(e)}")
+
+
+@router.post("/ocr/batch")
+async def ocr_batch(
+    req: BatchOCRRequest,
+    background: bool = Query(True, description="Enfileira como job e retorna o id"),
+):
+    """OCR em lote de uma pasta, glob ou arquivo compactado de imagens"""
+    try:
+        if background:
+            return JSONResponse(status_code=202, content=submit_job("ocr_batch", req.dict()))
+
+        logger.info(f"Iniciando OCR em lote: {req.source}")
+        summary = await pools.run(
+            "ocr",
+            ocr_service.ocr_batch,
+            req.source,
+            Path(req.output_path) if req.output_path else None,
+            req.language,
+            req.preprocess,
+            req.boxes,
+        )
+        return {"status": "success", **summary}
+
+    except WorkloadRejected:
+        raise
     except Exception as e:
+        logger.error(f"Erro no OCR em lote: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro no OCR em lote: {str(e)}")
+
+
+def stream_event(fmt: str, event: str, payload: Dict[str, Any]) -> str:
+    """Serializa um evento como linha NDJSON ou mensagem SSE"""
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    return json.dumps({"event": event, **payload}, ensure_ascii=False) + "\n"
+
+
+def stream_response(events, fmt: str) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream" if fmt == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def close_quietly(iterator) -> None:
+    # Se uma thread ainda estiver dentro do gerador, ele termina sozinho
+    try:
+        iterator.close()
+    except ValueError:
+        pass
+
+
+@router.post("/ocr/stream")
+async def ocr_document_stream(
+    req: OCRRequest,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson ou sse"),
+):
+    """OCR com o texto e a confiança de cada página enviados assim que ficam prontos"""
+    file_path = Path(req.file_path)
+    output_path = (
+        Path(req.output_path) if req.output_path else file_path.parent / f"{file_path.stem}_ocr.txt"
+    )
+    pages = ocr_service.iter_ocr_pages(file_path, req.language)
+
+    # O stream ocupa uma vaga do pool de OCR do início ao fim: fila cheia
+    # responde 429/503 antes de abrir o stream e cada página roda no pool
+    session = contextlib.AsyncExitStack()
+    try:
+        pool = await session.enter_async_context(pools.session("ocr"))
+        first = await pool.execute(next, pages, None)
+    except WorkloadRejected:
+        close_quietly(pages)
+        await session.aclose()
+        raise
+    except Exception as e:
+        close_quietly(pages)
+        await session.aclose()
         logger.error(f"Erro no OCR: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erro no OCR: {str(e)}")
 
+    async def events():
+        page, count, text_length = first, 0, 0
+        try:
+            with output_path.open("w", encoding="utf-8") as out:
+                while page is not None:
+                    out.write(format_page(page) + "\n")
+                    count += 1
+                    text_length += len(page["text"])
+                    yield stream_event(format, "page", page)
+                    page = await pool.execute(next, pages, None)
+            logger.info(f"OCR em streaming concluído: {count} páginas em {output_path}")
+            yield stream_event(
+                format,
+                "done",
+                {
+                    "status": "success",
+                    "pages": count,
+                    "text_length": text_length,
+                    "output_path": str(output_path),
+                    "language": req.language,
+                },
+            )
+        except Exception as e:
+            logger.error(f"Erro no OCR em streaming: {str(e)}", exc_info=True)
+            yield stream_event(format, "error", {"detail": f"Erro no OCR: {str(e)}"})
+        finally:
+            close_quietly(pages)
+            await session.aclose()
+
+    return stream_response(events(), format)
+
 
 @router.post("/transcribe")
-async def transcribe_audio(req: STTRequest):
+async def transcribe_audio(
+    req: STTRequest,
+    background: bool = Query(False, description="Enfileira como job e retorna o id"),
+):
     """Transcreve áudio para texto usando Whisper"""
     try:
+        if background:
+            return JSONResponse(status_code=202, content=submit_job("transcribe", req.dict()))
+
         logger.info(f"Iniciando transcrição do áudio: {req.audio_path}")
 
         # Transcreve o áudio
-        result = stt_service.transcribe_audio(
-            Path(req.audio_path), req.model_size, req.language
+        result = await pools.run(
+            "stt",
+            stt_service.transcribe_audio,
+            Path(req.audio_path),
+            req.model_size,
+            req.language,
+            req.long_form,
         )
 
         # Se result é string, converte para dict
@@ -170,20 +365,33 @@ async def transcribe_audio(req: STTRequest):
             "audio_file": req.audio_path,
         }
 
+    except WorkloadRejected:
+        raise
     except Exception as e:
         logger.error(f"Erro na transcrição: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erro na transcrição: {str(e)}")
 
 
 @router.post("/transcribe-video")
-async def transcribe_video(req: VideoRequest):
-    """Transcreve vídeo para texto extraindo o áudio"""
+async def transcribe_video(
+    req: VideoRequest,
+    background: bool = Query(False, description="Enfileira como job e retorna o id"),
+):
+    """Transcreve vídeo para texto (a trilha de áudio é lida por pipe, sem WAV temporário)"""
     try:
+        if background:
+            return JSONResponse(
+                status_code=202, content=submit_job("transcribe_video", req.dict())
+            )
+
         logger.info(f"Iniciando transcrição do vídeo: {req.video_path}")
 
         # Transcreve o vídeo
-        result = video_service.transcribe_video(
-            Path(req.video_path), req.model_size, req.extract_audio
+        result = await pools.run(
+            "stt",
+            video_service.transcribe_video,
+            Path(req.video_path),
+            req.model_size,
         )
 
         # Se result é string, converte para dict
@@ -203,9 +411,10 @@ async def transcribe_video(req: VideoRequest):
             "model_used": req.model_size,
             "text_length": len(text),
             "video_file": req.video_path,
-            "audio_extracted": req.extract_audio,
         }
 
+    except WorkloadRejected:
+        raise
     except Exception as e:
         logger.error(f"Erro na transcrição de vídeo: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -213,6 +422,196 @@ async def transcribe_video(req: VideoRequest):
         )
 
 
+@router.post("/video/ingest")
+async def ingest_video(
+    req: VideoIngestRequest,
+    background: bool = Query(True, description="Enfileira como job e retorna o id"),
+):
+    """Metadados, transcrição e quadros com OCR em uma única passada do ffmpeg"""
+    try:
+        if background:
+            # Quadros indexados no CLIP só no processo da API (escritor único)
+            if req.embed_frames:
+                raise HTTPException(
+                    status_code=400,
+                    detail="embed_frames exige background=false (o índice de imagens é escrito só pela API)",
+                )
+            return JSONResponse(
+                status_code=202, content=submit_job("video_ingest", req.dict())
+            )
+
+        logger.info(f"Iniciando ingestão do vídeo: {req.video_path}")
+        return await pools.run(
+            "stt",
+            video_service.process_video,
+            Path(req.video_path),
+            req.model_size,
+            req.language,
+            req.fps,
+            req.scene_threshold,
+            req.transcribe,
+            req.ocr_frames,
+            req.embed_frames,
+            ocr_language=req.ocr_language,
+        )
+
+    except (HTTPException, WorkloadRejected):
+        raise
+    except Exception as e:
+        logger.error(f"Erro na ingestão de vídeo: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500, detail=f"Erro na ingestão de vídeo: {str(e)}"
+        )
+
+
+@router.get("/probe")
+async def probe_media(path: str = Query(..., description="Caminho do arquivo de áudio ou vídeo")):
+    """Duração, taxa de amostragem, canais e dados de vídeo lidos dos cabeçalhos"""
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Arquivo não encontrado: {path}")
+    try:
+        return await pools.run("stt", media_probe.probe_media, Path(path))
+    except WorkloadRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao sondar mídia: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro ao sondar mídia: {str(e)}")
+
+
+async def transcription_stream(
+    media_path: Path, model_size: str, language: Optional[str], long_form: Optional[bool], fmt: str
+) -> StreamingResponse:
+    """Segmentos de cada janela enviados assim que a janela termina"""
+    windows = stt_service.iter_transcription(media_path, model_size, language, long_form)
+
+    # O stream ocupa uma vaga do pool de STT do início ao fim: fila cheia
+    # responde 429/503 antes de abrir o stream e cada janela roda no pool
+    session = contextlib.AsyncExitStack()
+    try:
+        pool = await session.enter_async_context(pools.session("stt"))
+        first = await pool.execute(next, windows, None)
+    except WorkloadRejected:
+        close_quietly(windows)
+        await session.aclose()
+        raise
+    except Exception as e:
+        close_quietly(windows)
+        await session.aclose()
+        logger.error(f"Erro na transcrição: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Erro na transcrição: {str(e)}")
+
+    async def events():
+        window, segments, text_length, detected = first, 0, 0, language
+        try:
+            while window is not None:
+                detected = detected or window["language"]
+                for segment in window["segments"]:
+                    segments += 1
+                    text_length += len(segment["text"]) + 1
+                    yield stream_event(fmt, "segment", {"window": window["window"], **segment})
+                yield stream_event(fmt, "progress", {"window": window["window"], "end": window["end"]})
+                window = await pool.execute(next, windows, None)
+            logger.info(f"Transcrição em streaming concluída: {segments} segmentos de {media_path}")
+            yield stream_event(
+                fmt,
+                "done",
+                {
+                    "status": "success",
+                    "segments": segments,
+                    "text_length": max(0, text_length - 1),
+                    "language": detected or "auto",
+                    "model_used": model_size,
+                },
+            )
+        except Exception as e:
+            logger.error(f"Erro na transcrição em streaming: {str(e)}", exc_info=True)
+            yield stream_event(fmt, "error", {"detail": f"Erro na transcrição: {str(e)}"})
+        finally:
+            close_quietly(windows)
+            await session.aclose()
+
+    return stream_response(events(), fmt)
+
+
+@router.post("/transcribe/stream")
+async def transcribe_audio_stream(
+    req: STTRequest,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson ou sse"),
+):
+    """Transcrição com os segmentos (início/fim em segundos) enviados por janela"""
+    return await transcription_stream(
+        Path(req.audio_path), req.model_size, req.language, req.long_form, format
+    )
+
+
+@router.post("/transcribe-video/stream")
+async def transcribe_video_stream(
+    req: VideoRequest,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson ou sse"),
+):
+    """Transcrição de vídeo em streaming (a trilha de áudio é lida direto pelo ffmpeg)"""
+    return await transcription_stream(Path(req.video_path), req.model_size, None, None, format)
+
+
+@router.websocket("/transcribe/live")
+async def transcribe_live(
+    websocket: WebSocket,
+    model_size: str = DEFAULT_WHISPER_MODEL,
+    language: Optional[str] = None,
+    sample_rate: int = 16000,
+):
+    """Transcrição ao vivo: recebe quadros PCM s16le mono e devolve texto incremental
+
+    Mensagens binárias são áudio; a mensagem de texto "stop" confirma o que
+    restou e encerra. Eventos enviados: partial, segment, done e error.
+    """
+    if model_size not in WHISPER_MODELS:
+        await websocket.close(code=1008, reason=f"Tamanho do modelo deve ser um de: {WHISPER_MODELS}")
+        return
+    if sample_rate <= 0:
+        await websocket.close(code=1008, reason="sample_rate deve ser maior que zero")
+        return
+
+    # A conexão ocupa uma vaga do pool de STT enquanto estiver aberta: sem
+    # capacidade, o socket é recusado (1013) em vez de disputar o Whisper
+    slot = contextlib.AsyncExitStack()
+    try:
+        pool = await slot.enter_async_context(pools.session("stt"))
+    except WorkloadRejected as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    try:
+        await websocket.accept()
+        session = stt_service.live_session(model_size, language, sample_rate)
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                events = await pool.execute(session.feed, message["bytes"])
+            elif (message.get("text") or "").strip().lower() == "stop":
+                for event in await pool.execute(session.finish):
+                    await websocket.send_json(event)
+                await websocket.send_json(
+                    {"event": "done", "text": session.text, "segments": len(session.segments)}
+                )
+                await websocket.close()
+                return
+            else:
+                continue
+            for event in events:
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Erro na transcrição ao vivo: {str(e)}", exc_info=True)
+        await websocket.send_json({"event": "error", "detail": f"Erro na transcrição: {str(e)}"})
+        await websocket.close(code=1011)
+    finally:
+        await slot.aclose()
+
+
 @router.get("/models/whisper")
 async def list_whisper_models():
     """Lista modelos Whisper disponíveis"""
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, validator
 from pathlib import Path
-from ..services import lora_trainer
+from ..services.jobs import job_queue, submit_job
 from ..config import SUPPORTED_MODELS
 import os
 
@@ -29,23 +30,38 @@ class TrainRequest(BaseModel):
 
 
 @router.post("/")
-async def train(req: TrainRequest):
-    """Treina modelo usando LoRA"""
+async def train(
+    req: TrainRequest,
+    priority: int = Query(0, ge=0, le=10, description="Prioridade na fila de jobs"),
+):
+    """Enfileira treinamento LoRA; acompanhe em GET /jobs/{job_id}"""
     try:
         # Cria diretório de saída se não existir
         output_path = Path(req.output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
 
-        lora_trainer.train_lora(req.model_name, Path(req.dataset_path), output_path)
-        return {
-            "output_dir": req.output_dir,
-            "status": "success",
-            "message": "Treinamento concluído com sucesso",
-        }
+        # Treino roda em um worker dedicado da fila de jobs
+        job = submit_job("train", req.dict(), priority=priority)
+        return JSONResponse(
+            status_code=202,
+            content={
+                **job,
+                "job_id": job["id"],
+                "output_dir": req.output_dir,
+                "message": "Treinamento enfileirado",
+            },
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro no treinamento: {str(e)}")
 
 
+@router.get("/status")
+async def training_status(limit: int = Query(20, ge=1, le=200)):
+    """Jobs de treinamento mais recentes"""
+    jobs, total = job_queue.list(kind="train", limit=limit)
+    return {"jobs": jobs, "total": total}
+
+
 @router.get("/models")
 async def list_supported_models():
     """Lista modelos suportados para treinamento"""
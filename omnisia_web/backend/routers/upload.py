@@ -1,94 +1,298 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Header, Response, Query
+from pydantic import BaseModel, Field
 from pathlib import Path
-import shutil
-import os
-from typing import List, Dict
-from ..config import UPLOAD_DIR, ALLOWED_EXTENSIONS, MAX_FILE_SIZE
+from typing import List, Dict, Optional
+from ..config import (
+    UPLOAD_DIR,
+    ALLOWED_EXTENSIONS,
+    MAX_FILE_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    UPLOAD_SESSION_TTL,
+    FILE_CATALOG_DB,
+)
+from ..services.file_catalog import FileCatalog, SORT_FIELDS
+from ..services.artifact_cache import artifact_cache
+from ..services.upload_store import (
+    ResumableUploads,
+    UploadOffsetMismatch,
+    UploadSessionNotFound,
+    UploadTooLarge,
+    safe_filename,
+    save_upload_file,
+    stream_to_path,
+)
 from datetime import datetime
+import logging
+import os
 
 router = APIRouter()
+logger = logging.getLogger("omnisia.upload")
 
+# Sessões de upload retomável (estilo tus)
+resumable_uploads = ResumableUploads(UPLOAD_DIR, MAX_FILE_SIZE, UPLOAD_SESSION_TTL)
+
+# Catálogo indexado dos arquivos enviados
+file_catalog = FileCatalog(UPLOAD_DIR, FILE_CATALOG_DB)
+
+
+class UploadSessionRequest(BaseModel):
+    filename: str = Field(..., description="Nome do arquivo")
+    size: int = Field(..., gt=0, description="Tamanho total em bytes")
+
+
+def validate_filename(filename: Optional[str]) -> str:
+    """Valida nome e extensão do arquivo enviado"""
+    # Verifica se o arquivo tem nome
+    if not filename:
+        raise HTTPException(status_code=400, detail="Nome do arquivo é obrigatório")
+
+    try:
+        name = safe_filename(filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-def validate_file(file: UploadFile) -> None:
-    """Valida o arquivo enviado"""
     # Verifica extensão
-    file_ext = Path(file.filename).suffix.lower()
+    file_ext = Path(name).suffix.lower()
     if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
             detail=f"Tipo de arquivo não permitido. Tipos aceitos: {', '.join(ALLOWED_EXTENSIONS)}",
         )
+    return name
 
-    # Verifica se o arquivo tem conteúdo
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="Nome do arquivo é obrigatório")
+
+def validate_file(file: UploadFile) -> str:
+    """Valida o arquivo enviado"""
+    return validate_filename(file.filename)
+
+
+def check_declared_size(size: Optional[int]) -> None:
+    """Recusa antes de ler o corpo quando o tamanho declarado excede o limite"""
+    if size is not None and size > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE // (1024*1024)}MB",
+        )
+
+
+def deduplicate(dest: Path, sha256: str) -> Optional[str]:
+    """Substitui um upload repetido por um hard link para o arquivo já existente"""
+    duplicate = file_catalog.find_by_hash(sha256, exclude=dest.name)
+    if duplicate is None:
+        return None
+    original = UPLOAD_DIR / duplicate["name"]
+    tmp = dest.with_name(f".{dest.name}.link")
+    try:
+        os.link(original, tmp)
+        os.replace(tmp, dest)
+    except OSError as e:
+        # Sistemas de arquivos sem hard link: mantém a cópia
+        tmp.unlink(missing_ok=True)
+        logger.warning(f"Não foi possível deduplicar {dest.name}: {str(e)}")
+    return duplicate["name"]
+
+
+def upload_info(saved: Dict, status: str = "Recebido") -> Dict:
+    """Registra no catálogo e retorna no formato do endpoint de listagem"""
+    dest = Path(saved["path"])
+    duplicate_of = deduplicate(dest, saved["sha256"])
+    file_catalog.add_file(dest, sha256=saved["sha256"])
+    # Evita recalcular o hash ao consultar o cache de OCR/transcrição
+    artifact_cache.remember_hash(dest, saved["sha256"])
+    return {
+        "name": dest.name,
+        "size": saved["size"],
+        "path": str(dest.resolve()),
+        "type": dest.suffix.lower().replace(".", ""),
+        "status": status,
+        "upload_date": datetime.now().isoformat(),
+        "sha256": saved["sha256"],
+        "duplicate_of": duplicate_of,
+    }
 
 
 @router.post("/")
 async def upload_file(file: UploadFile = File(...)):
     """Upload de arquivo com validação e retorno de metadados completos."""
     try:
-        validate_file(file)
-
-        # Verifica tamanho do arquivo
-        file_content = await file.read()
-        if len(file_content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE // (1024*1024)}MB",
-            )
-
-        # Salva o arquivo
-        dest = UPLOAD_DIR / file.filename
-        dest.write_bytes(file_content)
-
-        # Retorna o mesmo formato do endpoint de listagem
-        return {
-            "name": file.filename,
-            "size": len(file_content),
-            "path": str(dest.resolve()),
-            "type": dest.suffix.lower().replace(".", ""),
-            "status": "Recebido",
-            "upload_date": datetime.now().isoformat(),
-        }
+        filename = validate_file(file)
+
+        # Copia em blocos para um temporário e renomeia ao final; para
+        # arquivos grandes prefira PUT /upload/stream ou /upload/sessions
+        saved = await save_upload_file(
+            file, UPLOAD_DIR / filename, MAX_FILE_SIZE, UPLOAD_CHUNK_SIZE
+        )
+        return upload_info(saved)
+
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro no upload: {str(e)}")
+
+
+@router.put("/stream/{filename}")
+async def upload_stream(
+    filename: str, request: Request, content_length: Optional[int] = Header(None)
+):
+    """Upload do corpo bruto em streaming, sem multipart nem buffer do arquivo"""
+    try:
+        name = validate_filename(filename)
+        check_declared_size(content_length)
 
+        saved = await stream_to_path(request.stream(), UPLOAD_DIR / name, MAX_FILE_SIZE)
+        return upload_info(saved)
+
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro no upload: {str(e)}")
 
 
+def session_headers(session: Dict) -> Dict[str, str]:
+    return {
+        "Upload-Offset": str(session["offset"]),
+        "Upload-Length": str(session["length"]),
+        "Cache-Control": "no-store",
+    }
+
+
+def get_session_or_404(session_id: str) -> Dict:
+    try:
+        return resumable_uploads.get(session_id)
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Sessão de upload não encontrada")
+
+
+@router.post("/sessions", status_code=201)
+async def create_upload_session(req: UploadSessionRequest, response: Response):
+    """Cria uma sessão de upload retomável para arquivos grandes"""
+    name = validate_filename(req.filename)
+    check_declared_size(req.size)
+    resumable_uploads.cleanup_expired()
+
+    session = resumable_uploads.create(name, req.size)
+    response.headers.update(session_headers(session))
+    response.headers["Location"] = f"/upload/sessions/{session['id']}"
+    return session
+
+
+@router.head("/sessions/{session_id}")
+async def upload_session_offset(session_id: str):
+    """Offset já recebido, para retomar após queda de conexão"""
+    session = get_session_or_404(session_id)
+    return Response(status_code=200, headers=session_headers(session))
+
+
+@router.get("/sessions/{session_id}")
+async def get_upload_session(session_id: str):
+    """Estado da sessão de upload"""
+    return get_session_or_404(session_id)
+
+
+@router.patch("/sessions/{session_id}")
+async def append_upload_session(
+    session_id: str, request: Request, upload_offset: int = Header(...)
+):
+    """Envia um bloco a partir de Upload-Offset; conclui ao atingir o tamanho total"""
+    try:
+        session = await resumable_uploads.append(session_id, upload_offset, request.stream())
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Sessão de upload não encontrada")
+    except UploadOffsetMismatch as e:
+        raise HTTPException(
+            status_code=409, detail=str(e), headers={"Upload-Offset": str(e.expected)}
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro no upload: {str(e)}")
+
+    if session.get("completed"):
+        return upload_info(session)
+    return Response(status_code=204, headers=session_headers(session))
+
+
+@router.delete("/sessions/{session_id}")
+async def abort_upload_session(session_id: str):
+    """Cancela a sessão e descarta os dados recebidos"""
+    try:
+        resumable_uploads.abort(session_id)
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=404, detail="Sessão de upload não encontrada")
+    return {"status": "success", "message": "Sessão de upload cancelada"}
+
+
+def catalog_entry(entry: Dict) -> Dict:
+    """Registro do catálogo no formato da listagem"""
+    return {
+        "name": entry["name"],
+        "size": entry["size"],
+        "path": str((UPLOAD_DIR / entry["name"]).resolve()),
+        "type": entry["type"],
+        "status": entry["status"],
+        "upload_date": datetime.fromtimestamp(entry["created_at"]).isoformat(),
+        "modified_date": datetime.fromtimestamp(entry["modified_at"]).isoformat(),
+        "sha256": entry["sha256"],
+    }
+
+
 @router.get("/files", response_model=List[Dict])
-async def list_uploaded_files():
+async def list_uploaded_files(
+    response: Response,
+    type: Optional[str] = Query(None, description="Filtra por extensão (pdf, mp3...)"),
+    status: Optional[str] = Query(None, description="Filtra por status"),
+    search: Optional[str] = Query(None, description="Trecho do nome"),
+    sort: str = Query("upload_date", description=f"Ordenação: {', '.join(SORT_FIELDS)}"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(1000, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+):
     """
-    Lista todos os arquivos no diretório de upload, fornecendo
-    um dicionário completo de informações para cada arquivo.
+    Lista os arquivos enviados a partir do catálogo indexado, com filtros,
+    ordenação e paginação. O total sem paginação vai no cabeçalho X-Total-Count.
     """
     try:
-        files_info = []
-        if not UPLOAD_DIR.exists():
-            return []
-
-        for item in UPLOAD_DIR.iterdir():
-            if item.is_file():
-                file_info = {
-                    "name": item.name,
-                    "size": item.stat().st_size,
-                    "path": str(item.resolve()),
-                    "type": item.suffix.lower().replace(".", ""),
-                    "status": "Disponível",
-                    "upload_date": datetime.fromtimestamp(
-                        item.stat().st_ctime
-                    ).isoformat(),
-                }
-                files_info.append(file_info)
-
-        # Ordena os arquivos por data de modificação, os mais recentes primeiro
-        files_info.sort(key=lambda x: x["upload_date"], reverse=True)
-        return files_info
+        entries, total = file_catalog.list(
+            type=type,
+            status=status,
+            search=search,
+            sort=sort,
+            descending=order == "desc",
+            limit=limit,
+            offset=offset,
+        )
+        response.headers["X-Total-Count"] = str(total)
+        return [catalog_entry(entry) for entry in entries]
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        # Log do erro pode ser adicionado aqui
         raise HTTPException(
             status_code=500, detail=f"Erro ao listar arquivos: {str(e)}"
         )
+
+
+@router.delete("/files/{filename}")
+async def delete_uploaded_file(filename: str):
+    """Remove um arquivo enviado e sua entrada no catálogo"""
+    try:
+        name = safe_filename(filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    path = UPLOAD_DIR / name
+    if not path.is_file():
+        file_catalog.remove(name)
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+
+    try:
+        path.unlink()
+        file_catalog.remove(name)
+        artifact_cache.forget_hash(path)
+        return {"status": "success", "message": f"Arquivo {name} removido com sucesso"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao remover arquivo: {str(e)}")
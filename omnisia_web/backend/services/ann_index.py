@@ -0,0 +1,241 @@
+"""
+Fábrica de índices ANN (Flat, HNSW, IVF-Flat, IVF-PQ) para FAISS
+ANN index factory (Flat, HNSW, IVF-Flat, IVF-PQ) for FAISS
+"""
+
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger("omnisia.ann_index")
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+# Tipos que precisam de treinamento (k-means) antes de receber vetores
+TRAINED_INDEX_TYPES = ("ivf_flat", "ivf_pq")
+
+# Métricas: distância L2 ou produto interno (cosseno para vetores normalizados)
+METRICS = {"l2": faiss.METRIC_L2, "ip": faiss.METRIC_INNER_PRODUCT}
+
+
+def index_kind(index: Optional[faiss.Index]) -> Optional[str]:
+    """Retorna o tipo lógico de um índice FAISS"""
+    if index is None:
+        return None
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def default_nlist(ntotal: int) -> int:
+    """Número de listas IVF recomendado (~4 * sqrt(n))"""
+    return max(1, min(65536, int(4 * math.sqrt(max(ntotal, 1)))))
+
+
+def factory_string(index_type: str, dim: int, config: Dict[str, Any], ntotal: int = 0) -> str:
+    """Monta a string do faiss.index_factory para o tipo configurado"""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{config.get('hnsw_m', 32)},Flat"
+
+    nlist = config.get("nlist") or default_nlist(ntotal)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        pq_m = config.get("pq_m", 16)
+        if dim % pq_m:
+            raise ValueError(f"Dimensão {dim} não é divisível por pq_m={pq_m}")
+        return f"IVF{nlist},PQ{pq_m}x{config.get('pq_bits', 8)}"
+
+    raise ValueError(f"Tipo de índice não suportado: {index_type}. Use um de {INDEX_TYPES}")
+
+
+def build_index(index_type: str, dim: int, config: Dict[str, Any], ntotal: int = 0) -> faiss.Index:
+    """Cria um índice vazio (ainda não treinado, se for IVF)"""
+    metric = config.get("metric", "l2")
+    if metric not in METRICS:
+        raise ValueError(f"Métrica não suportada: {metric}. Use uma de {list(METRICS)}")
+    index = faiss.index_factory(dim, factory_string(index_type, dim, config, ntotal), METRICS[metric])
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = config.get("ef_construction", 200)
+    configure_search(index, config)
+    return index
+
+
+def configure_search(index: faiss.Index, config: Dict[str, Any]) -> None:
+    """Aplica parâmetros de busca (nprobe, efSearch)"""
+    kind = index_kind(index)
+    if kind in TRAINED_INDEX_TYPES:
+        faiss.extract_index_ivf(index).nprobe = config.get("nprobe", 16)
+    elif kind == "hnsw":
+        faiss.downcast_index(index).hnsw.efSearch = config.get("ef_search", 64)
+
+
+def id_selector(ids: np.ndarray, ntotal: int):
+    """Bitmap dos ids permitidos (1 bit por vetor) para busca pré-filtrada
+
+    Retorna o seletor e o buffer que o sustenta; o buffer precisa continuar
+    referenciado enquanto a busca roda.
+    """
+    bits = np.zeros(ntotal, dtype=bool)
+    bits[ids] = True
+    bitmap = np.packbits(bits, bitorder="little")
+    return faiss.IDSelectorBitmap(ntotal, faiss.swig_ptr(bitmap)), bitmap
+
+
+def search_parameters(index: faiss.Index, config: Dict[str, Any], selector) -> faiss.SearchParameters:
+    """Parâmetros de busca do tipo do índice com um seletor de ids"""
+    kind = index_kind(index)
+    if kind in TRAINED_INDEX_TYPES:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=config.get("nprobe", 16))
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=config.get("ef_search", 64))
+    return faiss.SearchParameters(sel=selector)
+
+
+def min_training_size(index_type: str, config: Dict[str, Any], ntotal: int) -> int:
+    """Quantidade mínima de vetores para treinar o índice sem degenerar"""
+    if index_type not in TRAINED_INDEX_TYPES:
+        return 0
+    nlist = config.get("nlist") or default_nlist(ntotal)
+    needed = 39 * nlist  # Recomendação do FAISS para o k-means
+    if index_type == "ivf_pq":
+        needed = max(needed, 39 * (1 << config.get("pq_bits", 8)))
+    return needed
+
+
+def training_threshold(index_type: str, config: Dict[str, Any], ntotal: int) -> int:
+    """Vetores necessários para migrar do Flat inicial para o tipo treinado"""
+    if index_type not in TRAINED_INDEX_TYPES:
+        return 0
+    return max(config.get("train_threshold", 50000), min_training_size(index_type, config, ntotal))
+
+
+def training_sample_size(index_type: str, config: Dict[str, Any], ntotal: int) -> int:
+    """Tamanho da amostra de treino: o configurado, nunca abaixo do mínimo do k-means
+
+    Com nlist automático (~4 * sqrt(n)) o mínimo passa de 100000 vetores
+    acima de ~410 mil vetores no índice.
+    """
+    return max(config.get("sample_size", 100000), min_training_size(index_type, config, ntotal))
+
+
+def iter_vectors(index: faiss.Index, start: int = 0, end: Optional[int] = None, batch_size: int = 65536):
+    """Reconstrói os vetores armazenados em lotes (exatos para Flat/HNSW/IVF-Flat)"""
+    end = index.ntotal if end is None else end
+    if index_kind(index) in TRAINED_INDEX_TYPES:
+        faiss.extract_index_ivf(index).make_direct_map()
+    for batch_start in range(start, end, batch_size):
+        count = min(batch_size, end - batch_start)
+        yield index.reconstruct_n(batch_start, count)
+
+
+class ReservoirSampler:
+    """Amostra uniforme de tamanho fixo sobre um fluxo de vetores (algoritmo R)"""
+
+    def __init__(self, capacity: int, seed: Optional[int] = None):
+        self.capacity = capacity
+        self.seen = 0
+        self.sample: Optional[np.ndarray] = None
+        self._filled = 0
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return self._filled
+
+    def add(self, vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype="float32")
+
+        # Preenche o reservatório enquanto houver espaço (cresce sob demanda)
+        free = min(self.capacity - self._filled, len(vectors))
+        if free:
+            needed = self._filled + free
+            if self.sample is None or len(self.sample) < needed:
+                size = min(self.capacity, max(needed, 2 * (0 if self.sample is None else len(self.sample))))
+                grown = np.empty((size, vectors.shape[1]), dtype="float32")
+                if self.sample is not None:
+                    grown[: self._filled] = self.sample[: self._filled]
+                self.sample = grown
+            self.sample[self._filled : self._filled + free] = vectors[:free]
+            self._filled += free
+            self.seen += free
+            vectors = vectors[free:]
+        if not len(vectors):
+            return
+
+        # Cada novo vetor i substitui uma posição com probabilidade capacity / (i + 1)
+        positions = self.seen + np.arange(len(vectors))
+        slots = (self._rng.random(len(vectors)) * (positions + 1)).astype(np.int64)
+        accepted = slots < self.capacity
+        self.sample[slots[accepted]] = vectors[accepted]
+        self.seen += len(vectors)
+
+    def get(self) -> np.ndarray:
+        if self.sample is None:
+            return np.empty((0, 0), dtype="float32")
+        return self.sample[: self._filled].copy()
+
+
+def benchmark_index_types(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    config: Dict[str, Any],
+    k: int = 10,
+    index_types: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Mede recall@k e latência de cada tipo de índice contra a busca exata"""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    dim = vectors.shape[1]
+
+    # Verdade de referência com a mesma métrica dos candidatos (L2 ou IP)
+    exact = build_index("flat", dim, config)
+    exact.add(vectors)
+    _, ground_truth = exact.search(queries, k)
+
+    results = []
+    for index_type in index_types or INDEX_TYPES:
+        try:
+            index = build_index(index_type, dim, config, len(vectors))
+            build_start = time.perf_counter()
+            if not index.is_trained:
+                sample_size = min(len(vectors), training_sample_size(index_type, config, len(vectors)))
+                sample_ids = np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)
+                index.train(vectors[sample_ids])
+            index.add(vectors)
+            build_seconds = time.perf_counter() - build_start
+
+            latencies = []
+            found = np.empty_like(ground_truth)
+            for i in range(len(queries)):
+                query_start = time.perf_counter()
+                _, found[i : i + 1] = index.search(queries[i : i + 1], k)
+                latencies.append((time.perf_counter() - query_start) * 1000)
+
+            hits = sum(len(set(found[i]) & set(ground_truth[i])) for i in range(len(queries)))
+            results.append(
+                {
+                    "index_type": index_type,
+                    "factory": factory_string(index_type, dim, config, len(vectors)),
+                    "recall_at_k": hits / float(k * len(queries)),
+                    "latency_ms_mean": float(np.mean(latencies)),
+                    "latency_ms_p95": float(np.percentile(latencies, 95)),
+                    "build_seconds": build_seconds,
+                    "bytes_per_vector": len(faiss.serialize_index(index)) / len(vectors),
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Benchmark do índice {index_type} falhou: {str(e)}")
+            results.append({"index_type": index_type, "error": str(e)})
+
+    return results
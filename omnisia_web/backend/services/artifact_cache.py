@@ -0,0 +1,326 @@
+"""
+Cache de artefatos derivados endereçado por conteúdo
+Content-addressed cache of derived artifacts
+
+Resultados caros (texto de OCR, transcrições com segmentos, áudio extraído
+de vídeos) são guardados sob a chave SHA-256 do arquivo de origem + tipo do
+artefato + parâmetros (idioma, modelo...). Reenviar ou reprocessar o mesmo
+conteúdo, com qualquer nome, reaproveita o resultado. O espaço em disco é
+limitado por uma política LRU; o total ocupado fica em uma tabela própria,
+atualizada na mesma transação de cada inserção ou remoção.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES, CACHE_ENABLED
+
+logger = logging.getLogger("omnisia.artifact_cache")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_access ON artifacts (last_access);
+CREATE INDEX IF NOT EXISTS idx_artifacts_hash ON artifacts (content_hash);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS totals (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def sha256_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def artifact_key(content_hash: str, kind: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Chave do artefato: conteúdo de origem + tipo + parâmetros"""
+    payload = json.dumps([content_hash, kind, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactCache:
+    """Armazém de artefatos em disco com índice SQLite e despejo LRU"""
+
+    def __init__(self, root: Path, max_bytes: int, enabled: bool = True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(root / "index.db"), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        # Índices criados antes do total acumulado: calcula uma única vez
+        self._db.execute(
+            "INSERT OR IGNORE INTO totals (name, value) "
+            "SELECT 'bytes', COALESCE(SUM(size), 0) FROM artifacts"
+        )
+        self._db.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Hash de conteúdo (memorizado por caminho, tamanho e mtime)
+    # ------------------------------------------------------------------
+
+    def known_hash(self, path: Path, stat: Optional[os.stat_result] = None) -> Optional[str]:
+        """SHA-256 já registrado para o arquivo no estado atual, sem ler o conteúdo"""
+        path = Path(path).resolve()
+        stat = stat or path.stat()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (str(path), stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        return row[0] if row else None
+
+    def content_hash(self, path: Path) -> str:
+        """SHA-256 do arquivo, recalculado só quando tamanho ou mtime mudam"""
+        path = Path(path).resolve()
+        stat = path.stat()
+        known = self.known_hash(path, stat)
+        if known:
+            return known
+        digest = sha256_file(path)
+        self.remember_hash(path, digest, stat)
+        return digest
+
+    def remember_hash(self, path: Path, sha256: str, stat: Optional[os.stat_result] = None) -> None:
+        """Registra um hash já conhecido (ex.: calculado durante o upload)"""
+        path = Path(path).resolve()
+        stat = stat or path.stat()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (str(path), stat.st_size, stat.st_mtime_ns, sha256),
+            )
+            self._db.commit()
+
+    def forget_hash(self, path: Path) -> None:
+        """Esquece o hash de um arquivo removido (ex.: upload apagado)"""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM file_hashes WHERE path = ?", (str(Path(path).resolve()),)
+            )
+            self._db.commit()
+
+    def prune_hashes(self) -> int:
+        """Remove hashes de arquivos que não existem mais ou mudaram"""
+        with self._lock:
+            rows = self._db.execute("SELECT path, size, mtime_ns FROM file_hashes").fetchall()
+        stale = []
+        for path, size, mtime_ns in rows:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stale.append((path,))
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                stale.append((path,))
+        if stale:
+            with self._lock:
+                self._db.executemany("DELETE FROM file_hashes WHERE path = ?", stale)
+                self._db.commit()
+            logger.info(f"Cache de artefatos: {len(stale)} hashes de arquivos removidos")
+        return len(stale)
+
+    # ------------------------------------------------------------------
+    # Artefatos
+    # ------------------------------------------------------------------
+
+    def _artifact_path(self, key: str, suffix: str) -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def get_path(self, content_hash: str, kind: str, params: Optional[Dict[str, Any]] = None) -> Optional[Path]:
+        """Caminho do artefato em cache ou None"""
+        if not self.enabled:
+            return None
+        key = artifact_key(content_hash, kind, params)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT filename FROM artifacts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            path = self.root / row[0]
+            if not path.exists():
+                self._delete_rows([key])
+                self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE artifacts SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+            self.hits += 1
+        return path
+
+    def put_path(
+        self,
+        content_hash: str,
+        kind: str,
+        params: Optional[Dict[str, Any]],
+        source: Path,
+        move: bool = False,
+    ) -> Path:
+        """Copia (ou move) um arquivo para o cache e retorna o novo caminho"""
+        if not self.enabled:
+            return source
+        key = artifact_key(content_hash, kind, params)
+        dest = self._artifact_path(key, Path(source).suffix)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+
+        # Grava em temporário no mesmo diretório e renomeia atomicamente
+        tmp = dest.with_name(f".{uuid.uuid4().hex}.tmp")
+        if move:
+            shutil.move(str(source), tmp)
+        else:
+            shutil.copyfile(source, tmp)
+        os.replace(tmp, dest)
+
+        self._record(key, content_hash, kind, params, dest)
+        return dest
+
+    def _add_bytes(self, delta: int) -> None:
+        self._db.execute("UPDATE totals SET value = value + ? WHERE name = 'bytes'", (delta,))
+
+    def _delete_rows(self, keys) -> None:
+        """Apaga registros e desconta seus tamanhos do total (sem commit)"""
+        for key in keys:
+            row = self._db.execute("SELECT size FROM artifacts WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._db.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+                self._add_bytes(-row[0])
+
+    def _record(self, key, content_hash, kind, params, dest: Path) -> None:
+        now = time.time()
+        size = dest.stat().st_size
+        with self._lock:
+            # Substituição do mesmo artefato: desconta o tamanho anterior
+            self._delete_rows([key])
+            self._add_bytes(size)
+            self._db.execute(
+                "INSERT OR REPLACE INTO artifacts "
+                "(key, content_hash, kind, params, filename, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    content_hash,
+                    kind,
+                    json.dumps(params or {}, sort_keys=True, default=str),
+                    str(dest.relative_to(self.root)),
+                    size,
+                    now,
+                    now,
+                ),
+            )
+            self._db.commit()
+        self.evict()
+
+    def _put_bytes(self, content_hash, kind, params, data: bytes, suffix: str) -> None:
+        if not self.enabled:
+            return
+        key = artifact_key(content_hash, kind, params)
+        dest = self._artifact_path(key, suffix)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{uuid.uuid4().hex}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, dest)
+        self._record(key, content_hash, kind, params, dest)
+
+    def get_text(self, content_hash: str, kind: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        path = self.get_path(content_hash, kind, params)
+        return path.read_text(encoding="utf-8") if path else None
+
+    def put_text(self, content_hash: str, kind: str, params: Optional[Dict[str, Any]], text: str) -> None:
+        self._put_bytes(content_hash, kind, params, text.encode("utf-8"), ".txt")
+
+    def get_json(self, content_hash: str, kind: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        path = self.get_path(content_hash, kind, params)
+        return json.loads(path.read_text(encoding="utf-8")) if path else None
+
+    def put_json(self, content_hash: str, kind: str, params: Optional[Dict[str, Any]], value: Any) -> None:
+        data = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        self._put_bytes(content_hash, kind, params, data, ".json")
+
+    # ------------------------------------------------------------------
+    # Manutenção
+    # ------------------------------------------------------------------
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM totals WHERE name = 'bytes'").fetchone()
+        return row[0] if row else 0
+
+    def evict(self) -> int:
+        """Remove os artefatos menos usados até caber em max_bytes"""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, filename, size FROM artifacts ORDER BY last_access"
+            )
+            victims = []
+            for key, filename, size in rows:
+                if total <= self.max_bytes:
+                    break
+                victims.append((key, filename))
+                total -= size
+            for key, filename in victims:
+                (self.root / filename).unlink(missing_ok=True)
+            self._delete_rows([key for key, _ in victims])
+            removed = len(victims)
+            self._db.commit()
+        logger.info(f"Cache de artefatos: {removed} artefatos despejados (LRU)")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "artifacts": count,
+            "total_bytes": self.total_bytes(),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Instância global (uma por processo; o índice SQLite é compartilhado)
+artifact_cache = ArtifactCache(ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES, CACHE_ENABLED)
@@ -0,0 +1,229 @@
+"""
+OCR em lote de pastas, padrões glob e arquivos compactados
+Batch OCR over directories, glob patterns and archives
+
+As imagens são lidas uma a uma da origem (pasta, glob, ZIP ou TAR), sem
+extrair o arquivo compactado para o disco, e processadas em paralelo pelo
+pool de engines Tesseract. No máximo 2x `workers` imagens ficam em memória.
+Cada resultado vira uma linha do manifesto (JSONL, ou Parquet quando
+pyarrow está instalado), gravado à medida que as imagens terminam.
+
+Este módulo não depende da configuração do backend para poder ser usado
+também pela CLI raiz (main.py ocr-batch).
+"""
+
+import functools
+import glob
+import io
+import json
+import logging
+import tarfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from PIL import Image
+
+from .tesseract_pool import TesseractPool, recognize
+
+# Import condicional para pyarrow (manifesto em Parquet)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger("omnisia.batch_ocr")
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def _is_image(name: str) -> bool:
+    return Path(name).suffix.lower() in IMAGE_EXTENSIONS and not Path(name).name.startswith(".")
+
+
+def _is_archive(path: Path) -> bool:
+    return path.is_file() and path.name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def describe_source(source: str) -> str:
+    """Tipo da origem: directory, zip, tar ou glob; erro se nada corresponder"""
+    path = Path(source)
+    if path.is_dir():
+        return "directory"
+    if _is_archive(path):
+        return "zip" if path.name.lower().endswith(".zip") else "tar"
+    if glob.has_magic(source):
+        return "glob"
+    raise ValueError(f"Origem deve ser uma pasta, um padrão glob ou um arquivo ZIP/TAR: {source}")
+
+
+def iter_image_sources(source: str) -> Iterator[Tuple[str, bytes]]:
+    """Gera (nome, bytes) de cada imagem da origem, lendo sob demanda"""
+    kind = describe_source(source)
+    if kind == "directory":
+        for path in sorted(Path(source).rglob("*")):
+            if path.is_file() and _is_image(path.name):
+                yield str(path), path.read_bytes()
+    elif kind == "glob":
+        for name in sorted(glob.iglob(source, recursive=True)):
+            if Path(name).is_file() and _is_image(name):
+                yield name, Path(name).read_bytes()
+    elif kind == "zip":
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _is_image(info.filename):
+                    yield info.filename, archive.read(info)
+    else:
+        # Modo de stream ("r|*"): membros lidos em sequência, sem índice em memória
+        with tarfile.open(source, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and _is_image(member.name):
+                    handle = archive.extractfile(member)
+                    yield member.name, handle.read()
+
+
+def count_image_sources(source: str) -> Optional[int]:
+    """Total de imagens quando dá para contar sem ler o conteúdo (não em TAR)"""
+    kind = describe_source(source)
+    if kind == "directory":
+        return sum(1 for p in Path(source).rglob("*") if p.is_file() and _is_image(p.name))
+    if kind == "glob":
+        return sum(1 for n in glob.iglob(source, recursive=True) if Path(n).is_file() and _is_image(n))
+    if kind == "zip":
+        with zipfile.ZipFile(source) as archive:
+            return sum(1 for i in archive.infolist() if not i.is_dir() and _is_image(i.filename))
+    return None
+
+
+class ManifestWriter:
+    """Grava os resultados em JSONL ou, para caminhos .parquet, em Parquet"""
+
+    PARQUET_BATCH = 500
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.format = "parquet" if path.suffix.lower() == ".parquet" else "jsonl"
+        if self.format == "parquet" and not PYARROW_AVAILABLE:
+            raise Exception("pyarrow não está instalado. Execute: pip install pyarrow")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._rows = []
+        self._writer = None
+        self._handle = open(path, "w", encoding="utf-8") if self.format == "jsonl" else None
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self._handle is not None:
+            self._handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        self._rows.append(record)
+        if len(self._rows) >= self.PARQUET_BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        # Caixas de palavras viram JSON para manter o esquema estável entre lotes
+        rows = [
+            {**row, "boxes": json.dumps(row["boxes"], ensure_ascii=False)} if "boxes" in row else row
+            for row in self._rows
+        ]
+        table = pa.Table.from_pylist(rows, schema=self._writer.schema if self._writer else None)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(str(self.path), table.schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            return
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _ocr_one(
+    item: Tuple[str, bytes],
+    language: str,
+    config: str,
+    with_boxes: bool,
+    preprocess: Optional[Callable[[Image.Image], Image.Image]] = None,
+) -> Dict[str, Any]:
+    """Decodifica, pré-processa e reconhece uma imagem (roda nas threads do pool)"""
+    name, data = item
+    start = time.perf_counter()
+    # Campos fixos: o esquema do manifesto é o mesmo com ou sem erro
+    record: Dict[str, Any] = {"source": name, "text": "", "confidence": None, "words": 0, "error": None}
+    if with_boxes:
+        record["boxes"] = []
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = preprocess(image) if preprocess else image.convert("RGB")
+            record.update(recognize(image, language, config, with_boxes))
+    except Exception as e:
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def run_batch_ocr(
+    source: str,
+    manifest_path: Path,
+    language: str,
+    pool: TesseractPool,
+    preprocess: Optional[Callable[[Image.Image], Image.Image]] = None,
+    with_boxes: bool = False,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Dict[str, Any]:
+    """OCR de todas as imagens da origem; retorna o resumo com a vazão"""
+    total = count_image_sources(source)
+    logger.info(f"OCR em lote de {source} ({total if total is not None else '?'} imagens)")
+
+    writer = ManifestWriter(manifest_path)
+    done = failed = chars = 0
+    start = time.perf_counter()
+    # Janela limitada e ordem de entrada vêm de TesseractPool.map
+    records = pool.map(
+        iter_image_sources(source),
+        language,
+        with_boxes,
+        task=functools.partial(_ocr_one, preprocess=preprocess),
+    )
+    try:
+        for record in records:
+            writer.write(record)
+            done += 1
+            if record["error"]:
+                failed += 1
+                logger.warning(f"Falha no OCR de {record['source']}: {record['error']}")
+            else:
+                chars += len(record["text"])
+            if progress:
+                fraction = done / total if total else 0.0
+                progress(fraction, f"{done}{'/' + str(total) if total else ''} imagens")
+    finally:
+        records.close()
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "source": source,
+        "manifest_path": str(manifest_path),
+        "format": writer.format,
+        "images": done,
+        "failed": failed,
+        "chars": chars,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(done / elapsed, 3) if elapsed else 0.0,
+        "workers": pool.workers,
+        "backend": pool.backend,
+    }
+    logger.info(
+        f"OCR em lote concluído: {done} imagens ({failed} falhas) em {elapsed:.1f}s "
+        f"({summary['pages_per_second']} páginas/s, {pool.workers} workers)"
+    )
+    return summary
@@ -0,0 +1,262 @@
+"""
+Limpeza e divisão de textos em trechos por tokens
+Text cleaning and token-aware chunking
+
+Implementação única, usada também por processamento/chunking.py: trechos de
+até `max_tokens` tokens, sem cortar frases, com sobreposição entre trechos
+consecutivos e sem atravessar quebras de página ("\\f"). A entrada pode ser
+uma string ou um iterável de pedaços; só o trecho em montagem fica em
+memória. `Chunker` faz o mesmo de forma incremental, para textos que chegam
+aos poucos.
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+PAGE_BREAK = "\f"
+
+# Fim de frase (pontuação seguida de espaço), parágrafo ou quebra de página
+_BOUNDARY = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+|\n\s*\n|\f")
+_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Sem nenhum limite de frase neste tamanho, corta no último espaço
+MAX_SENTENCE_CHARS = 20000
+
+_CONTROL = re.compile(r"[\x00-\x08\x0b\x0e-\x1f\x7f\u00ad\u200b-\u200d\ufeff]")
+_HYPHENATED = re.compile(r"(\w)-\n(\w)")
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*")
+
+
+def normalize_text(text: str) -> str:
+    """Limpa texto extraído (OCR, PDF, transcrição) mantendo parágrafos e páginas
+
+    Normaliza Unicode (NFC), remove caracteres de controle e invisíveis,
+    junta palavras hifenizadas na quebra de linha e reduz espaços repetidos.
+    """
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = _CONTROL.sub("", text)
+    text = _HYPHENATED.sub(r"\1\2", text)
+    text = _SPACES.sub(" ", text)
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+@dataclass
+class Chunk:
+    text: str
+    start: int  # posição (caracteres) no texto de origem
+    end: int
+    tokens: int
+    index: int
+    page: int = 1
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+def token_counter(tokenizer: Any = None) -> Callable[[str], int]:
+    """Função que conta tokens: tokenizer Hugging Face, função ou aproximação por palavras"""
+    if tokenizer is None:
+        return lambda text: len(_TOKEN.findall(text))
+    if hasattr(tokenizer, "encode"):
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+    return lambda text: len(tokenizer(text))
+
+
+def join_pages(pages: Iterable[str]) -> Iterator[str]:
+    """Junta páginas (ex.: OCR página a página) com o separador de página"""
+    for number, page in enumerate(pages):
+        if number:
+            yield PAGE_BREAK
+        yield page
+
+
+class SentenceSplitter:
+    """Divisão incremental em frases: cada pedaço devolve as frases já completas"""
+
+    def __init__(self):
+        self.buffer, self.offset, self.page = "", 0, 1
+
+    def feed(self, piece: str) -> List[Tuple[str, int, int]]:
+        """(frase, início, página) das frases que o pedaço completou"""
+        sentences = []
+        buffer, position = self.buffer + piece, 0
+        for match in _BOUNDARY.finditer(buffer):
+            # Um separador no fim do buffer pode continuar no próximo pedaço
+            if match.end() == len(buffer) and PAGE_BREAK not in match.group():
+                break
+            sentences.append((buffer[position : match.end()], self.offset + position, self.page))
+            self.page += match.group().count(PAGE_BREAK)
+            position = match.end()
+        buffer = buffer[position:]
+        self.offset += position
+
+        while len(buffer) > MAX_SENTENCE_CHARS:
+            cut = buffer.rfind(" ", 0, MAX_SENTENCE_CHARS) + 1 or MAX_SENTENCE_CHARS
+            sentences.append((buffer[:cut], self.offset, self.page))
+            buffer = buffer[cut:]
+            self.offset += cut
+        self.buffer = buffer
+        return sentences
+
+    def finish(self) -> List[Tuple[str, int, int]]:
+        """Frase final ainda no buffer"""
+        sentences = [(self.buffer, self.offset, self.page)] if self.buffer else []
+        self.offset += len(self.buffer)
+        self.buffer = ""
+        return sentences
+
+
+def iter_sentences(pieces: Iterable[str]) -> Iterator[Tuple[str, int, int]]:
+    """Gera (frase, início, página) lendo o texto em pedaços
+
+    Cada frase inclui o espaço que a segue, de modo que as frases
+    concatenadas reproduzem o texto original.
+    """
+    splitter = SentenceSplitter()
+    for piece in pieces:
+        yield from splitter.feed(piece)
+    yield from splitter.finish()
+
+
+def _split_long(
+    sentence: str, start: int, count: Callable[[str], int], max_tokens: int, overlap_tokens: int
+):
+    """Divide uma frase maior que o limite em janelas de palavras"""
+    words = [(m.group(), m.start()) for m in re.finditer(r"\S+\s*", sentence)]
+    sizes = [count(word) for word, _ in words]
+    first = 0
+    while first < len(words):
+        last, total = first, 0
+        while last < len(words) and (total + sizes[last] <= max_tokens or last == first):
+            total += sizes[last]
+            last += 1
+        piece_start = words[first][1]
+        piece_end = words[last - 1][1] + len(words[last - 1][0])
+        yield sentence[piece_start:piece_end], start + piece_start, total
+        if last >= len(words):
+            return
+        # Recua até `overlap_tokens` palavras para a próxima janela
+        back, kept = last, 0
+        while back - 1 > first and kept + sizes[back - 1] <= overlap_tokens:
+            back -= 1
+            kept += sizes[back]
+        first = back
+
+
+class Chunker:
+    """Divisão incremental em trechos: `feed` devolve os trechos já fechados
+
+    Permite montar trechos de um documento que chega aos poucos (páginas,
+    janelas de transcrição, blocos de arquivo) com índices e posições
+    contínuos no documento inteiro. Regras iguais às de `iter_chunks`.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 256,
+        overlap_tokens: int = 32,
+        tokenizer: Any = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        respect_pages: bool = True,
+        clean: Optional[Callable[[str], str]] = None,
+    ):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens deve ser menor que max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count = token_counter(tokenizer)
+        self.metadata = metadata or {}
+        self.respect_pages = respect_pages
+        self.clean = clean
+        self._sentences = SentenceSplitter()
+        self._current: List[Tuple[str, int, int]] = []  # (frase, início, tokens)
+        self._current_tokens = 0
+        self._current_page = 1
+        self.index = 0
+
+    def _has_text(self) -> bool:
+        return bool(self._current) and bool("".join(s for s, _, _ in self._current).strip())
+
+    def _emit(self) -> Chunk:
+        current = self._current
+        text = "".join(sentence for sentence, _, _ in current)
+        start = current[0][1] + (len(text) - len(text.lstrip()))
+        end = current[0][1] + len(text.rstrip())
+        body = self.clean(text) if self.clean else " ".join(text.split())
+        chunk = Chunk(
+            body, start, end, self._current_tokens, self.index, self._current_page, dict(self.metadata)
+        )
+        self.index += 1
+        return chunk
+
+    def _overlap_tail(self):
+        tail, kept = [], 0
+        for sentence in reversed(self._current[1:]):
+            if kept + sentence[2] > self.overlap_tokens:
+                break
+            tail.insert(0, sentence)
+            kept += sentence[2]
+        return tail, kept
+
+    def _add(self, sentence: str, start: int, page: int) -> List[Chunk]:
+        chunks = []
+        if self.respect_pages and page != self._current_page:
+            if self._has_text():
+                chunks.append(self._emit())
+            self._current, self._current_tokens, self._current_page = [], 0, page
+        if not sentence.strip():
+            if self._current:
+                self._current.append((sentence, start, 0))
+            return chunks
+
+        size = self.count(sentence)
+        parts = (
+            [(sentence, start, size)]
+            if size <= self.max_tokens
+            else list(_split_long(sentence, start, self.count, self.max_tokens, self.overlap_tokens))
+        )
+        for part, part_start, part_size in parts:
+            if self._current and self._current_tokens + part_size > self.max_tokens:
+                chunks.append(self._emit())
+                self._current, self._current_tokens = self._overlap_tail()
+                # A sobreposição não pode empurrar a frase nova além do limite
+                while self._current and self._current_tokens + part_size > self.max_tokens:
+                    self._current_tokens -= self._current.pop(0)[2]
+            self._current.append((part, part_start, part_size))
+            self._current_tokens += part_size
+        return chunks
+
+    def feed(self, piece: str) -> List[Chunk]:
+        """Acrescenta um pedaço do texto; devolve os trechos que ele fechou"""
+        return [chunk for sentence in self._sentences.feed(piece) for chunk in self._add(*sentence)]
+
+    def finish(self) -> List[Chunk]:
+        """Fim do texto: devolve os trechos restantes"""
+        chunks = [chunk for sentence in self._sentences.finish() for chunk in self._add(*sentence)]
+        if self._has_text():
+            chunks.append(self._emit())
+        self._current, self._current_tokens = [], 0
+        return chunks
+
+
+def iter_chunks(
+    source: Union[str, Iterable[str]],
+    max_tokens: int = 256,
+    overlap_tokens: int = 32,
+    tokenizer: Any = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    respect_pages: bool = True,
+    clean: Optional[Callable[[str], str]] = None,
+) -> Iterator[Chunk]:
+    """Gera trechos de até `max_tokens` tokens, sem cortar frases
+
+    Trechos consecutivos repetem as últimas frases do anterior, até
+    `overlap_tokens`. Com `respect_pages`, um trecho nunca atravessa uma
+    quebra de página. `start`/`end` apontam para o texto de entrada; o texto
+    do trecho passa por `clean` ou, sem ela, tem os espaços reduzidos a um.
+    """
+    chunker = Chunker(max_tokens, overlap_tokens, tokenizer, metadata, respect_pages, clean)
+    for piece in [source] if isinstance(source, str) else source:
+        yield from chunker.feed(piece)
+    yield from chunker.finish()
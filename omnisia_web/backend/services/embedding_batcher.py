@@ -0,0 +1,151 @@
+"""
+Micro-batching de chamadas de encode para o modelo de embeddings
+Micro-batching of encode calls for the embedding model
+
+Chamadas concorrentes (consultas do chat e ingestão de contexto) são
+agrupadas em lotes limitados por tamanho máximo e tempo máximo de espera,
+e executadas em um pool de threads fora do event loop.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .workload_pools import PoolSaturatedError
+
+logger = logging.getLogger("omnisia.embedding_batcher")
+
+
+class EmbeddingBatcher:
+    """Agrupa chamadas concorrentes de encode em micro-lotes"""
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        workers: int = 2,
+        executor: Optional[Executor] = None,
+        max_pending: int = 0,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.workers = workers
+        # Limite de chamadas aguardando encode (0 = sem limite)
+        self.max_pending = max_pending
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="embedding"
+        )
+        self._pending = 0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # Métricas
+        self.batches = 0
+        self.encoded_texts = 0
+        self.requests = 0
+        self.rejected = 0
+
+    def _ensure_started(self) -> None:
+        """Cria fila e dispatcher no event loop em execução"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._dispatcher and not self._dispatcher.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._dispatcher = loop.create_task(self._dispatch())
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Retorna os embeddings de `texts`, agrupando com outras chamadas"""
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+        if self.max_pending and self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolSaturatedError(
+                "embedding", f"Fila de embeddings cheia ({self.max_pending}); tente novamente"
+            )
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._pending += 1
+        try:
+            await self._queue.put((texts, future))
+            self.requests += 1
+            return await future
+        finally:
+            self._pending -= 1
+
+    async def _collect(self) -> List[Tuple[List[str], asyncio.Future]]:
+        """Aguarda a primeira chamada e agrega as seguintes até o limite do lote"""
+        pending = [await self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    async def _dispatch(self) -> None:
+        while True:
+            pending = await self._collect()
+            await self._slots.acquire()
+            self._loop.create_task(self._run_batch(pending))
+
+    async def _run_batch(self, pending: List[Tuple[List[str], asyncio.Future]]) -> None:
+        try:
+            texts = [text for item_texts, _ in pending for text in item_texts]
+            try:
+                embeddings = await self._loop.run_in_executor(self.executor, self.encode_fn, texts)
+                embeddings = np.asarray(embeddings, dtype="float32")
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.batches += 1
+            self.encoded_texts += len(texts)
+
+            # Devolve a cada chamador a sua fatia do lote
+            offset = 0
+            for item_texts, future in pending:
+                if not future.done():
+                    future.set_result(embeddings[offset : offset + len(item_texts)])
+                offset += len(item_texts)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "pending": self._pending,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "encoded_texts": self.encoded_texts,
+            "avg_batch_size": self.encoded_texts / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def shutdown(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,215 @@
+"""
+Cache de embeddings endereçado por conteúdo
+Content-addressed embedding cache
+
+A chave é o SHA-1 do texto normalizado + nome do modelo, separada por
+backend de inferência (fp32, int8, ONNX), cujos vetores diferem um pouco.
+Os vetores ficam em um LRU em memória e, opcionalmente, em um SQLite em
+disco limitado a `max_disk_items` (os menos usados são removidos).
+
+Acertos não escrevem no disco: o uso (`last_used`) é acumulado em memória
+e gravado em lote junto da próxima inserção, de `flush()` ou ao atingir
+`touch_batch` chaves. Com o disco ligado, as chamadas fazem E/S de SQLite e
+devem rodar fora do event loop.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("omnisia.embedding_cache")
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza unicode e espaços para que variações triviais compartilhem a chave"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def content_key(text: str, model_name: str) -> str:
+    """Chave de conteúdo de um texto para um modelo"""
+    payload = f"{model_name}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+class EmbeddingCache:
+    """LRU de embeddings com persistência opcional em SQLite"""
+
+    def __init__(
+        self,
+        max_items: int = 10000,
+        disk_path: Optional[Path] = None,
+        max_disk_items: int = 1000000,
+        namespace: str = "",
+        touch_batch: int = 1000,
+    ):
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self.touch_batch = touch_batch
+        # Prefixo das chaves (ex.: o backend de inferência)
+        self.namespace = namespace
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_items = 0
+        # chave -> último uso ainda não gravado no disco
+        self._touched: Dict[str, float] = {}
+
+        if disk_path is not None:
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(disk_path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB, last_used REAL)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(embeddings)")}
+            if "last_used" not in columns:
+                # Caches antigos: entradas sem data são as primeiras a sair
+                self._db.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+            )
+            self._db.commit()
+            self._disk_items = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._prune()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def _scoped(self, key: str) -> str:
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Retorna os vetores encontrados (memória e depois disco)"""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                else:
+                    missing.append(key)
+
+            if found and self._db is not None:
+                # Mantém no disco o que continua sendo usado em memória
+                self._touch(list(found))
+            if missing and self._db is not None:
+                disk_found = []
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start : start + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                        [self._scoped(key) for key in chunk],
+                    ).fetchall()
+                    prefix = len(self._scoped(""))
+                    for scoped_key, blob in rows:
+                        key = scoped_key[prefix:]
+                        vector = np.frombuffer(blob, dtype="float32")
+                        found[key] = vector
+                        disk_found.append(key)
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+                if disk_found:
+                    self._touch(disk_found)
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touches()
+                self._db.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """Armazena vetores recém-calculados"""
+        vectors = np.asarray(vectors, dtype="float32")
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector.copy())
+            if self._db is not None:
+                now = time.time()
+                cursor = self._db.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    [(self._scoped(key), vector.tobytes(), now) for key, vector in zip(keys, vectors)],
+                )
+                self._disk_items += max(cursor.rowcount, 0)
+                # Usos pendentes entram antes da poda, que segue o last_used
+                self._flush_touches()
+                self._db.commit()
+                self._prune()
+
+    def flush(self) -> None:
+        """Grava no disco os usos acumulados desde a última escrita"""
+        with self._lock:
+            if self._db is not None and self._touched:
+                self._flush_touches()
+                self._db.commit()
+
+    def _touch(self, keys: List[str]) -> None:
+        now = time.time()
+        for key in keys:
+            self._touched[key] = now
+
+    def _flush_touches(self) -> None:
+        if not self._touched:
+            return
+        self._db.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE key = ?",
+            [(used, self._scoped(key)) for key, used in self._touched.items()],
+        )
+        self._touched = {}
+
+    def _prune(self) -> None:
+        """Remove do disco os vetores usados há mais tempo acima do limite"""
+        if self._disk_items <= self.max_disk_items:
+            return
+        # Remove 10% a mais para não podar a cada inserção
+        excess = self._disk_items - int(self.max_disk_items * 0.9)
+        cursor = self._db.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._disk_items -= cursor.rowcount
+        self._db.commit()
+        logger.info(f"Cache de embeddings em disco: {cursor.rowcount} vetores removidos")
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "max_items": self.max_items,
+            "persistent": self.persistent,
+            "disk_items": self._disk_items,
+            "max_disk_items": self.max_disk_items,
+            "namespace": self.namespace,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self.flush()
+            self._db.close()
@@ -1,58 +1,376 @@
-import faiss
+import asyncio
+import re
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from typing import List, Tuple
-from ..config import EMBEDDING_MODEL
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from .ann_index import benchmark_index_types
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import EmbeddingCache, content_key
+from .quantization import load_sentence_transformer
+from .vector_store import PersistentVectorStore
+from .workload_pools import WorkloadRejected, pools
+from ..config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_CONFIG,
+    VECTOR_STORE_MMAP,
+    VECTOR_SNAPSHOT_EVERY,
+    VECTOR_SNAPSHOT_INTERVAL,
+    VECTOR_DB_CONFIG,
+    VECTOR_TENANT_PARTITIONS,
+    CACHE_ENABLED,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_DISK,
+    EMBEDDING_CACHE_DISK_MAX_ITEMS,
+    ONNX_MODELS_DIR,
+    get_vector_store_path,
+)
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+
+def record_key(text: str, model_name: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """Chave de um vetor no índice: o conteúdo, mais tenant e documento quando houver
+
+    O mesmo trecho em documentos (ou tenants) diferentes vira um vetor por
+    documento, para que os filtros o encontrem; o embedding vem do cache.
+    """
+    metadata = metadata or {}
+    scope = (metadata.get("tenant"), metadata.get("doc_id"))
+    if scope == (None, None):
+        return content_key(text, model_name)
+    return content_key("\0".join(value or "" for value in scope) + "\0" + text, model_name)
 
 
 class EmbeddingService:
-    def __init__(self, model_name: str = EMBEDDING_MODEL):
+    def __init__(self, model_name: str = EMBEDDING_MODEL, store_dir: Path = None):
         """Inicializa o serviço de embeddings"""
-        self.model = SentenceTransformer(model_name)
-        self.index = None
-        self.texts = []
+        self.model_name = model_name
+        # fp32, int8 ou ONNX Runtime; os vetores ficam no mesmo espaço do fp32
+        self.backend = EMBEDDING_BACKEND
+        self.model = load_sentence_transformer(model_name, EMBEDDING_BACKEND, ONNX_MODELS_DIR)
+
+        # Um diretório por modelo evita misturar espaços vetoriais diferentes
+        if store_dir is None:
+            store_dir = get_vector_store_path() / _slug(model_name)
+
+        self.store = self._open_store(store_dir)
+        # Tenants grandes ganham índice próprio; os demais dividem o principal
+        self.partitions: Dict[str, PersistentVectorStore] = {
+            tenant: self._open_store(store_dir / "tenants" / _slug(tenant))
+            for tenant in VECTOR_TENANT_PARTITIONS
+        }
+
+        # Agrupa encodes concorrentes e os executa no pool "embedding"
+        embedding_pool = pools["embedding"]
+        self.batcher = EmbeddingBatcher(
+            self.encode,
+            max_batch_size=EMBEDDING_CONFIG["batch_size"],
+            max_wait_ms=EMBEDDING_CONFIG["max_wait_ms"],
+            workers=embedding_pool.workers,
+            executor=embedding_pool.executor,
+            max_pending=embedding_pool.queue_size,
+        )
+
+        # Cache de embeddings por conteúdo (hash do texto normalizado + modelo)
+        self.cache = (
+            EmbeddingCache(
+                EMBEDDING_CACHE_SIZE,
+                store_dir / "embedding_cache.db" if EMBEDDING_CACHE_DISK else None,
+                max_disk_items=EMBEDDING_CACHE_DISK_MAX_ITEMS,
+                # Vetores de fp32, int8 e ONNX diferem: um espaço de chaves por backend
+                namespace=EMBEDDING_BACKEND,
+            )
+            if CACHE_ENABLED
+            else None
+        )
+
+    @staticmethod
+    def _open_store(directory: Path) -> PersistentVectorStore:
+        return PersistentVectorStore(
+            directory,
+            use_mmap=VECTOR_STORE_MMAP,
+            snapshot_every=VECTOR_SNAPSHOT_EVERY,
+            snapshot_interval=VECTOR_SNAPSHOT_INTERVAL,
+            index_config=VECTOR_DB_CONFIG,
+        )
+
+    @property
+    def index(self):
+        return self.store.index
+
+    @property
+    def texts(self):
+        return self.store.texts
+
+    @property
+    def stores(self) -> List[PersistentVectorStore]:
+        return [self.store, *self.partitions.values()]
+
+    @property
+    def ntotal(self) -> int:
+        """Vetores no índice principal e nas partições"""
+        return sum(store.ntotal for store in self.stores)
+
+    def store_for(self, tenant: Optional[str] = None) -> PersistentVectorStore:
+        """Índice onde ficam os vetores do tenant"""
+        return self.partitions.get(tenant, self.store) if tenant else self.store
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Gera embeddings em lotes de EMBEDDING_CONFIG['batch_size']"""
+        embeddings = self.model.encode(
+            texts, batch_size=EMBEDDING_CONFIG["batch_size"], show_progress_bar=False
+        )
+        return np.asarray(embeddings, dtype="float32")
+
+    def _keys(self, texts: List[str]) -> List[str]:
+        return [content_key(text, self.model_name) for text in texts]
+
+    def _new_records(
+        self, texts: List[str], metadata: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Tuple[PersistentVectorStore, List[int], List[str]]]:
+        """Agrupa os textos por índice de destino sem os já indexados ou repetidos
+
+        Retorna (índice, posições em `texts`, chaves) para cada índice.
+        """
+        groups: Dict[PersistentVectorStore, List[int]] = {}
+        for position in range(len(texts)):
+            tenant = (metadata[position] or {}).get("tenant") if metadata else None
+            groups.setdefault(self.store_for(tenant), []).append(position)
+
+        records = []
+        for store, positions in groups.items():
+            keys = [
+                record_key(texts[i], self.model_name, metadata[i] if metadata else None)
+                for i in positions
+            ]
+            seen = store.existing_keys(keys)
+            new_positions, new_keys = [], []
+            for position, key in zip(positions, keys):
+                if key not in seen:
+                    seen.add(key)
+                    new_positions.append(position)
+                    new_keys.append(key)
+            if new_positions:
+                records.append((store, new_positions, new_keys))
+        return records
+
+    @staticmethod
+    def _store_records(records, texts, embeddings, metadata) -> int:
+        """Grava cada grupo de _new_records no seu índice"""
+        added, offset = 0, 0
+        for store, positions, keys in records:
+            added += store.add(
+                [texts[i] for i in positions],
+                embeddings[offset : offset + len(positions)],
+                keys,
+                [metadata[i] for i in positions] if metadata else None,
+            )
+            offset += len(positions)
+        return added
+
+    def _lookup_cache(self, keys: List[str]) -> Tuple[Dict[str, np.ndarray], List[int]]:
+        """Retorna vetores em cache e as posições que precisam de encode"""
+        cached = self.cache.get_many(keys) if self.cache is not None else {}
+        return cached, [i for i, key in enumerate(keys) if key not in cached]
+
+    def _assemble(
+        self, keys: List[str], cached: Dict[str, np.ndarray], missing: List[int], encoded
+    ) -> np.ndarray:
+        """Junta vetores do cache e recém-calculados na ordem original"""
+        fresh = {keys[i]: vector for i, vector in zip(missing, encoded)}
+        if fresh and self.cache is not None:
+            self.cache.put_many(list(fresh), np.asarray(list(fresh.values())))
+        return np.vstack([cached.get(key, fresh.get(key)) for key in keys]).astype("float32")
+
+    def cached_encode(self, texts: List[str], keys: List[str] = None) -> np.ndarray:
+        """Encode que reaproveita vetores já calculados"""
+        keys = keys or self._keys(texts)
+        cached, missing = self._lookup_cache(keys)
+        encoded = self.encode([texts[i] for i in missing]) if missing else []
+        return self._assemble(keys, cached, missing, encoded)
+
+    async def acached_encode(self, texts: List[str], keys: List[str] = None) -> np.ndarray:
+        """Versão assíncrona de cached_encode (misses em micro-lotes)
+
+        Com o cache em disco, consulta e gravação (SQLite) rodam fora do
+        event loop; o cache só em memória é consultado diretamente.
+        """
+        keys = keys or self._keys(texts)
+        on_disk = self.cache is not None and self.cache.persistent
+        if on_disk:
+            cached, missing = await asyncio.to_thread(self._lookup_cache, keys)
+        else:
+            cached, missing = self._lookup_cache(keys)
+        encoded = await self.batcher.encode([texts[i] for i in missing]) if missing else []
+        if on_disk and missing:
+            return await asyncio.to_thread(self._assemble, keys, cached, missing, encoded)
+        return self._assemble(keys, cached, missing, encoded)
 
-    def add_texts(self, texts: List[str]):
-        """Adiciona textos ao índice vetorial"""
+    def add_texts(
+        self, texts: List[str], metadata: Optional[List[Dict[str, Any]]] = None
+    ) -> int:
+        """Adiciona textos ao índice vetorial; retorna quantos eram novos
+
+        `metadata` (um dicionário por texto: doc_id, source, file_type,
+        tenant, created_at...) é usado nos filtros da busca.
+        """
         try:
-            # Gera embeddings
-            embeddings = self.model.encode(texts)
+            records = self._new_records(texts, metadata)
+            if not records:
+                return 0
 
-            # Inicializa o índice FAISS se necessário
-            if self.index is None:
-                dimension = embeddings.shape[1]
-                self.index = faiss.IndexFlatL2(dimension)
+            # Gera embeddings (reaproveitando o cache)
+            new_texts = [texts[i] for _, positions, _ in records for i in positions]
+            embeddings = self.cached_encode(new_texts)
 
-            # Adiciona ao índice
-            self.index.add(embeddings.astype("float32"))
-            self.texts.extend(texts)
+            # Persiste textos, WAL, índice e metadados
+            return self._store_records(records, texts, embeddings, metadata)
 
         except Exception as e:
             raise Exception(f"Erro ao adicionar textos: {str(e)}")
 
-    def query(self, text: str, k: int = 5) -> List[Tuple[str, float]]:
-        """Consulta textos similares"""
-        try:
-            if self.index is None or len(self.texts) == 0:
-                return []
+    def _targets(
+        self, filters: Optional[Dict[str, Any]]
+    ) -> List[Tuple[PersistentVectorStore, Dict[str, Any]]]:
+        """Índices a consultar e o filtro aplicado em cada um
 
-            # Gera embedding da query
-            query_embedding = self.model.encode([text])
+        Um tenant com partição é buscado só nela (sem o filtro de tenant); os
+        demais tenants, no índice principal filtrado pelos metadados.
+        """
+        filters = {name: value for name, value in (filters or {}).items() if value is not None}
+        tenant = filters.pop("tenant", None)
+        if tenant is None:
+            return [(store, filters) for store in self.stores if store.ntotal]
 
-            # Busca no índice
-            distances, indices = self.index.search(query_embedding.astype("float32"), k)
+        tenants = [tenant] if isinstance(tenant, str) else list(tenant)
+        targets = [(self.partitions[t], filters) for t in tenants if t in self.partitions]
+        shared = [t for t in tenants if t not in self.partitions]
+        if shared:
+            targets.append((self.store, {**filters, "tenant": shared}))
+        return [(store, store_filters) for store, store_filters in targets if store.ntotal]
 
-            # Retorna resultados
-            results = []
-            for idx, distance in zip(indices[0], distances[0]):
-                if idx < len(self.texts):
-                    results.append((self.texts[idx], float(distance)))
+    def _search(
+        self, query_embedding: np.ndarray, k: int, filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Busca filtrada em cada índice alvo e junta os k melhores"""
+        hits = []
+        for store, store_filters in self._targets(filters):
+            ids = store.filter_ids(store_filters)
+            for idx, distance in store.search(query_embedding, k, ids)[0]:
+                hits.append((distance, idx, store))
+        hits.sort(key=lambda hit: hit[0], reverse=VECTOR_DB_CONFIG.get("metric") == "ip")
+        hits = hits[:k]
 
-            return results
+        metadata = {
+            store: store.get_metadata([idx for _, idx, hit_store in hits if hit_store is store])
+            for store in {store for _, _, store in hits}
+        }
+        return [
+            {"text": store.texts[idx], "distance": distance, "metadata": metadata[store].get(idx, {})}
+            for distance, idx, store in hits
+        ]
 
+    def search(
+        self, text: str, k: int = 5, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Textos similares com distância e metadados, opcionalmente filtrados
+
+        `filters` aceita doc_id, source, file_type e tenant (valor ou lista) e
+        created_after / created_before (epoch).
+        """
+        try:
+            if not self.ntotal:
+                return []
+            return self._search(self.cached_encode([text]), k, filters)
         except Exception as e:
             raise Exception(f"Erro na consulta: {str(e)}")
 
-    def add_text(self, text: str):
+    def query(
+        self, text: str, k: int = 5, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float]]:
+        """Consulta textos similares"""
+        return [(hit["text"], hit["distance"]) for hit in self.search(text, k, filters)]
+
+    async def aadd_texts(
+        self, texts: List[str], metadata: Optional[List[Dict[str, Any]]] = None
+    ) -> int:
+        """Versão assíncrona de add_texts (encode em micro-lotes)"""
+        try:
+            records = await asyncio.to_thread(self._new_records, texts, metadata)
+            if not records:
+                return 0
+            new_texts = [texts[i] for _, positions, _ in records for i in positions]
+            embeddings = await self.acached_encode(new_texts)
+            return await asyncio.to_thread(
+                self._store_records, records, texts, embeddings, metadata
+            )
+        except WorkloadRejected:
+            raise
+        except Exception as e:
+            raise Exception(f"Erro ao adicionar textos: {str(e)}")
+
+    async def asearch(
+        self, text: str, k: int = 5, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Versão assíncrona de search (encode em micro-lotes)"""
+        try:
+            if not self.ntotal:
+                return []
+            query_embedding = await self.acached_encode([text])
+            return await asyncio.to_thread(self._search, query_embedding, k, filters)
+        except WorkloadRejected:
+            raise
+        except Exception as e:
+            raise Exception(f"Erro na consulta: {str(e)}")
+
+    async def aquery(
+        self, text: str, k: int = 5, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float]]:
+        """Versão assíncrona de query (encode em micro-lotes)"""
+        hits = await self.asearch(text, k, filters)
+        return [(hit["text"], hit["distance"]) for hit in hits]
+
+    def add_text(self, text: str) -> int:
         """Adiciona um único texto"""
-        self.add_texts([text])
+        return self.add_texts([text])
+
+    def benchmark_index_types(self, sample_size: int = 20000, queries: int = 200, k: int = 10):
+        """Compara recall@k e latência dos tipos de índice sobre uma amostra do corpus"""
+        vectors = self.store.get_vectors(sample_size)
+        if not len(vectors):
+            return []
+        rng = np.random.default_rng(0)
+        query_vectors = vectors[rng.choice(len(vectors), min(queries, len(vectors)), replace=False)]
+        return benchmark_index_types(vectors, query_vectors, VECTOR_DB_CONFIG, k=k)
+
+    def snapshot(self):
+        """Grava snapshot do índice em disco"""
+        for store in self.stores:
+            store.snapshot()
+
+    def maybe_snapshot(self) -> bool:
+        """Grava snapshot periódico se houver alterações pendentes"""
+        if self.cache is not None:
+            # Usos acumulados do cache de embeddings (LRU em disco)
+            self.cache.flush()
+        return any([store.maybe_snapshot() for store in self.stores])
+
+    def clear(self):
+        """Remove todo o contexto armazenado (memória e disco)"""
+        for store in self.stores:
+            store.clear()
+
+    def partition_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Estado do índice de cada tenant com partição própria"""
+        return {tenant: store.stats() for tenant, store in self.partitions.items()}
+
+    def close(self):
+        """Grava alterações pendentes e libera arquivos"""
+        self.batcher.shutdown()
+        if self.cache is not None:
+            self.cache.close()
+        for store in self.stores:
+            store.close()
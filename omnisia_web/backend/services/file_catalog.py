@@ -0,0 +1,332 @@
+"""
+Catálogo persistente dos arquivos enviados
+Persistent catalog of uploaded files
+
+Mantém em SQLite nome, tamanho, hash, tipo, status e datas de cada arquivo
+de UPLOAD_DIR, para que a listagem seja uma consulta indexada em vez de uma
+varredura do diretório a cada requisição. Upload e remoção atualizam o
+catálogo diretamente; um observador (watchdog, quando instalado, ou
+varredura periódica) reconcilia alterações feitas fora da API.
+
+Este módulo não depende da configuração do backend para poder ser usado
+também pela API raiz (web/api.py).
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Import condicional para watchdog (eventos do sistema de arquivos)
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+logger = logging.getLogger("omnisia.file_catalog")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    sha256 TEXT,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    modified_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_created ON files (created_at);
+CREATE INDEX IF NOT EXISTS idx_files_size ON files (size);
+CREATE INDEX IF NOT EXISTS idx_files_type ON files (type, created_at);
+CREATE INDEX IF NOT EXISTS idx_files_status ON files (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files (sha256);
+"""
+
+# Campos de ordenação aceitos -> coluna
+SORT_FIELDS = {
+    "upload_date": "created_at",
+    "modified": "modified_at",
+    "name": "name",
+    "size": "size",
+    "type": "type",
+}
+
+
+def file_type(name: str) -> str:
+    return Path(name).suffix.lower().replace(".", "")
+
+
+class FileCatalog:
+    """Catálogo SQLite dos arquivos de um diretório de upload"""
+
+    def __init__(self, upload_dir: Path, db_path: Path, default_status: str = "Disponível"):
+        self.upload_dir = upload_dir
+        self.default_status = default_status
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+        self._watcher = None
+
+    @staticmethod
+    def _visible(name: str) -> bool:
+        # Ignora temporários (.partial) e arquivos ocultos
+        return not name.startswith(".")
+
+    # ------------------------------------------------------------------
+    # Atualização
+    # ------------------------------------------------------------------
+
+    def upsert(
+        self,
+        name: str,
+        size: int,
+        modified_at: float,
+        sha256: Optional[str] = None,
+        status: Optional[str] = None,
+        created_at: Optional[float] = None,
+    ) -> None:
+        """Insere ou atualiza um arquivo; hash e status anteriores são preservados se omitidos"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO files (name, size, sha256, type, status, created_at, modified_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET size = excluded.size, "
+                "sha256 = COALESCE(?, CASE WHEN files.size = excluded.size "
+                "AND files.modified_at = excluded.modified_at THEN files.sha256 END), "
+                "status = COALESCE(?, files.status), modified_at = excluded.modified_at",
+                (
+                    name,
+                    size,
+                    sha256,
+                    file_type(name),
+                    status or self.default_status,
+                    created_at or now,
+                    modified_at,
+                    sha256,
+                    status,
+                ),
+            )
+            self._db.commit()
+
+    def add_file(self, path: Path, sha256: Optional[str] = None, status: Optional[str] = None) -> None:
+        """Registra um arquivo a partir do disco"""
+        stat = path.stat()
+        self.upsert(path.name, stat.st_size, stat.st_mtime, sha256=sha256, status=status)
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM files WHERE name = ?", (name,))
+            self._db.commit()
+        return cursor.rowcount > 0
+
+    def find_by_hash(self, sha256: str, exclude: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Outro arquivo do catálogo com o mesmo conteúdo"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM files WHERE sha256 = ? AND name != ? LIMIT 1",
+                (sha256, exclude or ""),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def set_status(self, name: str, status: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE files SET status = ? WHERE name = ?", (status, name))
+            self._db.commit()
+
+    def reconcile(self) -> Dict[str, int]:
+        """Sincroniza o catálogo com o diretório (uma única varredura com scandir)"""
+        on_disk: Dict[str, Tuple[int, float, float]] = {}
+        if self.upload_dir.exists():
+            with os.scandir(self.upload_dir) as entries:
+                for entry in entries:
+                    if entry.is_file() and self._visible(entry.name):
+                        stat = entry.stat()
+                        on_disk[entry.name] = (stat.st_size, stat.st_mtime, stat.st_ctime)
+
+        with self._lock:
+            known = {
+                row["name"]: (row["size"], row["modified_at"])
+                for row in self._db.execute("SELECT name, size, modified_at FROM files")
+            }
+
+        added = updated = 0
+        for name, (size, mtime, ctime) in on_disk.items():
+            if name not in known:
+                self.upsert(name, size, mtime, created_at=ctime)
+                added += 1
+            elif known[name] != (size, mtime):
+                self.upsert(name, size, mtime)
+                updated += 1
+
+        removed = [name for name in known if name not in on_disk]
+        if removed:
+            with self._lock:
+                self._db.executemany("DELETE FROM files WHERE name = ?", [(n,) for n in removed])
+                self._db.commit()
+
+        if added or updated or removed:
+            logger.info(
+                f"Catálogo reconciliado: +{added} ~{updated} -{len(removed)} "
+                f"({len(on_disk)} arquivos)"
+            )
+        return {"added": added, "updated": updated, "removed": len(removed), "total": len(on_disk)}
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM files WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def list(
+        self,
+        type: Optional[str] = None,
+        status: Optional[str] = None,
+        search: Optional[str] = None,
+        sort: str = "upload_date",
+        descending: bool = True,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Listagem filtrada, ordenada e paginada; retorna (página, total)"""
+        column = SORT_FIELDS.get(sort)
+        if column is None:
+            raise ValueError(f"Ordenação deve ser uma de: {list(SORT_FIELDS)}")
+
+        where, args = [], []
+        if type:
+            where.append("type = ?")
+            args.append(type.lower().lstrip("."))
+        if status:
+            where.append("status = ?")
+            args.append(status)
+        if search:
+            where.append("name LIKE ? ESCAPE '\\'")
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            args.append(f"%{escaped}%")
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        direction = "DESC" if descending else "ASC"
+
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM files {clause}", args).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT * FROM files {clause} ORDER BY {column} {direction}, name "
+                f"LIMIT ? OFFSET ?",
+                args + [limit, offset],
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    # ------------------------------------------------------------------
+    # Observador
+    # ------------------------------------------------------------------
+
+    def start_watcher(self, poll_interval: float = 60.0) -> None:
+        """Reconcilia agora e passa a acompanhar alterações do diretório"""
+        self.reconcile()
+        if WATCHDOG_AVAILABLE:
+            self._watcher = _WatchdogWatcher(self)
+        else:
+            self._watcher = _PollingWatcher(self, poll_interval)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def close(self) -> None:
+        self.stop_watcher()
+        with self._lock:
+            self._db.close()
+
+
+class _PollingWatcher:
+    """Reconciliação periódica quando watchdog não está instalado"""
+
+    def __init__(self, catalog: FileCatalog, interval: float):
+        self.catalog = catalog
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="file-catalog", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.catalog.reconcile()
+            except Exception as e:
+                logger.error(f"Erro ao reconciliar catálogo: {str(e)}")
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+
+if WATCHDOG_AVAILABLE:
+
+    class _CatalogEventHandler(FileSystemEventHandler):
+        """Aplica eventos do sistema de arquivos ao catálogo"""
+
+        def __init__(self, catalog: FileCatalog):
+            self.catalog = catalog
+
+        def _refresh(self, path: str) -> None:
+            path = Path(path)
+            if path.parent != self.catalog.upload_dir or not self.catalog._visible(path.name):
+                return
+            try:
+                self.catalog.add_file(path)
+            except FileNotFoundError:
+                self.catalog.remove(path.name)
+
+        def on_created(self, event):
+            if not event.is_directory:
+                self._refresh(event.src_path)
+
+        def on_modified(self, event):
+            if not event.is_directory:
+                self._refresh(event.src_path)
+
+        def on_closed(self, event):
+            self._refresh(event.src_path)
+
+        def on_deleted(self, event):
+            if not event.is_directory:
+                self.catalog.remove(Path(event.src_path).name)
+
+        def on_moved(self, event):
+            if not event.is_directory:
+                self.catalog.remove(Path(event.src_path).name)
+                self._refresh(event.dest_path)
+
+
+class _WatchdogWatcher:
+    """Eventos inotify/FSEvents via watchdog"""
+
+    def __init__(self, catalog: FileCatalog):
+        self._observer = Observer()
+        self._observer.schedule(
+            _CatalogEventHandler(catalog), str(catalog.upload_dir), recursive=False
+        )
+
+    def start(self) -> None:
+        self._observer.start()
+
+    def stop(self) -> None:
+        self._observer.stop()
+        self._observer.join(timeout=5)
@@ -0,0 +1,314 @@
+"""
+Embeddings de imagem com CLIP e índice multimodal
+CLIP image embeddings and multimodal index
+
+Imagens são decodificadas em um pool de threads, empilhadas em lotes para
+`get_image_features` e normalizadas (L2). Os vetores vão para um índice
+FAISS de produto interno, em que o score é a similaridade de cosseno. Textos
+passam pelo encoder de texto do mesmo modelo, o que permite buscas
+texto→imagem e imagem→imagem sem chamar o modelo para cada imagem indexada.
+
+Cada vetor guarda o `doc_id` do documento de origem: o hash de conteúdo do
+cache de artefatos, o mesmo que identifica o OCR e a transcrição do arquivo.
+
+O índice só é aberto no primeiro uso e apenas o processo da API escreve nele;
+os workers da fila de jobs importam este módulo sem abrir o índice.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+from PIL import Image
+
+from .artifact_cache import artifact_cache
+from .quantization import TORCH_BACKENDS, check_backend, quantize_int8
+from .vector_store import PersistentVectorStore
+from ..config import (
+    CLIP_BACKEND,
+    CLIP_BATCH_SIZE,
+    CLIP_DECODE_WORKERS,
+    CLIP_MODEL,
+    VECTOR_DB_CONFIG,
+    VECTOR_SNAPSHOT_EVERY,
+    VECTOR_SNAPSHOT_INTERVAL,
+    VECTOR_STORE_MMAP,
+    get_vector_store_path,
+)
+
+# Import condicional para CLIP (transformers + torch)
+try:
+    import torch
+    from transformers import CLIPModel, CLIPProcessor
+
+    CLIP_AVAILABLE = True
+except ImportError:
+    CLIP_AVAILABLE = False
+
+logger = logging.getLogger("omnisia.image_embeddings")
+
+ImageInput = Union[str, Path, bytes, Image.Image, np.ndarray]
+
+
+def load_image(image: ImageInput) -> Image.Image:
+    """Abre caminho, bytes, array ou imagem PIL como RGB"""
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image).convert("RGB")
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        image = Image.open(io.BytesIO(bytes(image)))
+    elif not isinstance(image, Image.Image):
+        image = Image.open(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    else:
+        image.load()
+    return image
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normaliza linhas para norma L2 unitária (produto interno = cosseno)"""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def image_key(image: Image.Image, model_name: str) -> str:
+    """Chave de conteúdo de uma imagem decodificada para um modelo"""
+    digest = hashlib.sha1(f"{model_name}\0{image.size}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class ClipEncoder:
+    """Modelo CLIP carregado sob demanda, com decodificação paralela e lotes"""
+
+    def __init__(
+        self, model_name: str, batch_size: int = 32, decode_workers: int = 4, backend: str = "fp32"
+    ):
+        self.model_name = model_name
+        self.backend = check_backend(backend, TORCH_BACKENDS, "CLIP")
+        self.batch_size = batch_size
+        self.decode_workers = max(1, decode_workers)
+        self._model = None
+        self._processor = None
+        self._device = "cpu"
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                if not CLIP_AVAILABLE:
+                    raise Exception("CLIP não disponível. Execute: pip install torch transformers")
+                logger.info(f"Carregando modelo CLIP: {self.model_name}")
+                self._processor = CLIPProcessor.from_pretrained(self.model_name)
+                model = CLIPModel.from_pretrained(self.model_name)
+                if self.backend == "int8":
+                    # Quantização dinâmica roda só em CPU
+                    self._device = "cpu"
+                    self._model = quantize_int8(model)
+                else:
+                    self._device = "cuda" if torch.cuda.is_available() else "cpu"
+                    self._model = model.to(self._device).eval()
+        return self._model, self._processor
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.decode_workers, thread_name_prefix="clip-decode"
+                )
+            return self._executor
+
+    def decode(self, images: Iterable[ImageInput]) -> Iterator[Image.Image]:
+        """Decodifica em paralelo, na ordem de entrada (no máximo 2 lotes em voo)"""
+        window = self.batch_size * 2
+        pending: deque = deque()
+        try:
+            for image in images:
+                pending.append(self.executor.submit(load_image, image))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def encode_images(self, images: Sequence[Image.Image]) -> np.ndarray:
+        """Vetores normalizados de imagens já decodificadas, em lotes"""
+        model, processor = self._load()
+        vectors = []
+        for start in range(0, len(images), self.batch_size):
+            batch = list(images[start : start + self.batch_size])
+            inputs = processor(images=batch, return_tensors="pt").to(self._device)
+            with torch.inference_mode():
+                features = model.get_image_features(**inputs)
+            vectors.append(features.float().cpu().numpy())
+        return normalize(np.vstack(vectors))
+
+    def encode_texts(self, texts: Sequence[str]) -> np.ndarray:
+        """Vetores normalizados de textos no mesmo espaço das imagens"""
+        model, processor = self._load()
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = list(texts[start : start + self.batch_size])
+            inputs = processor(text=batch, return_tensors="pt", padding=True, truncation=True).to(
+                self._device
+            )
+            with torch.inference_mode():
+                features = model.get_text_features(**inputs)
+            vectors.append(features.float().cpu().numpy())
+        return normalize(np.vstack(vectors))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class ImageEmbeddingService:
+    """Índice de imagens por CLIP, com registros ligados aos documentos de origem"""
+
+    def __init__(self, model_name: str = CLIP_MODEL, store_dir: Path = None):
+        self.model_name = model_name
+        self.encoder = ClipEncoder(model_name, CLIP_BATCH_SIZE, CLIP_DECODE_WORKERS, CLIP_BACKEND)
+
+        # Um diretório por modelo, separado do índice de textos
+        if store_dir is None:
+            slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+            store_dir = get_vector_store_path() / "images" / slug
+        self.store_dir = store_dir
+        self._store: Optional[PersistentVectorStore] = None
+        self._store_lock = threading.Lock()
+
+    @property
+    def store(self) -> PersistentVectorStore:
+        """Índice persistente, aberto no primeiro uso"""
+        with self._store_lock:
+            if self._store is None:
+                self._store = PersistentVectorStore(
+                    self.store_dir,
+                    use_mmap=VECTOR_STORE_MMAP,
+                    snapshot_every=VECTOR_SNAPSHOT_EVERY,
+                    snapshot_interval=VECTOR_SNAPSHOT_INTERVAL,
+                    index_config={**VECTOR_DB_CONFIG, "metric": "ip"},
+                )
+            return self._store
+
+    def _record(self, image: ImageInput, doc_id: Optional[str], metadata: Optional[dict]) -> dict:
+        source = str(image) if isinstance(image, (str, Path)) else None
+        if doc_id is None and source:
+            doc_id = artifact_cache.content_hash(Path(source))
+        return {"doc_id": doc_id, "source": source, **(metadata or {})}
+
+    def add_images(
+        self,
+        images: Sequence[ImageInput],
+        doc_ids: Optional[Sequence[Optional[str]]] = None,
+        metadata: Optional[Sequence[Optional[dict]]] = None,
+    ) -> int:
+        """Indexa imagens; retorna quantas eram novas
+
+        `doc_ids` liga cada imagem ao seu documento (padrão: hash do arquivo,
+        quando a imagem é um caminho); `metadata` é guardado no registro
+        (ex.: instante do quadro em um vídeo).
+        """
+        try:
+            added = 0
+            chunk_size = self.encoder.batch_size * 4
+            decoded = self.encoder.decode(images)
+            for start in range(0, len(images), chunk_size):
+                count = min(chunk_size, len(images) - start)
+                chunk = [next(decoded) for _ in range(count)]
+                records = [
+                    self._record(
+                        images[start + i],
+                        doc_ids[start + i] if doc_ids else None,
+                        metadata[start + i] if metadata else None,
+                    )
+                    for i in range(count)
+                ]
+                keys = [image_key(image, self.model_name) for image in chunk]
+
+                # Só imagens ainda não indexadas passam pelo modelo
+                seen = self.store.existing_keys(keys)
+                keep = []
+                for position, key in enumerate(keys):
+                    if key not in seen:
+                        seen.add(key)
+                        keep.append(position)
+                if not keep:
+                    continue
+                embeddings = self.encoder.encode_images([chunk[i] for i in keep])
+                added += self.store.add(
+                    [json.dumps(records[i], ensure_ascii=False) for i in keep],
+                    embeddings,
+                    [keys[i] for i in keep],
+                )
+            return added
+
+        except Exception as e:
+            raise Exception(f"Erro ao indexar imagens: {str(e)}")
+
+    def _hits(self, query: np.ndarray, k: int) -> List[Dict[str, Any]]:
+        hits = self.store.search(query, k)[0]
+        return [{**json.loads(self.store.texts[idx]), "score": score} for idx, score in hits]
+
+    def search_text(self, text: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Imagens mais próximas de uma descrição em texto"""
+        try:
+            if self.store.ntotal == 0:
+                return []
+            return self._hits(self.encoder.encode_texts([text]), k)
+        except Exception as e:
+            raise Exception(f"Erro na busca de imagens: {str(e)}")
+
+    def search_image(self, image: ImageInput, k: int = 5) -> List[Dict[str, Any]]:
+        """Imagens mais próximas de uma imagem de consulta"""
+        try:
+            if self.store.ntotal == 0:
+                return []
+            return self._hits(self.encoder.encode_images([load_image(image)]), k)
+        except Exception as e:
+            raise Exception(f"Erro na busca de imagens: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "backend": self.encoder.backend,
+            "available": CLIP_AVAILABLE,
+            "loaded": self.encoder.loaded,
+            "index": self.store.stats(),
+        }
+
+    def maybe_snapshot(self) -> bool:
+        return self._store.maybe_snapshot() if self._store is not None else False
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def close(self) -> None:
+        self.encoder.shutdown()
+        with self._store_lock:
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+
+
+# Instância global: modelo e índice carregados no primeiro uso
+image_index = ImageEmbeddingService()
@@ -0,0 +1,586 @@
+"""
+Pipeline de ingestão em streaming: extração → limpeza → trechos → embeddings → índice
+Streaming ingestion pipeline: extract → clean → chunk → embed → index
+
+Cada estágio tem seus próprios workers (tarefas asyncio) e lê de uma fila
+asyncio limitada. Um estágio lento enche a fila à sua frente e o anterior
+espera em `put`: a memória fica limitada ao tamanho das filas, qualquer que
+seja o tamanho do documento. A extração entrega uma unidade por vez (página
+de PDF ou imagem, janela de transcrição, bloco de parágrafos de um texto).
+Os trechos são montados por documento, na ordem das unidades, por um único
+Chunker: índice e posições são contínuos no documento e um trecho pode
+atravessar blocos e janelas (páginas continuam separadas).
+
+O trabalho pesado continua nos pools de carga (OCR, STT e o micro-batching
+de embeddings); a extração de OCR/STT ocupa uma vaga do pool da carga até o
+fim do documento. Limpeza e divisão em trechos rodam em threads. Os passos de
+embed e índice são os de EmbeddingService.aadd_texts, separados em estágios;
+cada trecho leva os metadados usados nos filtros da busca (documento, origem,
+tipo, tenant, data) e vai para o índice do seu tenant.
+Cada estágio mede itens processados, tempo ocupado, vazão e utilização.
+"""
+
+import asyncio
+import bisect
+import contextlib
+import copy
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from . import ocr_service, stt_service
+from .chunking import PAGE_BREAK, Chunk, Chunker, normalize_text
+from .embedding_cache import content_key
+from .embeddings import record_key
+from .workload_pools import PoolSaturatedError, pools
+
+logger = logging.getLogger("omnisia.ingest")
+
+DOCUMENT_KINDS = {
+    "pdf": {".pdf"},
+    "image": {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff"},
+    "audio": {".mp3", ".wav", ".m4a", ".flac", ".ogg"},
+    "video": {".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv"},
+    "text": {".txt", ".md"},
+}
+
+
+def document_kind(path: Path) -> str:
+    """Tipo de extração pelo sufixo: pdf, image, audio, video ou text"""
+    suffix = path.suffix.lower()
+    for kind, suffixes in DOCUMENT_KINDS.items():
+        if suffix in suffixes:
+            return kind
+    raise ValueError(f"Tipo de arquivo sem extração de texto: {suffix or path.name}")
+
+
+def iter_text_blocks(path: Path, block_chars: int = 65536) -> Iterator[str]:
+    """Lê um arquivo de texto em blocos que terminam em parágrafo ou linha"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        buffer = ""
+        while True:
+            data = f.read(block_chars)
+            buffer += data
+            if not data:
+                break
+            if len(buffer) < block_chars:
+                continue
+            cut = buffer.rfind("\n\n")
+            if cut < block_chars // 2:
+                cut = buffer.rfind("\n")
+            if cut < block_chars // 2:
+                cut = buffer.rfind(" ")
+            if cut <= 0:
+                cut = len(buffer)
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+        if buffer.strip():
+            yield buffer
+
+
+def block_joint(block: str) -> str:
+    """Separador equivalente ao espaço em branco no início de um bloco"""
+    lead = block[: len(block) - len(block.lstrip())]
+    if lead.count("\n") >= 2:
+        return "\n\n"
+    if "\n" in lead:
+        return "\n"
+    return " " if lead else ""
+
+
+@dataclass
+class Document:
+    """Arquivo em ingestão e o que ainda falta para concluí-lo"""
+
+    doc_id: str
+    path: Path
+    kind: str
+    options: Dict[str, Any]
+    future: asyncio.Future
+    started: float = field(default_factory=time.perf_counter)
+    created_at: float = field(default_factory=time.time)
+    pending: int = 0  # unidades e trechos ainda dentro do pipeline
+    extracted: bool = False
+    error: Optional[BaseException] = None
+    units: int = 0
+    chunks: int = 0
+    tokens: int = 0
+    indexed: int = 0
+    duplicates: int = 0
+    # Montagem dos trechos: unidades em ordem, texto já entregue ao Chunker e
+    # onde começa cada unidade nele (para os metadados de cada trecho)
+    chunker: Optional[Chunker] = None
+    ready: Dict[int, "Unit"] = field(default_factory=dict)
+    next_unit: int = 0
+    chunk_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    fed_chars: int = 0
+    unit_starts: List[int] = field(default_factory=list)
+    unit_metadata: List[Dict[str, Any]] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "doc_id": self.doc_id,
+            "name": self.path.name,
+            "kind": self.kind,
+            "units": self.units,
+            "chunks": self.chunks,
+            "tokens": self.tokens,
+            "new_chunks": self.indexed,
+            "duplicates": self.duplicates,
+            "seconds": round(time.perf_counter() - self.started, 3),
+        }
+
+
+@dataclass
+class Unit:
+    """Página, janela de transcrição ou bloco de texto de um documento"""
+
+    doc: Document
+    number: int
+    text: str
+    metadata: Dict[str, Any]
+    joint: str = ""  # separador da unidade anterior no texto do documento
+    seq: int = 0  # posição na ordem de extração
+    final: bool = False  # marca de fim do documento
+
+
+@dataclass
+class EmbeddedBatch:
+    store: Any  # PersistentVectorStore de destino
+    items: List[Tuple[Document, Chunk]]
+    embeddings: np.ndarray
+    keys: List[str]
+
+
+class Stage:
+    """Estágio do pipeline: fila limitada, workers e métricas de vazão"""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[List[Any]], Awaitable[None]],
+        workers: int,
+        queue_size: int,
+        batch_size: int = 1,
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        # Itens retirados de uma vez da fila (lotes para o modelo de embeddings)
+        self.batch_size = max(1, batch_size)
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.started_at: Optional[float] = None
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def start(self) -> None:
+        self.queue = asyncio.Queue(self.queue_size)
+        self.started_at = time.monotonic()
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"ingest-{self.name}-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def full(self) -> bool:
+        return self.queue is not None and self.queue.full()
+
+    async def put(self, item: Any) -> None:
+        """Enfileira um item; espera enquanto a fila estiver cheia (backpressure)"""
+        await self.queue.put(item)
+        self.received += 1
+
+    async def _work(self) -> None:
+        while True:
+            items = [await self.queue.get()]
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            start = time.perf_counter()
+            try:
+                await self.handler(items)
+            except Exception as e:
+                # O handler já marcou os documentos afetados como falhos
+                self.failed += len(items)
+                logger.debug(f"Falha no estágio {self.name}: {str(e)}")
+            finally:
+                self.busy_seconds += time.perf_counter() - start
+                self.processed += len(items)
+                for _ in items:
+                    self.queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "received": self.received,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            # Itens/s enquanto ocupado (capacidade) e fração do tempo ocupado
+            "items_per_second": (
+                round(self.processed / self.busy_seconds, 2) if self.busy_seconds else 0.0
+            ),
+            "utilization": (
+                round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed else 0.0
+            ),
+        }
+
+
+class IngestPipeline:
+    """Leva arquivos do disco até trechos indexados, em estágios com filas limitadas"""
+
+    def __init__(
+        self,
+        embedding_service,
+        max_tokens: int = 256,
+        overlap_tokens: int = 32,
+        queue_size: int = 64,
+        max_documents: int = 16,
+        workers: Optional[Dict[str, int]] = None,
+        embed_batch_size: int = 32,
+        text_block_chars: int = 65536,
+    ):
+        self.embedding_service = embedding_service
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.text_block_chars = text_block_chars
+        workers = workers or {}
+        index_queue = max(2, queue_size // max(1, embed_batch_size))
+        self.stages: Dict[str, Stage] = {
+            "extract": Stage("extract", self._extract, workers.get("extract", 2), max_documents),
+            "clean": Stage("clean", self._clean, workers.get("clean", 2), queue_size),
+            "chunk": Stage("chunk", self._chunk, workers.get("chunk", 2), queue_size),
+            "embed": Stage(
+                "embed", self._embed, workers.get("embed", 2), queue_size, embed_batch_size
+            ),
+            "index": Stage("index", self._index, workers.get("index", 1), index_queue),
+        }
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tokenizer = None
+        self.completed = 0
+        self.failed = 0
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+
+        # Tokens contados com o tokenizer do modelo de embeddings, em uma
+        # cópia: o encode do modelo altera truncation/padding do original
+        model = self.embedding_service.model
+        tokenizer = getattr(model, "tokenizer", None)
+        self._tokenizer = copy.deepcopy(tokenizer) if tokenizer is not None else None
+        # Trechos maiores que a entrada do modelo seriam truncados no encode
+        max_seq_length = getattr(model, "max_seq_length", None)
+        if isinstance(max_seq_length, int) and max_seq_length > 2:
+            self.max_tokens = min(self.max_tokens, max_seq_length - 2)
+        self.overlap_tokens = min(self.overlap_tokens, self.max_tokens // 2)
+
+        for stage in self.stages.values():
+            stage.start()
+        logger.info(
+            f"Pipeline de ingestão iniciado (trechos de {self.max_tokens} tokens, "
+            f"sobreposição {self.overlap_tokens})"
+        )
+
+    async def stop(self) -> None:
+        for stage in self.stages.values():
+            await stage.stop()
+        self._loop = None
+
+    def check_capacity(self) -> None:
+        """Recusa (429) quando já há documentos demais aguardando extração"""
+        if self.stages["extract"].full:
+            raise PoolSaturatedError(
+                "ingest",
+                f"Fila de ingestão cheia ({self.stages['extract'].queue_size} documentos); "
+                "tente novamente",
+            )
+
+    async def ingest(
+        self, path: Path, doc_id: str, options: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Extrai, limpa, divide, vetoriza e indexa um arquivo; retorna o resumo"""
+        kind = document_kind(path)
+        self._ensure_started()
+        self.check_capacity()
+        doc = Document(doc_id, path, kind, options or {}, asyncio.get_running_loop().create_future())
+        await self.stages["extract"].put(doc)
+        return await doc.future
+
+    # ------------------------------------------------------------------
+    # Estado dos documentos
+    # ------------------------------------------------------------------
+
+    def _settle(self, doc: Document) -> None:
+        if doc.future.done():
+            return
+        if doc.error is not None:
+            self.failed += 1
+            doc.future.set_exception(doc.error)
+        elif doc.extracted and doc.pending == 0:
+            self.completed += 1
+            summary = doc.summary()
+            logger.info(
+                f"Ingestão concluída: {doc.path.name} - {summary['units']} unidades, "
+                f"{summary['chunks']} trechos ({summary['new_chunks']} novos) "
+                f"em {summary['seconds']}s"
+            )
+            doc.future.set_result(summary)
+
+    def _release(self, doc: Document, count: int = 1) -> None:
+        doc.pending -= count
+        self._settle(doc)
+
+    def _fail(self, doc: Document, error: BaseException) -> None:
+        if doc.error is None:
+            logger.error(f"Erro na ingestão de {doc.path.name}: {str(error)}")
+            doc.error = error
+        self._settle(doc)
+
+    # ------------------------------------------------------------------
+    # Estágios
+    # ------------------------------------------------------------------
+
+    def _iter_units(self, doc: Document) -> Iterator[Unit]:
+        options = doc.options
+        if doc.kind in ("pdf", "image"):
+            for page in ocr_service.iter_ocr_pages(doc.path, options.get("ocr_language")):
+                yield Unit(doc, page["page"], page["text"], {"page": page["page"]}, PAGE_BREAK)
+        elif doc.kind in ("audio", "video"):
+            windows = stt_service.iter_transcription(
+                doc.path, options.get("model_size"), options.get("language")
+            )
+            for window in windows:
+                text = " ".join(segment["text"].strip() for segment in window["segments"])
+                yield Unit(
+                    doc,
+                    window["window"],
+                    text,
+                    {"start_time": window["start"], "end_time": window["end"]},
+                    " ",
+                )
+        else:
+            # Blocos brutos: os trechos atravessam os cortes entre blocos
+            for number, block in enumerate(iter_text_blocks(doc.path, self.text_block_chars), 1):
+                yield Unit(doc, number, block, {}, block_joint(block))
+
+    async def _extract(self, docs: List[Document]) -> None:
+        for doc in docs:
+            units = self._iter_units(doc)
+            session = contextlib.AsyncExitStack()
+            try:
+                # OCR e STT ocupam uma vaga do pool da carga até o fim do documento
+                if doc.kind == "text":
+                    run = asyncio.to_thread
+                else:
+                    workload = "stt" if doc.kind in ("audio", "video") else "ocr"
+                    run = (await session.enter_async_context(pools.session(workload))).execute
+                unit = await run(next, units, None)
+                while unit is not None and doc.error is None:
+                    unit.seq = doc.units
+                    doc.units += 1
+                    doc.pending += 1
+                    await self.stages["clean"].put(unit)
+                    unit = await run(next, units, None)
+                if doc.error is None:
+                    # Marca de fim: o estágio de trechos fecha o último trecho
+                    doc.pending += 1
+                    await self.stages["clean"].put(Unit(doc, 0, "", {}, seq=doc.units, final=True))
+            except Exception as e:
+                self._fail(doc, e)
+                raise
+            finally:
+                await asyncio.to_thread(units.close)
+                await session.aclose()
+                doc.extracted = True
+                self._settle(doc)
+
+    async def _clean(self, units: List[Unit]) -> None:
+        for unit in units:
+            if unit.doc.error is None and not unit.final:
+                try:
+                    unit.text = await asyncio.to_thread(normalize_text, unit.text)
+                except Exception as e:
+                    self._fail(unit.doc, e)
+                    self._release(unit.doc)
+                    raise
+            if unit.doc.error is not None:
+                self._release(unit.doc)
+                continue
+            # Unidades vazias também seguem: o estágio de trechos consome em ordem
+            await self.stages["chunk"].put(unit)
+
+    def _feed(self, unit: Unit) -> List[Chunk]:
+        """Entrega a unidade ao Chunker do documento; devolve os trechos fechados"""
+        doc = unit.doc
+        if doc.chunker is None:
+            metadata = {
+                "doc_id": doc.doc_id,
+                "source": doc.path.name,
+                "file_type": doc.path.suffix.lower().lstrip("."),
+                "created_at": doc.created_at,
+            }
+            if doc.options.get("tenant"):
+                metadata["tenant"] = doc.options["tenant"]
+            doc.chunker = Chunker(self.max_tokens, self.overlap_tokens, self._tokenizer, metadata)
+        if unit.final:
+            chunks = doc.chunker.finish()
+        elif unit.text:
+            joint = unit.joint if doc.fed_chars else ""
+            doc.unit_starts.append(doc.fed_chars + len(joint))
+            doc.unit_metadata.append(unit.metadata)
+            doc.fed_chars += len(joint) + len(unit.text)
+            chunks = doc.chunker.feed(joint + unit.text)
+        else:
+            return []
+
+        for chunk in chunks:
+            # Metadados da unidade onde o trecho começa; o fim vem da última
+            first = bisect.bisect_right(doc.unit_starts, chunk.start) - 1
+            last = bisect.bisect_right(doc.unit_starts, max(chunk.start, chunk.end - 1)) - 1
+            chunk.metadata.update(doc.unit_metadata[first])
+            if "end_time" in doc.unit_metadata[last]:
+                chunk.metadata["end_time"] = doc.unit_metadata[last]["end_time"]
+        return chunks
+
+    async def _chunk(self, units: List[Unit]) -> None:
+        for unit in units:
+            doc = unit.doc
+            doc.ready[unit.seq] = unit
+            # As unidades podem chegar fora de ordem (vários workers de limpeza)
+            async with doc.chunk_lock:
+                while doc.next_unit in doc.ready:
+                    current = doc.ready.pop(doc.next_unit)
+                    doc.next_unit += 1
+                    if doc.error is None:
+                        try:
+                            chunks = await asyncio.to_thread(self._feed, current)
+                        except Exception as e:
+                            self._fail(doc, e)
+                            self._release(doc)
+                            raise
+                        doc.chunks += len(chunks)
+                        doc.tokens += sum(chunk.tokens for chunk in chunks)
+                        doc.pending += len(chunks)
+                        for chunk in chunks:
+                            await self.stages["embed"].put((doc, chunk))
+                    self._release(doc)
+
+    async def _embed(self, items: List[Tuple[Document, Chunk]]) -> None:
+        live = []
+        for doc, chunk in items:
+            if doc.error is None:
+                live.append((doc, chunk))
+            else:
+                self._release(doc)
+        if not live:
+            return
+
+        # Cada tenant com partição própria vai para o seu índice
+        groups: Dict[Any, List[int]] = {}
+        for position, (doc, _) in enumerate(live):
+            store = self.embedding_service.store_for(doc.options.get("tenant"))
+            groups.setdefault(store, []).append(position)
+        error = None
+        for store, positions in groups.items():
+            try:
+                await self._embed_group(store, [live[i] for i in positions])
+            except Exception as e:
+                error = e  # Os documentos do grupo já foram marcados como falhos
+        if error is not None:
+            raise error
+
+    async def _embed_group(self, store, live: List[Tuple[Document, Chunk]]) -> None:
+        model_name = self.embedding_service.model_name
+        texts = [chunk.text for _, chunk in live]
+        keys = [record_key(chunk.text, model_name, chunk.metadata) for _, chunk in live]
+        try:
+            # Trechos já indexados (ou repetidos no lote) não passam pelo modelo
+            seen = await asyncio.to_thread(store.existing_keys, keys)
+        except Exception as e:
+            for doc, _ in live:
+                self._fail(doc, e)
+                self._release(doc)
+            raise
+
+        fresh = []
+        for position, (doc, _) in enumerate(live):
+            if keys[position] in seen:
+                doc.duplicates += 1
+                self._release(doc)
+            else:
+                seen.add(keys[position])
+                fresh.append(position)
+        if not fresh:
+            return
+
+        try:
+            # O cache de embeddings é endereçado só pelo conteúdo
+            embeddings = await self.embedding_service.acached_encode(
+                [texts[i] for i in fresh], [content_key(texts[i], model_name) for i in fresh]
+            )
+        except Exception as e:
+            for i in fresh:
+                self._fail(live[i][0], e)
+                self._release(live[i][0])
+            raise
+        await self.stages["index"].put(
+            EmbeddedBatch(store, [live[i] for i in fresh], embeddings, [keys[i] for i in fresh])
+        )
+
+    async def _index(self, batches: List[EmbeddedBatch]) -> None:
+        for batch in batches:
+            texts = [chunk.text for _, chunk in batch.items]
+            metadata = [
+                {**chunk.metadata, "chunk": chunk.index, "start": chunk.start, "end": chunk.end}
+                for _, chunk in batch.items
+            ]
+            try:
+                await asyncio.to_thread(
+                    batch.store.add, texts, batch.embeddings, batch.keys, metadata
+                )
+            except Exception as e:
+                for doc, _ in batch.items:
+                    self._fail(doc, e)
+                raise
+            else:
+                for doc, _ in batch.items:
+                    doc.indexed += 1
+            finally:
+                for doc, _ in batch.items:
+                    self._release(doc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._loop is not None,
+            "max_tokens": self.max_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "documents": {"completed": self.completed, "failed": self.failed},
+            "stages": {name: stage.stats() for name, stage in self.stages.items()},
+        }
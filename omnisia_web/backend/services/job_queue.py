@@ -0,0 +1,345 @@
+"""
+Fila de jobs durável em SQLite
+Durable SQLite-backed job queue
+
+Os jobs sobrevivem a reinícios do servidor: cada transição (fila, execução,
+progresso, conclusão, falha, cancelamento) é gravada no banco. Vários
+processos worker compartilham o mesmo arquivo; a reserva de um job usa
+BEGIN IMMEDIATE para que apenas um worker o receba.
+
+O job reservado recebe um lease (prazo) que o worker renova enquanto o
+executa. Só jobs com o lease vencido (worker morto ou travado) voltam à
+fila: outras instâncias do servidor ou workers vivos não são afetados. O
+lease vencido conta como tentativa falha, e o resultado só é gravado pelo
+worker que detém a reserva atual.
+
+Este módulo não depende da configuração do backend para poder ser usado
+também pela API raiz (web/api.py).
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("omnisia.job_queue")
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 1,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    lease_expires_at REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim
+    ON jobs (status, priority DESC, available_at, created_at);
+"""
+
+
+class JobCancelled(Exception):
+    """Cancelamento solicitado para o job em execução"""
+
+
+class JobQueue:
+    """Fila de jobs com prioridades, tentativas, progresso e cancelamento"""
+
+    def __init__(self, db_path: Path, lease_seconds: float = 60.0):
+        self.db_path = Path(db_path)
+        self.lease_seconds = lease_seconds
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit: as transações são abertas explicitamente quando necessário
+        self._db = sqlite3.connect(
+            str(self.db_path), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=30000")
+        self._db.executescript(_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "lease_expires_at" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at REAL")
+
+    # ------------------------------------------------------------------
+    # Submissão e consulta
+    # ------------------------------------------------------------------
+
+    def submit(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        priority: int = 0,
+        max_attempts: int = 1,
+        job_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Enfileira um job e retorna seu estado inicial"""
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, params, status, priority, max_attempts, "
+                "message, created_at, available_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, 'Na fila', ?, ?, ?)",
+                (job_id, kind, json.dumps(params), priority, max_attempts, now, now, now),
+            )
+        logger.info(f"Job {job_id} ({kind}) enfileirado com prioridade {priority}")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna o job ou None"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        kind: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Lista jobs (mais recentes primeiro) e o total sem paginação"""
+        where, args = [], []
+        if status:
+            where.append("status = ?")
+            args.append(status)
+        if kind:
+            where.append("kind = ?")
+            args.append(kind)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM jobs {clause}", args).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT * FROM jobs {clause} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                args + [limit, offset],
+            ).fetchall()
+        return [self._to_job(row) for row in rows], total
+
+    def counts(self, kind: Optional[str] = None) -> Dict[str, int]:
+        """Quantidade de jobs por status (opcionalmente de um tipo)"""
+        clause, args = ("WHERE kind = ?", [kind]) if kind else ("", [])
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT status, COUNT(*) FROM jobs {clause} GROUP BY status", args
+            ).fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancela um job na fila ou pede o cancelamento de um job em execução"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'cancelled', message = 'Cancelado', "
+                "finished_at = ?, updated_at = ? WHERE id = ? AND status = 'queued'",
+                (now, now, job_id),
+            )
+            self._db.execute(
+                "UPDATE jobs SET cancel_requested = 1, message = 'Cancelamento solicitado', "
+                "updated_at = ? WHERE id = ? AND status = 'running'",
+                (now, job_id),
+            )
+        return self.get(job_id)
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida (usado pelos workers)
+    # ------------------------------------------------------------------
+
+    def claim(self, worker: str, kinds: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Reserva o próximo job disponível (maior prioridade, mais antigo)"""
+        now = time.time()
+        kind_clause = f"AND kind IN ({','.join('?' * len(kinds))})" if kinds else ""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._requeue_expired(now)
+                row = self._db.execute(
+                    f"SELECT id FROM jobs WHERE status = 'queued' AND available_at <= ? "
+                    f"{kind_clause} ORDER BY priority DESC, created_at LIMIT 1",
+                    [now] + list(kinds or []),
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                self._db.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                    "progress = 0, message = 'Em execução', error = NULL, started_at = ?, "
+                    "updated_at = ?, lease_expires_at = ? WHERE id = ?",
+                    (worker, now, now, now + self.lease_seconds, row["id"]),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.get(row["id"])
+
+    def start(self, job_id: str, worker: str) -> None:
+        """Marca como em execução um job executado fora dos workers da fila"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                "message = 'Em execução', started_at = ?, updated_at = ?, "
+                "lease_expires_at = ? WHERE id = ?",
+                (worker, now, now, now + self.lease_seconds, job_id),
+            )
+
+    def heartbeat(self, job_id: str) -> bool:
+        """Renova o lease do job em execução; retorna True se houve pedido de cancelamento"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = 'running'",
+                (now + self.lease_seconds, job_id),
+            )
+            row = self._db.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def report_progress(self, job_id: str, progress: float, message: Optional[str] = None) -> bool:
+        """Atualiza o progresso (0-1); retorna True se houve pedido de cancelamento"""
+        now = time.time()
+        progress = min(max(progress, 0.0), 1.0)
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET progress = ?, message = COALESCE(?, message), updated_at = ?, "
+                "lease_expires_at = ? WHERE id = ? AND status = 'running'",
+                (progress, message, now, now + self.lease_seconds, job_id),
+            )
+            row = self._db.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def complete(self, job_id: str, worker: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        """Registra o resultado; False se o job não pertence mais a este worker"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'succeeded', progress = 1, message = 'Concluído', "
+                "result = ?, finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND worker = ?",
+                (json.dumps(result or {}), now, now, job_id, worker),
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id: str, worker: str, error: str, retry_delay: float = 0.0) -> Optional[str]:
+        """Registra a falha; reenfileira se ainda houver tentativas
+
+        Retorna o novo status, ou None se o job não pertence mais a este
+        worker (lease vencido e job retomado por outro).
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT attempts, max_attempts FROM jobs "
+                "WHERE id = ? AND status = 'running' AND worker = ?",
+                (job_id, worker),
+            ).fetchone()
+            if row is None:
+                return None
+            if row["attempts"] < row["max_attempts"]:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, worker = NULL, "
+                    "lease_expires_at = NULL, message = 'Aguardando nova tentativa', "
+                    "available_at = ?, updated_at = ? WHERE id = ?",
+                    (error, now + retry_delay, now, job_id),
+                )
+                return "queued"
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, message = 'Falhou', "
+                "finished_at = ?, updated_at = ? WHERE id = ?",
+                (error, now, now, job_id),
+            )
+            return "failed"
+
+    def mark_cancelled(self, job_id: str, worker: str) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'cancelled', message = 'Cancelado', "
+                "finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND worker = ?",
+                (now, now, job_id, worker),
+            )
+        return cursor.rowcount > 0
+
+    def _requeue_expired(self, now: float) -> int:
+        # Lease vencido conta como tentativa: um job que derruba o worker
+        # (OOM, segfault) não volta à fila para sempre
+        cursor = self._db.execute(
+            "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' "
+            "WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+            "error = CASE WHEN cancel_requested THEN error "
+            "ELSE 'Worker interrompido (lease vencido)' END, "
+            "message = CASE WHEN cancel_requested THEN 'Cancelado' "
+            "WHEN attempts >= max_attempts THEN 'Falhou' "
+            "ELSE 'Retomado após interrupção' END, "
+            "finished_at = CASE WHEN cancel_requested OR attempts >= max_attempts "
+            "THEN ? ELSE finished_at END, "
+            "worker = NULL, lease_expires_at = NULL, updated_at = ? "
+            "WHERE status = 'running' AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+            (now, now, now),
+        )
+        if cursor.rowcount:
+            logger.warning(f"{cursor.rowcount} jobs com lease vencido devolvidos à fila ou encerrados")
+        return cursor.rowcount
+
+    def requeue_orphans(self) -> int:
+        """Encerra a reserva de jobs cujo lease venceu (worker morto ou travado)
+
+        O job volta à fila enquanto houver tentativas; depois fica como falho.
+        """
+        with self._lock:
+            return self._requeue_expired(time.time())
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+
+        # ETA linear a partir do progresso reportado
+        job["eta_seconds"] = None
+        if job["status"] == "running" and job["started_at"] and job["progress"] > 0:
+            elapsed = time.time() - job["started_at"]
+            job["eta_seconds"] = elapsed * (1 - job["progress"]) / job["progress"]
+        return job
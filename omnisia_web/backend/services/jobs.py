@@ -0,0 +1,439 @@
+"""
+Jobs em segundo plano: handlers, processos worker e fila global
+Background jobs: handlers, worker processes and the global queue
+
+Trabalhos longos (OCR, transcrição, vídeo, treinamento) são enfileirados em
+SQLite e executados por processos worker iniciados junto com o backend.
+A submissão retorna imediatamente o id do job; o progresso, o ETA e o local
+do resultado ficam disponíveis em GET /jobs/{id}.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .job_queue import JobCancelled, JobQueue
+from ..config import (
+    DEFAULT_OCR_LANGUAGE,
+    DEFAULT_WHISPER_MODEL,
+    ENABLE_OCR_PREPROCESSING,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_INTERVAL,
+    JOB_RETRY_DELAY,
+    JOB_TRAINING_WORKERS,
+    JOB_WORKERS,
+    get_jobs_path,
+)
+
+logger = logging.getLogger("omnisia.jobs")
+
+JOBS_DB_NAME = "jobs.db"
+
+
+class JobContext:
+    """Contexto entregue aos handlers: progresso, cancelamento e diretório de saída"""
+
+    def __init__(self, queue: JobQueue, job_id: str, output_dir: Path):
+        self.queue = queue
+        self.job_id = job_id
+        self.output_dir = output_dir
+
+    def progress(self, fraction: float, message: Optional[str] = None) -> None:
+        """Reporta progresso (0-1); interrompe o handler se o job foi cancelado"""
+        if self.queue.report_progress(self.job_id, fraction, message):
+            raise JobCancelled(f"Job {self.job_id} cancelado")
+
+    def output_path(self, name: str) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        return self.output_dir / name
+
+
+# ----------------------------------------------------------------------
+# Handlers por tipo de job
+# ----------------------------------------------------------------------
+
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any], JobContext], Dict[str, Any]]] = {}
+
+# Tipos executados pelos workers de treinamento (processos dedicados)
+TRAINING_KINDS = ["train"]
+
+
+def job_handler(kind: str):
+    """Registra um handler para um tipo de job"""
+
+    def decorator(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+
+    return decorator
+
+
+# Os serviços são importados dentro dos handlers: cada worker só carrega
+# as dependências (Whisper, Tesseract, Transformers) do que de fato executa.
+
+
+@job_handler("ocr")
+def run_ocr_job(params: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    from . import ocr_service
+
+    file_path = Path(params["file_path"])
+    output_path = (
+        Path(params["output_path"])
+        if params.get("output_path")
+        else file_path.parent / f"{file_path.stem}_ocr.txt"
+    )
+    language = params.get("language") or DEFAULT_OCR_LANGUAGE
+
+    ctx.progress(0.05, f"OCR de {file_path.name}")
+    # Progresso por página (PDFs); também permite cancelar no meio do documento
+    text = ocr_service.ocr_to_file(
+        file_path, output_path, language, progress=lambda f, msg: ctx.progress(0.05 + 0.9 * f, msg)
+    )
+    return {"output_path": str(output_path), "text_length": len(text), "language": language}
+
+
+@job_handler("ocr_batch")
+def run_ocr_batch_job(params: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    from . import ocr_service
+
+    manifest_path = (
+        Path(params["output_path"]) if params.get("output_path") else ctx.output_path("manifest.jsonl")
+    )
+    ctx.progress(0.0, f"OCR em lote de {params['source']}")
+    summary = ocr_service.ocr_batch(
+        params["source"],
+        manifest_path,
+        params.get("language"),
+        preprocess=params.get("preprocess", ENABLE_OCR_PREPROCESSING),
+        with_boxes=params.get("boxes", False),
+        progress=ctx.progress,
+    )
+    return {**summary, "output_path": summary["manifest_path"]}
+
+
+def _save_transcription(result, ctx: JobContext, fallback_language: str) -> Dict[str, Any]:
+    """Grava a transcrição em disco e devolve o resumo do resultado"""
+    if isinstance(result, str):
+        result = {"text": result}
+    text = result.get("text", "")
+    output_path = ctx.output_path("transcription.txt")
+    output_path.write_text(text, encoding="utf-8")
+    ctx.output_path("transcription.json").write_text(
+        json.dumps(result, ensure_ascii=False, default=str), encoding="utf-8"
+    )
+    return {
+        "output_path": str(output_path),
+        "text_length": len(text),
+        "language": result.get("language", fallback_language),
+    }
+
+
+@job_handler("transcribe")
+def run_transcribe_job(params: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    from . import stt_service
+
+    model_size = params.get("model_size") or DEFAULT_WHISPER_MODEL
+    ctx.progress(0.05, f"Transcrevendo com Whisper {model_size}")
+    result = stt_service.transcribe_audio(
+        Path(params["audio_path"]),
+        model_size,
+        params.get("language"),
+        long_form=params.get("long_form"),
+        progress=ctx.progress,
+    )
+    ctx.progress(0.95, "Gravando transcrição")
+    return _save_transcription(result, ctx, params.get("language") or "auto")
+
+
+@job_handler("transcribe_video")
+def run_transcribe_video_job(params: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    from . import video_service
+
+    model_size = params.get("model_size") or DEFAULT_WHISPER_MODEL
+    ctx.progress(0.05, f"Transcrevendo vídeo com Whisper {model_size}")
+    result = video_service.transcribe_video(
+        Path(params["video_path"]),
+        model_size,
+        progress=ctx.progress,
+    )
+    ctx.progress(0.95, "Gravando transcrição")
+    return _save_transcription(result, ctx, "auto")
+
+
+@job_handler("video_ingest")
+def run_video_ingest_job(params: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    from . import video_service
+
+    # O índice de imagens tem um único escritor: o processo da API
+    if params.get("embed_frames"):
+        raise Exception("embed_frames não é suportado em jobs; use background=false")
+
+    ctx.progress(0.0, f"Processando vídeo {Path(params['video_path']).name} em uma passada")
+    result = video_service.process_video(
+        Path(params["video_path"]),
+        params.get("model_size"),
+        params.get("language"),
+        fps=params.get("fps"),
+        scene_threshold=params.get("scene_threshold"),
+        transcribe=params.get("transcribe", True),
+        ocr_frames=params.get("ocr_frames", True),
+        ocr_language=params.get("ocr_language"),
+        frames_dir=ctx.output_path("frames"),
+        progress=ctx.progress,
+    )
+    ctx.progress(0.95, "Gravando resultado")
+    output_path = ctx.output_path("video.json")
+    output_path.write_text(json.dumps(result, ensure_ascii=False, default=str), encoding="utf-8")
+    transcription = result["transcription"] or {}
+    return {
+        "output_path": str(output_path),
+        "frames_dir": result["frames_dir"],
+        "frames": len(result["frames"]),
+        "text_length": len(transcription.get("text", "")),
+        "language": transcription.get("language") or "auto",
+    }
+
+
+@job_handler("train")
+def run_train_job(params: Dict[str, Any], ctx: JobContext) -> Dict[str, Any]:
+    from . import lora_trainer
+
+    output_dir = Path(params["output_dir"])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    lora_trainer.train_lora(
+        params["model_name"],
+        Path(params["dataset_path"]),
+        output_dir,
+        progress=ctx.progress,
+        epochs=params.get("epochs"),
+        batch_size=params.get("batch_size"),
+        learning_rate=params.get("learning_rate"),
+        lora_r=params.get("lora_r"),
+        lora_alpha=params.get("lora_alpha"),
+    )
+    return {"output_path": str(output_dir), "model_name": params["model_name"]}
+
+
+# ----------------------------------------------------------------------
+# Execução
+# ----------------------------------------------------------------------
+
+
+def run_job(queue: JobQueue, job: Dict[str, Any], jobs_dir: Path) -> str:
+    """Executa um job já reservado e registra o resultado; retorna o status final"""
+    job_id = job["id"]
+    worker = job["worker"]
+    ctx = JobContext(queue, job_id, jobs_dir / job_id)
+    try:
+        handler = JOB_HANDLERS.get(job["kind"])
+        if handler is None:
+            raise ValueError(f"Tipo de job desconhecido: {job['kind']}")
+        result = handler(job["params"], ctx)
+        if not queue.complete(job_id, worker, result):
+            logger.warning(f"Job {job_id} concluído após perder o lease; resultado descartado")
+            return "lost"
+        logger.info(f"Job {job_id} ({job['kind']}) concluído")
+        return "succeeded"
+    except Exception as e:
+        # Handlers podem embrulhar JobCancelled; o pedido fica registrado no banco
+        if isinstance(e, JobCancelled) or queue.cancel_requested(job_id):
+            if not queue.mark_cancelled(job_id, worker):
+                return "lost"
+            logger.info(f"Job {job_id} cancelado")
+            return "cancelled"
+        status = queue.fail(job_id, worker, str(e), retry_delay=JOB_RETRY_DELAY * job["attempts"])
+        if status is None:
+            logger.warning(f"Job {job_id} falhou após perder o lease: {str(e)}")
+            return "lost"
+        logger.error(f"Job {job_id} ({job['kind']}) falhou: {str(e)} -> {status}")
+        return status
+
+
+class LeaseKeeper:
+    """Renova o lease do job em uma thread enquanto o handler executa"""
+
+    def __init__(self, queue: JobQueue, job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="job-lease", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            try:
+                self.queue.heartbeat(self.job_id)
+            except Exception as e:
+                logger.warning(f"Falha ao renovar o lease do job {self.job_id}: {str(e)}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def worker_main(
+    worker_id: str,
+    db_path: str,
+    jobs_dir: str,
+    kinds: Optional[List[str]],
+    poll_interval: float,
+    stop_event,
+) -> None:
+    """Laço de um processo worker: reserva, executa e registra jobs"""
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    queue = JobQueue(Path(db_path), lease_seconds=JOB_LEASE_SECONDS)
+    # O pid distingue um worker reiniciado da instância que perdeu a reserva
+    worker = f"{worker_id}:{os.getpid()}"
+    logger.info(f"Worker {worker} iniciado (tipos {kinds})")
+    try:
+        while not stop_event.is_set():
+            job = queue.claim(worker, kinds)
+            if job is None:
+                stop_event.wait(poll_interval)
+                continue
+            with LeaseKeeper(queue, job["id"]):
+                run_job(queue, job, Path(jobs_dir))
+    finally:
+        queue.close()
+
+
+class JobWorkerPool:
+    """Processos worker que consomem a fila de jobs
+
+    Os workers não são daemônicos: handlers de OCR e transcrição criam
+    seus próprios pools de processos. `supervise()` reinicia workers que
+    morreram (OOM, segfault) para que o pool mantenha o tamanho configurado.
+    """
+
+    def __init__(self, db_path: Path, jobs_dir: Path, poll_interval: float = JOB_POLL_INTERVAL):
+        self.db_path = db_path
+        self.jobs_dir = jobs_dir
+        self.poll_interval = poll_interval
+        # spawn evita herdar o estado do servidor (event loop, modelos, conexões)
+        self._mp = multiprocessing.get_context("spawn")
+        self._stop = self._mp.Event()
+        self._lock = threading.Lock()
+        # worker_id -> (kinds, processo)
+        self._workers: Dict[str, Any] = {}
+        self.restarts = 0
+
+    def _spawn(self, worker_id: str, kinds: Optional[List[str]]) -> multiprocessing.Process:
+        process = self._mp.Process(
+            target=worker_main,
+            args=(
+                worker_id,
+                str(self.db_path),
+                str(self.jobs_dir),
+                kinds,
+                self.poll_interval,
+                self._stop,
+            ),
+            name=f"omnisia-job-{worker_id}",
+            daemon=False,
+        )
+        process.start()
+        self._workers[worker_id] = (kinds, process)
+        return process
+
+    def start(self, groups: Dict[str, Any]) -> None:
+        """Inicia `count` processos para cada grupo {nome: (count, kinds)}"""
+        with self._lock:
+            self._stop.clear()
+            for name, (count, kinds) in groups.items():
+                for i in range(count):
+                    self._spawn(f"{name}-{i}", kinds)
+            logger.info(f"{len(self._workers)} workers de jobs iniciados")
+
+    def supervise(self) -> int:
+        """Reinicia workers que morreram; retorna quantos foram reiniciados"""
+        restarted = 0
+        with self._lock:
+            if self._stop.is_set():
+                return 0
+            for worker_id, (kinds, process) in list(self._workers.items()):
+                if process.is_alive():
+                    continue
+                process.join(0)
+                logger.warning(
+                    f"Worker {worker_id} (pid {process.pid}) terminou com código "
+                    f"{process.exitcode}; reiniciando"
+                )
+                self._spawn(worker_id, kinds)
+                restarted += 1
+            self.restarts += restarted
+        return restarted
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Para os workers; jobs interrompidos voltam à fila quando o lease vencer"""
+        with self._lock:
+            self._stop.set()
+            for _, process in self._workers.values():
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+                    process.join(1)
+            self._workers = {}
+
+    def stats(self) -> Dict[str, Any]:
+        processes = [process for _, process in self._workers.values()]
+        return {
+            "workers": len(processes),
+            "alive": sum(1 for process in processes if process.is_alive()),
+            "restarts": self.restarts,
+        }
+
+
+# Instâncias globais
+job_queue = JobQueue(get_jobs_path() / JOBS_DB_NAME, lease_seconds=JOB_LEASE_SECONDS)
+job_workers = JobWorkerPool(job_queue.db_path, get_jobs_path())
+
+
+def start_training_workers() -> None:
+    """Inicia apenas os workers de treinamento (usado pela API raiz)"""
+    job_queue.requeue_orphans()
+    job_workers.start({"training": (JOB_TRAINING_WORKERS, TRAINING_KINDS)})
+
+
+def start_workers() -> None:
+    """Retoma jobs com lease vencido e inicia os workers configurados"""
+    job_queue.requeue_orphans()
+    general_kinds = [kind for kind in JOB_HANDLERS if kind not in TRAINING_KINDS]
+    job_workers.start(
+        {
+            "worker": (JOB_WORKERS, general_kinds),
+            "training": (JOB_TRAINING_WORKERS, TRAINING_KINDS),
+        }
+    )
+
+
+def supervise_workers() -> int:
+    """Reinicia workers mortos e encerra as reservas vencidas que eles deixaram"""
+    restarted = job_workers.supervise()
+    job_queue.requeue_orphans()
+    return restarted
+
+
+def submit_job(
+    kind: str,
+    params: Dict[str, Any],
+    priority: int = 0,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    job_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Enfileira um job de um tipo conhecido; inclui a URL de acompanhamento"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Tipo de job desconhecido: {kind}")
+    job = job_queue.submit(
+        kind, params, priority=priority, max_attempts=max_attempts, job_id=job_id
+    )
+    return {**job, "status_url": f"/jobs/{job['id']}"}
@@ -0,0 +1,544 @@
+"""
+Transcrição de áudios longos em janelas paralelas
+Chunked, parallel long-form transcription
+
+O áudio é decodificado pelo ffmpeg em fluxo (PCM mono 16 kHz por pipe), sem
+carregar o arquivo inteiro na memória. Um detector de atividade de voz por
+energia escolhe pontos de silêncio próximos ao tamanho de janela desejado;
+cada janela leva uma pequena sobreposição com as vizinhas e é transcrita por
+um pool de processos Whisper. Os segmentos voltam com timestamps globais e,
+nas sobreposições, vale a janela cujo núcleo contém o meio do segmento.
+Janelas sem voz não são enviadas ao modelo.
+
+Cada áudio usa um pool próprio de processos, cada um com o seu modelo. Com
+um registro de modelos, a memória desses modelos é reservada no orçamento
+dele e o número de processos vem do espaço livre (orçamento / tamanho do
+modelo, no máximo `workers`).
+
+Este módulo não depende da configuração do backend.
+"""
+
+import logging
+import multiprocessing
+import os
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("omnisia.long_audio")
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+
+
+def stream_pcm(
+    source: Path,
+    sample_rate: int = SAMPLE_RATE,
+    block_seconds: float = 30.0,
+    max_seconds: Optional[float] = None,
+) -> Iterator[np.ndarray]:
+    """Decodifica qualquer mídia suportada pelo ffmpeg em blocos float32 mono
+
+    Com `max_seconds`, o ffmpeg para após esse trecho inicial.
+    """
+    limit = ["-t", str(max_seconds)] if max_seconds else []
+    command = [
+        "ffmpeg",
+        "-nostdin",
+        "-v",
+        "error",
+        "-i",
+        str(source),
+        *limit,
+        "-vn",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        "-f",
+        "s16le",
+        "-",
+    ]
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise Exception("ffmpeg não encontrado. Instale o ffmpeg para decodificar mídia")
+
+    block_bytes = int(block_seconds * sample_rate) * 2
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            if len(data) % 2:
+                data += process.stdout.read(1)
+            yield np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        process.wait()
+        if process.returncode != 0:
+            raise Exception(f"Erro no ffmpeg: {process.stderr.read().decode(errors='replace').strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def read_pcm(
+    source: Path, max_seconds: Optional[float] = None, expected_seconds: Optional[float] = None
+) -> np.ndarray:
+    """Áudio completo (ou os primeiros `max_seconds`) como array float32 mono 16 kHz
+
+    Os blocos do pipe são copiados para um único buffer pré-alocado pela
+    duração esperada (ex.: do ffprobe), sem arquivo WAV intermediário.
+    """
+    seconds = max_seconds or (expected_seconds + 1.0 if expected_seconds else 60.0)
+    audio = np.empty(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    size = 0
+    for block in stream_pcm(source, max_seconds=max_seconds):
+        if size + len(block) > len(audio):
+            # Duração subestimada: cresce o buffer geometricamente
+            grown = np.empty(max(2 * len(audio), size + len(block)), dtype=np.float32)
+            grown[:size] = audio[:size]
+            audio = grown
+        audio[size : size + len(block)] = block
+        size += len(block)
+    return audio[:size]
+
+
+def frame_levels(audio: np.ndarray, frame: int) -> np.ndarray:
+    """Energia (dBFS) de cada quadro de `frame` amostras"""
+    count = len(audio) // frame
+    if count == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = audio[: count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def iter_windows(
+    blocks: Iterator[np.ndarray],
+    window_seconds: float = 120.0,
+    overlap_seconds: float = 1.0,
+    search_seconds: float = 15.0,
+    silence_db: float = -40.0,
+    sample_rate: int = SAMPLE_RATE,
+) -> Iterator[Tuple[np.ndarray, float, float, float, bool]]:
+    """Gera (áudio, início do áudio, início do núcleo, fim do núcleo, tem_voz)
+
+    O corte é feito no quadro mais silencioso dos últimos `search_seconds`
+    antes do tamanho alvo. O áudio de cada janela estende o núcleo em
+    `overlap_seconds` para cada lado; tempos em segundos globais.
+    """
+    frame = int(FRAME_SECONDS * sample_rate)
+    target = int(window_seconds * sample_rate)
+    search = min(int(search_seconds * sample_rate), target // 2)
+    overlap = int(overlap_seconds * sample_rate)
+
+    buffer = np.empty(0, dtype=np.float32)
+    buffer_start = 0  # amostra global do início do buffer
+    core_start = 0
+
+    def emit(cut: int, end: int):
+        audio = buffer[: end - buffer_start]
+        core = buffer[core_start - buffer_start : cut - buffer_start]
+        has_voice = bool(len(core)) and bool((frame_levels(core, frame) > silence_db).any())
+        return (
+            audio,
+            buffer_start / sample_rate,
+            core_start / sample_rate,
+            cut / sample_rate,
+            has_voice,
+        )
+
+    for block in blocks:
+        buffer = np.concatenate([buffer, block])
+        # Janela completa: núcleo alvo + sobreposição à direita já disponíveis
+        while buffer_start + len(buffer) >= core_start + target + overlap:
+            region_start = core_start + target - search
+            region = buffer[region_start - buffer_start : core_start + target - buffer_start]
+            levels = frame_levels(region, frame)
+            # Entre quadros igualmente silenciosos, o mais próximo do tamanho alvo
+            quietest = len(levels) - 1 - int(np.argmin(levels[::-1])) if len(levels) else None
+            cut = region_start + (quietest * frame + frame // 2 if quietest is not None else search)
+            yield emit(cut, cut + overlap)
+            # Mantém apenas a sobreposição à esquerda da próxima janela
+            drop = (cut - overlap) - buffer_start
+            buffer = buffer[drop:]
+            buffer_start += drop
+            core_start = cut
+
+    end = buffer_start + len(buffer)
+    if end > core_start:
+        yield emit(end, end)
+
+
+# Modelo carregado por processo worker
+_worker_model: Dict[str, Any] = {}
+
+
+def _init_worker(threads: int) -> None:
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def whisper_fp16(model) -> bool:
+    """fp16 só compensa em GPU; em CPU (fp32 ou int8) o Whisper usa fp32"""
+    device = getattr(model, "device", None)
+    return getattr(device, "type", "cpu") == "cuda"
+
+
+def transcribe_array(model, audio: np.ndarray, offset: float, language: Optional[str]) -> Dict[str, Any]:
+    """Transcreve um trecho PCM com um modelo Whisper; tempos somados a `offset`"""
+    options = {"fp16": whisper_fp16(model), "verbose": False, "condition_on_previous_text": False}
+    if language:
+        options["language"] = language
+    result = model.transcribe(audio, **options)
+    segments = [
+        {
+            "start": round(segment["start"] + offset, 3),
+            "end": round(segment["end"] + offset, 3),
+            "text": segment.get("text", "").strip(),
+        }
+        for segment in result.get("segments", [])
+    ]
+    return {"language": result.get("language"), "segments": segments}
+
+
+def transcribe_window(
+    audio: np.ndarray,
+    offset: float,
+    model_size: str,
+    language: Optional[str],
+    backend: str = "fp32",
+) -> Dict[str, Any]:
+    """Transcreve uma janela (roda no processo worker); tempos já globais"""
+    from .quantization import load_whisper
+
+    if _worker_model.get("key") != (model_size, backend):
+        _worker_model["model"] = load_whisper(model_size, backend)
+        _worker_model["key"] = (model_size, backend)
+    return transcribe_array(_worker_model["model"], audio, offset, language)
+
+
+def stitch_segments(
+    segments: List[Dict[str, Any]], core_start: float, core_end: float
+) -> List[Dict[str, Any]]:
+    """Mantém os segmentos cujo ponto médio cai no núcleo da janela"""
+    return [
+        segment
+        for segment in segments
+        if segment["text"] and core_start <= (segment["start"] + segment["end"]) / 2 < core_end
+    ]
+
+
+def window_result(index: int, core_start: float, core_end: float, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultado de uma janela: apenas os segmentos do seu núcleo"""
+    return {
+        "window": index,
+        "start": round(core_start, 3),
+        "end": round(core_end, 3),
+        "language": result["language"],
+        "segments": stitch_segments(result["segments"], core_start, core_end),
+    }
+
+
+def merge_windows(windows: Iterator[Dict[str, Any]], language: Optional[str] = None) -> Dict[str, Any]:
+    """Junta as janelas em texto, idioma predominante e segmentos numerados"""
+    segments = []
+    languages: Dict[str, int] = {}
+    count = 0
+    for window in windows:
+        count += 1
+        if window["language"]:
+            languages[window["language"]] = languages.get(window["language"], 0) + 1
+        for segment in window["segments"]:
+            segments.append({"id": len(segments), **segment})
+    return {
+        "text": " ".join(segment["text"] for segment in segments),
+        "language": language or (max(languages, key=languages.get) if languages else None),
+        "segments": segments,
+        "windows": count,
+    }
+
+
+def iter_local_segments(
+    source: Optional[Path],
+    transcribe: Callable[[np.ndarray, float], Dict[str, Any]],
+    window_seconds: float = 120.0,
+    overlap_seconds: float = 1.0,
+    silence_db: float = -40.0,
+    blocks: Optional[Iterator[np.ndarray]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Mesmas janelas de LongAudioTranscriber, transcritas no processo atual
+
+    `transcribe(áudio, início)` recebe cada janela com voz; usado quando o
+    modelo já está carregado no processo (ex.: streaming de áudios curtos).
+    Com `blocks`, o PCM vem de um fluxo já aberto em vez de `source`.
+    """
+    windows = iter_windows(
+        blocks if blocks is not None else stream_pcm(source),
+        window_seconds=window_seconds,
+        overlap_seconds=overlap_seconds,
+        silence_db=silence_db,
+    )
+    for index, (audio, offset, core_start, core_end, has_voice) in enumerate(windows):
+        result = transcribe(audio, offset) if has_voice else {"language": None, "segments": []}
+        yield window_result(index, core_start, core_end, result)
+
+
+class LongAudioTranscriber:
+    """Pool de processos Whisper para transcrever áudios longos em janelas"""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        window_seconds: float = 120.0,
+        overlap_seconds: float = 1.0,
+        silence_db: float = -40.0,
+        backend: str = "fp32",
+        registry=None,
+        estimate_bytes: Optional[Callable[[str], int]] = None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.silence_db = silence_db
+        self.backend = backend
+        self.registry = registry
+        self.estimate_bytes = estimate_bytes
+        self._executors: List[ProcessPoolExecutor] = []
+        self._lock = threading.Lock()
+        self.windows_transcribed = 0
+        self.windows_skipped = 0
+
+    def _reserve(self, model_size: str):
+        """Reserva no registro um modelo por processo; gera o número de processos"""
+        unit = self.estimate_bytes(model_size) if self.estimate_bytes else 0
+        if self.registry is None or not unit:
+            return nullcontext(self.workers)
+        return self.registry.reserve(f"long_form:{model_size}", unit, self.workers)
+
+    @contextmanager
+    def _pool(self, workers: int) -> Iterator[ProcessPoolExecutor]:
+        """Pool de um áudio; núcleos divididos entre os processos"""
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        )
+        with self._lock:
+            self._executors.append(executor)
+        logger.info(f"Pool de transcrição longa iniciado ({workers} processos, {threads} threads cada)")
+        try:
+            yield executor
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            with self._lock:
+                if executor in self._executors:
+                    self._executors.remove(executor)
+
+    def iter_segments(
+        self,
+        source: Optional[Path],
+        model_size: str,
+        language: Optional[str] = None,
+        duration: Optional[float] = None,
+        progress: Optional[Callable[[float, str], None]] = None,
+        blocks: Optional[Iterator[np.ndarray]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Gera {window, start, end, language, segments} de cada janela, em ordem
+
+        No máximo 2x o número de processos em janelas ficam em voo; com
+        janelas de 120 s isso dá poucos MB de áudio em memória, qualquer que
+        seja a duração. Com `blocks`, o PCM vem de um fluxo já aberto em vez
+        de `source`.
+        """
+        with self._reserve(model_size) as workers, self._pool(workers) as executor:
+            yield from self._iter_windows(
+                executor, workers, source, model_size, language, duration, progress, blocks
+            )
+
+    def _iter_windows(
+        self, executor, workers, source, model_size, language, duration, progress, blocks
+    ) -> Iterator[Dict[str, Any]]:
+        window_limit = workers * 2
+        pending: deque = deque()  # (índice, início, fim, Future ou None)
+        index = 0
+        try:
+            windows = iter_windows(
+                blocks if blocks is not None else stream_pcm(source),
+                window_seconds=self.window_seconds,
+                overlap_seconds=self.overlap_seconds,
+                silence_db=self.silence_db,
+            )
+            for audio, offset, core_start, core_end, has_voice in windows:
+                future = None
+                if has_voice:
+                    future = executor.submit(
+                        transcribe_window, audio, offset, model_size, language, self.backend
+                    )
+                pending.append((index, core_start, core_end, future))
+                index += 1
+                while pending and (
+                    pending[0][3] is None or pending[0][3].done() or len(pending) >= window_limit
+                ):
+                    yield self._collect(pending.popleft(), duration, progress)
+            while pending:
+                yield self._collect(pending.popleft(), duration, progress)
+        finally:
+            for *_, future in pending:
+                if future is not None:
+                    future.cancel()
+
+    def _collect(self, entry, duration, progress) -> Dict[str, Any]:
+        index, core_start, core_end, future = entry
+        if future is None:
+            self.windows_skipped += 1
+            result = {"language": None, "segments": []}
+        else:
+            result = future.result()
+            self.windows_transcribed += 1
+        if progress and duration:
+            progress(min(core_end / duration, 1.0), f"{core_end:.0f}s de {duration:.0f}s transcritos")
+        return window_result(index, core_start, core_end, result)
+
+    def transcribe(
+        self,
+        source: Path,
+        model_size: str,
+        language: Optional[str] = None,
+        duration: Optional[float] = None,
+        progress: Optional[Callable[[float, str], None]] = None,
+    ) -> Dict[str, Any]:
+        """Transcrição completa no formato de whisper.transcribe"""
+        return merge_windows(self.iter_segments(source, model_size, language, duration, progress), language)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "window_seconds": self.window_seconds,
+            "backend": self.backend,
+            "active_pools": len(self._executors),
+            "windows_transcribed": self.windows_transcribed,
+            "windows_skipped": self.windows_skipped,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executors, self._executors = self._executors, []
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LiveTranscriber:
+    """Transcrição incremental de PCM recebido em tempo real (ex.: microfone)
+
+    O áudio acumulado é retranscrito a cada `step_seconds`, gerando eventos
+    "partial" com o texto provisório. Após `silence_seconds` de silêncio, ou
+    quando o trecho atinge `max_seconds`, os segmentos são confirmados
+    (eventos "segment") e o trecho é descartado.
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[np.ndarray, float], Dict[str, Any]],
+        input_rate: int = SAMPLE_RATE,
+        step_seconds: float = 2.0,
+        max_seconds: float = 20.0,
+        silence_seconds: float = 0.6,
+        silence_db: float = -40.0,
+    ):
+        if input_rate <= 0:
+            raise ValueError(f"Taxa de amostragem inválida: {input_rate}")
+        self.transcribe = transcribe
+        self.input_rate = input_rate
+        self.step = int(step_seconds * SAMPLE_RATE)
+        self.max_samples = int(max_seconds * SAMPLE_RATE)
+        self.silence_frames = int(silence_seconds / FRAME_SECONDS)
+        self.silence_db = silence_db
+        self.buffer = np.empty(0, dtype=np.float32)
+        self.offset = 0  # amostra global do início do buffer
+        self.since_decode = 0
+        self.segments: List[Dict[str, Any]] = []
+
+    def _resample(self, samples: np.ndarray) -> np.ndarray:
+        if self.input_rate == SAMPLE_RATE or not len(samples):
+            return samples
+        count = int(round(len(samples) * SAMPLE_RATE / self.input_rate))
+        positions = np.linspace(0, len(samples) - 1, count)
+        return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+    def feed(self, pcm: bytes) -> List[Dict[str, Any]]:
+        """Recebe quadros PCM s16le mono; retorna os eventos produzidos"""
+        samples = np.frombuffer(pcm[: len(pcm) - len(pcm) % 2], dtype=np.int16)
+        samples = self._resample(samples.astype(np.float32) / 32768.0)
+        self.buffer = np.concatenate([self.buffer, samples])
+        self.since_decode += len(samples)
+        if self.since_decode < self.step and len(self.buffer) < self.max_samples:
+            return []
+        self.since_decode = 0
+        return self._decode(final=False)
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Confirma o que restou no buffer"""
+        return self._decode(final=True) if len(self.buffer) else []
+
+    def _advance(self, samples: int) -> None:
+        self.buffer = self.buffer[samples:]
+        self.offset += samples
+
+    def _commit(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        events = []
+        for segment in segments:
+            self.segments.append(segment)
+            events.append({"event": "segment", **segment})
+        return events
+
+    def _decode(self, final: bool) -> List[Dict[str, Any]]:
+        frame = int(FRAME_SECONDS * SAMPLE_RATE)
+        voiced = frame_levels(self.buffer, frame) > self.silence_db
+        if not voiced.any():
+            # Só silêncio: nada a transcrever
+            self._advance(len(self.buffer))
+            return []
+
+        result = self.transcribe(self.buffer, self.offset / SAMPLE_RATE)
+        segments = [segment for segment in result["segments"] if segment["text"]]
+        trailing_silence = len(voiced) - 1 - int(np.flatnonzero(voiced)[-1])
+
+        if final or trailing_silence >= self.silence_frames:
+            self._advance(len(self.buffer))
+            return self._commit(segments)
+        if len(self.buffer) >= self.max_samples:
+            # Fala contínua: confirma tudo menos o último segmento, que pode estar cortado
+            if len(segments) > 1:
+                keep_from = int(segments[-1]["start"] * SAMPLE_RATE) - self.offset
+                self._advance(max(0, keep_from))
+                return self._commit(segments[:-1])
+            self._advance(len(self.buffer))
+            return self._commit(segments)
+        return [
+            {
+                "event": "partial",
+                "start": round(self.offset / SAMPLE_RATE, 3),
+                "end": round((self.offset + len(self.buffer)) / SAMPLE_RATE, 3),
+                "text": " ".join(segment["text"] for segment in segments),
+            }
+        ]
+
+    @property
+    def text(self) -> str:
+        return " ".join(segment["text"] for segment in self.segments)
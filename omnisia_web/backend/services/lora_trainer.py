@@ -1,14 +1,48 @@
 from pathlib import Path
+from typing import Callable, Optional
 from datasets import load_dataset
-from transformers import AutoTokenizer, AutoModelForCausalLM, TrainingArguments, Trainer
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    TrainingArguments,
+    Trainer,
+    TrainerCallback,
+)
 from peft import LoraConfig, get_peft_model, TaskType
 import torch
 from ..config import LORA_CONFIG, TRAINING_CONFIG
 
 
-def train_lora(model_name: str, dataset_path: Path, output_dir: Path) -> None:
-    """Treina um modelo usando LoRA"""
+class ProgressCallback(TrainerCallback):
+    """Repassa o progresso dos passos de treino para um callback externo"""
+
+    def __init__(self, progress: Callable[[float, str], None]):
+        self.progress = progress
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if state.max_steps:
+            self.progress(
+                0.1 + 0.85 * state.global_step / state.max_steps,
+                f"Passo {state.global_step}/{state.max_steps} (época {state.epoch or 0:.2f})",
+            )
+
+
+def train_lora(
+    model_name: str,
+    dataset_path: Path,
+    output_dir: Path,
+    progress: Optional[Callable[[float, str], None]] = None,
+    epochs: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    learning_rate: Optional[float] = None,
+    lora_r: Optional[int] = None,
+    lora_alpha: Optional[int] = None,
+) -> None:
+    """Treina um modelo usando LoRA (hiperparâmetros omitidos vêm da configuração)"""
     try:
+        if progress:
+            progress(0.0, "Carregando dataset e modelo")
+
         # Carrega o dataset
         dataset = load_dataset("text", data_files=str(dataset_path))["train"]
 
@@ -19,8 +53,8 @@ def train_lora(model_name: str, dataset_path: Path, output_dir: Path) -> None:
         # Configuração LoRA
         lora_config = LoraConfig(
             task_type=TaskType.CAUSAL_LM,
-            r=LORA_CONFIG["r"],
-            lora_alpha=LORA_CONFIG["lora_alpha"],
+            r=lora_r or LORA_CONFIG["r"],
+            lora_alpha=lora_alpha or LORA_CONFIG["lora_alpha"],
             lora_dropout=LORA_CONFIG["lora_dropout"],
             target_modules=LORA_CONFIG["target_modules"],
         )
@@ -31,11 +65,11 @@ def train_lora(model_name: str, dataset_path: Path, output_dir: Path) -> None:
         # Configuração de treinamento
         training_args = TrainingArguments(
             output_dir=str(output_dir),
-            num_train_epochs=TRAINING_CONFIG["num_train_epochs"],
-            per_device_train_batch_size=TRAINING_CONFIG["per_device_train_batch_size"],
+            num_train_epochs=epochs or TRAINING_CONFIG["num_train_epochs"],
+            per_device_train_batch_size=batch_size or TRAINING_CONFIG["per_device_train_batch_size"],
             gradient_accumulation_steps=TRAINING_CONFIG["gradient_accumulation_steps"],
             warmup_steps=TRAINING_CONFIG["warmup_steps"],
-            learning_rate=TRAINING_CONFIG["learning_rate"],
+            learning_rate=learning_rate or TRAINING_CONFIG["learning_rate"],
             fp16=TRAINING_CONFIG["fp16"],
             logging_steps=TRAINING_CONFIG["logging_steps"],
             save_steps=TRAINING_CONFIG["save_steps"],
@@ -48,6 +82,8 @@ def train_lora(model_name: str, dataset_path: Path, output_dir: Path) -> None:
             )
 
         # Tokeniza o dataset
+        if progress:
+            progress(0.05, "Tokenizando dataset")
         tokenized_dataset = dataset.map(tokenize_function, batched=True)
 
         # Treina o modelo
@@ -55,9 +91,12 @@ def train_lora(model_name: str, dataset_path: Path, output_dir: Path) -> None:
             model=model,
             args=training_args,
             train_dataset=tokenized_dataset,
+            callbacks=[ProgressCallback(progress)] if progress else None,
         )
 
         trainer.train()
+        if progress:
+            progress(0.95, "Salvando modelo")
         trainer.save_model()
 
     except Exception as e:
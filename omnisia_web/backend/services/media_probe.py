@@ -0,0 +1,141 @@
+"""
+Sondagem barata de arquivos de mídia
+Cheap media probing
+
+Duração, taxa de amostragem, canais e dados de vídeo vêm dos cabeçalhos do
+contêiner em uma única chamada ao ffprobe, sem decodificar o conteúdo. O
+resultado fica no cache de artefatos sob o hash do conteúdo quando ele já é
+conhecido (ex.: calculado no upload) e, caso contrário, sob caminho, tamanho
+e mtime: sondar nunca lê o arquivo inteiro. Para detecção de idioma, apenas
+os primeiros segundos do áudio são decodificados.
+"""
+
+import json
+import logging
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .artifact_cache import artifact_cache
+from .long_audio import read_pcm
+
+logger = logging.getLogger("omnisia.media_probe")
+
+PROBE_ARTIFACT_KIND = "probe"
+
+
+def _number(value: Any, cast=float, default=0):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _rate(value: Optional[str]) -> float:
+    """Taxa no formato do ffprobe ("30000/1001") em número"""
+    numerator, _, denominator = (value or "0/1").partition("/")
+    den = _number(denominator or 1)
+    return round(_number(numerator) / den, 3) if den else 0.0
+
+
+def run_ffprobe(path: Path) -> Dict[str, Any]:
+    """Saída JSON do ffprobe (formato e streams) para o arquivo"""
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-print_format",
+        "json",
+        "-show_format",
+        "-show_streams",
+        str(path),
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise Exception("ffprobe não encontrado. Instale o ffmpeg para sondar mídia")
+    if result.returncode != 0:
+        raise Exception(f"Erro no ffprobe: {result.stderr.strip()}")
+    return json.loads(result.stdout or "{}")
+
+
+def summarize(data: Dict[str, Any], path: Path) -> Dict[str, Any]:
+    """Resumo do ffprobe: formato, primeira trilha de áudio e de vídeo"""
+    format_info = data.get("format", {})
+    video_stream = audio_stream = None
+    for stream in data.get("streams", []):
+        if stream.get("codec_type") == "video" and video_stream is None:
+            # Capas de álbum aparecem como vídeo de um quadro
+            if not stream.get("disposition", {}).get("attached_pic"):
+                video_stream = stream
+        elif stream.get("codec_type") == "audio" and audio_stream is None:
+            audio_stream = stream
+
+    info = {
+        "filename": path.name,
+        "size_bytes": _number(format_info.get("size"), int),
+        "duration": _number(format_info.get("duration")),
+        "bitrate": _number(format_info.get("bit_rate"), int),
+        "format_name": format_info.get("format_name", ""),
+        "has_audio": audio_stream is not None,
+        "has_video": video_stream is not None,
+    }
+    if video_stream:
+        info["video"] = {
+            "codec": video_stream.get("codec_name", ""),
+            "width": video_stream.get("width", 0),
+            "height": video_stream.get("height", 0),
+            "fps": _rate(video_stream.get("avg_frame_rate") or video_stream.get("r_frame_rate")),
+            "bitrate": _number(video_stream.get("bit_rate"), int),
+        }
+    if audio_stream:
+        info["audio"] = {
+            "codec": audio_stream.get("codec_name", ""),
+            "sample_rate": _number(audio_stream.get("sample_rate"), int),
+            "channels": _number(audio_stream.get("channels"), int),
+            "bitrate": _number(audio_stream.get("bit_rate"), int),
+        }
+        if not info["duration"]:
+            info["duration"] = _number(audio_stream.get("duration"))
+    return info
+
+
+def _probe_key(path: Path):
+    """Chave do cache: hash já conhecido ou identidade do arquivo (caminho, tamanho, mtime)"""
+    resolved = path.resolve()
+    stat = resolved.stat()
+    content_hash = artifact_cache.known_hash(resolved, stat)
+    if content_hash:
+        return content_hash, content_hash, None
+    identity = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return None, f"file:{resolved}", identity
+
+
+def probe_media(path: Path) -> Dict[str, Any]:
+    """Metadados do arquivo (uma chamada ao ffprobe por arquivo ou conteúdo, depois cache)"""
+    path = Path(path)
+    content_hash, key, params = _probe_key(path)
+    cached = artifact_cache.get_json(key, PROBE_ARTIFACT_KIND, params)
+    if cached is not None:
+        return {**cached, "filename": path.name, "sha256": content_hash}
+
+    info = summarize(run_ffprobe(path), path)
+    info["sha256"] = content_hash
+    artifact_cache.put_json(key, PROBE_ARTIFACT_KIND, params, info)
+    return info
+
+
+def media_duration(path: Path) -> float:
+    """Duração em segundos (0.0 se não for possível sondar)"""
+    try:
+        return probe_media(path)["duration"]
+    except Exception as e:
+        logger.warning(f"Não foi possível determinar a duração de {path}: {str(e)}")
+        return 0.0
+
+
+def decode_head(path: Path, seconds: float = 30.0) -> np.ndarray:
+    """Decodifica só os primeiros `seconds` do áudio (float32 mono 16 kHz)"""
+    return read_pcm(path, max_seconds=seconds)
@@ -0,0 +1,245 @@
+"""
+Registro de modelos carregados com orçamento de memória
+Registry of loaded models under a memory budget
+
+Mantém modelos (ex.: Whisper) em memória enquanto couberem no orçamento,
+despejando os menos usados recentemente (LRU) quando um novo precisa de
+espaço. A carga é única por modelo: requisições simultâneas aguardam a mesma
+carga em vez de carregar o modelo duas vezes. Cada modelo tem um semáforo
+que limita as execuções concorrentes sobre ele, e modelos em uso nunca são
+despejados. Memória ocupada por modelos fora do registro (ex.: em processos
+worker) entra no mesmo orçamento por meio de reservas.
+
+Este módulo não depende da configuração do backend.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger("omnisia.model_registry")
+
+
+def torch_model_bytes(model: Any) -> int:
+    """Memória ocupada pelos parâmetros e buffers de um modelo PyTorch"""
+    total = 0
+    for tensors in (getattr(model, "parameters", None), getattr(model, "buffers", None)):
+        if tensors is None:
+            continue
+        for tensor in tensors():
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class _Entry:
+    def __init__(self, model: Any, size_bytes: int, concurrency: int):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.in_use = 0
+        self.uses = 0
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+
+
+class ModelRegistry:
+    """Modelos em memória com LRU por orçamento, carga única e semáforo por modelo"""
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[str], Any],
+        memory_budget_bytes: int,
+        estimate_bytes: Optional[Callable[[str], int]] = None,
+        measure_bytes: Callable[[Any], int] = torch_model_bytes,
+        concurrency_per_model: int = 1,
+    ):
+        self.name = name
+        self.loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self.estimate_bytes = estimate_bytes or (lambda model_name: 0)
+        self.measure_bytes = measure_bytes
+        self.concurrency_per_model = concurrency_per_model
+        self._lock = threading.Lock()
+        self._models: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._reserved: Dict[str, int] = {}
+        self._reservation_ids = itertools.count(1)
+        self.loads = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+
+    def _entry(self, model_name: str) -> _Entry:
+        with self._lock:
+            entry = self._models.get(model_name)
+            if entry is not None:
+                self._models.move_to_end(model_name)
+                return entry
+            future = self._loading.get(model_name)
+            owner = future is None
+            if owner:
+                future = self._loading[model_name] = Future()
+                # Abre espaço antes da carga com a estimativa de tamanho
+                self._evict_for(self.estimate_bytes(model_name))
+
+        if not owner:
+            # Outra thread já está carregando este modelo: aguarda a mesma carga
+            return future.result()
+
+        try:
+            logger.info(f"Carregando modelo {self.name}: {model_name}")
+            start = time.time()
+            model = self.loader(model_name)
+            size = self.measure_bytes(model) or self.estimate_bytes(model_name)
+            entry = _Entry(model, size, self.concurrency_per_model)
+            with self._lock:
+                self._models[model_name] = entry
+                self._loading.pop(model_name, None)
+                self.loads += 1
+                self._evict_for(0, keep=model_name)
+            logger.info(
+                f"Modelo {self.name} {model_name} carregado em {time.time() - start:.1f}s "
+                f"({size / 1024 ** 2:.0f} MB; em uso {self.used_bytes() / 1024 ** 2:.0f} MB "
+                f"de {self.memory_budget_bytes / 1024 ** 2:.0f} MB)"
+            )
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(model_name, None)
+            future.set_exception(e)
+            raise
+
+    def get(self, model_name: str) -> Any:
+        """Modelo carregado (carrega uma única vez se necessário)"""
+        return self._entry(model_name).model
+
+    @contextmanager
+    def use(self, model_name: str) -> Iterator[Any]:
+        """Reserva o modelo: respeita o semáforo e impede o despejo durante o uso"""
+        while True:
+            entry = self._entry(model_name)
+            with self._lock:
+                # Pode ter sido despejado entre a carga e a reserva
+                if self._models.get(model_name) is entry:
+                    entry.in_use += 1
+                    break
+        try:
+            with entry.semaphore:
+                entry.last_used = time.time()
+                entry.uses += 1
+                yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+                self._evict_for(0)
+
+    def preload(self, model_names: Iterable[str]) -> None:
+        """Carrega os modelos configurados (falhas são registradas, não propagadas)"""
+        for model_name in model_names:
+            try:
+                self.get(model_name)
+            except Exception as e:
+                logger.error(f"Erro ao pré-carregar modelo {self.name} {model_name}: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # Despejo
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def reserve(self, label: str, unit_bytes: int, max_units: int = 1) -> Iterator[int]:
+        """Reserva memória de modelos carregados fora do registro
+
+        Concede entre 1 e `max_units` unidades de `unit_bytes`, conforme o
+        orçamento não ocupado por modelos em uso e outras reservas; modelos
+        ociosos são despejados para abrir espaço. Retorna as unidades concedidas.
+        """
+        with self._lock:
+            pinned = sum(e.size_bytes for e in self._models.values() if e.in_use)
+            free = self.memory_budget_bytes - pinned - sum(self._reserved.values())
+            units = max(1, min(max_units, free // unit_bytes if unit_bytes else max_units))
+            key = f"{label}#{next(self._reservation_ids)}"
+            self._evict_for(units * unit_bytes)
+            self._reserved[key] = units * unit_bytes
+        try:
+            yield units
+        finally:
+            with self._lock:
+                self._reserved.pop(key, None)
+
+    def used_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._models.values()) + sum(
+            self._reserved.values()
+        )
+
+    def _evict_for(self, incoming_bytes: int, keep: Optional[str] = None) -> None:
+        """Despeja modelos ociosos (LRU) até caber `incoming_bytes` no orçamento"""
+        # Chamado com self._lock adquirido
+        used = self.used_bytes()
+        for model_name in list(self._models):
+            if used + incoming_bytes <= self.memory_budget_bytes:
+                return
+            entry = self._models[model_name]
+            if model_name == keep or entry.in_use:
+                continue
+            del self._models[model_name]
+            used -= entry.size_bytes
+            self.evictions += 1
+            logger.info(f"Modelo {self.name} {model_name} despejado (LRU)")
+        if used + incoming_bytes > self.memory_budget_bytes:
+            logger.warning(
+                f"Orçamento de memória de {self.name} excedido: modelos em uso não podem ser despejados"
+            )
+
+    def unload(self, model_name: str) -> bool:
+        """Remove um modelo ocioso; retorna False se ausente ou em uso"""
+        with self._lock:
+            entry = self._models.get(model_name)
+            if entry is None or entry.in_use:
+                return False
+            del self._models[model_name]
+        logger.info(f"Modelo {self.name} {model_name} descarregado")
+        return True
+
+    def clear(self) -> int:
+        """Remove todos os modelos ociosos"""
+        removed = 0
+        for model_name in list(self._models):
+            removed += self.unload(model_name)
+        return removed
+
+    def is_loaded(self, model_name: str) -> bool:
+        return model_name in self._models
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {
+                model_name: {
+                    "size_mb": round(entry.size_bytes / 1024 ** 2, 1),
+                    "in_use": entry.in_use,
+                    "uses": entry.uses,
+                    "idle_seconds": round(time.time() - entry.last_used, 1),
+                }
+                for model_name, entry in self._models.items()
+            }
+            return {
+                "models": models,
+                "loading": list(self._loading),
+                "reserved": {
+                    key: round(size / 1024 ** 2, 1) for key, size in self._reserved.items()
+                },
+                "used_mb": round(self.used_bytes() / 1024 ** 2, 1),
+                "budget_mb": round(self.memory_budget_bytes / 1024 ** 2, 1),
+                "concurrency_per_model": self.concurrency_per_model,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
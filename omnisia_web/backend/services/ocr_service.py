@@ -1,9 +1,32 @@
 from pathlib import Path
-import ocrmypdf
+from typing import Any, Callable, Dict, Iterator, Optional
 from PIL import Image
-import pytesseract
+import io
 import logging
-from ..config import DEFAULT_OCR_LANGUAGE, TESSERACT_CONFIG
+import time
+from .artifact_cache import artifact_cache
+from .batch_ocr import run_batch_ocr
+from .image_preprocess import preprocess_array
+from .page_ocr import PageOCREngine, format_page
+from .tesseract_pool import TesseractPool
+from ..config import (
+    DEFAULT_OCR_LANGUAGE,
+    TESSERACT_CONFIG,
+    OCR_PAGE_WORKERS,
+    OCR_PDF_DPI,
+    OCR_TEXT_LAYER_MIN_CHARS,
+    OCR_ENGINE_WORKERS,
+    DATASETS_DIR,
+    ENABLE_OCR_PREPROCESSING,
+)
+
+# Import condicional para pytesseract
+try:
+    import pytesseract
+
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
 
 # Import condicional para PyMuPDF
 try:
@@ -15,30 +38,17 @@ except ImportError:
 
 logger = logging.getLogger("omnisia.ocr")
 
+# Engines Tesseract residentes para imagens (tesserocr; pytesseract como fallback)
+tesseract_pool = TesseractPool(OCR_ENGINE_WORKERS, TESSERACT_CONFIG)
 
-def ocr_pdf(pdf_path: Path, output_path: Path, language: str = None) -> Path:
-    """Extrai texto de um PDF usando OCR"""
-    try:
-        lang = language or DEFAULT_OCR_LANGUAGE
-        logger.info(f"Processando PDF {pdf_path} com idioma {lang}")
-
-        # Configura opções do OCR
-        ocr_options = {
-            "language": lang,
-            "output_type": "pdf",
-            "deskew": True,
-            "remove_background": True,
-            "clean": True,
-            "force_ocr": True,
-        }
-
-        ocrmypdf.ocr(str(pdf_path), str(output_path), **ocr_options)
-        logger.info(f"OCR concluído: {output_path}")
-
-        return output_path
-    except Exception as e:
-        logger.error(f"Erro no OCR do PDF: {str(e)}")
-        raise Exception(f"Erro no OCR do PDF: {str(e)}")
+# Pool de processos Tesseract para PDFs (iniciado no primeiro uso)
+page_engine = PageOCREngine(
+    OCR_PAGE_WORKERS,
+    OCR_PDF_DPI,
+    OCR_TEXT_LAYER_MIN_CHARS,
+    TESSERACT_CONFIG,
+    preprocess=ENABLE_OCR_PREPROCESSING,
+)
 
 
 def ocr_image(image_path: Path, language: str = None) -> str:
@@ -47,22 +57,35 @@ def ocr_image(image_path: Path, language: str = None) -> str:
         lang = language or DEFAULT_OCR_LANGUAGE
         logger.info(f"Processando imagem {image_path} com idioma {lang}")
 
-        # Abre e processa a imagem
-        img = Image.open(image_path)
+        # Imagem vai em memória para uma engine já carregada com o idioma
+        text = ocr_image_buffer(image_path.read_bytes(), lang, with_boxes=False)["text"]
 
-        # Converte para RGB se necessário
-        if img.mode != "RGB":
-            img = img.convert("RGB")
+        logger.info(f"OCR concluído. Texto extraído: {len(text)} caracteres")
+        return text.strip()
 
-        # Configura o Tesseract
-        config = TESSERACT_CONFIG
+    except Exception as e:
+        logger.error(f"Erro no OCR da imagem: {str(e)}")
+        raise Exception(f"Erro no OCR da imagem: {str(e)}")
 
-        # Extrai texto
-        text = pytesseract.image_to_string(img, lang=lang, config=config)
 
-        logger.info(f"OCR concluído. Texto extraído: {len(text)} caracteres")
-        return text.strip()
+def decode_for_ocr(data: bytes, preprocess: bool = ENABLE_OCR_PREPROCESSING):
+    """Decodifica a imagem e, se habilitado, aplica o pré-processamento vetorizado"""
+    if not preprocess:
+        return data
+    with Image.open(io.BytesIO(data)) as img:
+        return preprocess_array(img)
 
+
+def ocr_image_buffer(
+    data: bytes,
+    language: str = None,
+    with_boxes: bool = True,
+    preprocess: bool = ENABLE_OCR_PREPROCESSING,
+) -> Dict[str, Any]:
+    """OCR de uma imagem em memória: texto, confiança e caixas das palavras"""
+    try:
+        image = decode_for_ocr(data, preprocess)
+        return tesseract_pool.ocr(image, language or DEFAULT_OCR_LANGUAGE, with_boxes)
     except Exception as e:
         logger.error(f"Erro no OCR da imagem: {str(e)}")
         raise Exception(f"Erro no OCR da imagem: {str(e)}")
@@ -76,15 +99,10 @@ def extract_text_from_pdf(pdf_path: Path) -> str:
 
         logger.info(f"Extraindo texto existente do PDF: {pdf_path}")
 
-        text = ""
-        doc = fitz.open(str(pdf_path))
-
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            page_text = page.get_text()
-            text += f"\n--- Página {page_num + 1} ---\n{page_text}\n"
-
-        doc.close()
+        with fitz.open(str(pdf_path)) as doc:
+            text = "\n".join(
+                format_page({"page": page.number + 1, "text": page.get_text()}) for page in doc
+            )
 
         logger.info(f"Texto extraído: {len(text)} caracteres")
         return text.strip()
@@ -94,29 +112,136 @@ def extract_text_from_pdf(pdf_path: Path) -> str:
         raise Exception(f"Erro ao extrair texto do PDF: {str(e)}")
 
 
-def preprocess_image_for_ocr(image_path: Path, output_path: Path = None) -> Path:
-    """Pré-processa imagem para melhorar OCR"""
+def iter_pdf_pages(
+    pdf_path: Path,
+    language: str = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """OCR de um PDF página a página, em ordem, com cache por página"""
+    lang = language or DEFAULT_OCR_LANGUAGE
+    logger.info(f"OCR por página de {pdf_path} com idioma {lang}")
+    return page_engine.iter_pages(
+        pdf_path,
+        lang,
+        cache=artifact_cache,
+        content_hash=artifact_cache.content_hash(pdf_path),
+        progress=progress,
+    )
+
+
+def iter_ocr_pages(
+    file_path: Path,
+    language: str = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """OCR de PDF ou imagem como sequência de páginas (uma imagem = uma página)"""
+    if file_path.suffix.lower() == ".pdf":
+        yield from iter_pdf_pages(file_path, language, progress)
+        return
+
+    result = ocr_image_buffer(file_path.read_bytes(), language, with_boxes=False)
+    page = {"page": 1, "source": "ocr", **result}
+    if progress:
+        progress(1.0, "Página 1/1")
+    yield page
+
+
+def ocr_pdf_text(
+    pdf_path: Path,
+    language: str = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> str:
+    """Texto completo de um PDF: camada de texto onde houver, OCR nas demais páginas"""
     try:
-        from PIL import ImageEnhance, ImageFilter
-
-        logger.info(f"Pré-processando imagem: {image_path}")
+        pages = [format_page(page) for page in iter_pdf_pages(pdf_path, language, progress)]
+        text = "\n".join(pages).strip()
+        logger.info(f"OCR concluído: {len(pages)} páginas, {len(text)} caracteres")
+        return text
+    except Exception as e:
+        logger.error(f"Erro no OCR do PDF: {str(e)}")
+        raise Exception(f"Erro no OCR do PDF: {str(e)}")
 
-        # Abre imagem
-        img = Image.open(image_path)
 
-        # Converte para escala de cinza
-        img = img.convert("L")
+def ocr_to_file(
+    file_path: Path,
+    output_path: Path,
+    language: str = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> str:
+    """Executa OCR em PDF ou imagem e grava o texto extraído em output_path"""
+    language = language or DEFAULT_OCR_LANGUAGE
+
+    # Mesmo conteúdo + mesmos parâmetros -> reaproveita o texto já extraído
+    content_hash = artifact_cache.content_hash(file_path)
+    params = {
+        "language": language,
+        "tesseract_config": TESSERACT_CONFIG,
+        "preprocess": ENABLE_OCR_PREPROCESSING,
+    }
+    text = artifact_cache.get_text(content_hash, "ocr_text", params)
+    if text is not None:
+        logger.info(f"OCR em cache para {file_path.name} ({content_hash[:12]})")
+    else:
+        text = _run_ocr(file_path, language, progress)
+        artifact_cache.put_text(content_hash, "ocr_text", params, text)
+
+    # Salva o texto extraído
+    with output_path.open("w", encoding="utf-8") as f:
+        f.write(text)
+    return text
+
+
+def _run_ocr(file_path: Path, language: str, progress=None) -> str:
+    # Processa baseado no tipo de arquivo
+    if file_path.suffix.lower() == ".pdf":
+        # Páginas em paralelo; só páginas sem camada de texto passam pelo Tesseract
+        text = ocr_pdf_text(file_path, language, progress)
+    else:
+        # Para imagens, usa o pool de engines Tesseract
+        text = ocr_image(file_path, language)
+    return text
+
+
+def default_manifest_path(source: str) -> Path:
+    """Manifesto padrão do OCR em lote, em DATASETS_DIR"""
+    name = Path(source).name.split(".")[0]
+    if not name or any(c in name for c in "*?["):
+        name = f"ocr_batch_{int(time.time())}"
+    return DATASETS_DIR / f"{name}_ocr.jsonl"
+
+
+def ocr_batch(
+    source: str,
+    manifest_path: Optional[Path] = None,
+    language: str = None,
+    preprocess: bool = ENABLE_OCR_PREPROCESSING,
+    with_boxes: bool = False,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Dict[str, Any]:
+    """OCR de uma pasta, glob ou ZIP/TAR de imagens com manifesto JSONL/Parquet"""
+    try:
+        return run_batch_ocr(
+            source,
+            manifest_path or default_manifest_path(source),
+            language or DEFAULT_OCR_LANGUAGE,
+            tesseract_pool,
+            preprocess=preprocess_array if preprocess else None,
+            with_boxes=with_boxes,
+            progress=progress,
+        )
+    except Exception as e:
+        logger.error(f"Erro no OCR em lote: {str(e)}")
+        raise Exception(f"Erro no OCR em lote: {str(e)}")
 
-        # Aumenta contraste
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(2.0)
 
-        # Aumenta nitidez
-        enhancer = ImageEnhance.Sharpness(img)
-        img = enhancer.enhance(1.5)
+def preprocess_image_for_ocr(image_path: Path, output_path: Path = None) -> Path:
+    """Pré-processa imagem para melhorar OCR"""
+    try:
+        logger.info(f"Pré-processando imagem: {image_path}")
 
-        # Aplica filtro para reduzir ruído
-        img = img.filter(ImageFilter.MedianFilter())
+        # Ruído, inclinação e limiarização em memória (ver image_preprocess)
+        with Image.open(image_path) as img:
+            processed = Image.fromarray(preprocess_array(img))
 
         # Define caminho de saída
         if not output_path:
@@ -125,7 +250,7 @@ def preprocess_image_for_ocr(image_path: Path, output_path: Path = None) -> Path
             )
 
         # Salva imagem processada
-        img.save(output_path, optimize=True, quality=95)
+        processed.save(output_path, optimize=True, quality=95)
 
         logger.info(f"Imagem pré-processada salva em: {output_path}")
         return output_path
@@ -137,6 +262,8 @@ def preprocess_image_for_ocr(image_path: Path, output_path: Path = None) -> Path
 
 def get_supported_languages() -> list:
     """Retorna lista de idiomas suportados pelo Tesseract"""
+    if not PYTESSERACT_AVAILABLE:
+        return ["eng", "por"]
     try:
         langs = pytesseract.get_languages(config="")
         return sorted(langs)
@@ -0,0 +1,213 @@
+"""
+OCR de PDFs página a página em paralelo
+Parallel page-level OCR for PDFs
+
+Cada página é tratada isoladamente: páginas que já possuem camada de texto
+são extraídas diretamente com PyMuPDF; apenas páginas de imagem são
+rasterizadas e enviadas a um pool de processos com Tesseract (engine
+residente via tesserocr quando instalado). Os resultados voltam na ordem das
+páginas, assim que ficam prontos, e podem ser guardados por página em um
+cache (hash do documento + página + idioma).
+
+Este módulo não depende da configuração do backend; os processos worker só
+importam PyMuPDF, Pillow e o backend Tesseract.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Import condicional para PyMuPDF
+try:
+    import fitz  # PyMuPDF
+
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+import numpy as np
+
+from .image_preprocess import preprocess_array
+from .tesseract_pool import recognize
+
+logger = logging.getLogger("omnisia.page_ocr")
+
+PAGE_ARTIFACT_KIND = "ocr_page"
+
+
+def format_page(page: Dict[str, Any]) -> str:
+    """Texto de uma página com o cabeçalho usado nos arquivos *_ocr.txt"""
+    return f"--- Página {page['page']} ---\n{page['text']}\n"
+
+
+# Documento aberto por processo worker: páginas do mesmo PDF reutilizam o handle
+_worker_doc: Dict[str, Any] = {}
+
+
+def _open_worker_doc(pdf_path: str):
+    if _worker_doc.get("path") != pdf_path:
+        if _worker_doc.get("doc") is not None:
+            _worker_doc["doc"].close()
+        _worker_doc["doc"] = fitz.open(pdf_path)
+        _worker_doc["path"] = pdf_path
+    return _worker_doc["doc"]
+
+
+def ocr_page(
+    pdf_path: str, page_index: int, language: str, config: str, dpi: int, preprocess: bool = False
+) -> Dict[str, Any]:
+    """Rasteriza uma página e executa o Tesseract (roda no processo worker)"""
+    doc = _open_worker_doc(pdf_path)
+    pix = doc.load_page(page_index).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    # Pixels do PyMuPDF vistos como array, sem cópia intermediária em PIL
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, : pix.width]
+    if preprocess:
+        gray = preprocess_array(gray)
+    result = recognize(gray, language, config, with_boxes=False)
+    return {"page": page_index + 1, "source": "ocr", **result}
+
+
+class PageOCREngine:
+    """Pool de processos Tesseract para OCR de PDFs por página"""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        dpi: int = 300,
+        min_text_chars: int = 20,
+        tesseract_config: str = "",
+        preprocess: bool = False,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.dpi = dpi
+        self.min_text_chars = min_text_chars
+        self.tesseract_config = tesseract_config
+        self.preprocess = preprocess
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """Pool criado na primeira página que precisa de OCR"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info(f"Pool de OCR por página iniciado ({self.workers} processos)")
+            return self._executor
+
+    def _cache_params(self, page_number: int, language: str) -> Dict[str, Any]:
+        return {
+            "page": page_number,
+            "language": language,
+            "tesseract_config": self.tesseract_config,
+            "dpi": self.dpi,
+            "preprocess": self.preprocess,
+        }
+
+    def iter_pages(
+        self,
+        pdf_path: Path,
+        language: str,
+        cache=None,
+        content_hash: Optional[str] = None,
+        progress: Optional[Callable[[float, str], None]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Gera {page, text, confidence, source} de cada página, em ordem
+
+        `source` é "text" (camada de texto), "ocr" ou "cache". No máximo
+        2x `workers` páginas ficam em voo, o que limita a memória mesmo em
+        documentos com centenas de páginas.
+        """
+        if not PYMUPDF_AVAILABLE:
+            raise Exception("PyMuPDF não está instalado. Execute: pip install pymupdf")
+
+        if content_hash is None:
+            cache = None
+        window = self.workers * 2
+        pending: deque = deque()  # (número da página, dict pronto ou Future)
+        in_flight = 0
+
+        doc = fitz.open(str(pdf_path))
+        total = len(doc)
+        done = 0
+        try:
+            for index in range(total):
+                number = index + 1
+                params = self._cache_params(number, language)
+
+                text = doc.load_page(index).get_text("text").strip()
+                if len(text) >= self.min_text_chars:
+                    page = {"page": number, "text": text, "confidence": 1.0, "source": "text"}
+                    pending.append((number, page))
+                else:
+                    cached = cache.get_json(content_hash, PAGE_ARTIFACT_KIND, params) if cache else None
+                    if cached is not None:
+                        pending.append((number, {**cached, "source": "cache"}))
+                    else:
+                        future = self.executor.submit(
+                            ocr_page,
+                            str(pdf_path),
+                            index,
+                            language,
+                            self.tesseract_config,
+                            self.dpi,
+                            self.preprocess,
+                        )
+                        pending.append((number, future))
+                        in_flight += 1
+
+                # Entrega a cabeça da fila se já estiver pronta ou se a janela encheu
+                while pending and (
+                    not isinstance(pending[0][1], Future) or pending[0][1].done() or in_flight >= window
+                ):
+                    if isinstance(pending[0][1], Future):
+                        in_flight -= 1
+                    done += 1
+                    yield self._collect(
+                        pending.popleft(), language, cache, content_hash, progress, done, total
+                    )
+
+            while pending:
+                done += 1
+                yield self._collect(
+                    pending.popleft(), language, cache, content_hash, progress, done, total
+                )
+        finally:
+            # Consumidor desistiu (ou erro): não processa páginas restantes
+            for _, item in pending:
+                if isinstance(item, Future):
+                    item.cancel()
+            doc.close()
+
+    def _collect(self, entry, language, cache, content_hash, progress, done, total) -> Dict[str, Any]:
+        """Aguarda o resultado de uma página, grava no cache e reporta progresso"""
+        number, item = entry
+        if isinstance(item, Future):
+            item = item.result()
+            if cache is not None:
+                params = self._cache_params(number, language)
+                cache.put_json(content_hash, PAGE_ARTIFACT_KIND, params, item)
+        if progress:
+            progress(done / total, f"Página {number}/{total}")
+        return item
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "dpi": self.dpi,
+            "started": self._executor is not None,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,145 @@
+"""
+Backends de inferência em CPU: fp32, int8 dinâmico e ONNX Runtime
+CPU inference backends: fp32, dynamic int8 and ONNX Runtime
+
+- fp32: PyTorch sem alterações (padrão).
+- int8: quantização dinâmica das camadas Linear (pesos int8, ativações
+  quantizadas em tempo de execução). Vale para qualquer modelo PyTorch:
+  embeddings, CLIP e Whisper.
+- onnx / onnx-int8: modelo de embeddings exportado para ONNX e executado no
+  ONNX Runtime; em onnx-int8 a exportação passa por quantização dinâmica.
+  Os arquivos exportados ficam em disco e são reaproveitados.
+
+Os vetores continuam no mesmo espaço do fp32 (mesmo modelo, pesos
+arredondados), então índices e caches existentes seguem válidos.
+`vector_agreement` mede a diferença para o benchmark.
+
+Este módulo não depende da configuração do backend.
+"""
+
+import logging
+import re
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+logger = logging.getLogger("omnisia.quantization")
+
+INFERENCE_BACKENDS = ("fp32", "int8", "onnx", "onnx-int8")
+
+# Whisper (decodificação autorregressiva própria) e CLIP (get_image_features)
+# não têm exportação ONNX pronta; usam a quantização dinâmica do PyTorch
+TORCH_BACKENDS = ("fp32", "int8")
+
+
+def check_backend(backend: str, supported=INFERENCE_BACKENDS, model: str = "") -> str:
+    """Valida o backend configurado para um modelo"""
+    backend = (backend or "fp32").lower()
+    if backend not in supported:
+        raise ValueError(
+            f"Backend de inferência '{backend}' não suportado para {model or 'o modelo'}. "
+            f"Use um de {list(supported)}"
+        )
+    return backend
+
+
+def quantize_int8(model):
+    """Quantiza dinamicamente as camadas Linear para int8 (apenas CPU)"""
+    import torch
+
+    # Subclasses de Linear que só mudam o forward (ex.: whisper.model.Linear,
+    # que converte o dtype dos pesos) não são reconhecidas pelo quantizador
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+
+    engines = torch.backends.quantized.supported_engines
+    if torch.backends.quantized.engine not in engines or torch.backends.quantized.engine == "none":
+        torch.backends.quantized.engine = "qnnpack" if "qnnpack" in engines else engines[0]
+
+    model = model.to("cpu").eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_whisper(model_size: str, backend: str = "fp32"):
+    """Carrega um modelo Whisper no backend escolhido"""
+    import whisper
+
+    backend = check_backend(backend, TORCH_BACKENDS, "Whisper")
+    if backend == "int8":
+        return quantize_int8(whisper.load_model(model_size, device="cpu"))
+    return whisper.load_model(model_size)
+
+
+def _onnx_dir(model_name: str, cache_dir: Path) -> Path:
+    return Path(cache_dir) / re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+
+def load_sentence_transformer(model_name: str, backend: str = "fp32", cache_dir: Path = None):
+    """Carrega um SentenceTransformer no backend escolhido
+
+    ONNX exige sentence-transformers >= 3.2 e `optimum[onnxruntime]`. A
+    primeira carga exporta (e quantiza) o modelo em `cache_dir`; as demais
+    abrem o arquivo salvo.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    backend = check_backend(backend, INFERENCE_BACKENDS, model_name)
+    if backend == "fp32":
+        return SentenceTransformer(model_name)
+    if backend == "int8":
+        model = SentenceTransformer(model_name, device="cpu")
+        return quantize_int8(model)
+
+    if cache_dir is None:
+        raise ValueError("cache_dir é obrigatório para os backends ONNX")
+    local_dir = _onnx_dir(model_name, cache_dir)
+    exported = local_dir / "onnx" / "model.onnx"
+    if not exported.exists():
+        logger.info(f"Exportando {model_name} para ONNX em {local_dir}")
+        SentenceTransformer(model_name, backend="onnx").save(str(local_dir))
+    if backend == "onnx":
+        return SentenceTransformer(str(local_dir), backend="onnx")
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    quantized = local_dir / "onnx" / "model_qint8_avx2.onnx"
+    if not quantized.exists():
+        logger.info(f"Quantizando {model_name} para int8 (ONNX Runtime)")
+        model = SentenceTransformer(str(local_dir), backend="onnx")
+        export_dynamic_quantized_onnx_model(model, "avx2", str(local_dir))
+    return SentenceTransformer(
+        str(local_dir),
+        backend="onnx",
+        model_kwargs={"file_name": str(quantized.relative_to(local_dir))},
+    )
+
+
+def vector_agreement(reference: np.ndarray, candidate: np.ndarray, k: int = 10) -> Dict[str, Any]:
+    """Diferença entre vetores de referência (fp32) e de outro backend
+
+    Cosseno médio e mínimo entre os pares e sobreposição dos k vizinhos mais
+    próximos de cada vetor (recall@k da busca feita com os novos vetores).
+    """
+    reference = np.asarray(reference, dtype="float32")
+    candidate = np.asarray(candidate, dtype="float32")
+    ref = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    cand = candidate / np.maximum(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12)
+    cosine = np.sum(ref * cand, axis=1)
+
+    k = min(k, len(ref) - 1)
+    overlap = None
+    if k > 0:
+        ref_neighbors = np.argsort(-(ref @ ref.T), axis=1)[:, 1 : k + 1]
+        cand_neighbors = np.argsort(-(cand @ cand.T), axis=1)[:, 1 : k + 1]
+        overlap = float(
+            np.mean(
+                [len(set(a) & set(b)) / k for a, b in zip(ref_neighbors, cand_neighbors)]
+            )
+        )
+    return {
+        "cosine_mean": round(float(cosine.mean()), 5),
+        "cosine_min": round(float(cosine.min()), 5),
+        f"recall@{k}": round(overlap, 4) if overlap is not None else None,
+    }
@@ -1,66 +1,223 @@
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
 import whisper
 import logging
-from ..config import DEFAULT_WHISPER_MODEL
+from .artifact_cache import artifact_cache
+from .long_audio import (
+    LiveTranscriber,
+    LongAudioTranscriber,
+    iter_local_segments,
+    read_pcm,
+    transcribe_array,
+    whisper_fp16,
+)
+from .media_probe import decode_head, media_duration
+from .model_registry import ModelRegistry
+from .quantization import TORCH_BACKENDS, check_backend, load_whisper
+from ..config import (
+    DEFAULT_WHISPER_MODEL,
+    STT_LIVE_MAX_SECONDS,
+    STT_LIVE_STEP_SECONDS,
+    STT_LONG_FORM_MIN_SECONDS,
+    STT_LONG_FORM_WORKERS,
+    STT_VAD_SILENCE_DB,
+    STT_WINDOW_OVERLAP_SECONDS,
+    STT_WINDOW_SECONDS,
+    WHISPER_BACKEND,
+    WHISPER_MEMORY_BUDGET_MB,
+    WHISPER_MODEL_CONCURRENCY,
+    WHISPER_PRELOAD_MODELS,
+)
 
 logger = logging.getLogger("omnisia.stt")
 
-# Cache para modelos carregados
-_loaded_models = {}
+# fp32 ou int8 (quantização dinâmica), o mesmo no processo e nos workers
+whisper_backend = check_backend(WHISPER_BACKEND, TORCH_BACKENDS, "Whisper")
+
+# Trecho analisado pelo Whisper na detecção de idioma (janela do modelo)
+LANGUAGE_DETECTION_SECONDS = 30.0
+
+# Memória aproximada de cada modelo em fp32 (parâmetros x 4 bytes), usada para
+# abrir espaço antes da carga; depois dela vale o tamanho medido
+WHISPER_MODEL_MB = {
+    "tiny": 150,
+    "base": 290,
+    "small": 970,
+    "medium": 3050,
+    "large": 6200,
+}
+
+
+def _estimate_model_bytes(model_size: str) -> int:
+    base_name = model_size.split(".")[0].split("-")[0]
+    return WHISPER_MODEL_MB.get(base_name, 0) * 1024 ** 2
+
+
+def _load_whisper_model(model_size: str):
+    try:
+        return load_whisper(model_size, whisper_backend)
+    except Exception as e:
+        logger.error(f"Erro ao carregar modelo {model_size}: {str(e)}")
+        raise Exception(f"Erro ao carregar modelo Whisper {model_size}: {str(e)}")
+
+
+# Modelos carregados: LRU dentro do orçamento, carga única e semáforo por modelo
+whisper_models = ModelRegistry(
+    "whisper",
+    _load_whisper_model,
+    memory_budget_bytes=WHISPER_MEMORY_BUDGET_MB * 1024 ** 2,
+    estimate_bytes=_estimate_model_bytes,
+    concurrency_per_model=WHISPER_MODEL_CONCURRENCY,
+)
+
+
+# Áudios longos: janelas cortadas em silêncios, transcritas em processos paralelos
+long_audio = LongAudioTranscriber(
+    STT_LONG_FORM_WORKERS,
+    window_seconds=STT_WINDOW_SECONDS,
+    overlap_seconds=STT_WINDOW_OVERLAP_SECONDS,
+    silence_db=STT_VAD_SILENCE_DB,
+    backend=whisper_backend,
+    registry=whisper_models,
+    estimate_bytes=_estimate_model_bytes,
+)
 
 
 def get_model(model_size: str = None):
     """Carrega e retorna modelo Whisper (com cache)"""
-    model_size = model_size or DEFAULT_WHISPER_MODEL
+    return whisper_models.get(model_size or DEFAULT_WHISPER_MODEL)
+
+
+def preload_models(model_sizes: list = None) -> None:
+    """Carrega os modelos configurados em WHISPER_PRELOAD_MODELS"""
+    whisper_models.preload(model_sizes if model_sizes is not None else WHISPER_PRELOAD_MODELS)
 
-    if model_size not in _loaded_models:
-        logger.info(f"Carregando modelo Whisper: {model_size}")
-        try:
-            _loaded_models[model_size] = whisper.load_model(model_size)
-            logger.info(f"Modelo {model_size} carregado com sucesso")
-        except Exception as e:
-            logger.error(f"Erro ao carregar modelo {model_size}: {str(e)}")
-            raise Exception(f"Erro ao carregar modelo Whisper {model_size}: {str(e)}")
 
-    return _loaded_models[model_size]
+def use_long_form(duration: float, long_form: Optional[bool] = None) -> bool:
+    """Modo longo explícito ou automático a partir de STT_LONG_FORM_MIN_SECONDS"""
+    if long_form is not None:
+        return long_form
+    return STT_LONG_FORM_MIN_SECONDS > 0 and duration >= STT_LONG_FORM_MIN_SECONDS
 
 
 def transcribe_audio(
-    audio_path: Path, model_size: str = None, language: str = None
+    audio_path: Path,
+    model_size: str = None,
+    language: str = None,
+    long_form: Optional[bool] = None,
+    progress: Optional[Callable[[float, str], None]] = None,
 ) -> dict:
-    """Transcreve áudio usando Whisper"""
+    """Transcreve áudio usando Whisper (em janelas paralelas para áudios longos)"""
     try:
         model_size = model_size or DEFAULT_WHISPER_MODEL
-        logger.info(f"Transcrevendo áudio: {audio_path} com modelo {model_size}")
+        duration = get_audio_duration(audio_path)
+        long_form = use_long_form(duration, long_form)
+
+        # Mesmo áudio + mesmo modelo/idioma -> reaproveita a transcrição
+        content_hash = artifact_cache.content_hash(audio_path)
+        params = {"model_size": model_size, "language": language}
+        if long_form:
+            params.update(long_form=True, window_seconds=STT_WINDOW_SECONDS)
+        if whisper_backend != "fp32":
+            params["backend"] = whisper_backend
+        cached = artifact_cache.get_json(content_hash, "transcript", params)
+        if cached is not None:
+            logger.info(f"Transcrição em cache para {audio_path} ({content_hash[:12]})")
+            return cached
+
+        if long_form:
+            logger.info(
+                f"Transcrevendo áudio longo: {audio_path} ({duration:.0f}s) com modelo "
+                f"{model_size} em até {long_audio.workers} processos"
+            )
+            result = long_audio.transcribe(audio_path, model_size, language, duration, progress)
+        else:
+            logger.info(f"Transcrevendo áudio: {audio_path} com modelo {model_size}")
 
-        # Carrega o modelo
-        model = get_model(model_size)
+            # Opções de transcrição
+            options = {"verbose": False}
 
-        # Opções de transcrição
-        options = {"fp16": False, "verbose": False}  # Melhor compatibilidade
+            # Adiciona idioma se especificado
+            if language:
+                options["language"] = language
 
-        # Adiciona idioma se especificado
-        if language:
-            options["language"] = language
+            # Decodifica por pipe (áudio ou vídeo) antes de reservar o modelo
+            audio = read_pcm(audio_path, expected_seconds=duration)
 
-        # Transcreve o áudio
-        result = model.transcribe(str(audio_path), **options)
+            # Reserva o modelo (carrega se necessário) e transcreve o áudio
+            with whisper_models.use(model_size) as model:
+                result = model.transcribe(audio, fp16=whisper_fp16(model), **options)
 
         logger.info(f"Transcrição concluída. Texto: {len(result['text'])} caracteres")
 
-        return {
+        transcription = {
             "text": result["text"].strip(),
-            "language": result.get("language", language or "auto"),
+            "language": result.get("language") or language or "auto",
             "segments": result.get("segments", []),
             "model_used": model_size,
-            "audio_duration": get_audio_duration(audio_path),
+            "audio_duration": duration,
         }
+        if long_form:
+            transcription["windows"] = result["windows"]
+        artifact_cache.put_json(content_hash, "transcript", params, transcription)
+        return transcription
 
     except Exception as e:
         logger.error(f"Erro na transcrição de áudio: {str(e)}")
         raise Exception(f"Erro na transcrição de áudio: {str(e)}")
 
 
+def transcribe_pcm(audio, offset: float, model_size: str = None, language: str = None) -> dict:
+    """Transcreve um trecho PCM (float32, 16 kHz) com o modelo em cache"""
+    with whisper_models.use(model_size or DEFAULT_WHISPER_MODEL) as model:
+        return transcribe_array(model, audio, offset, language)
+
+
+def iter_transcription(
+    media_path: Optional[Path],
+    model_size: str = None,
+    language: str = None,
+    long_form: Optional[bool] = None,
+    blocks: Optional[Iterator] = None,
+    duration: Optional[float] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Gera {window, start, end, language, segments} à medida que cada janela termina
+
+    Aceita áudio ou vídeo (o ffmpeg lê só a trilha de áudio). Áudios longos
+    usam o pool de processos; os demais, o modelo carregado neste processo.
+    Com `blocks` (PCM float32 16 kHz já decodificado, ex.: pelo ingest de
+    vídeo), informe `duration` para escolher o modo.
+    """
+    model_size = model_size or DEFAULT_WHISPER_MODEL
+    if duration is None:
+        duration = get_audio_duration(media_path)
+    if use_long_form(duration, long_form):
+        yield from long_audio.iter_segments(
+            media_path, model_size, language, duration, blocks=blocks
+        )
+        return
+    yield from iter_local_segments(
+        media_path,
+        lambda audio, offset: transcribe_pcm(audio, offset, model_size, language),
+        window_seconds=STT_WINDOW_SECONDS,
+        overlap_seconds=STT_WINDOW_OVERLAP_SECONDS,
+        silence_db=STT_VAD_SILENCE_DB,
+        blocks=blocks,
+    )
+
+
+def live_session(model_size: str = None, language: str = None, sample_rate: int = 16000) -> LiveTranscriber:
+    """Sessão de transcrição incremental para PCM recebido em tempo real"""
+    model_size = model_size or DEFAULT_WHISPER_MODEL
+    return LiveTranscriber(
+        lambda audio, offset: transcribe_pcm(audio, offset, model_size, language),
+        input_rate=sample_rate,
+        step_seconds=STT_LIVE_STEP_SECONDS,
+        max_seconds=STT_LIVE_MAX_SECONDS,
+        silence_db=STT_VAD_SILENCE_DB,
+    )
+
+
 def transcribe_with_timestamps(
     audio_path: Path, model_size: str = None, language: str = None
 ) -> dict:
@@ -69,14 +226,15 @@ def transcribe_with_timestamps(
         model_size = model_size or DEFAULT_WHISPER_MODEL
         logger.info(f"Transcrevendo com timestamps: {audio_path}")
 
-        model = get_model(model_size)
-
-        options = {"fp16": False, "verbose": False, "word_timestamps": True}
+        options = {"verbose": False, "word_timestamps": True}
 
         if language:
             options["language"] = language
 
-        result = model.transcribe(str(audio_path), **options)
+        duration = get_audio_duration(audio_path)
+        audio = read_pcm(audio_path, expected_seconds=duration)
+        with whisper_models.use(model_size) as model:
+            result = model.transcribe(audio, fp16=whisper_fp16(model), **options)
 
         # Processa segmentos com timestamps
         segments_with_timestamps = []
@@ -107,7 +265,7 @@ def transcribe_with_timestamps(
             "language": result.get("language", language or "auto"),
             "segments": segments_with_timestamps,
             "model_used": model_size,
-            "audio_duration": get_audio_duration(audio_path),
+            "audio_duration": duration,
             "has_word_timestamps": True,
         }
 
@@ -117,43 +275,8 @@ def transcribe_with_timestamps(
 
 
 def get_audio_duration(audio_path: Path) -> float:
-    """Obtém duração do áudio em segundos"""
-    try:
-        import librosa
-
-        duration = librosa.get_duration(filename=str(audio_path))
-        return duration
-    except ImportError:
-        logger.warning("librosa não instalado, usando método alternativo")
-        try:
-            # Método alternativo usando ffprobe
-            import subprocess
-
-            result = subprocess.run(
-                [
-                    "ffprobe",
-                    "-v",
-                    "error",
-                    "-show_entries",
-                    "format=duration",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    str(audio_path),
-                ],
-                capture_output=True,
-                text=True,
-            )
-
-            if result.returncode == 0:
-                return float(result.stdout.strip())
-        except Exception:
-            pass
-
-        logger.warning("Não foi possível determinar duração do áudio")
-        return 0.0
-    except Exception as e:
-        logger.warning(f"Erro ao obter duração do áudio: {str(e)}")
-        return 0.0
+    """Obtém duração do áudio em segundos (cabeçalhos do contêiner, com cache)"""
+    return media_duration(audio_path)
 
 
 def detect_language(audio_path: Path, model_size: str = None) -> dict:
@@ -162,17 +285,15 @@ def detect_language(audio_path: Path, model_size: str = None) -> dict:
         model_size = model_size or DEFAULT_WHISPER_MODEL
         logger.info(f"Detectando idioma do áudio: {audio_path}")
 
-        model = get_model(model_size)
-
-        # Carrega apenas os primeiros 30 segundos para detecção
-        audio = whisper.load_audio(str(audio_path))
-        audio = whisper.pad_or_trim(audio)
+        # Decodifica apenas os primeiros 30 segundos para detecção
+        audio = whisper.pad_or_trim(decode_head(audio_path, LANGUAGE_DETECTION_SECONDS))
 
-        # Gera mel-spectrogram
-        mel = whisper.log_mel_spectrogram(audio).to(model.device)
+        with whisper_models.use(model_size) as model:
+            # Gera mel-spectrogram
+            mel = whisper.log_mel_spectrogram(audio).to(model.device)
 
-        # Detecta idioma
-        _, probs = model.detect_language(mel)
+            # Detecta idioma
+            _, probs = model.detect_language(mel)
 
         # Ordena por probabilidade
         detected_languages = [
@@ -243,12 +364,16 @@ def get_model_info(model_size: str = None) -> dict:
     return {
         "model": model_size,
         "info": model_info.get(model_size, {}),
-        "is_loaded": model_size in _loaded_models,
+        "is_loaded": whisper_models.is_loaded(model_size),
     }
 
 
+def unload_model(model_size: str) -> bool:
+    """Descarrega um modelo ocioso; False se não estiver carregado ou em uso"""
+    return whisper_models.unload(model_size)
+
+
 def clear_model_cache():
-    """Limpa cache de modelos carregados"""
-    global _loaded_models
+    """Limpa cache de modelos carregados (modelos em uso são mantidos)"""
     logger.info("Limpando cache de modelos Whisper")
-    _loaded_models = {}
+    whisper_models.clear()
@@ -0,0 +1,275 @@
+"""
+Pool de engines Tesseract residentes em memória
+In-process pool of warm Tesseract engines
+
+Com tesserocr, cada thread do pool mantém uma instância de PyTessBaseAPI por
+conjunto de idiomas (ex.: por+eng), carregada uma única vez. As imagens
+entram como buffers em memória, sem subprocesso nem arquivo temporário, e o
+reconhecimento libera o GIL, de modo que as threads trabalham em paralelo.
+Sem tesserocr, o reconhecimento cai para pytesseract (um subprocesso por
+imagem), com o mesmo formato de resultado.
+
+Este módulo não depende da configuração do backend.
+"""
+
+import io
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Import condicional para tesserocr (API C++ do Tesseract em processo)
+try:
+    from tesserocr import OEM, PSM, RIL, PyTessBaseAPI, iterate_level
+
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+# Import condicional para pytesseract (fallback via subprocesso)
+try:
+    import pytesseract
+
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+logger = logging.getLogger("omnisia.tesseract_pool")
+
+
+def parse_tesseract_config(config: str) -> Tuple[Optional[int], Optional[int], Dict[str, str]]:
+    """Converte "--oem 3 --psm 6 -c chave=valor" em (oem, psm, variáveis)"""
+    oem = psm = None
+    variables: Dict[str, str] = {}
+    tokens = (config or "").split()
+    for i, token in enumerate(tokens):
+        value = tokens[i + 1] if i + 1 < len(tokens) else None
+        if token == "--oem" and value is not None:
+            oem = int(value)
+        elif token == "--psm" and value is not None:
+            psm = int(value)
+        elif token == "-c" and value and "=" in value:
+            key, _, val = value.partition("=")
+            variables[key] = val
+    return oem, psm, variables
+
+
+def words_to_result(data: Dict[str, list], with_boxes: bool = True) -> Dict[str, Any]:
+    """Texto por linhas, confiança média e caixas a partir de image_to_data"""
+    lines: Dict[tuple, list] = {}
+    boxes = []
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        word = (word or "").strip()
+        conf = float(data["conf"][i])
+        if not word or conf < 0:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        confidences.append(conf)
+        if with_boxes:
+            boxes.append(
+                {
+                    "text": word,
+                    "confidence": round(conf / 100, 4),
+                    "box": [data["left"][i], data["top"][i], data["width"][i], data["height"][i]],
+                }
+            )
+
+    parts = []
+    previous_block = None
+    for key in sorted(lines):
+        if previous_block is not None and key[0] != previous_block:
+            parts.append("")
+        parts.append(" ".join(lines[key]))
+        previous_block = key[0]
+
+    result = {
+        "text": "\n".join(parts),
+        "confidence": round(sum(confidences) / len(confidences) / 100, 4) if confidences else 0.0,
+        "words": len(confidences),
+    }
+    if with_boxes:
+        result["boxes"] = boxes
+    return result
+
+
+# Engines por thread: {(idioma, config): PyTessBaseAPI}
+_local = threading.local()
+
+
+def _engine(language: str, config: str):
+    engines = getattr(_local, "engines", None)
+    if engines is None:
+        engines = _local.engines = {}
+    key = (language, config)
+    if key not in engines:
+        oem, psm, variables = parse_tesseract_config(config)
+        options = {"lang": language}
+        if oem is not None:
+            options["oem"] = OEM(oem)
+        if psm is not None:
+            options["psm"] = PSM(psm)
+        api = PyTessBaseAPI(**options)
+        for name, value in variables.items():
+            api.SetVariable(name, value)
+        engines[key] = api
+        logger.info(f"Engine Tesseract carregada ({language}) em {threading.current_thread().name}")
+    return engines[key]
+
+
+def _set_image(api, image) -> None:
+    if isinstance(image, np.ndarray):
+        # Buffer de pixels entregue direto ao Tesseract, sem passar por PIL
+        pixels = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = pixels.shape[:2]
+        channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+        api.SetImageBytes(pixels.tobytes(), width, height, channels, width * channels)
+    else:
+        api.SetImage(image)
+
+
+def _recognize_tesserocr(image, language: str, config: str, with_boxes: bool) -> Dict[str, Any]:
+    api = _engine(language, config)
+    try:
+        _set_image(api, image)
+        api.Recognize()
+        text = api.GetUTF8Text().strip()
+        boxes = []
+        confidences = []
+        iterator = api.GetIterator()
+        if iterator is not None:
+            for word in iterate_level(iterator, RIL.WORD):
+                value = (word.GetUTF8Text(RIL.WORD) or "").strip()
+                if not value:
+                    continue
+                conf = word.Confidence(RIL.WORD)
+                confidences.append(conf)
+                if with_boxes:
+                    x1, y1, x2, y2 = word.BoundingBox(RIL.WORD)
+                    boxes.append(
+                        {"text": value, "confidence": round(conf / 100, 4), "box": [x1, y1, x2 - x1, y2 - y1]}
+                    )
+    finally:
+        api.Clear()
+
+    result = {
+        "text": text,
+        "confidence": round(sum(confidences) / len(confidences) / 100, 4) if confidences else 0.0,
+        "words": len(confidences),
+    }
+    if with_boxes:
+        result["boxes"] = boxes
+    return result
+
+
+def recognize(image, language: str, config: str = "", with_boxes: bool = True) -> Dict[str, Any]:
+    """Reconhece uma imagem PIL ou array uint8: texto, confiança média e caixas"""
+    if TESSEROCR_AVAILABLE:
+        return _recognize_tesserocr(image, language, config, with_boxes)
+    if not PYTESSERACT_AVAILABLE:
+        raise Exception("Nenhum backend Tesseract instalado. Execute: pip install tesserocr")
+    data = pytesseract.image_to_data(
+        image, lang=language, config=config, output_type=pytesseract.Output.DICT
+    )
+    return words_to_result(data, with_boxes)
+
+
+def recognize_buffer(data: bytes, language: str, config: str = "", with_boxes: bool = True) -> Dict[str, Any]:
+    """Reconhece uma imagem codificada (PNG, JPEG, TIFF...) em memória"""
+    with Image.open(io.BytesIO(data)) as image:
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        return recognize(image, language, config, with_boxes)
+
+
+class TesseractPool:
+    """Threads com engines Tesseract aquecidas para OCR de imagens em lote"""
+
+    def __init__(self, workers: Optional[int] = None, config: str = ""):
+        self.workers = workers or os.cpu_count() or 1
+        self.config = config
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.completed = 0
+
+    @property
+    def backend(self) -> str:
+        return "tesserocr" if TESSEROCR_AVAILABLE else "pytesseract"
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="tesseract"
+                )
+                logger.info(f"Pool Tesseract iniciado ({self.workers} threads, {self.backend})")
+            return self._executor
+
+    def _run(self, image, language: str, with_boxes: bool, task: Optional[Callable] = None) -> Dict[str, Any]:
+        if task is not None:
+            result = task(image, language, self.config, with_boxes)
+        elif isinstance(image, (bytes, bytearray, memoryview)):
+            result = recognize_buffer(bytes(image), language, self.config, with_boxes)
+        else:
+            result = recognize(image, language, self.config, with_boxes)
+        self.completed += 1
+        return result
+
+    def submit(
+        self, image, language: str, with_boxes: bool = True, task: Optional[Callable] = None
+    ) -> Future:
+        """Enfileira uma imagem (bytes codificados, imagem PIL ou array NumPy)
+
+        `task(item, language, config, with_boxes)` substitui o reconhecimento
+        padrão quando o item precisa de outro tratamento na thread do pool.
+        """
+        return self.executor.submit(self._run, image, language, with_boxes, task)
+
+    def ocr(self, image, language: str, with_boxes: bool = True) -> Dict[str, Any]:
+        return self.submit(image, language, with_boxes).result()
+
+    def map(
+        self,
+        images: Iterable,
+        language: str,
+        with_boxes: bool = True,
+        task: Optional[Callable] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """OCR de várias imagens em paralelo, na ordem de entrada
+
+        Lê a entrada sob demanda: no máximo 2x `workers` imagens ficam em
+        memória, mesmo para pastas com milhares de arquivos.
+        """
+        window = self.workers * 2
+        pending: deque = deque()
+        try:
+            for image in images:
+                pending.append(self.submit(image, language, with_boxes, task))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "started": self._executor is not None,
+            "completed": self.completed,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
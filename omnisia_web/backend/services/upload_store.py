@@ -0,0 +1,254 @@
+"""
+Gravação de uploads em streaming e uploads retomáveis
+Streaming upload storage and resumable uploads
+
+Os arquivos são gravados em blocos de tamanho fixo em um arquivo temporário
+dentro de UPLOAD_DIR/.partial (mesmo sistema de arquivos), com SHA-256
+calculado durante a escrita e o limite de tamanho verificado a cada bloco.
+Ao final o arquivo é movido atomicamente para UPLOAD_DIR.
+
+Os uploads retomáveis seguem a ideia do protocolo tus: uma sessão é criada
+com o tamanho total, os blocos são enviados com o offset atual e o cliente
+pode consultar o offset após uma queda de conexão para continuar dali.
+
+Este módulo não depende da configuração do backend para poder ser usado
+também pela API raiz (web/api.py).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+logger = logging.getLogger("omnisia.upload_store")
+
+PARTIAL_DIR_NAME = ".partial"
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Upload excedeu o tamanho máximo"""
+
+
+class UploadOffsetMismatch(Exception):
+    """Offset enviado não corresponde ao já recebido"""
+
+    def __init__(self, expected: int, received: int):
+        super().__init__(f"Offset esperado {expected}, recebido {received}")
+        self.expected = expected
+
+
+class UploadSessionNotFound(Exception):
+    """Sessão de upload inexistente ou expirada"""
+
+
+def safe_filename(filename: str) -> str:
+    """Remove componentes de diretório do nome enviado pelo cliente"""
+    name = Path(filename or "").name
+    if name in ("", ".", "..") or name.startswith("."):
+        raise ValueError(f"Nome de arquivo inválido: {filename!r}")
+    return name
+
+
+def _fsync_and_close(handle) -> None:
+    handle.flush()
+    os.fsync(handle.fileno())
+    handle.close()
+
+
+async def iter_upload_file(upload, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Itera um UploadFile em blocos sem carregá-lo inteiro na memória"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def stream_to_path(
+    chunks: AsyncIterator[bytes], dest: Path, max_size: int
+) -> Dict[str, Any]:
+    """Grava blocos em um temporário, com hash e limite, e renomeia para `dest`"""
+    partial_dir = dest.parent / PARTIAL_DIR_NAME
+    partial_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = partial_dir / f"{uuid.uuid4().hex}.part"
+
+    hasher = hashlib.sha256()
+    size = 0
+    handle = open(tmp_path, "wb")
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLarge(
+                    f"Arquivo muito grande. Tamanho máximo: {max_size // (1024 * 1024)}MB"
+                )
+            hasher.update(chunk)
+            await asyncio.to_thread(handle.write, chunk)
+
+        await asyncio.to_thread(_fsync_and_close, handle)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        handle.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    logger.info(f"Upload gravado: {dest.name} ({size} bytes)")
+    return {"path": dest, "size": size, "sha256": hasher.hexdigest()}
+
+
+async def save_upload_file(
+    upload, dest: Path, max_size: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """Grava um UploadFile em streaming em `dest`"""
+    return await stream_to_path(iter_upload_file(upload, chunk_size), dest, max_size)
+
+
+def _hash_file(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ResumableUploads:
+    """Sessões de upload retomável (estilo tus) persistidas em disco"""
+
+    def __init__(self, upload_dir: Path, max_size: int, ttl_seconds: float = 24 * 3600):
+        self.upload_dir = upload_dir
+        self.partial_dir = upload_dir / PARTIAL_DIR_NAME
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # Hash incremental enquanto a sessão vive neste processo
+        self._hashers: Dict[str, Any] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _meta_path(self, session_id: str) -> Path:
+        return self.partial_dir / f"{session_id}.json"
+
+    def _data_path(self, session_id: str) -> Path:
+        return self.partial_dir / f"{session_id}.part"
+
+    def _write_meta(self, session: Dict[str, Any]) -> None:
+        path = self._meta_path(session["id"])
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(session))
+        os.replace(tmp, path)
+
+    def create(self, filename: str, length: int, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Abre uma sessão para um arquivo de `length` bytes"""
+        if length > self.max_size:
+            raise UploadTooLarge(
+                f"Arquivo muito grande. Tamanho máximo: {self.max_size // (1024 * 1024)}MB"
+            )
+        session = {
+            "id": uuid.uuid4().hex,
+            "filename": safe_filename(filename),
+            "length": length,
+            "metadata": metadata or {},
+            "created_at": time.time(),
+        }
+        self._data_path(session["id"]).touch()
+        self._write_meta(session)
+        self._hashers[session["id"]] = hashlib.sha256()
+        return self.get(session["id"])
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """Sessão com o offset atual (tamanho já gravado)"""
+        if not session_id.isalnum():
+            raise UploadSessionNotFound(session_id)
+        try:
+            session = json.loads(self._meta_path(session_id).read_text())
+            session["offset"] = self._data_path(session_id).stat().st_size
+        except FileNotFoundError:
+            raise UploadSessionNotFound(session_id)
+        return session
+
+    async def append(
+        self, session_id: str, offset: int, chunks: AsyncIterator[bytes]
+    ) -> Dict[str, Any]:
+        """Anexa blocos a partir de `offset`; finaliza quando atingir o tamanho total"""
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            session = self.get(session_id)
+            if offset != session["offset"]:
+                raise UploadOffsetMismatch(session["offset"], offset)
+
+            # O hash incremental só existe se a sessão nasceu neste processo;
+            # caso contrário o arquivo é lido novamente ao finalizar
+            hasher = self._hashers.get(session_id)
+
+            written = offset
+            handle = open(self._data_path(session_id), "ab")
+            try:
+                async for chunk in chunks:
+                    if written + len(chunk) > session["length"]:
+                        raise UploadTooLarge(
+                            f"Dados além do tamanho declarado ({session['length']} bytes)"
+                        )
+                    if hasher is not None:
+                        hasher.update(chunk)
+                    await asyncio.to_thread(handle.write, chunk)
+                    written += len(chunk)
+            except BaseException:
+                self._hashers.pop(session_id, None)
+                raise
+            finally:
+                # Mantém o que já foi recebido para que o cliente possa retomar
+                await asyncio.to_thread(_fsync_and_close, handle)
+
+            session["offset"] = written
+            if written == session["length"]:
+                return await self._finalize(session)
+            return session
+
+    async def _finalize(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        session_id = session["id"]
+        data_path = self._data_path(session_id)
+        hasher = self._hashers.pop(session_id, None)
+        sha256 = hasher.hexdigest() if hasher is not None else await asyncio.to_thread(_hash_file, data_path)
+
+        dest = self.upload_dir / session["filename"]
+        os.replace(data_path, dest)
+        self._meta_path(session_id).unlink(missing_ok=True)
+        self._locks.pop(session_id, None)
+
+        logger.info(f"Upload retomável concluído: {dest.name} ({session['length']} bytes)")
+        return {**session, "completed": True, "path": dest, "size": session["length"], "sha256": sha256}
+
+    def abort(self, session_id: str) -> None:
+        """Descarta a sessão e os dados recebidos"""
+        self.get(session_id)
+        self._data_path(session_id).unlink(missing_ok=True)
+        self._meta_path(session_id).unlink(missing_ok=True)
+        self._hashers.pop(session_id, None)
+        self._locks.pop(session_id, None)
+
+    def cleanup_expired(self) -> int:
+        """Remove sessões abandonadas há mais de `ttl_seconds`"""
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for meta_path in self.partial_dir.glob("*.json"):
+            session_id = meta_path.stem
+            data_path = self._data_path(session_id)
+            last_activity = max(
+                meta_path.stat().st_mtime,
+                data_path.stat().st_mtime if data_path.exists() else 0,
+            )
+            if last_activity < cutoff:
+                data_path.unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+                self._hashers.pop(session_id, None)
+                removed += 1
+        # Temporários de uploads em streaming interrompidos
+        for part_path in self.partial_dir.glob("*.part"):
+            if not self._meta_path(part_path.stem).exists() and part_path.stat().st_mtime < cutoff:
+                part_path.unlink(missing_ok=True)
+        return removed
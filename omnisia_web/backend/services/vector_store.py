@@ -0,0 +1,648 @@
+"""
+Armazenamento vetorial persistente para o EmbeddingService
+Persistent vector storage for EmbeddingService
+
+Layout do diretório / Directory layout:
+- index.faiss: snapshot do índice FAISS (aberto com IO_FLAG_MMAP)
+- index.json: metadados do snapshot (ntotal, dimensão, data)
+- texts.dat / texts.idx: textos em arquivo append-only com índice de offsets
+- wal.log: write-ahead log dos embeddings adicionados após o snapshot
+- vectors.db: chave de conteúdo (inserções idempotentes) e metadados de cada
+  vetor (documento, origem, tipo, tenant, data), usados na busca filtrada
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from .ann_index import (
+    TRAINED_INDEX_TYPES,
+    ReservoirSampler,
+    build_index,
+    configure_search,
+    id_selector,
+    index_kind,
+    iter_vectors,
+    search_parameters,
+    training_sample_size,
+    training_threshold,
+)
+
+logger = logging.getLogger("omnisia.vector_store")
+
+# Cabeçalho de cada registro do WAL: start_id, count, dim, crc32
+_WAL_HEADER = struct.Struct("<QIII")
+
+# Metadados com coluna indexada; os demais campos vão em JSON (extra)
+METADATA_COLUMNS = ("doc_id", "source", "file_type", "tenant", "created_at")
+FILTER_FIELDS = ("doc_id", "source", "file_type", "tenant", "created_after", "created_before")
+
+
+def metadata_filter_sql(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Cláusula WHERE dos filtros: valor único ou lista por campo, datas em epoch"""
+    clauses, params = [], []
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if name == "created_after":
+            clauses.append("created_at >= ?")
+            params.append(float(value))
+        elif name == "created_before":
+            clauses.append("created_at < ?")
+            params.append(float(value))
+        elif name in METADATA_COLUMNS:
+            values = [value] if isinstance(value, str) else list(value)
+            clauses.append(f"{name} IN ({','.join('?' * len(values))})" if values else "0")
+            params.extend(values)
+        else:
+            raise ValueError(f"Filtro não suportado: {name}. Use um de {list(FILTER_FIELDS)}")
+    return " AND ".join(clauses) or "1", params
+
+
+def _fsync_dir(directory: Path) -> None:
+    """Garante que renomeações no diretório sejam persistidas"""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Escreve arquivo de forma atômica (tmp + fsync + rename)"""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path.parent)
+
+
+class TextStore:
+    """Textos em arquivo append-only, acessados por offset"""
+
+    # Cada entrada do índice: offset (uint64) e tamanho (uint64) em bytes
+    _ENTRY = np.dtype([("offset", "<u8"), ("length", "<u8")])
+
+    def __init__(self, directory: Path):
+        self.data_path = directory / "texts.dat"
+        self.index_path = directory / "texts.idx"
+        self.data_path.touch(exist_ok=True)
+        self.index_path.touch(exist_ok=True)
+
+        entries = np.fromfile(str(self.index_path), dtype=self._ENTRY)
+        data_size = self.data_path.stat().st_size
+
+        # Descarta entradas parciais deixadas por uma queda no meio da escrita
+        valid = len(entries)
+        while valid and int(entries[valid - 1]["offset"] + entries[valid - 1]["length"]) > data_size:
+            valid -= 1
+        self._offsets = entries["offset"][:valid].tolist()
+        self._lengths = entries["length"][:valid].tolist()
+        if valid != len(entries) or self.index_path.stat().st_size % self._ENTRY.itemsize:
+            self.truncate(valid)
+
+        self._data = self.data_path.open("ab")
+        self._reader = self.data_path.open("rb")
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, position: int) -> str:
+        if position < 0:
+            position += len(self._offsets)
+        offset, length = self._offsets[position], self._lengths[position]
+        return os.pread(self._reader.fileno(), length, offset).decode("utf-8")
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def extend(self, texts: Iterable[str]) -> None:
+        """Anexa textos ao final do arquivo"""
+        offset = self._data.seek(0, os.SEEK_END)
+        entries = []
+        for text in texts:
+            encoded = text.encode("utf-8")
+            self._data.write(encoded)
+            entries.append((offset, len(encoded)))
+            offset += len(encoded)
+        self._data.flush()
+        os.fsync(self._data.fileno())
+
+        with self.index_path.open("ab") as f:
+            f.write(np.array(entries, dtype=self._ENTRY).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        for entry_offset, length in entries:
+            self._offsets.append(entry_offset)
+            self._lengths.append(length)
+
+    def truncate(self, count: int) -> None:
+        """Mantém apenas as primeiras `count` entradas"""
+        data_end = self._offsets[count - 1] + self._lengths[count - 1] if count else 0
+        del self._offsets[count:]
+        del self._lengths[count:]
+        with self.data_path.open("r+b") as f:
+            f.truncate(data_end)
+        with self.index_path.open("r+b") as f:
+            f.truncate(count * self._ENTRY.itemsize)
+
+    def close(self) -> None:
+        self._data.close()
+        self._reader.close()
+
+
+class WriteAheadLog:
+    """Registro dos embeddings adicionados desde o último snapshot"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.touch(exist_ok=True)
+        self._file = self.path.open("ab")
+
+    def append(self, start_id: int, embeddings: np.ndarray) -> None:
+        payload = np.ascontiguousarray(embeddings, dtype="float32").tobytes()
+        count, dim = embeddings.shape
+        header = _WAL_HEADER.pack(start_id, count, dim, zlib.crc32(payload))
+        self._file.write(header + payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def replay(self) -> Iterable[Tuple[int, np.ndarray]]:
+        """Lê registros válidos; um registro incompleto encerra a leitura"""
+        valid_size = 0
+        with self.path.open("rb") as f:
+            while True:
+                header = f.read(_WAL_HEADER.size)
+                if len(header) < _WAL_HEADER.size:
+                    break
+                start_id, count, dim, crc = _WAL_HEADER.unpack(header)
+                payload = f.read(count * dim * 4)
+                if len(payload) < count * dim * 4 or zlib.crc32(payload) != crc:
+                    logger.warning("Registro incompleto no WAL descartado")
+                    break
+                valid_size = f.tell()
+                yield start_id, np.frombuffer(payload, dtype="float32").reshape(count, dim)
+
+        if valid_size != self.path.stat().st_size:
+            self._file.truncate(valid_size)
+
+    def reset(self) -> None:
+        self._file.truncate(0)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class PersistentVectorStore:
+    """Índice FAISS + textos persistidos em disco com snapshots atômicos"""
+
+    def __init__(
+        self,
+        directory: Path,
+        use_mmap: bool = True,
+        snapshot_every: int = 1000,
+        snapshot_interval: float = 300.0,
+        index_config: Optional[Dict[str, Any]] = None,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.faiss"
+        self.meta_path = self.directory / "index.json"
+        self.use_mmap = use_mmap
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self.index_config = dict(index_config or {"index_type": "flat"})
+        self.index_type = self.index_config.get("index_type", "flat")
+
+        self._lock = threading.RLock()
+        self.index: Optional[faiss.Index] = None
+        self.texts = TextStore(self.directory)
+        self.wal = WriteAheadLog(self.directory / "wal.log")
+        self._db = sqlite3.connect(str(self.directory / "vectors.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vector_keys (key TEXT PRIMARY KEY, id INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vector_metadata (id INTEGER PRIMARY KEY, doc_id TEXT, "
+            "source TEXT, file_type TEXT, tenant TEXT, created_at REAL, extra TEXT)"
+        )
+        for column in METADATA_COLUMNS:
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_vector_metadata_{column} "
+                f"ON vector_metadata ({column})"
+            )
+        self._db.commit()
+        self.sampler = ReservoirSampler(self.index_config.get("sample_size", 100000))
+        self._pending = 0
+        self._last_snapshot = time.time()
+        self._rebuild_thread: Optional[threading.Thread] = None
+
+        self._load()
+
+    def _load(self) -> None:
+        """Abre o snapshot e reaplica o WAL"""
+        start = time.time()
+        if self.index_path.exists():
+            flags = faiss.IO_FLAG_MMAP if self.use_mmap else 0
+            self.index = faiss.read_index(str(self.index_path), flags)
+            configure_search(self.index, self.index_config)
+
+        replayed = 0
+        for start_id, embeddings in self.wal.replay():
+            ntotal = self.ntotal
+            if start_id + len(embeddings) <= ntotal:
+                continue  # Já incluído no snapshot
+            if start_id > ntotal:
+                logger.error(f"Lacuna no WAL: esperado id {ntotal}, encontrado {start_id}")
+                break
+            self._index_add(embeddings[ntotal - start_id :])
+            replayed += len(embeddings) - (ntotal - start_id)
+
+        # Textos gravados sem o registro correspondente no WAL são descartados
+        if len(self.texts) > self.ntotal:
+            logger.warning(
+                f"Descartando {len(self.texts) - self.ntotal} textos sem embedding persistido"
+            )
+            self.texts.truncate(self.ntotal)
+        elif len(self.texts) < self.ntotal:
+            raise Exception(
+                f"Armazenamento inconsistente: {self.ntotal} vetores e {len(self.texts)} textos"
+            )
+
+        # Chaves e metadados de vetores que não sobreviveram à queda
+        self._db.execute("DELETE FROM vector_keys WHERE id >= ?", (self.ntotal,))
+        self._db.execute("DELETE FROM vector_metadata WHERE id >= ?", (self.ntotal,))
+        self._db.commit()
+
+        self._pending = replayed
+        logger.info(
+            f"Índice vetorial carregado de {self.directory}: {self.ntotal} vetores "
+            f"({replayed} do WAL) em {time.time() - start:.2f}s"
+        )
+
+        # Migração automática quando o tipo configurado mudou
+        if self.index is not None and index_kind(self.index) != self.index_type:
+            self._seed_sampler()
+            self._maybe_start_rebuild()
+
+    def _seed_sampler(self) -> None:
+        """Preenche o reservatório com uma amostra aleatória do índice existente"""
+        size = min(self.ntotal, self.sampler.capacity)
+        if not size:
+            return
+        if index_kind(self.index) in TRAINED_INDEX_TYPES:
+            faiss.extract_index_ivf(self.index).make_direct_map()
+        ids = np.sort(np.random.default_rng().choice(self.ntotal, size, replace=False))
+        self.sampler.add(np.vstack([self.index.reconstruct(int(i)) for i in ids]))
+        self.sampler.seen = self.ntotal
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    def _index_add(self, embeddings: np.ndarray) -> None:
+        if self.index is None:
+            # Índices IVF começam como Flat até haver amostra para o treino
+            initial_type = "flat" if self.index_type in TRAINED_INDEX_TYPES else self.index_type
+            self.index = build_index(initial_type, embeddings.shape[1], self.index_config)
+        self.index.add(embeddings)
+
+    def _maybe_start_rebuild(self) -> None:
+        """Dispara a migração em segundo plano quando o tipo atual difere do configurado"""
+        if index_kind(self.index) == self.index_type or self.rebuilding:
+            return
+        if self.ntotal < training_threshold(self.index_type, self.index_config, self.ntotal):
+            return
+
+        self._rebuild_thread = threading.Thread(
+            target=self._rebuild, args=(self.index_type,), name="vector-index-rebuild", daemon=True
+        )
+        self._rebuild_thread.start()
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._rebuild_thread is not None and self._rebuild_thread.is_alive()
+
+    def _copy_vectors(self, source: faiss.Index, target: faiss.Index, start: int, end: int) -> None:
+        batch_size = 65536
+        for batch_start in range(start, end, batch_size):
+            with self._lock:
+                batch = source.reconstruct_n(batch_start, min(batch_size, end - batch_start))
+            target.add(batch)
+
+    def _resample(self, source: faiss.Index, count: int, size: int) -> np.ndarray:
+        """Amostra uniforme de `size` vetores entre os `count` primeiros do índice"""
+        sampler = ReservoirSampler(size)
+        batch_size = 65536
+        for batch_start in range(0, count, batch_size):
+            with self._lock:
+                sampler.add(source.reconstruct_n(batch_start, min(batch_size, count - batch_start)))
+        logger.info(f"Amostra de treino refeita com {len(sampler)} vetores")
+        return sampler.get()
+
+    def _rebuild(self, index_type: str) -> None:
+        """Treina e preenche um novo índice e o troca atomicamente pelo atual"""
+        try:
+            start = time.time()
+            with self._lock:
+                source = self.index
+                copied = source.ntotal
+                sample = self.sampler.get()
+                if index_kind(source) in TRAINED_INDEX_TYPES:
+                    faiss.extract_index_ivf(source).make_direct_map()
+
+            logger.info(
+                f"Reconstruindo índice {index_kind(source)} -> {index_type} "
+                f"({copied} vetores, amostra de {len(sample)})"
+            )
+            target = build_index(index_type, source.d, self.index_config, copied)
+            if not target.is_trained:
+                needed = min(copied, training_sample_size(index_type, self.index_config, copied))
+                if len(sample) < needed:
+                    # O reservatório ficou abaixo do mínimo do k-means para este nlist
+                    sample = self._resample(source, copied, needed)
+                target.train(sample)
+
+            # Cópia principal fora do lock; a busca continua no índice antigo
+            self._copy_vectors(source, target, 0, copied)
+
+            with self._lock:
+                if self.index is not source:
+                    logger.warning("Índice alterado durante a reconstrução; migração descartada")
+                    return
+                # Vetores adicionados durante a reconstrução
+                self._copy_vectors(source, target, copied, source.ntotal)
+                self.index = target
+                self.snapshot()
+
+            logger.info(f"Índice migrado para {index_type} em {time.time() - start:.2f}s")
+
+        except Exception as e:
+            logger.error(f"Erro na reconstrução do índice: {str(e)}", exc_info=True)
+
+    def add(
+        self,
+        texts: List[str],
+        embeddings: np.ndarray,
+        keys: Optional[List[str]] = None,
+        metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> int:
+        """Adiciona textos e embeddings de forma durável; retorna quantos foram inseridos
+
+        `metadata` (um dicionário por texto) fica ligado ao id do vetor e
+        permite filtrar a busca.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        with self._lock:
+            if keys:
+                # Descarta chaves já indexadas ou repetidas no mesmo lote
+                existing = self.existing_keys(keys)
+                keep = []
+                for position, key in enumerate(keys):
+                    if key not in existing:
+                        existing.add(key)
+                        keep.append(position)
+                if len(keep) != len(keys):
+                    texts = [texts[i] for i in keep]
+                    embeddings = embeddings[keep]
+                    keys = [keys[i] for i in keep]
+                    metadata = [metadata[i] for i in keep] if metadata else None
+                if not keep:
+                    return 0
+
+            if self.index is not None and embeddings.shape[1] != self.index.d:
+                raise Exception(
+                    f"Dimensão incompatível: índice {self.index.d}, embeddings {embeddings.shape[1]}"
+                )
+            start_id = self.ntotal
+            self.texts.extend(texts)
+            self.wal.append(start_id, embeddings)
+            self._index_add(embeddings)
+            self.sampler.add(embeddings)
+            self._pending += len(texts)
+
+            if keys:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO vector_keys (key, id) VALUES (?, ?)",
+                    [(key, start_id + offset) for offset, key in enumerate(keys)],
+                )
+            if metadata:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO vector_metadata "
+                    "(id, doc_id, source, file_type, tenant, created_at, extra) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        self._metadata_row(start_id + offset, meta)
+                        for offset, meta in enumerate(metadata)
+                        if meta
+                    ],
+                )
+            if keys or metadata:
+                self._db.commit()
+
+            if self._pending >= self.snapshot_every:
+                self.snapshot()
+            self._maybe_start_rebuild()
+            return len(texts)
+
+    def existing_keys(self, keys: List[str]) -> set:
+        """Subconjunto de `keys` que já está no índice"""
+        found = set()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                rows = self._db.execute(
+                    f"SELECT key FROM vector_keys WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    @staticmethod
+    def _metadata_row(vector_id: int, metadata: Dict[str, Any]) -> Tuple:
+        extra = {key: value for key, value in metadata.items() if key not in METADATA_COLUMNS}
+        return (
+            vector_id,
+            *(metadata.get(column) for column in METADATA_COLUMNS),
+            json.dumps(extra, ensure_ascii=False) if extra else None,
+        )
+
+    def get_metadata(self, ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        """Metadados dos vetores em `ids` (vetores sem metadados ficam de fora)"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = [int(i) for i in ids[start : start + 500]]
+                rows = self._db.execute(
+                    f"SELECT id, {', '.join(METADATA_COLUMNS)}, extra FROM vector_metadata "
+                    f"WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    record = {
+                        column: value
+                        for column, value in zip(METADATA_COLUMNS, row[1:-1])
+                        if value is not None
+                    }
+                    if row[-1]:
+                        record.update(json.loads(row[-1]))
+                    found[row[0]] = record
+        return found
+
+    def filter_ids(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Ids cujos metadados atendem aos filtros; None quando não há filtro"""
+        filters = {name: value for name, value in (filters or {}).items() if value is not None}
+        if not filters:
+            return None
+        where, params = metadata_filter_sql(filters)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id FROM vector_metadata WHERE {where} AND id < ? ORDER BY id",
+                [*params, self.ntotal],
+            )
+            return np.fromiter((row[0] for row in rows), dtype="int64")
+
+    def _exact_search(self, query: np.ndarray, ids: np.ndarray, k: int):
+        """Distâncias calculadas só para os vetores em `ids`"""
+        if index_kind(self.index) in TRAINED_INDEX_TYPES:
+            ivf = faiss.extract_index_ivf(self.index)
+            if ivf.direct_map.no():
+                ivf.make_direct_map()
+        vectors = self.index.reconstruct_batch(ids)
+        if self.index_config.get("metric", "l2") == "ip":
+            scores = query @ vectors.T
+            order = np.argsort(-scores, axis=1)[:, :k]
+        else:
+            scores = (
+                np.sum(query**2, axis=1)[:, None]
+                - 2 * query @ vectors.T
+                + np.sum(vectors**2, axis=1)[None, :]
+            )
+            order = np.argsort(scores, axis=1)[:, :k]
+        return np.take_along_axis(scores, order, axis=1), ids[order]
+
+    def search(
+        self, embeddings: np.ndarray, k: int, ids: Optional[np.ndarray] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """Busca os k vizinhos mais próximos de cada embedding
+
+        Com `ids` (ex.: de `filter_ids`), só esses vetores são considerados:
+        poucos candidatos têm a distância calculada diretamente; os demais
+        casos usam o índice com um bitmap de ids permitidos (IDSelector).
+        """
+        query = np.ascontiguousarray(embeddings, dtype="float32")
+        with self._lock:
+            if self.index is None or self.ntotal == 0 or (ids is not None and not len(ids)):
+                return [[] for _ in range(len(embeddings))]
+            if ids is None:
+                distances, indices = self.index.search(query, k)
+            elif len(ids) <= self.index_config.get("filter_exact_max", 4096):
+                distances, indices = self._exact_search(query, ids, k)
+            else:
+                selector, _bitmap = id_selector(ids, self.ntotal)
+                distances, indices = self.index.search(
+                    query, k, params=search_parameters(self.index, self.index_config, selector)
+                )
+        return [
+            [(int(idx), float(dist)) for idx, dist in zip(row_ids, row_dists) if idx >= 0]
+            for row_ids, row_dists in zip(indices, distances)
+        ]
+
+    def get_vectors(self, count: int) -> np.ndarray:
+        """Reconstrói os primeiros `count` vetores do índice"""
+        with self._lock:
+            if self.index is None or self.ntotal == 0:
+                return np.empty((0, 0), dtype="float32")
+            return np.vstack(list(iter_vectors(self.index, 0, min(count, self.ntotal))))
+
+    def snapshot(self) -> None:
+        """Grava o índice atomicamente e zera o WAL"""
+        with self._lock:
+            if self.index is None:
+                return
+            start = time.time()
+            tmp_path = self.index_path.with_suffix(".faiss.tmp")
+            faiss.write_index(self.index, str(tmp_path))
+            with tmp_path.open("rb+") as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.index_path)
+            _atomic_write_bytes(
+                self.meta_path,
+                json.dumps(
+                    {
+                        "ntotal": self.ntotal,
+                        "dimension": self.index.d,
+                        "index_type": type(self.index).__name__,
+                        "created_at": time.time(),
+                    }
+                ).encode("utf-8"),
+            )
+            self.wal.reset()
+            self._pending = 0
+            self._last_snapshot = time.time()
+            logger.info(
+                f"Snapshot do índice gravado: {self.ntotal} vetores em {time.time() - start:.2f}s"
+            )
+
+    def maybe_snapshot(self) -> bool:
+        """Grava snapshot se houver alterações e o intervalo tiver expirado"""
+        if self._pending and time.time() - self._last_snapshot >= self.snapshot_interval:
+            self.snapshot()
+            return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Resumo do estado do índice"""
+        return {
+            "ntotal": self.ntotal,
+            "index_type": index_kind(self.index),
+            "target_index_type": self.index_type,
+            "is_trained": bool(self.index.is_trained) if self.index is not None else False,
+            "rebuilding": self.rebuilding,
+            "pending_since_snapshot": self._pending,
+        }
+
+    def clear(self) -> None:
+        """Remove todos os vetores e textos"""
+        with self._lock:
+            self.index = None
+            self.sampler = ReservoirSampler(self.sampler.capacity)
+            self.texts.truncate(0)
+            self.wal.reset()
+            self._db.execute("DELETE FROM vector_keys")
+            self._db.execute("DELETE FROM vector_metadata")
+            self._db.commit()
+            for path in (self.index_path, self.meta_path):
+                if path.exists():
+                    path.unlink()
+            self._pending = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pending:
+                self.snapshot()
+            self.wal.close()
+            self.texts.close()
+            self._db.close()
@@ -0,0 +1,273 @@
+"""
+Ingestão de vídeo em uma única passada do ffmpeg
+Single-pass video ingest
+
+Um único processo ffmpeg abre o arquivo e produz, na mesma decodificação:
+- a trilha de áudio como PCM mono 16 kHz (stdout);
+- quadros RGB amostrados a `fps` fixo ou por mudança de cena (pipe extra);
+- o instante de cada quadro (filtro showinfo, lido do stderr).
+
+Os metadados vêm da sondagem do contêiner (cabeçalhos, em cache). Cada saída
+é entregue a um consumidor em sua própria thread, de modo que transcrição,
+OCR dos quadros e embeddings trabalham em paralelo enquanto o ffmpeg
+decodifica. Os pipes têm contrapressão natural: um consumidor lento segura
+a decodificação em vez de acumular dados em memória.
+
+Este módulo não depende da configuração do backend.
+"""
+
+import logging
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .long_audio import SAMPLE_RATE
+
+logger = logging.getLogger("omnisia.video_ingest")
+
+_PTS_TIME = re.compile(r"pts_time:\s*([0-9.]+)")
+
+
+@dataclass
+class Frame:
+    """Quadro amostrado: posição, instante (s) e pixels RGB (altura x largura x 3)"""
+
+    index: int
+    time: float
+    pixels: np.ndarray
+
+
+def frame_size(info: Dict[str, Any], max_width: int) -> Tuple[int, int]:
+    """Dimensões de saída (pares) limitadas a `max_width`, mantendo a proporção"""
+    width = info["video"]["width"]
+    height = info["video"]["height"]
+    if width > max_width:
+        height = height * max_width / width
+        width = max_width
+    return int(width) // 2 * 2, int(round(height / 2)) * 2
+
+
+def frame_filter(fps: float, scene_threshold: Optional[float], width: int, height: int) -> str:
+    """Filtro de amostragem: mudança de cena (se definido) ou fps fixo"""
+    if scene_threshold:
+        select = f"select='gt(scene,{scene_threshold})'"
+    else:
+        select = f"fps={fps}"
+    return f"{select},scale={width}:{height},showinfo"
+
+
+def _read_exact(handle, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = handle.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _drain(handle, block: int = 1 << 20) -> None:
+    # Consumidor terminou antes: esvazia o pipe para o ffmpeg não travar
+    while handle.read(block):
+        pass
+
+
+class VideoIngest:
+    """Áudio, quadros e metadados de um vídeo em uma única execução do ffmpeg"""
+
+    def __init__(
+        self,
+        fps: float = 1.0,
+        scene_threshold: Optional[float] = None,
+        max_width: int = 1280,
+        audio_block_seconds: float = 10.0,
+    ):
+        self.fps = fps
+        self.scene_threshold = scene_threshold
+        self.max_width = max_width
+        self.audio_block_seconds = audio_block_seconds
+
+    def command(self, video_path: Path, info: Dict[str, Any], frames_fd: Optional[int]) -> list:
+        """Linha de comando do ffmpeg com uma saída por consumidor"""
+        command = ["ffmpeg", "-nostdin", "-hide_banner", "-nostats", "-loglevel", "info", "-i", str(video_path)]
+        if info.get("has_audio"):
+            command += ["-map", "0:a:0", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "pipe:1"]
+        if frames_fd is not None:
+            width, height = frame_size(info, self.max_width)
+            command += [
+                "-map",
+                "0:v:0",
+                "-vf",
+                frame_filter(self.fps, self.scene_threshold, width, height),
+                # Sem duplicar nem descartar quadros: um quadro por linha do showinfo
+                "-fps_mode",
+                "passthrough",
+                "-pix_fmt",
+                "rgb24",
+                "-f",
+                "rawvideo",
+                f"pipe:{frames_fd}",
+            ]
+        return command
+
+    def run(
+        self,
+        video_path: Path,
+        info: Dict[str, Any],
+        on_audio: Optional[Callable[[Iterator[np.ndarray]], Any]] = None,
+        on_frames: Optional[Callable[[Iterator[Frame]], Any]] = None,
+    ) -> Dict[str, Any]:
+        """Decodifica o vídeo uma vez e entrega cada saída ao seu consumidor
+
+        `info` é o resultado de media_probe.probe_media. Os consumidores
+        recebem iteradores (blocos PCM float32 e objetos Frame) e rodam em
+        threads próprias; o retorno de cada um volta em "audio" e "frames".
+        """
+        on_audio = on_audio if info.get("has_audio") else None
+        on_frames = on_frames if info.get("has_video") else None
+        if on_audio is None and on_frames is None:
+            raise Exception("Nada a extrair: o arquivo não tem as trilhas pedidas")
+
+        frames_read = frames_write = None
+        if on_frames is not None:
+            frames_read, frames_write = os.pipe()
+        command = self.command(video_path, {**info, "has_audio": on_audio is not None}, frames_write)
+
+        start = time.perf_counter()
+        try:
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE if on_audio else subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                pass_fds=(frames_write,) if frames_write is not None else (),
+            )
+        except FileNotFoundError:
+            for fd in (frames_read, frames_write):
+                if fd is not None:
+                    os.close(fd)
+            raise Exception("ffmpeg não encontrado. Instale o ffmpeg para processar vídeos")
+        if frames_write is not None:
+            # O processo filho tem sua cópia; fechar a nossa garante EOF no fim
+            os.close(frames_write)
+
+        timestamps: "queue.Queue[float]" = queue.Queue()
+        stderr_done = threading.Event()
+        errors: list = []
+        results: Dict[str, Any] = {}
+        stats = {"audio_seconds": 0.0, "frames": 0}
+
+        def read_stderr():
+            try:
+                for line in iter(process.stderr.readline, b""):
+                    text = line.decode(errors="replace")
+                    if "showinfo" in text and "pts_time" in text:
+                        match = _PTS_TIME.search(text)
+                        if match:
+                            timestamps.put(float(match.group(1)))
+                    elif "Error" in text or "error" in text:
+                        errors.append(text.strip())
+            finally:
+                stderr_done.set()
+
+        def next_timestamp() -> Optional[float]:
+            # showinfo registra o quadro antes de ele sair pelo pipe; enquanto o
+            # stderr estiver aberto, espera a linha dele para não desalinhar a fila
+            while True:
+                try:
+                    return timestamps.get(timeout=1)
+                except queue.Empty:
+                    if stderr_done.is_set() and timestamps.empty():
+                        return None
+
+        def audio_blocks() -> Iterator[np.ndarray]:
+            block_bytes = int(self.audio_block_seconds * SAMPLE_RATE) * 2
+            while True:
+                data = _read_exact(process.stdout, block_bytes)
+                if not data:
+                    return
+                data = data[: len(data) - len(data) % 2]
+                stats["audio_seconds"] += len(data) / 2 / SAMPLE_RATE
+                yield np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+        def video_frames(handle) -> Iterator[Frame]:
+            width, height = frame_size(info, self.max_width)
+            size = width * height * 3
+            index = 0
+            while True:
+                data = _read_exact(handle, size)
+                if len(data) < size:
+                    return
+                moment = next_timestamp()
+                if moment is None:
+                    # ffmpeg sem showinfo: só então estima pelo fps
+                    moment = index / self.fps if self.fps else 0.0
+                stats["frames"] += 1
+                yield Frame(index, round(moment, 3), np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3))
+                index += 1
+
+        def consume(name: str, consumer, iterator, handle):
+            try:
+                results[name] = consumer(iterator)
+            except BaseException as e:
+                results[name] = e
+            finally:
+                _drain(handle)
+
+        threads = [threading.Thread(target=read_stderr, name="ingest-stderr", daemon=True)]
+        frames_handle = os.fdopen(frames_read, "rb") if frames_read is not None else None
+        if on_audio is not None:
+            threads.append(
+                threading.Thread(
+                    target=consume, args=("audio", on_audio, audio_blocks(), process.stdout), name="ingest-audio"
+                )
+            )
+        if on_frames is not None:
+            threads.append(
+                threading.Thread(
+                    target=consume,
+                    args=("frames", on_frames, video_frames(frames_handle), frames_handle),
+                    name="ingest-frames",
+                )
+            )
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads[1:]:
+                thread.join()
+            process.wait()
+            threads[0].join(timeout=5)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            if frames_handle is not None:
+                frames_handle.close()
+
+        for name in ("audio", "frames"):
+            if isinstance(results.get(name), BaseException):
+                raise results[name]
+        if process.returncode != 0:
+            raise Exception(f"Erro no ffmpeg: {' | '.join(errors[-3:]) or process.returncode}")
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Ingestão de {video_path.name}: {stats['audio_seconds']:.0f}s de áudio e "
+            f"{stats['frames']} quadros em {elapsed:.1f}s (uma passada)"
+        )
+        return {
+            "audio": results.get("audio"),
+            "frames": results.get("frames"),
+            "audio_seconds": round(stats["audio_seconds"], 3),
+            "frame_count": stats["frames"],
+            "seconds": round(elapsed, 3),
+        }
@@ -1,9 +1,24 @@
 from pathlib import Path
 import subprocess
-import tempfile
 import logging
-from . import stt_service
-from ..config import DEFAULT_WHISPER_MODEL
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from PIL import Image
+from . import ocr_service, stt_service
+from .artifact_cache import artifact_cache
+from .image_embeddings import image_index
+from .image_preprocess import preprocess_array
+from .long_audio import merge_windows
+from .media_probe import probe_media
+from .video_ingest import Frame, VideoIngest
+from ..config import (
+    DATASETS_DIR,
+    DEFAULT_OCR_LANGUAGE,
+    DEFAULT_WHISPER_MODEL,
+    ENABLE_OCR_PREPROCESSING,
+    VIDEO_FRAME_FPS,
+    VIDEO_FRAME_MAX_WIDTH,
+    VIDEO_SCENE_THRESHOLD,
+)
 
 logger = logging.getLogger("omnisia.video")
 
@@ -48,116 +63,191 @@ def extract_audio_from_video(
 
 
 def transcribe_video(
-    video_path: Path, model_size: str = None, extract_audio: bool = True
+    video_path: Path,
+    model_size: str = None,
+    progress: Optional[Callable[[float, str], None]] = None,
 ) -> dict:
-    """Transcreve vídeo para texto extraindo o áudio"""
+    """Transcreve vídeo para texto lendo a trilha de áudio por pipe
+
+    O ffmpeg entrega o PCM direto em memória (ou ao transcritor em janelas,
+    para vídeos longos), sem gravar nem reler um WAV temporário. Use
+    `extract_audio_from_video` quando o áudio for necessário em disco.
+    """
     try:
         model_size = model_size or DEFAULT_WHISPER_MODEL
         logger.info(f"Transcrevendo vídeo: {video_path} com modelo {model_size}")
 
-        # Cria arquivo temporário para o áudio
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
-            temp_audio_path = Path(temp_audio.name)
-
-        try:
-            # Extrai áudio do vídeo
-            audio_path = extract_audio_from_video(video_path, temp_audio_path)
-
-            # Transcreve o áudio
-            transcription_result = stt_service.transcribe_audio(
-                audio_path, model_size=model_size
-            )
-
-            # Adiciona informações do vídeo
-            video_info = get_video_info(video_path)
-
-            result = {
-                **transcription_result,
-                "video_file": str(video_path),
-                "video_info": video_info,
-                "audio_extracted": True,
-                "temp_audio_path": str(audio_path) if not extract_audio else None,
-            }
-
-            logger.info(
-                f"Transcrição de vídeo concluída. Texto: {len(result['text'])} caracteres"
-            )
-            return result
-
-        finally:
-            # Remove arquivo temporário se necessário
-            if extract_audio and temp_audio_path.exists():
-                temp_audio_path.unlink()
-                logger.info("Arquivo de áudio temporário removido")
+        # A transcrição fica no cache de artefatos, indexada pelo hash do vídeo
+        transcription_result = stt_service.transcribe_audio(
+            video_path, model_size=model_size, progress=progress
+        )
+
+        # Adiciona informações do vídeo (sondagem em cache)
+        video_info = get_video_info(video_path)
+
+        result = {
+            **transcription_result,
+            "video_file": str(video_path),
+            "video_info": video_info,
+        }
+
+        logger.info(
+            f"Transcrição de vídeo concluída. Texto: {len(result['text'])} caracteres"
+        )
+        return result
 
     except Exception as e:
         logger.error(f"Erro na transcrição de vídeo: {str(e)}")
         raise Exception(f"Erro na transcrição de vídeo: {str(e)}")
 
 
-def get_video_info(video_path: Path) -> dict:
-    """Obtém informações sobre o arquivo de vídeo"""
+def save_frames(frames: Iterator[Frame], output_dir: Path, records: List[dict]) -> Iterator[Frame]:
+    """Grava cada quadro como JPEG e registra {index, time, path} em `records`"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for frame in frames:
+        path = output_dir / f"frame_{frame.index:05d}.jpg"
+        Image.fromarray(frame.pixels).save(path, quality=90)
+        records.append({"index": frame.index, "time": frame.time, "path": str(path)})
+        yield frame
+
+
+def ocr_frames_sink(frames: Iterator[Frame], records: List[dict], language: str = None) -> None:
+    """OCR dos quadros no pool Tesseract, preenchendo text/confidence em `records`"""
+    language = language or DEFAULT_OCR_LANGUAGE
+
+    def images():
+        for frame in frames:
+            yield preprocess_array(frame.pixels) if ENABLE_OCR_PREPROCESSING else frame.pixels
+
+    # O pool lê quadros à frente; o resultado i corresponde a records[i]
+    results = ocr_service.tesseract_pool.map(images(), language, with_boxes=False)
+    for index, result in enumerate(results):
+        records[index]["text"] = result["text"]
+        records[index]["confidence"] = result.get("confidence")
+
+
+def embed_frames_sink(
+    frames: Iterator[Frame], doc_id: str, source: str, batch_size: int
+) -> Iterator[Frame]:
+    """Indexa os quadros no CLIP em lotes e os repassa ao próximo consumidor"""
+    batch: List[Frame] = []
+
+    def flush():
+        image_index.add_images(
+            [frame.pixels for frame in batch],
+            [doc_id] * len(batch),
+            [{"source": source, "frame": frame.index, "time": frame.time} for frame in batch],
+        )
+
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) >= batch_size:
+            flush()
+            yield from batch
+            batch = []
+    if batch:
+        flush()
+        yield from batch
+
+
+def process_video(
+    video_path: Path,
+    model_size: str = None,
+    language: str = None,
+    fps: float = None,
+    scene_threshold: float = None,
+    transcribe: bool = True,
+    ocr_frames: bool = True,
+    embed_frames: bool = False,
+    frames_dir: Path = None,
+    progress: Optional[Callable[[float, str], None]] = None,
+    ocr_language: str = None,
+) -> Dict[str, Any]:
+    """Metadados, transcrição e quadros (com OCR) em uma única decodificação
+
+    O ffmpeg roda uma vez: o PCM segue para a transcrição em janelas e os
+    quadros amostrados vão para disco, para o OCR e, com `embed_frames`, para
+    o índice de imagens (CLIP), em paralelo.
+    """
     try:
-        logger.info(f"Obtendo informações do vídeo: {video_path}")
-
-        # Comando ffprobe para obter informações
-        cmd = [
-            "ffprobe",
-            "-v",
-            "quiet",
-            "-print_format",
-            "json",
-            "-show_format",
-            "-show_streams",
-            str(video_path),
-        ]
-
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            raise Exception(f"Erro no ffprobe: {result.stderr}")
-
-        import json
-
-        data = json.loads(result.stdout)
-
-        # Extrai informações relevantes
-        format_info = data.get("format", {})
-        video_stream = None
-        audio_stream = None
+        model_size = model_size or DEFAULT_WHISPER_MODEL
+        info = probe_media(video_path)
+        duration = info.get("duration") or 0.0
+        frames_dir = frames_dir or DATASETS_DIR / f"{video_path.stem}_frames"
+        logger.info(f"Processando vídeo em uma passada: {video_path}")
+
+        def on_audio(blocks):
+            def windows():
+                for window in stt_service.iter_transcription(
+                    None, model_size, language, blocks=blocks, duration=duration
+                ):
+                    if progress and duration:
+                        progress(min(window["end"] / duration, 1.0), "Transcrevendo e extraindo quadros")
+                    yield window
+
+            return merge_windows(windows(), language)
+
+        records: List[dict] = []
+
+        def on_frames(frames):
+            frames = save_frames(frames, frames_dir, records)
+            if embed_frames:
+                frames = embed_frames_sink(
+                    frames,
+                    info["sha256"] or artifact_cache.content_hash(video_path),
+                    str(video_path),
+                    image_index.encoder.batch_size,
+                )
+            if ocr_frames:
+                ocr_frames_sink(frames, records, ocr_language)
+            else:
+                for _ in frames:
+                    pass
+            return records
+
+        ingest = VideoIngest(
+            fps=fps or VIDEO_FRAME_FPS,
+            scene_threshold=VIDEO_SCENE_THRESHOLD if scene_threshold is None else scene_threshold,
+            max_width=VIDEO_FRAME_MAX_WIDTH,
+        )
+        outputs = ingest.run(
+            video_path,
+            info,
+            on_audio=on_audio if transcribe else None,
+            on_frames=on_frames,
+        )
+
+        transcription = outputs["audio"]
+        if transcription is not None:
+            transcription["model_used"] = model_size
+            transcription["duration"] = duration
+        result = {
+            "video_file": str(video_path),
+            "video_info": info,
+            "transcription": transcription,
+            "frames_dir": str(frames_dir),
+            "frames": outputs["frames"] or [],
+            "timings": {
+                "seconds": outputs["seconds"],
+                "audio_seconds": outputs["audio_seconds"],
+                "frame_count": outputs["frame_count"],
+            },
+        }
+        logger.info(
+            f"Vídeo processado: {outputs['frame_count']} quadros em {outputs['seconds']:.1f}s"
+        )
+        return result
 
-        for stream in data.get("streams", []):
-            if stream.get("codec_type") == "video" and not video_stream:
-                video_stream = stream
-            elif stream.get("codec_type") == "audio" and not audio_stream:
-                audio_stream = stream
+    except Exception as e:
+        logger.error(f"Erro no processamento do vídeo: {str(e)}")
+        raise Exception(f"Erro no processamento do vídeo: {str(e)}")
 
-        info = {
-            "filename": video_path.name,
-            "size_bytes": int(format_info.get("size", 0)),
-            "duration": float(format_info.get("duration", 0)),
-            "bitrate": int(format_info.get("bit_rate", 0)),
-            "format_name": format_info.get("format_name", ""),
-        }
 
-        if video_stream:
-            info["video"] = {
-                "codec": video_stream.get("codec_name", ""),
-                "width": video_stream.get("width", 0),
-                "height": video_stream.get("height", 0),
-                "fps": eval(video_stream.get("r_frame_rate", "0/1")),
-                "bitrate": int(video_stream.get("bit_rate", 0)),
-            }
-
-        if audio_stream:
-            info["audio"] = {
-                "codec": audio_stream.get("codec_name", ""),
-                "sample_rate": int(audio_stream.get("sample_rate", 0)),
-                "channels": int(audio_stream.get("channels", 0)),
-                "bitrate": int(audio_stream.get("bit_rate", 0)),
-            }
-
-        return info
+def get_video_info(video_path: Path) -> dict:
+    """Obtém informações sobre o arquivo de vídeo"""
+    try:
+        logger.info(f"Obtendo informações do vídeo: {video_path}")
+        return probe_media(video_path)
 
     except Exception as e:
         logger.error(f"Erro ao obter informações do vídeo: {str(e)}")
@@ -0,0 +1,184 @@
+"""
+Camada de execução de requisições com pools por classe de carga
+Request-execution layer with per-workload pools
+
+Cada classe de carga (embedding, OCR, STT) tem seu próprio pool de threads
+ou processos e uma fila limitada; o treinamento roda nos workers da fila de
+jobs (services/jobs.py). Quando a fila está cheia
+a chamada é rejeitada (429); quando o limite global MAX_CONCURRENT_REQUESTS
+não libera vaga dentro do tempo de espera, a chamada expira (503).
+
+Respostas em streaming usam uma sessão: a admissão acontece uma vez e a vaga
+fica reservada até o fim do stream, com cada passo executado no pool.
+"""
+
+import asyncio
+import contextlib
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ..config import MAX_CONCURRENT_REQUESTS, QUEUE_WAIT_TIMEOUT, WORKLOAD_POOLS
+
+logger = logging.getLogger("omnisia.workload_pools")
+
+
+class WorkloadRejected(Exception):
+    """Carga recusada por falta de capacidade"""
+
+    status_code = 503
+
+    def __init__(self, workload: str, message: str):
+        super().__init__(message)
+        self.workload = workload
+
+
+class PoolSaturatedError(WorkloadRejected):
+    """Fila do pool cheia"""
+
+    status_code = 429
+
+
+class PoolTimeoutError(WorkloadRejected):
+    """Tempo de espera por uma vaga esgotado"""
+
+    status_code = 503
+
+
+class WorkloadPool:
+    """Pool de execução com fila limitada para uma classe de carga"""
+
+    def __init__(self, name: str, workers: int, queue_size: int, kind: str = "thread"):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.kind = kind
+        self._executor: Optional[Executor] = None
+
+        self.inflight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn evita herdar modelos e locks do processo do servidor
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=self.name
+                )
+        return self._executor
+
+    @property
+    def capacity(self) -> int:
+        """Execuções simultâneas + aguardando na fila"""
+        return self.workers + self.queue_size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "inflight": self.inflight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+    async def execute(self, fn: Callable, *args, **kwargs) -> Any:
+        """Executa `fn` no executor do pool (a admissão é feita por WorkloadPools)"""
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class WorkloadPools:
+    """Registro dos pools e do limite global de execuções simultâneas"""
+
+    def __init__(
+        self,
+        pools_config: Dict[str, Dict[str, Any]],
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+        queue_timeout: float = QUEUE_WAIT_TIMEOUT,
+    ):
+        self.pools = {name: WorkloadPool(name, **config) for name, config in pools_config.items()}
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __getitem__(self, name: str) -> WorkloadPool:
+        return self.pools[name]
+
+    def _global_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        return self._slots
+
+    async def run(self, workload: str, fn: Callable, *args, **kwargs) -> Any:
+        """Executa `fn` no pool da carga, respeitando fila e limite global"""
+        async with self.session(workload) as pool:
+            return await pool.execute(fn, *args, **kwargs)
+
+    @contextlib.asynccontextmanager
+    async def session(self, workload: str):
+        """Admite uma vez e mantém a vaga (fila e limite global) até sair do bloco"""
+        pool = self.pools[workload]
+        if pool.inflight >= pool.capacity:
+            pool.rejected += 1
+            raise PoolSaturatedError(
+                workload, f"Fila de {workload} cheia ({pool.capacity}); tente novamente"
+            )
+
+        pool.inflight += 1
+        try:
+            slots = self._global_slots()
+            try:
+                await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                pool.rejected += 1
+                raise PoolTimeoutError(
+                    workload,
+                    f"Servidor ocupado: sem vaga para {workload} em {self.queue_timeout}s",
+                )
+
+            try:
+                yield pool
+            finally:
+                slots.release()
+        finally:
+            pool.inflight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "pools": {name: pool.stats() for name, pool in self.pools.items()},
+        }
+
+    def shutdown(self) -> None:
+        for pool in self.pools.values():
+            pool.shutdown()
+
+
+# Instância global compartilhada pelos routers
+pools = WorkloadPools(WORKLOAD_POOLS)
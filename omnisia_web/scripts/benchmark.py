@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de desempenho do OmnisIA Trainer Web
+Performance benchmarks for OmnisIA Trainer Web
+
+Uso / Usage (a partir de omnisia_web/):
+    python scripts/benchmark.py index --vectors 100000 --dim 384
+    python scripts/benchmark.py ocr-engines --images data/uploads/scans --workers 4
+    python scripts/benchmark.py preprocess --pages 10 --skew 2.0
+    python scripts/benchmark.py video --video data/uploads/aula.mp4 --fps 1
+    python scripts/benchmark.py quantization --model embedding --backends fp32 int8 onnx-int8
+    python scripts/benchmark.py quantization --model whisper --audio data/uploads/aula.mp3
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Permite importar o pacote backend a partir de omnisia_web/ (e os módulos da raiz)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(1, str(Path(__file__).resolve().parent.parent.parent))
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp"}
+
+
+def print_results(title: str, results):
+    """Imprime resultados em tabela simples e JSON"""
+    print(f"\n📊 {title}")
+    for row in results:
+        print("   " + json.dumps(row, ensure_ascii=False))
+
+
+def bench_index(args):
+    """Recall@k x latência dos tipos de índice ANN"""
+    import numpy as np
+    from backend.services.ann_index import benchmark_index_types, INDEX_TYPES
+
+    rng = np.random.default_rng(args.seed)
+    # Vetores sintéticos agrupados, mais próximos de embeddings reais que ruído uniforme
+    centers = rng.standard_normal((args.clusters, args.dim)).astype("float32")
+    labels = rng.integers(0, args.clusters, args.vectors)
+    vectors = centers[labels] + 0.3 * rng.standard_normal((args.vectors, args.dim)).astype("float32")
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype("float32")
+
+    config = {
+        "nlist": args.nlist,
+        "nprobe": args.nprobe,
+        "pq_m": args.pq_m,
+        "hnsw_m": args.hnsw_m,
+        "ef_search": args.ef_search,
+        "sample_size": args.sample_size,
+    }
+    results = benchmark_index_types(
+        vectors, queries, config, k=args.k, index_types=args.types or list(INDEX_TYPES)
+    )
+    print_results(f"Índices ANN ({args.vectors} vetores, dim={args.dim}, k={args.k})", results)
+
+
+def synthetic_pages(count: int, output_dir: Path):
+    """Gera páginas de texto sintéticas (PNG) para quando não há digitalizações"""
+    from PIL import Image, ImageDraw
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        image = Image.new("L", (1240, 1754), 255)  # A4 a 150 DPI
+        draw = ImageDraw.Draw(image)
+        for line in range(40):
+            draw.text((80, 80 + line * 40), f"Pagina {i + 1} linha {line + 1}: texto de teste OmnisIA", fill=0)
+        path = output_dir / f"page_{i:04d}.png"
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+def timed(label: str, fn, paths, **extra):
+    start = time.perf_counter()
+    chars = sum(len(text) for text in fn(paths))
+    elapsed = time.perf_counter() - start
+    return {
+        "engine": label,
+        "images": len(paths),
+        "seconds": round(elapsed, 3),
+        "images_per_second": round(len(paths) / elapsed, 2) if elapsed else None,
+        "chars": chars,
+        **extra,
+    }
+
+
+def bench_ocr_engines(args):
+    """Subprocesso por imagem (ingestao.ocr / pytesseract) x engines residentes"""
+    from backend.services.tesseract_pool import TesseractPool
+
+    if args.images:
+        paths = sorted(
+            p for p in Path(args.images).rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS
+        )[: args.limit]
+    else:
+        paths = synthetic_pages(args.synthetic, Path(args.workdir))
+    if not paths:
+        sys.exit("Nenhuma imagem encontrada")
+
+    results = []
+    if "subprocess" in args.engines:
+        from ingestao.ocr import ocr_image as subprocess_ocr
+
+        results.append(timed("subprocess (tesseract CLI)", lambda ps: (subprocess_ocr(p) for p in ps), paths))
+
+    if "pytesseract" in args.engines:
+        import pytesseract
+        from PIL import Image
+
+        def run_pytesseract(ps):
+            for p in ps:
+                with Image.open(p) as image:
+                    yield pytesseract.image_to_string(image, lang=args.language, config=args.config)
+
+        results.append(timed("pytesseract", run_pytesseract, paths))
+
+    if "pool" in args.engines:
+        pool = TesseractPool(args.workers, args.config)
+        # Carrega as engines antes de medir (custo pago uma vez por thread)
+        list(pool.map([paths[0].read_bytes()] * args.workers, args.language, with_boxes=False))
+        results.append(
+            timed(
+                f"pool ({pool.backend})",
+                lambda ps: (
+                    r["text"] for r in pool.map((p.read_bytes() for p in ps), args.language, False)
+                ),
+                paths,
+                workers=pool.workers,
+            )
+        )
+        pool.shutdown()
+
+    print_results(f"OCR de imagens ({len(paths)} imagens, idioma {args.language})", results)
+
+
+def synthetic_scans(count: int, skew: float, output_dir: Path):
+    """Páginas A4 a 300 DPI com texto inclinado, iluminação irregular e ruído"""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    rng = np.random.default_rng(0)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    width, height = 2480, 3508
+    shading = np.linspace(0, 60, width, dtype=np.float32)[None, :]
+    paths = []
+    for i in range(count):
+        page = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(page)
+        for line in range(70):
+            draw.text((200, 200 + line * 44), f"Linha {line + 1} da pagina {i + 1} - OmnisIA " * 3, fill=0)
+        page = page.rotate(skew, resample=Image.BILINEAR, fillcolor=255)
+        pixels = np.asarray(page, dtype=np.float32) - shading + rng.normal(0, 12, (height, width))
+        path = output_dir / f"scan_{i:03d}.png"
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path)
+        paths.append(path)
+    return paths
+
+
+def bench_preprocess(args):
+    """Cadeia PIL + arquivo intermediário x pipeline vetorizado em memória"""
+    import numpy as np
+    from PIL import Image, ImageEnhance, ImageFilter
+    from backend.services.image_preprocess import OPENCV_AVAILABLE, estimate_skew, preprocess_array
+
+    paths = synthetic_scans(args.pages, args.skew, Path(args.workdir))
+
+    def legacy(path):
+        # Caminho anterior: realces PIL encadeados e ida e volta ao disco antes do OCR
+        with Image.open(path) as image:
+            image = image.convert("L")
+            image = ImageEnhance.Contrast(image).enhance(2.0)
+            image = ImageEnhance.Sharpness(image).enhance(1.5)
+            image = image.filter(ImageFilter.MedianFilter())
+            processed = path.with_name(f"{path.stem}_processed.png")
+            image.save(processed, optimize=True, quality=95)
+        with Image.open(processed) as reloaded:
+            return np.asarray(reloaded)
+
+    def vectorized(path):
+        with Image.open(path) as image:
+            return preprocess_array(image)
+
+    results = []
+    for label, fn in (("pil + disco", legacy), (f"numpy ({'opencv' if OPENCV_AVAILABLE else 'numpy puro'})", vectorized)):
+        timings = []
+        for path in paths:
+            start = time.perf_counter()
+            fn(path)
+            timings.append(time.perf_counter() - start)
+        results.append(
+            {
+                "pipeline": label,
+                "pages": len(paths),
+                "ms_per_page": round(1000 * sum(timings) / len(timings), 1),
+                "pages_per_second": round(len(timings) / sum(timings), 2),
+            }
+        )
+
+    with Image.open(paths[0]) as image:
+        detected = estimate_skew(np.asarray(image.convert("L")))
+    # A correção esperada é o ângulo aplicado com sinal invertido
+    results.append({"skew_applied": args.skew, "correction_detected": detected})
+    print_results(f"Pré-processamento OCR (A4 300 DPI, {len(paths)} páginas)", results)
+
+
+def synthetic_video(seconds: int, output_path: Path) -> Path:
+    """Gera um vídeo de teste (testsrc + senoide) com o próprio ffmpeg"""
+    import subprocess
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    command = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=duration={seconds}:size=1280x720:rate=30",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac", "-shortest", str(output_path),
+    ]
+    subprocess.run(command, check=True)
+    return output_path
+
+
+def bench_video(args):
+    """Sondagem + WAV temporário + quadros em disco x uma passada do ffmpeg"""
+    import shutil
+    from backend.services.long_audio import read_pcm
+    from backend.services.media_probe import run_ffprobe, summarize
+    from backend.services.video_ingest import VideoIngest
+    from backend.services.video_service import extract_audio_from_video, extract_frames
+
+    workdir = Path(args.workdir)
+    video = Path(args.video) if args.video else synthetic_video(args.seconds, workdir / "synthetic.mp4")
+
+    def legacy():
+        # Caminho anterior: ffprobe, ffmpeg para o WAV, ffmpeg para os quadros e releitura
+        info = summarize(run_ffprobe(video), video)
+        wav = extract_audio_from_video(video, workdir / "legacy.wav")
+        frames = extract_frames(video, workdir / "legacy_frames", fps=args.fps)
+        audio = read_pcm(wav)
+        return info, len(audio) / 16000, len(frames)
+
+    def single_pass():
+        info = summarize(run_ffprobe(video), video)
+        outputs = VideoIngest(fps=args.fps, max_width=args.max_width).run(
+            video,
+            info,
+            on_audio=lambda blocks: sum(len(block) for block in blocks),
+            on_frames=lambda frames: sum(1 for _ in frames),
+        )
+        return info, outputs["audio"] / 16000, outputs["frames"]
+
+    results = []
+    for label, fn in (("ffprobe + wav + frames", legacy), ("uma passada", single_pass)):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            info, audio_seconds, frames = fn()
+            timings.append(time.perf_counter() - start)
+        results.append(
+            {
+                "pipeline": label,
+                "audio_seconds": round(audio_seconds, 1),
+                "frames": frames,
+                "seconds": round(min(timings), 2),
+                "realtime_factor": round(info["duration"] / min(timings), 1) if info["duration"] else None,
+            }
+        )
+    shutil.rmtree(workdir / "legacy_frames", ignore_errors=True)
+    print_results(f"Vídeo ({video.name}, {args.fps} quadros/s)", results)
+
+
+def synthetic_sentences(count: int, seed: int = 0):
+    """Frases variadas para medir embeddings sem depender de um corpus"""
+    import random
+
+    rng = random.Random(seed)
+    subjects = ["O relatório", "A equipe", "O modelo", "O cliente", "A reunião", "O servidor"]
+    verbs = ["descreve", "analisa", "apresenta", "resume", "compara", "critica"]
+    objects = ["os resultados do trimestre", "a latência da busca", "o custo de inferência",
+               "as métricas de qualidade", "o plano de migração", "os erros de transcrição"]
+    tails = ["em detalhes", "para a diretoria", "com gráficos", "sem GPU", "em português", "hoje"]
+    return [
+        f"{rng.choice(subjects)} {rng.choice(verbs)} {rng.choice(objects)} {rng.choice(tails)} ({i})"
+        for i in range(count)
+    ]
+
+
+def bench_quantization(args):
+    """Vazão e diferença de qualidade de int8/ONNX em relação ao fp32"""
+    import difflib
+    import numpy as np
+    from backend.services.quantization import (
+        load_sentence_transformer,
+        load_whisper,
+        vector_agreement,
+    )
+
+    backends = args.backends or (
+        ["fp32", "int8", "onnx", "onnx-int8"] if args.model == "embedding" else ["fp32", "int8"]
+    )
+    if "fp32" not in backends:
+        backends = ["fp32"] + backends
+
+    if args.model == "embedding":
+        texts = synthetic_sentences(args.samples)
+        name = args.name or "all-MiniLM-L6-v2"
+
+        def run(backend):
+            model = load_sentence_transformer(name, backend, Path(args.workdir) / "onnx")
+            model.encode(texts[:8])  # Aquecimento
+            start = time.perf_counter()
+            vectors = model.encode(texts, batch_size=32, show_progress_bar=False)
+            return np.asarray(vectors), time.perf_counter() - start, len(texts), "texts"
+
+    elif args.model == "clip":
+        from backend.services.image_embeddings import ClipEncoder, load_image
+
+        paths = synthetic_pages(args.samples, Path(args.workdir) / "pages")
+        name = args.name or "openai/clip-vit-base-patch32"
+
+        def run(backend):
+            encoder = ClipEncoder(name, batch_size=32, backend=backend)
+            encoder.encode_images([load_image(paths[0])])  # Carga + aquecimento
+            start = time.perf_counter()
+            vectors = encoder.encode_images(list(encoder.decode(paths)))
+            encoder.shutdown()
+            return vectors, time.perf_counter() - start, len(paths), "images"
+
+    else:
+        from backend.services.long_audio import read_pcm, transcribe_array
+
+        if not args.audio:
+            sys.exit("--audio é obrigatório para --model whisper")
+        audio = read_pcm(Path(args.audio))
+        name = args.name or "base"
+
+        def run(backend):
+            model = load_whisper(name, backend)
+            start = time.perf_counter()
+            result = transcribe_array(model, audio, 0.0, None)
+            text = " ".join(segment["text"] for segment in result["segments"])
+            return text, time.perf_counter() - start, len(audio) / 16000, "audio_seconds"
+
+    results, reference = [], None
+    for backend in backends:
+        try:
+            output, elapsed, amount, unit = run(backend)
+        except Exception as e:
+            results.append({"backend": backend, "error": str(e)})
+            continue
+        row = {"backend": backend, f"{unit}_per_second": round(amount / elapsed, 2), "seconds": round(elapsed, 3)}
+        if reference is None:
+            reference = output
+        elif args.model == "whisper":
+            # Concordância palavra a palavra com a transcrição fp32
+            matcher = difflib.SequenceMatcher(None, reference.split(), output.split())
+            row["word_agreement"] = round(matcher.ratio(), 4)
+        else:
+            row.update(vector_agreement(reference, output, k=10))
+        results.append(row)
+
+    print_results(f"Backends de inferência ({args.model}: {name})", results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do OmnisIA Trainer Web")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="Recall@k x latência dos índices ANN")
+    index_parser.add_argument("--vectors", type=int, default=100000)
+    index_parser.add_argument("--dim", type=int, default=384)
+    index_parser.add_argument("--queries", type=int, default=500)
+    index_parser.add_argument("--clusters", type=int, default=256)
+    index_parser.add_argument("--k", type=int, default=10)
+    index_parser.add_argument("--nlist", type=int, default=0)
+    index_parser.add_argument("--nprobe", type=int, default=16)
+    index_parser.add_argument("--pq-m", type=int, default=16)
+    index_parser.add_argument("--hnsw-m", type=int, default=32)
+    index_parser.add_argument("--ef-search", type=int, default=64)
+    index_parser.add_argument("--sample-size", type=int, default=100000)
+    index_parser.add_argument("--types", nargs="*", help="Subconjunto de tipos de índice")
+    index_parser.add_argument("--seed", type=int, default=0)
+    index_parser.set_defaults(func=bench_index)
+
+    ocr_parser = subparsers.add_parser(
+        "ocr-engines", help="OCR de imagens: subprocesso por imagem x engines residentes"
+    )
+    ocr_parser.add_argument("--images", help="Pasta com imagens (padrão: páginas sintéticas)")
+    ocr_parser.add_argument("--limit", type=int, default=200)
+    ocr_parser.add_argument("--synthetic", type=int, default=50)
+    ocr_parser.add_argument("--workdir", default="/tmp/omnisia_bench_ocr")
+    ocr_parser.add_argument("--language", default="por+eng")
+    ocr_parser.add_argument("--config", default="--oem 3 --psm 6")
+    ocr_parser.add_argument("--workers", type=int, default=0)
+    ocr_parser.add_argument(
+        "--engines", nargs="*", default=["subprocess", "pytesseract", "pool"],
+        help="Subconjunto de: subprocess, pytesseract, pool",
+    )
+    ocr_parser.set_defaults(func=bench_ocr_engines)
+
+    pre_parser = subparsers.add_parser(
+        "preprocess", help="Pré-processamento OCR: cadeia PIL + disco x NumPy/OpenCV"
+    )
+    pre_parser.add_argument("--pages", type=int, default=10)
+    pre_parser.add_argument("--skew", type=float, default=2.0, help="Inclinação sintética (graus)")
+    pre_parser.add_argument("--workdir", default="/tmp/omnisia_bench_preprocess")
+    pre_parser.set_defaults(func=bench_preprocess)
+
+    video_parser = subparsers.add_parser(
+        "video", help="Ingestão de vídeo: ffmpeg por saída x uma única passada"
+    )
+    video_parser.add_argument("--video", help="Arquivo de vídeo (padrão: vídeo sintético)")
+    video_parser.add_argument("--seconds", type=int, default=120, help="Duração do vídeo sintético")
+    video_parser.add_argument("--fps", type=float, default=1.0)
+    video_parser.add_argument("--max-width", type=int, default=1280)
+    video_parser.add_argument("--repeat", type=int, default=3)
+    video_parser.add_argument("--workdir", default="/tmp/omnisia_bench_video")
+    video_parser.set_defaults(func=bench_video)
+
+    quant_parser = subparsers.add_parser(
+        "quantization", help="fp32 x int8 x ONNX: vazão e diferença de qualidade"
+    )
+    quant_parser.add_argument("--model", choices=["embedding", "clip", "whisper"], default="embedding")
+    quant_parser.add_argument("--name", help="Nome do modelo (padrão: o do serviço)")
+    quant_parser.add_argument("--backends", nargs="*", help="Subconjunto de fp32, int8, onnx, onnx-int8")
+    quant_parser.add_argument("--samples", type=int, default=512, help="Textos ou imagens sintéticos")
+    quant_parser.add_argument("--audio", help="Áudio para --model whisper")
+    quant_parser.add_argument("--workdir", default="/tmp/omnisia_bench_quantization")
+    quant_parser.set_defaults(func=bench_quantization)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Configuração comum dos testes
+Shared test configuration
+
+Os testes importam o backend como a aplicação o executa (`backend.*` a
+partir de omnisia_web), os pacotes da raiz (`processamento`) a partir do
+repositório, e gravam dados em um diretório temporário.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Antes de qualquer import do backend: config.py cria os diretórios de dados
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="omnisia-tests-"))
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("JOB_TRAINING_WORKERS", "0")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.append(str(Path(__file__).resolve().parents[2]))
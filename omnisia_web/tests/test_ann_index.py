@@ -0,0 +1,103 @@
+"""
+Testes dos tipos de índice ANN e da migração automática entre eles
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from backend.services.ann_index import (  # noqa: E402
+    ReservoirSampler,
+    benchmark_index_types,
+    build_index,
+    factory_string,
+    index_kind,
+    min_training_size,
+    training_sample_size,
+    training_threshold,
+)
+from backend.services.vector_store import PersistentVectorStore  # noqa: E402
+
+
+def vectors(count, dim=16, seed=0):
+    return np.random.default_rng(seed).random((count, dim), dtype="float32")
+
+
+def test_factory_strings():
+    """Cada tipo vira a string esperada do faiss.index_factory"""
+    config = {"hnsw_m": 16, "nlist": 8, "pq_m": 4, "pq_bits": 8}
+    assert factory_string("flat", 16, config) == "Flat"
+    assert factory_string("hnsw", 16, config) == "HNSW16,Flat"
+    assert factory_string("ivf_flat", 16, config) == "IVF8,Flat"
+    assert factory_string("ivf_pq", 16, config) == "IVF8,PQ4x8"
+    with pytest.raises(ValueError):
+        factory_string("ivf_pq", 18, config)
+    with pytest.raises(ValueError):
+        factory_string("lsh", 16, config)
+
+
+def test_index_kind_and_training_size():
+    """O tipo lógico é reconhecido e IVF exige amostra mínima para o treino"""
+    assert index_kind(build_index("hnsw", 16, {"hnsw_m": 8})) == "hnsw"
+    assert index_kind(build_index("ivf_flat", 16, {"nlist": 4})) == "ivf_flat"
+    assert min_training_size("flat", {}, 1000) == 0
+    assert min_training_size("ivf_flat", {"nlist": 4}, 1000) == 39 * 4
+
+
+def test_training_sample_follows_nlist():
+    """A amostra e o limiar de treino nunca ficam abaixo de 39 * nlist"""
+    config = {"sample_size": 100000, "train_threshold": 50000}
+    assert training_sample_size("ivf_flat", config, 100000) == 100000
+    # nlist automático ~4 * sqrt(1e6) = 4000 -> 39 * 4000 vetores
+    assert training_sample_size("ivf_flat", config, 1000000) == 39 * 4000
+    assert training_threshold("ivf_flat", {**config, "nlist": 2000}, 0) == 39 * 2000
+    assert training_threshold("hnsw", config, 1000000) == 0
+
+
+def test_rebuild_resamples_when_reservoir_is_too_small(tmp_path):
+    """Reservatório menor que o mínimo do k-means é refeito a partir do índice"""
+    data = vectors(400)
+    config = {"index_type": "ivf_flat", "nlist": 8, "train_threshold": 0, "sample_size": 4}
+    store = PersistentVectorStore(tmp_path, index_config=config)
+    store.add([str(i) for i in range(400)], data)
+    if store._rebuild_thread is not None:
+        store._rebuild_thread.join(timeout=30)
+    assert store.stats()["index_type"] == "ivf_flat"
+    assert store.ntotal == 400
+    store.close()
+
+
+def test_reservoir_sampler_keeps_capacity():
+    """A amostra nunca passa da capacidade e conta todos os vetores vistos"""
+    sampler = ReservoirSampler(50, seed=1)
+    for seed in range(5):
+        sampler.add(vectors(30, seed=seed))
+    assert len(sampler) == 50
+    assert sampler.seen == 150
+    assert sampler.get().shape == (50, 16)
+
+
+def test_store_migrates_to_configured_type(tmp_path):
+    """Reabrir com outro tipo configurado reconstrói o índice sem perder vetores"""
+    data = vectors(200)
+    store = PersistentVectorStore(tmp_path, index_config={"index_type": "flat"})
+    store.add([str(i) for i in range(200)], data)
+    store.close()
+
+    config = {"index_type": "ivf_flat", "nlist": 4, "nprobe": 4, "train_threshold": 0}
+    migrated = PersistentVectorStore(tmp_path, index_config=config)
+    if migrated._rebuild_thread is not None:
+        migrated._rebuild_thread.join(timeout=30)
+    assert migrated.stats()["index_type"] == "ivf_flat"
+    assert migrated.ntotal == 200
+    assert migrated.search(data[5:6], 1)[0][0][0] == 5
+    migrated.close()
+
+
+def test_benchmark_ground_truth_uses_metric():
+    """Com produto interno, o índice exato tem recall 1 contra a referência"""
+    data = vectors(300)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    results = benchmark_index_types(data, data[:10], {"metric": "ip"}, k=5, index_types=["flat"])
+    assert results[0]["recall_at_k"] == 1.0
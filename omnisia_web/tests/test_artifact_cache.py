@@ -0,0 +1,66 @@
+"""
+Testes do cache de artefatos derivados
+"""
+
+import os
+
+from backend.services.artifact_cache import ArtifactCache, sha256_file
+
+
+def test_text_and_json_round_trip(tmp_path):
+    """Artefatos são encontrados pela chave de conteúdo + tipo + parâmetros"""
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=10_000)
+    cache.put_text("h1", "ocr", {"lang": "por"}, "olá")
+    cache.put_json("h1", "stt", {"model": "base"}, {"segments": [1, 2]})
+
+    assert cache.get_text("h1", "ocr", {"lang": "por"}) == "olá"
+    assert cache.get_text("h1", "ocr", {"lang": "eng"}) is None
+    assert cache.get_json("h1", "stt", {"model": "base"}) == {"segments": [1, 2]}
+    assert cache.stats()["hits"] == 2
+
+
+def test_running_total_and_lru_eviction(tmp_path):
+    """O total acompanha inserções e substituições; o LRU respeita max_bytes"""
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=25)
+    cache.put_text("a", "ocr", None, "x" * 10)
+    cache.put_text("a", "ocr", None, "x" * 8)
+    assert cache.total_bytes() == 8
+
+    cache.put_text("b", "ocr", None, "y" * 10)
+    cache.get_text("a", "ocr")
+    cache.put_text("c", "ocr", None, "z" * 10)
+    assert cache.total_bytes() == 18
+    assert cache.get_text("b", "ocr") is None
+    assert cache.get_text("a", "ocr") == "x" * 8
+
+    reopened = ArtifactCache(tmp_path / "cache", max_bytes=25)
+    assert reopened.total_bytes() == 18
+
+
+def test_content_hash_is_memoized_and_pruned(tmp_path):
+    """O hash é reaproveitado enquanto o arquivo não muda e esquecido depois"""
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=1000)
+    source = tmp_path / "doc.pdf"
+    source.write_bytes(b"conteudo")
+
+    assert cache.known_hash(source) is None
+    digest = cache.content_hash(source)
+    assert digest == sha256_file(source)
+    assert cache.known_hash(source) == digest
+
+    source.write_bytes(b"conteudo novo")
+    os.utime(source, ns=(1, 1))
+    assert cache.known_hash(source) is None
+    assert cache.prune_hashes() == 1
+
+    cache.content_hash(source)
+    cache.forget_hash(source)
+    assert cache.known_hash(source) is None
+
+
+def test_disabled_cache_is_a_no_op(tmp_path):
+    """Com o cache desligado nada é gravado nem encontrado"""
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=1000, enabled=False)
+    cache.put_text("a", "ocr", None, "texto")
+    assert cache.get_text("a", "ocr") is None
+    assert cache.total_bytes() == 0
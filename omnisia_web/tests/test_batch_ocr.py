@@ -0,0 +1,99 @@
+"""
+Testes do OCR em lote de pastas, globs e arquivos compactados
+"""
+
+import io
+import json
+import tarfile
+import zipfile
+
+import pytest
+from PIL import Image
+
+from backend.services import batch_ocr
+from backend.services.batch_ocr import (
+    count_image_sources,
+    describe_source,
+    iter_image_sources,
+    run_batch_ocr,
+)
+from backend.services.tesseract_pool import TesseractPool
+
+
+def png_bytes(value=255):
+    buffer = io.BytesIO()
+    Image.new("L", (4, 4), value).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def make_folder(root):
+    (root / "sub").mkdir(parents=True)
+    (root / "a.png").write_bytes(png_bytes())
+    (root / "sub" / "b.jpg").write_bytes(png_bytes())
+    (root / "notas.txt").write_text("não é imagem")
+    (root / ".oculta.png").write_bytes(png_bytes())
+    return root
+
+
+def test_describe_source(tmp_path):
+    """Pasta, ZIP, TAR e glob são reconhecidos; o resto é recusado"""
+    folder = make_folder(tmp_path / "imgs")
+    with zipfile.ZipFile(tmp_path / "imgs.zip", "w") as archive:
+        archive.writestr("a.png", png_bytes())
+    with tarfile.open(tmp_path / "imgs.tar.gz", "w:gz") as archive:
+        archive.add(folder / "a.png", arcname="a.png")
+
+    assert describe_source(str(folder)) == "directory"
+    assert describe_source(str(tmp_path / "imgs.zip")) == "zip"
+    assert describe_source(str(tmp_path / "imgs.tar.gz")) == "tar"
+    assert describe_source(str(folder / "*.png")) == "glob"
+    with pytest.raises(ValueError):
+        describe_source(str(tmp_path / "inexistente.pdf"))
+
+
+def test_sources_skip_non_images(tmp_path):
+    """Só imagens visíveis entram, de pastas e de arquivos compactados"""
+    folder = make_folder(tmp_path / "imgs")
+    names = [name for name, _ in iter_image_sources(str(folder))]
+    assert [name.split("imgs/")[1] for name in names] == ["a.png", "sub/b.jpg"]
+    assert count_image_sources(str(folder)) == 2
+
+    with zipfile.ZipFile(tmp_path / "imgs.zip", "w") as archive:
+        archive.writestr("x/a.png", png_bytes())
+        archive.writestr("x/leia.txt", "texto")
+    assert [name for name, _ in iter_image_sources(str(tmp_path / "imgs.zip"))] == ["x/a.png"]
+
+    with tarfile.open(tmp_path / "imgs.tar", "w") as archive:
+        archive.add(folder / "sub" / "b.jpg", arcname="b.jpg")
+    assert count_image_sources(str(tmp_path / "imgs.tar")) is None
+    assert [name for name, _ in iter_image_sources(str(tmp_path / "imgs.tar"))] == ["b.jpg"]
+
+
+def test_run_batch_ocr_writes_manifest(tmp_path, monkeypatch):
+    """Cada imagem vira uma linha do manifesto; imagens inválidas registram o erro"""
+    monkeypatch.setattr(
+        batch_ocr,
+        "recognize",
+        lambda image, language, config="", with_boxes=True: {
+            "text": f"{image.size[0]}px",
+            "confidence": 0.9,
+            "words": 1,
+        },
+    )
+    folder = tmp_path / "imgs"
+    folder.mkdir()
+    (folder / "a.png").write_bytes(png_bytes())
+    (folder / "b.png").write_bytes(b"corrompido")
+
+    pool = TesseractPool(workers=2)
+    try:
+        summary = run_batch_ocr(str(folder), tmp_path / "out" / "manifest.jsonl", "por", pool)
+    finally:
+        pool.shutdown()
+
+    records = [json.loads(line) for line in (tmp_path / "out" / "manifest.jsonl").read_text().splitlines()]
+    assert [record["text"] for record in records] == ["4px", ""]
+    assert records[1]["error"]
+    assert summary["images"] == 2
+    assert summary["failed"] == 1
+    assert summary["format"] == "jsonl"
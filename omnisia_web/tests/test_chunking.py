@@ -0,0 +1,123 @@
+"""
+Testes da divisão de textos em trechos por tokens
+"""
+
+import random
+
+import pytest
+
+from backend.services.chunking import (
+    PAGE_BREAK,
+    Chunker,
+    iter_chunks,
+    iter_sentences,
+    join_pages,
+    normalize_text,
+    token_counter,
+)
+
+WORDS = ["casa", "rio", "documento", "página", "OCR", "texto", "modelo", "áudio", "vídeo"]
+
+
+def random_text(seed, sentences=60):
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(sentences):
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 25)))
+        parts.append(sentence.capitalize() + rng.choice([".", "!", "?"]))
+        parts.append(rng.choice([" ", " ", "\n", "\n\n", PAGE_BREAK]))
+    return "".join(parts)
+
+
+def pieces(text, seed):
+    """O mesmo texto cortado em pedaços de tamanhos aleatórios"""
+    rng = random.Random(seed)
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 40)
+        yield text[position : position + size]
+        position += size
+
+
+def test_sentences_reproduce_the_text():
+    """Frases concatenadas reproduzem a entrada, com posições corretas"""
+    text = random_text(1)
+    sentences = list(iter_sentences(pieces(text, 1)))
+    assert "".join(sentence for sentence, _, _ in sentences) == text
+    assert all(text[start : start + len(sentence)] == sentence for sentence, start, _ in sentences)
+    assert sentences[-1][2] == text.count(PAGE_BREAK) + 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunks_do_not_depend_on_how_the_text_arrives(seed):
+    """Texto inteiro ou em pedaços gera os mesmos trechos"""
+    text = random_text(seed)
+    whole = list(iter_chunks(text, max_tokens=40, overlap_tokens=10))
+    streamed = list(iter_chunks(pieces(text, seed), max_tokens=40, overlap_tokens=10))
+    assert whole == streamed
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunk_limits_offsets_and_pages(seed):
+    """Limite de tokens, posições no original e páginas sem trechos atravessando quebras"""
+    text = random_text(seed)
+    count = token_counter()
+    chunks = list(iter_chunks(text, max_tokens=40, overlap_tokens=10))
+
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        original = text[chunk.start : chunk.end]
+        assert chunk.tokens <= 40
+        assert count(original) == chunk.tokens
+        assert " ".join(original.split()) == chunk.text
+        assert PAGE_BREAK not in original
+        assert text.count(PAGE_BREAK, 0, chunk.start) + 1 == chunk.page
+
+
+def test_consecutive_chunks_overlap():
+    """Cada trecho repete frases finais do anterior, até o limite de sobreposição"""
+    text = " ".join(f"Frase número {i} do texto." for i in range(30))
+    chunks = list(iter_chunks(text, max_tokens=30, overlap_tokens=12))
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.start < chunk.start < previous.end
+        assert token_counter()(text[chunk.start : previous.end]) <= 12
+
+
+def test_long_sentence_is_split_in_word_windows():
+    """Uma frase acima do limite vira janelas de palavras"""
+    text = " ".join(f"palavra{i}" for i in range(100))
+    chunks = list(iter_chunks(text, max_tokens=20, overlap_tokens=5))
+    assert len(chunks) > 5
+    assert all(chunk.tokens <= 20 for chunk in chunks)
+    assert chunks[-1].text.endswith("palavra99")
+
+
+def test_incremental_chunker_and_validation():
+    """Chunker entrega os trechos já fechados a cada pedaço"""
+    chunker = Chunker(max_tokens=10, overlap_tokens=0, metadata={"source": "a.pdf"})
+    # Um separador no fim do pedaço pode continuar no próximo: a frase espera
+    assert chunker.feed("Um dois três quatro cinco. Seis sete oito nove dez. ") == []
+    first = chunker.feed("Onze doze treze. ")
+    assert [chunk.text for chunk in first] == ["Um dois três quatro cinco."]
+    last = chunker.finish()
+    assert [(chunk.index, chunk.text) for chunk in last] == [(1, "Seis sete oito nove dez. Onze doze treze.")]
+    assert first[0].metadata == {"source": "a.pdf"}
+    with pytest.raises(ValueError):
+        Chunker(max_tokens=10, overlap_tokens=10)
+
+
+def test_join_pages_and_normalize_text():
+    """Páginas viram quebras de página; a limpeza junta hifenização e espaços"""
+    assert "".join(join_pages(["a", "b", "c"])) == f"a{PAGE_BREAK}b{PAGE_BREAK}c"
+    assert normalize_text("docu-\nmento  com­   espaços\n\n\n\nfim") == "documento com espaços\n\nfim"
+
+
+def test_root_wrapper_cleans_chunk_text():
+    """processamento.chunking usa a mesma implementação, com clean_text por padrão"""
+    from processamento.chunking import iter_chunks as root_iter_chunks
+
+    text = "Primeira linha\nsegunda linha. Outra frase."
+    root = list(root_iter_chunks(text, max_tokens=50, overlap_tokens=5))
+    backend = list(iter_chunks(text, max_tokens=50, overlap_tokens=5))
+    assert [(c.start, c.end, c.tokens) for c in root] == [(c.start, c.end, c.tokens) for c in backend]
+    assert root[0].text == "Primeira linha segunda linha. Outra frase."
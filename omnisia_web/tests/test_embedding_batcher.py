@@ -0,0 +1,89 @@
+"""
+Testes do micro-batching de embeddings
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from backend.services.embedding_batcher import EmbeddingBatcher
+from backend.services.workload_pools import PoolSaturatedError
+
+
+def fake_encode(calls):
+    """Encode determinístico: o vetor de cada texto é o seu comprimento"""
+
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype="float32")
+
+    return encode
+
+
+def test_concurrent_calls_share_a_batch():
+    """Chamadas simultâneas viram um lote e cada uma recebe a sua fatia"""
+    calls = []
+    batcher = EmbeddingBatcher(fake_encode(calls), max_batch_size=32, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(
+            batcher.encode(["a"]), batcher.encode(["bb", "ccc"]), batcher.encode(["dddd"])
+        )
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        batcher.shutdown()
+
+    assert calls == [["a", "bb", "ccc", "dddd"]]
+    assert [r[:, 0].tolist() for r in results] == [[1], [2, 3], [4]]
+    assert batcher.stats()["batches"] == 1
+
+
+def test_batch_size_limit_splits_batches():
+    """Um lote nunca passa muito de max_batch_size"""
+    calls = []
+    batcher = EmbeddingBatcher(fake_encode(calls), max_batch_size=2, max_wait_ms=50, workers=1)
+
+    async def main():
+        return await asyncio.gather(*(batcher.encode([str(i)]) for i in range(5)))
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        batcher.shutdown()
+
+    assert [len(call) for call in calls] == [2, 2, 1]
+    assert len(results) == 5
+
+
+def test_errors_reach_every_caller():
+    """Uma falha no encode é propagada a todas as chamadas do lote"""
+
+    def failing(texts):
+        raise RuntimeError("modelo indisponível")
+
+    batcher = EmbeddingBatcher(failing, max_wait_ms=20)
+
+    async def main():
+        return await asyncio.gather(
+            batcher.encode(["a"]), batcher.encode(["b"]), return_exceptions=True
+        )
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        batcher.shutdown()
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_full_queue_rejects():
+    """Acima de max_pending a chamada é recusada em vez de enfileirar"""
+    batcher = EmbeddingBatcher(fake_encode([]), max_pending=1)
+    batcher._pending = 1
+    with pytest.raises(PoolSaturatedError):
+        asyncio.run(batcher.encode(["a"]))
+    assert batcher.stats()["rejected"] == 1
+    batcher.shutdown()
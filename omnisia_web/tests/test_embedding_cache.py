@@ -0,0 +1,102 @@
+"""
+Testes do cache de embeddings endereçado por conteúdo
+"""
+
+import sqlite3
+import time
+
+import numpy as np
+
+from backend.services.embedding_cache import EmbeddingCache, content_key
+
+
+def vectors(count, dim=4):
+    return np.arange(count * dim, dtype="float32").reshape(count, dim)
+
+
+def test_content_key_ignores_trivial_whitespace():
+    """Espaços extras não mudam a chave; o modelo muda"""
+    assert content_key("olá  mundo\n", "m") == content_key("olá mundo", "m")
+    assert content_key("olá mundo", "m") != content_key("olá mundo", "outro")
+
+
+def test_memory_lru_keeps_recent_items():
+    """O LRU em memória descarta o item usado há mais tempo"""
+    cache = EmbeddingCache(max_items=2)
+    cache.put_many(["a", "b"], vectors(2))
+    cache.get_many(["a"])
+    cache.put_many(["c"], vectors(1))
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+
+
+def test_disk_survives_reopen_per_namespace(tmp_path):
+    """Vetores persistem no disco e ficam separados por namespace"""
+    path = tmp_path / "embeddings.db"
+    cache = EmbeddingCache(disk_path=path, namespace="fp32")
+    cache.put_many(["a"], vectors(1))
+    cache.close()
+
+    reopened = EmbeddingCache(disk_path=path, namespace="fp32")
+    found = reopened.get_many(["a"])
+    assert np.array_equal(found["a"], vectors(1)[0])
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+    other = EmbeddingCache(disk_path=path, namespace="int8")
+    assert other.get_many(["a"]) == {}
+    other.close()
+
+
+def test_disk_prune_drops_least_recently_used(tmp_path):
+    """Acima de max_disk_items saem os vetores usados há mais tempo"""
+    cache = EmbeddingCache(max_items=1, disk_path=tmp_path / "embeddings.db", max_disk_items=10)
+    keys = [f"k{i}" for i in range(10)]
+    for i, key in enumerate(keys):
+        cache.put_many([key], vectors(1) + i)
+    # Usar k0 o torna o mais recente no disco
+    cache._memory.clear()
+    cache.get_many(["k0"])
+    cache.put_many(["k10"], vectors(1))
+
+    assert cache.stats()["disk_items"] == 9
+    cache._memory.clear()
+    found = cache.get_many(keys + ["k10"])
+    assert "k0" in found and "k10" in found
+    assert "k1" not in found and "k2" not in found
+    cache.close()
+
+
+def _last_used(path, key):
+    with sqlite3.connect(str(path)) as db:
+        return db.execute("SELECT last_used FROM embeddings WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_defer_last_used_writes(tmp_path):
+    """Acertos não escrevem no disco: o uso é gravado em lote no flush"""
+    path = tmp_path / "embeddings.db"
+    cache = EmbeddingCache(disk_path=path, touch_batch=100)
+    cache.put_many(["a"], vectors(1))
+    stored = _last_used(path, "a")
+
+    time.sleep(0.01)
+    cache.get_many(["a"])
+    assert _last_used(path, "a") == stored
+
+    cache.flush()
+    assert _last_used(path, "a") > stored
+    cache.close()
+
+
+def test_touch_batch_flushes_on_lookup(tmp_path):
+    """Ao acumular touch_batch chaves, o uso é gravado na própria consulta"""
+    path = tmp_path / "embeddings.db"
+    cache = EmbeddingCache(disk_path=path, touch_batch=2)
+    cache.put_many(["a", "b"], vectors(2))
+    stored = _last_used(path, "b")
+
+    time.sleep(0.01)
+    cache.get_many(["a"])
+    assert _last_used(path, "a") == stored
+    cache.get_many(["b"])
+    assert _last_used(path, "a") > stored and _last_used(path, "b") > stored
+    cache.close()
@@ -0,0 +1,70 @@
+"""
+Testes do catálogo persistente de uploads
+"""
+
+import os
+
+import pytest
+
+from backend.services.file_catalog import FileCatalog
+
+
+def make_catalog(tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    return uploads, FileCatalog(uploads, tmp_path / "catalog.db")
+
+
+def test_reconcile_tracks_changes_outside_the_api(tmp_path):
+    """Arquivos criados, alterados e removidos no disco entram no catálogo"""
+    uploads, catalog = make_catalog(tmp_path)
+    (uploads / "a.pdf").write_bytes(b"a")
+    (uploads / "b.txt").write_bytes(b"bb")
+    (uploads / ".partial").mkdir()
+    (uploads / ".oculto").write_bytes(b"x")
+    assert catalog.reconcile() == {"added": 2, "updated": 0, "removed": 0, "total": 2}
+
+    (uploads / "a.pdf").write_bytes(b"aaaa")
+    os.utime(uploads / "a.pdf", (1, 1))
+    (uploads / "b.txt").unlink()
+    assert catalog.reconcile() == {"added": 0, "updated": 1, "removed": 1, "total": 1}
+    assert catalog.get("a.pdf")["size"] == 4
+    assert catalog.get("b.txt") is None
+    catalog.close()
+
+
+def test_hash_is_kept_only_while_file_is_unchanged(tmp_path):
+    """O hash registrado sobrevive a upserts sem alteração e cai quando o arquivo muda"""
+    uploads, catalog = make_catalog(tmp_path)
+    catalog.upsert("a.pdf", 10, 100.0, sha256="abc", status="Processado")
+    catalog.upsert("a.pdf", 10, 100.0)
+    assert catalog.get("a.pdf")["sha256"] == "abc"
+    assert catalog.find_by_hash("abc", exclude="b.pdf")["name"] == "a.pdf"
+    assert catalog.find_by_hash("abc", exclude="a.pdf") is None
+
+    catalog.upsert("a.pdf", 11, 200.0)
+    stored = catalog.get("a.pdf")
+    assert stored["sha256"] is None
+    assert stored["status"] == "Processado"
+    catalog.close()
+
+
+def test_list_filters_sorts_and_pages(tmp_path):
+    """A listagem filtra, ordena, pagina e devolve o total sem paginação"""
+    uploads, catalog = make_catalog(tmp_path)
+    for i, name in enumerate(["c.pdf", "a.pdf", "b.txt", "d_1.pdf", "d21.pdf"]):
+        catalog.upsert(name, i, float(i), created_at=float(i))
+
+    page, total = catalog.list(type=".PDF", sort="name", descending=False, limit=2, offset=1)
+    assert total == 4
+    assert [row["name"] for row in page] == ["c.pdf", "d21.pdf"]
+
+    page, total = catalog.list(search="d_")
+    assert [row["name"] for row in page] == ["d_1.pdf"]
+
+    page, _ = catalog.list(sort="size")
+    assert page[0]["name"] == "d21.pdf"
+
+    with pytest.raises(ValueError):
+        catalog.list(sort="owner")
+    catalog.close()
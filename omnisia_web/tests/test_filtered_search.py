@@ -0,0 +1,106 @@
+"""
+Testes da busca vetorial filtrada por metadados
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from backend.services.vector_store import PersistentVectorStore, metadata_filter_sql  # noqa: E402
+
+SOURCES = ("a.pdf", "b.mp3", "c.txt")
+
+
+def populated_store(path, index_type="flat", count=300, **config):
+    """Vetores distribuídos entre três documentos e dois tenants"""
+    store = PersistentVectorStore(path, index_config={"index_type": index_type, **config})
+    data = np.random.default_rng(0).random((count, 16), dtype="float32")
+    metadata = [
+        {
+            "doc_id": f"doc{i % 3}",
+            "source": SOURCES[i % 3],
+            "file_type": SOURCES[i % 3].split(".")[1],
+            "tenant": "acme" if i % 2 else "globex",
+            "created_at": float(i),
+            "chunk": i,
+        }
+        for i in range(count)
+    ]
+    store.add([f"texto {i}" for i in range(count)], data, metadata=metadata)
+    return store, data
+
+
+def brute_force(data, ids, query, k):
+    distances = np.sum((data[ids] - query) ** 2, axis=1)
+    return ids[np.argsort(distances)[:k]].tolist()
+
+
+def test_filter_sql_accepts_values_lists_and_dates():
+    """Valor único, lista, intervalo de datas; campos desconhecidos são recusados"""
+    where, params = metadata_filter_sql({"doc_id": "d1", "file_type": ["pdf", "txt"], "created_after": 10})
+    assert where == "doc_id IN (?) AND file_type IN (?,?) AND created_at >= ?"
+    assert params == ["d1", "pdf", "txt", 10.0]
+    assert metadata_filter_sql({"tenant": []})[0] == "0"
+    with pytest.raises(ValueError):
+        metadata_filter_sql({"owner": "x"})
+
+
+def test_filter_ids_and_metadata_round_trip(tmp_path):
+    """Ids filtrados batem com os metadados; campos extras voltam do JSON"""
+    store, _ = populated_store(tmp_path)
+    ids = store.filter_ids({"doc_id": "doc1", "tenant": "acme", "created_before": 50})
+    assert ids.tolist() == [i for i in range(50) if i % 3 == 1 and i % 2]
+    assert store.filter_ids({}) is None
+    assert store.get_metadata([4])[4] == {
+        "doc_id": "doc1",
+        "source": "b.mp3",
+        "file_type": "mp3",
+        "tenant": "globex",
+        "created_at": 4.0,
+        "chunk": 4,
+    }
+    store.close()
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_exact_and_bitmap_paths_agree(tmp_path, index_type):
+    """Poucos candidatos (distância exata) e bitmap no índice dão os mesmos vizinhos"""
+    store, data = populated_store(tmp_path, index_type, ef_search=256)
+    ids = store.filter_ids({"source": "c.txt"})
+    query = data[10:11] + 0.01
+    expected = brute_force(data, ids, query[0], 5)
+
+    exact = [idx for idx, _ in store.search(query, 5, ids)[0]]
+    store.index_config["filter_exact_max"] = 0
+    bitmap = [idx for idx, _ in store.search(query, 5, ids)[0]]
+
+    assert exact == expected
+    assert set(bitmap) == set(expected)
+    assert all(idx % 3 == 2 for idx in bitmap)
+    store.close()
+
+
+def test_empty_filter_returns_no_hits(tmp_path):
+    """Filtro sem correspondência não cai na busca sem filtro"""
+    store, data = populated_store(tmp_path, count=30)
+    ids = store.filter_ids({"doc_id": "inexistente"})
+    assert store.search(data[:2], 3, ids) == [[], []]
+    store.close()
+
+
+def test_record_key_is_scoped_by_tenant_and_document():
+    """O mesmo trecho em documentos ou tenants diferentes vira vetores distintos"""
+    from backend.services.embedding_cache import content_key
+    from backend.services.embeddings import record_key
+
+    assert record_key("trecho", "m") == content_key("trecho", "m")
+    keys = {
+        record_key("trecho", "m", {"doc_id": "d1"}),
+        record_key("trecho", "m", {"doc_id": "d2"}),
+        record_key("trecho", "m", {"doc_id": "d1", "tenant": "acme"}),
+    }
+    assert len(keys) == 3
+    assert record_key("trecho", "m", {"doc_id": "d1", "source": "a.pdf"}) == record_key(
+        "trecho", "m", {"doc_id": "d1"}
+    )
@@ -0,0 +1,66 @@
+"""
+Testes do índice de imagens (com um encoder falso no lugar do CLIP)
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+pytest.importorskip("faiss")
+
+from backend.services.image_embeddings import (  # noqa: E402
+    ImageEmbeddingService,
+    image_key,
+    load_image,
+    normalize,
+)
+
+
+def fake_vectors(images):
+    """Vetor da imagem = cor média, normalizada (imagens iguais, vetores iguais)"""
+    return normalize(np.array([np.asarray(image, dtype="float32").mean(axis=(0, 1)) + 1 for image in images]))
+
+
+def make_service(tmp_path, monkeypatch):
+    service = ImageEmbeddingService("clip-teste", store_dir=tmp_path / "images")
+    monkeypatch.setattr(service.encoder, "encode_images", fake_vectors)
+    return service
+
+
+def solid(color):
+    return np.full((8, 8, 3), color, dtype=np.uint8)
+
+
+def test_image_key_depends_on_pixels_and_model():
+    """A chave muda com o conteúdo e com o modelo, não com o formato de entrada"""
+    red = load_image(solid((255, 0, 0)))
+    assert image_key(red, "a") == image_key(load_image(Image.fromarray(solid((255, 0, 0)))), "a")
+    assert image_key(red, "a") != image_key(red, "b")
+    assert image_key(red, "a") != image_key(load_image(solid((0, 0, 255))), "a")
+
+
+def test_store_opens_lazily(tmp_path, monkeypatch):
+    """Criar o serviço, fechar ou pedir snapshot não abre o índice"""
+    service = make_service(tmp_path, monkeypatch)
+    assert service.maybe_snapshot() is False
+    service.close()
+    assert service._store is None
+    assert not (tmp_path / "images").exists()
+
+
+def test_add_images_skips_known_content(tmp_path, monkeypatch):
+    """Imagens repetidas (no lote ou já indexadas) não voltam ao modelo"""
+    service = make_service(tmp_path, monkeypatch)
+    encoded = []
+    monkeypatch.setattr(
+        service.encoder, "encode_images", lambda images: encoded.append(len(images)) or fake_vectors(images)
+    )
+    red, blue = solid((255, 0, 0)), solid((0, 0, 255))
+
+    assert service.add_images([red, blue, red], doc_ids=["d1", "d2", "d1"]) == 2
+    assert service.add_images([blue], doc_ids=["d2"]) == 0
+    assert encoded == [2]
+
+    hits = service.search_image(blue, k=1)
+    assert hits[0]["doc_id"] == "d2"
+    service.close()
@@ -0,0 +1,67 @@
+"""
+Testes do pré-processamento de imagens para OCR
+"""
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from backend.services.image_preprocess import (
+    _median3x3,
+    adaptive_threshold,
+    deskew,
+    estimate_skew,
+    preprocess_array,
+    to_gray_array,
+)
+
+
+def text_lines(height=600, width=800):
+    """Página branca com faixas pretas horizontais no lugar de linhas de texto"""
+    gray = np.full((height, width), 255, dtype=np.uint8)
+    for y in range(50, height - 50, 30):
+        gray[y : y + 8, 100 : width - 100] = 0
+    return gray
+
+
+def test_median_matches_pil_filter():
+    """A rede de ordenação dá a mesma mediana 3x3 que o filtro do Pillow"""
+    gray = np.random.default_rng(0).integers(0, 256, (40, 50), dtype=np.uint8)
+    expected = np.asarray(Image.fromarray(gray).filter(ImageFilter.MedianFilter(3)))
+    assert np.array_equal(_median3x3(gray)[1:-1, 1:-1], expected[1:-1, 1:-1])
+
+
+def test_gray_conversion_from_rgb_and_pil():
+    """Arrays RGB e imagens PIL viram uint8 de um canal"""
+    rgb = np.zeros((4, 4, 3), dtype=np.uint8)
+    rgb[..., 1] = 200
+    assert to_gray_array(rgb).shape == (4, 4)
+    assert to_gray_array(Image.new("RGB", (4, 3))).shape == (3, 4)
+
+
+def test_skew_is_estimated_and_corrected():
+    """Uma página girada 3 graus é detectada e endireitada"""
+    page = text_lines()
+    rotated = np.asarray(Image.fromarray(page).rotate(3, fillcolor=255))
+    assert estimate_skew(page) == 0
+    assert abs(estimate_skew(rotated) + 3) <= 0.2
+    assert abs(estimate_skew(deskew(rotated))) <= 0.2
+    assert deskew(page) is page
+
+
+def test_adaptive_threshold_handles_uneven_light():
+    """Texto escuro sobre fundo com gradiente vira preto sobre branco"""
+    background = np.tile(np.linspace(120, 250, 200).astype(np.uint8), (100, 1))
+    page = background.copy()
+    page[40:60, 20:180] = (background[40:60, 20:180] * 0.4).astype(np.uint8)
+    binary = adaptive_threshold(page)
+    assert set(np.unique(binary)) <= {0, 255}
+    assert (binary[45:55, 30:170] == 0).mean() > 0.9
+    assert (binary[:20] == 255).mean() > 0.95
+
+
+def test_preprocess_array_pipeline():
+    """O pipeline completo devolve um array binário do mesmo tamanho"""
+    result = preprocess_array(Image.fromarray(text_lines()).convert("RGB"))
+    assert result.dtype == np.uint8
+    assert result.shape == (600, 800)
+    assert set(np.unique(result)) <= {0, 255}
@@ -0,0 +1,112 @@
+"""
+Testes do pipeline de ingestão (com um serviço de embeddings falso)
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+# Extração usa os serviços de OCR e transcrição (whisper)
+ingest_pipeline = pytest.importorskip("backend.services.ingest_pipeline")
+
+IngestPipeline = ingest_pipeline.IngestPipeline
+
+SENTENCES = [f"Frase número {i} tem algumas palavras aqui." for i in range(400)]
+
+
+class FakeStore:
+    def __init__(self):
+        self.rows = []
+
+    def existing_keys(self, keys):
+        return {key for key, _ in self.rows if key in keys}
+
+    def add(self, texts, embeddings, keys, metadata):
+        self.rows += list(zip(keys, [{**meta, "text": text} for text, meta in zip(texts, metadata)]))
+        return len(texts)
+
+
+class FakeEmbeddingService:
+    model = object()
+    model_name = "fake"
+
+    def __init__(self):
+        self.store = FakeStore()
+
+    def store_for(self, tenant):
+        return self.store
+
+    async def acached_encode(self, texts, keys):
+        return np.zeros((len(texts), 4), dtype="float32")
+
+
+def run_ingest(path, doc_id, **options):
+    service = FakeEmbeddingService()
+    pipeline = IngestPipeline(
+        service, max_tokens=40, overlap_tokens=8, text_block_chars=500, workers={"clean": 3, "chunk": 2}
+    )
+
+    async def main():
+        try:
+            return await pipeline.ingest(path, doc_id, options)
+        finally:
+            await pipeline.stop()
+
+    summary = asyncio.run(main())
+    rows = sorted((meta for _, meta in service.store.rows), key=lambda meta: meta["chunk"])
+    return summary, rows
+
+
+def test_text_blocks_end_at_paragraphs(tmp_path):
+    """Blocos terminam em parágrafo e, juntos, reproduzem o arquivo"""
+    path = tmp_path / "doc.txt"
+    text = "\n\n".join(" ".join(SENTENCES[i : i + 5]) for i in range(0, 100, 5))
+    path.write_text(text)
+    blocks = list(ingest_pipeline.iter_text_blocks(path, 500))
+    assert "".join(blocks) == text
+    assert len(blocks) > 1
+    assert all(block.startswith("\n\n") for block in blocks[1:])
+    assert ingest_pipeline.block_joint("\n\nParágrafo") == "\n\n"
+    assert ingest_pipeline.block_joint("texto") == ""
+
+
+def test_text_document_is_chunked_as_one_stream(tmp_path):
+    """Trechos contínuos, em ordem, com posições no arquivo e sem cortar frases"""
+    path = tmp_path / "doc.txt"
+    text = "\n\n".join(" ".join(SENTENCES[i : i + 5]) for i in range(0, 400, 5))
+    path.write_text(text)
+
+    summary, rows = run_ingest(path, "doc1")
+
+    assert summary["chunks"] == len(rows) == summary["new_chunks"]
+    assert [row["chunk"] for row in rows] == list(range(len(rows)))
+    assert all(a["start"] < b["start"] for a, b in zip(rows, rows[1:]))
+    assert all(" ".join(text[row["start"] : row["end"]].split()) == row["text"] for row in rows)
+    assert all(row["text"].endswith(".") for row in rows)
+
+
+def test_pdf_pages_keep_their_numbers(tmp_path, monkeypatch):
+    """Trechos de PDF não atravessam páginas e levam o número da página"""
+    monkeypatch.setattr(
+        ingest_pipeline.ocr_service,
+        "iter_ocr_pages",
+        lambda path, language: (
+            {"page": page, "text": f"Página {page}. " + " ".join(SENTENCES[:30])} for page in (1, 2, 3)
+        ),
+    )
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF")
+
+    summary, rows = run_ingest(path, "doc2")
+
+    pages = [row["page"] for row in rows]
+    assert pages == sorted(pages)
+    assert set(pages) == {1, 2, 3}
+    assert all(row["text"].startswith(f"Página {row['page']}.") for row in rows if row["chunk"] == 0)
+
+
+def test_unknown_file_type_is_rejected(tmp_path):
+    """Arquivos sem extração de texto são recusados antes de entrar no pipeline"""
+    with pytest.raises(ValueError):
+        ingest_pipeline.document_kind(tmp_path / "planilha.xlsx")
@@ -0,0 +1,130 @@
+"""
+Testes da fila de jobs durável
+"""
+
+import time
+
+from backend.services.job_queue import JobQueue
+
+
+def test_claim_respects_priority_and_kinds(tmp_path):
+    """O worker recebe o job de maior prioridade entre os tipos que atende"""
+    queue = JobQueue(tmp_path / "jobs.db")
+    low = queue.submit("ocr", {"n": 1})
+    high = queue.submit("ocr", {"n": 2}, priority=5)
+    other = queue.submit("training", {})
+
+    assert queue.claim("w1", ["ocr"])["id"] == high["id"]
+    assert queue.claim("w1", ["ocr"])["id"] == low["id"]
+    assert queue.claim("w1", ["ocr"]) is None
+    assert queue.claim("w1")["id"] == other["id"]
+    queue.close()
+
+
+def test_failure_retries_until_max_attempts(tmp_path):
+    """A falha reenfileira enquanto houver tentativas e depois marca como falho"""
+    queue = JobQueue(tmp_path / "jobs.db")
+    job = queue.submit("ocr", {}, max_attempts=2)
+
+    queue.claim("w1")
+    assert queue.fail(job["id"], "w1", "erro 1") == "queued"
+    claimed = queue.claim("w1")
+    assert claimed["attempts"] == 2
+    assert queue.fail(job["id"], "w1", "erro 2") == "failed"
+    assert queue.get(job["id"])["error"] == "erro 2"
+    queue.close()
+
+
+def test_retry_delay_postpones_claim(tmp_path):
+    """Com retry_delay o job só volta a ser reservado depois do prazo"""
+    queue = JobQueue(tmp_path / "jobs.db")
+    job = queue.submit("ocr", {}, max_attempts=2)
+    queue.claim("w1")
+    queue.fail(job["id"], "w1", "erro", retry_delay=60)
+    assert queue.claim("w1") is None
+    queue.close()
+
+
+def test_cancel_queued_and_running(tmp_path):
+    """Job na fila é cancelado na hora; em execução recebe o pedido de cancelamento"""
+    queue = JobQueue(tmp_path / "jobs.db")
+    queued = queue.submit("ocr", {})
+    running = queue.submit("ocr", {}, priority=1)
+    queue.claim("w1")
+
+    assert queue.cancel(queued["id"])["status"] == "cancelled"
+    assert queue.cancel(running["id"])["status"] == "running"
+    assert queue.report_progress(running["id"], 0.5) is True
+    assert queue.heartbeat(running["id"]) is True
+    queue.close()
+
+
+def test_expired_lease_returns_job_to_queue(tmp_path):
+    """Só jobs com lease vencido voltam à fila; cancelados não voltam"""
+    queue = JobQueue(tmp_path / "jobs.db", lease_seconds=0.05)
+    job = queue.submit("ocr", {}, max_attempts=2)
+    doomed = queue.submit("ocr", {}, max_attempts=2)
+    queue.claim("w1")
+    queue.claim("w1")
+    queue.cancel(doomed["id"])
+    assert queue.requeue_orphans() == 0
+
+    time.sleep(0.1)
+    assert queue.requeue_orphans() == 2
+    assert queue.get(job["id"])["status"] == "queued"
+    assert queue.get(doomed["id"])["status"] == "cancelled"
+    queue.close()
+
+
+def test_expired_lease_counts_as_attempt(tmp_path):
+    """Um job que derruba o worker falha ao esgotar as tentativas, sem voltar para sempre"""
+    queue = JobQueue(tmp_path / "jobs.db", lease_seconds=0.05)
+    job = queue.submit("ocr", {}, max_attempts=2)
+
+    for _ in range(2):
+        assert queue.claim("w1")["id"] == job["id"]
+        time.sleep(0.1)
+        queue.requeue_orphans()
+
+    stored = queue.get(job["id"])
+    assert stored["status"] == "failed"
+    assert stored["attempts"] == 2
+    assert "lease" in stored["error"]
+    assert queue.claim("w1") is None
+    queue.close()
+
+
+def test_stale_worker_cannot_overwrite_result(tmp_path):
+    """Depois de perder o lease, o worker antigo não grava resultado nem falha"""
+    queue = JobQueue(tmp_path / "jobs.db", lease_seconds=0.05)
+    job = queue.submit("ocr", {}, max_attempts=3)
+    queue.claim("w1")
+    time.sleep(0.1)
+    queue.claim("w2")
+
+    assert queue.complete(job["id"], "w1", {"stale": True}) is False
+    assert queue.fail(job["id"], "w1", "erro antigo") is None
+    assert queue.mark_cancelled(job["id"], "w1") is False
+    assert queue.get(job["id"])["status"] == "running"
+
+    assert queue.complete(job["id"], "w2", {"pages": 1}) is True
+    stored = queue.get(job["id"])
+    assert stored["status"] == "succeeded"
+    assert stored["result"] == {"pages": 1}
+    queue.close()
+
+
+def test_jobs_survive_reopen(tmp_path):
+    """O estado persiste entre instâncias (reinício do servidor)"""
+    queue = JobQueue(tmp_path / "jobs.db")
+    job = queue.submit("ocr", {"path": "a.pdf"})
+    queue.claim("w1")
+    queue.complete(job["id"], "w1", {"pages": 3})
+    queue.close()
+
+    reopened = JobQueue(tmp_path / "jobs.db")
+    stored = reopened.get(job["id"])
+    assert stored["status"] == "succeeded"
+    assert stored["result"] == {"pages": 3}
+    assert reopened.counts()["succeeded"] == 1
+    reopened.close()
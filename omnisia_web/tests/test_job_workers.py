@@ -0,0 +1,70 @@
+"""
+Testes dos processos worker da fila de jobs
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.services import jobs
+from backend.services.job_queue import FINAL_STATUSES, JobQueue
+
+
+@jobs.job_handler("pool_probe")
+def run_pool_probe(params, ctx):
+    """Handler que, como o OCR por página e o Whisper longo, usa um pool de processos"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=jobs.multiprocessing.get_context("spawn")) as pool:
+        child = pool.submit(os.getpid).result()
+    return {"worker_pid": os.getpid(), "child_pid": child}
+
+
+def probe_worker_main(*args):
+    """Alvo dos processos de teste: este módulo registra o handler pool_probe"""
+    jobs.worker_main(*args)
+
+
+def _wait_final(queue, job_id, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in FINAL_STATUSES:
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} não terminou: {queue.get(job_id)}")
+
+
+def test_worker_process_runs_handler_with_process_pool(tmp_path, monkeypatch):
+    """O worker (não daemônico) pode criar os pools de processos dos handlers"""
+    monkeypatch.setattr(jobs, "worker_main", probe_worker_main)
+    queue = JobQueue(tmp_path / "jobs.db")
+    job = queue.submit("pool_probe", {})
+    pool = jobs.JobWorkerPool(queue.db_path, tmp_path / "jobs", poll_interval=0.05)
+    pool.start({"worker": (1, ["pool_probe"])})
+    try:
+        finished = _wait_final(queue, job["id"])
+    finally:
+        pool.stop()
+
+    assert finished["status"] == "succeeded", finished["error"]
+    assert finished["result"]["child_pid"] not in (finished["result"]["worker_pid"], os.getpid())
+    queue.close()
+
+
+def test_supervise_respawns_dead_worker(tmp_path):
+    """Um worker morto é reiniciado e o pool volta ao tamanho configurado"""
+    pool = jobs.JobWorkerPool(tmp_path / "jobs.db", tmp_path / "jobs", poll_interval=0.05)
+    pool.start({"worker": (2, ["pool_probe"])})
+    try:
+        assert pool.supervise() == 0
+        _, victim = pool._workers["worker-0"]
+        victim.kill()
+        victim.join(10)
+
+        assert pool.stats()["alive"] == 1
+        assert pool.supervise() == 1
+        stats = pool.stats()
+        assert stats == {"workers": 2, "alive": 2, "restarts": 1}
+        assert pool._workers["worker-0"][1].pid != victim.pid
+    finally:
+        pool.stop()
+    assert pool.supervise() == 0
@@ -0,0 +1,215 @@
+"""
+Testes da transcrição de áudios longos em janelas
+"""
+
+import io
+
+import numpy as np
+import pytest
+
+from backend.services import long_audio
+from backend.services.long_audio import (
+    SAMPLE_RATE,
+    LiveTranscriber,
+    LongAudioTranscriber,
+    iter_local_segments,
+    iter_windows,
+    merge_windows,
+    read_pcm,
+    stitch_segments,
+)
+from backend.services.model_registry import ModelRegistry
+
+MB = 1024 ** 2
+
+
+def speech(pattern):
+    """PCM com tom (fala) ou zeros (silêncio): pattern = [(segundos, tem_voz), ...]"""
+    parts = []
+    for seconds, voiced in pattern:
+        count = int(seconds * SAMPLE_RATE)
+        tone = 0.5 * np.sin(np.arange(count) * 2 * np.pi * 220 / SAMPLE_RATE)
+        parts.append(tone.astype(np.float32) if voiced else np.zeros(count, dtype=np.float32))
+    return np.concatenate(parts)
+
+
+def blocks(audio, seconds=0.5):
+    step = int(seconds * SAMPLE_RATE)
+    for start in range(0, len(audio), step):
+        yield audio[start : start + step]
+
+
+def test_windows_cut_at_silence_and_cover_the_audio():
+    """Os cortes caem no silêncio e os núcleos cobrem o áudio sem lacunas"""
+    audio = speech([(1.7, True), (0.2, False), (1.8, True), (0.2, False), (1.1, True)])
+    windows = list(
+        iter_windows(blocks(audio), window_seconds=2.0, overlap_seconds=0.1, search_seconds=0.5)
+    )
+
+    cores = [(core_start, core_end) for _, _, core_start, core_end, _ in windows]
+    assert cores[0][0] == 0
+    assert abs(cores[-1][1] - len(audio) / SAMPLE_RATE) < 1e-6
+    assert all(a[1] == b[0] for a, b in zip(cores, cores[1:]))
+    assert 1.7 <= cores[0][1] <= 1.9
+    assert 3.7 <= cores[1][1] <= 3.9
+
+    # O áudio de cada janela estende o núcleo pela sobreposição
+    window_audio, audio_start, core_start, core_end, _ = windows[1]
+    assert abs(audio_start - (core_start - 0.1)) < 1e-3
+    assert abs(len(window_audio) / SAMPLE_RATE - (core_end - core_start + 0.2)) < 1e-3
+
+
+def test_silent_windows_have_no_voice():
+    """Janelas só de silêncio são marcadas para não irem ao modelo"""
+    audio = speech([(2.5, False), (2.0, True)])
+    windows = list(iter_windows(blocks(audio), window_seconds=2.0, overlap_seconds=0.1))
+    voiced = [has_voice for *_, has_voice in windows]
+    assert voiced[0] is False
+    assert all(voiced[1:])
+
+
+def test_stitch_and_merge_keep_each_segment_once():
+    """Na sobreposição vale a janela cujo núcleo contém o meio do segmento"""
+    first = {"language": "pt", "segments": [{"start": 0.0, "end": 1.0, "text": "um"}, {"start": 1.8, "end": 2.4, "text": "dois"}]}
+    second = {"language": "pt", "segments": [{"start": 1.8, "end": 2.4, "text": "dois"}, {"start": 2.5, "end": 3.0, "text": "três"}]}
+
+    assert [s["text"] for s in stitch_segments(first["segments"], 0.0, 2.0)] == ["um"]
+    merged = merge_windows(
+        iter(
+            [
+                {"language": "pt", "segments": stitch_segments(first["segments"], 0.0, 2.0)},
+                {"language": "en", "segments": stitch_segments(second["segments"], 2.0, 4.0)},
+                {"language": "pt", "segments": []},
+            ]
+        )
+    )
+    assert merged["text"] == "um dois três"
+    assert [s["id"] for s in merged["segments"]] == [0, 1, 2]
+    assert merged["language"] == "pt"
+    assert merged["windows"] == 3
+
+
+def test_workers_come_from_the_model_budget():
+    """Com registro, o número de processos é o que cabe no orçamento"""
+    registry = ModelRegistry("whisper", lambda name: name, 700 * MB)
+    transcriber = LongAudioTranscriber(
+        workers=4, registry=registry, estimate_bytes=lambda model_size: 300 * MB
+    )
+    with transcriber._reserve("base") as workers:
+        assert workers == 2
+        assert registry.used_bytes() == 600 * MB
+    assert registry.used_bytes() == 0
+
+    with LongAudioTranscriber(workers=3)._reserve("base") as workers:
+        assert workers == 3
+
+
+def fake_transcribe(calls):
+    """Transcrição falsa: um segmento por janela, com o início global"""
+
+    def transcribe(audio, offset):
+        calls.append(offset)
+        seconds = len(audio) / SAMPLE_RATE
+        return {"language": "pt", "segments": [{"start": offset, "end": offset + seconds, "text": f"t{len(calls)}"}]}
+
+    return transcribe
+
+
+def test_local_segments_stream_windows_in_order():
+    """Cada janela com voz é transcrita no processo atual e entregue em ordem"""
+    calls = []
+    audio = speech([(2.5, False), (2.0, True)])
+    windows = list(
+        iter_local_segments(None, fake_transcribe(calls), window_seconds=2.0, overlap_seconds=0.1, blocks=blocks(audio))
+    )
+    assert [window["window"] for window in windows] == list(range(len(windows)))
+    assert windows[0]["segments"] == []
+    assert len(calls) == len(windows) - 1
+
+
+def pcm(audio):
+    return (audio * 32767).astype(np.int16).tobytes()
+
+
+def test_live_transcriber_partials_then_segment():
+    """Fala gera parciais; o silêncio depois dela confirma o segmento"""
+    calls = []
+    live = LiveTranscriber(fake_transcribe(calls), step_seconds=0.5, silence_seconds=0.3)
+
+    events = []
+    for block in blocks(speech([(1.0, True)]), 0.5):
+        events += live.feed(pcm(block))
+    assert [event["event"] for event in events] == ["partial", "partial"]
+
+    events = live.feed(pcm(speech([(0.5, False)])))
+    assert [event["event"] for event in events] == ["segment"]
+    assert live.text == events[0]["text"]
+    assert live.finish() == []
+
+
+def test_live_transcriber_resamples_input():
+    """PCM em outra taxa é reamostrado para 16 kHz antes do modelo"""
+    live = LiveTranscriber(fake_transcribe([]), input_rate=8000, step_seconds=10)
+    live.feed(pcm(np.zeros(8000, dtype=np.float32)))
+    assert len(live.buffer) == SAMPLE_RATE
+
+
+def test_live_transcriber_rejects_invalid_rate():
+    """Taxa zero ou negativa é recusada em vez de dividir por zero ao reamostrar"""
+    with pytest.raises(ValueError):
+        LiveTranscriber(fake_transcribe([]), input_rate=0)
+
+
+def test_read_pcm_grows_the_preallocated_buffer(monkeypatch):
+    """Duração subestimada não perde amostras: o buffer cresce e é recortado"""
+    audio = speech([(3.0, True)])
+    monkeypatch.setattr(long_audio, "stream_pcm", lambda source, max_seconds=None: blocks(audio, 0.7))
+
+    result = read_pcm("video.mp4", expected_seconds=1.0)
+    assert np.array_equal(result, audio)
+    assert np.array_equal(read_pcm("video.mp4"), audio)
+
+
+def test_stream_pcm_converts_s16le_blocks(monkeypatch):
+    """O PCM do pipe do ffmpeg vira blocos float32 em [-1, 1)"""
+    samples = np.array([0, 16384, -32768, 32767], dtype=np.int16)
+
+    class FakeProcess:
+        returncode = 0
+
+        def __init__(self, command, stdout, stderr):
+            self.command = command
+            self.stdout = io.BytesIO(samples.tobytes())
+            self.stderr = io.BytesIO()
+
+        def wait(self):
+            return 0
+
+        def poll(self):
+            return 0
+
+    monkeypatch.setattr(long_audio.subprocess, "Popen", FakeProcess)
+    decoded = np.concatenate(list(long_audio.stream_pcm("video.mp4", block_seconds=2 / SAMPLE_RATE)))
+    assert decoded.dtype == np.float32
+    assert decoded.tolist() == [0.0, 0.5, -1.0, 32767 / 32768]
+
+
+def test_transcribe_video_reads_the_track_by_pipe(tmp_path, monkeypatch):
+    """A transcrição recebe o próprio vídeo, sem extrair um WAV para o disco"""
+    video_service = pytest.importorskip("backend.services.video_service")
+    calls = []
+
+    def fake_transcribe(path, model_size=None, progress=None):
+        calls.append(path)
+        return {"text": "olá", "language": "pt"}
+
+    monkeypatch.setattr(video_service.stt_service, "transcribe_audio", fake_transcribe)
+    monkeypatch.setattr(video_service, "get_video_info", lambda path: {"duration": 1.0})
+    video = tmp_path / "aula.mp4"
+
+    result = video_service.transcribe_video(video, "tiny")
+
+    assert calls == [video]
+    assert result["text"] == "olá"
+    assert result["video_info"] == {"duration": 1.0}
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,72 @@
+"""
+Testes da sondagem de mídia com cache
+"""
+
+import os
+
+from backend.services import media_probe
+from backend.services.artifact_cache import artifact_cache
+from backend.services.media_probe import probe_media, summarize
+
+FFPROBE_OUTPUT = {
+    "format": {"size": "1000", "duration": "12.5", "bit_rate": "64000", "format_name": "mov,mp4"},
+    "streams": [
+        {"codec_type": "video", "codec_name": "mjpeg", "disposition": {"attached_pic": 1}},
+        {"codec_type": "video", "codec_name": "h264", "width": 640, "height": 360, "avg_frame_rate": "30000/1001"},
+        {"codec_type": "audio", "codec_name": "aac", "sample_rate": "44100", "channels": 2},
+    ],
+}
+
+
+def fake_ffprobe(monkeypatch):
+    calls = []
+
+    def run_ffprobe(path):
+        calls.append(path)
+        return FFPROBE_OUTPUT
+
+    monkeypatch.setattr(media_probe, "run_ffprobe", run_ffprobe)
+    return calls
+
+
+def test_summarize_skips_cover_art():
+    """A capa do álbum não conta como vídeo; fps e números são convertidos"""
+    info = summarize(FFPROBE_OUTPUT, media_probe.Path("clip.mp4"))
+    assert info["video"]["codec"] == "h264"
+    assert info["video"]["fps"] == 29.97
+    assert info["audio"] == {"codec": "aac", "sample_rate": 44100, "channels": 2, "bitrate": 0}
+    assert info["duration"] == 12.5
+
+
+def test_probe_is_cached_by_file_identity(tmp_path, monkeypatch):
+    """O mesmo arquivo é sondado uma vez; alterado, é sondado de novo"""
+    calls = fake_ffprobe(monkeypatch)
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"video")
+
+    first = probe_media(clip)
+    second = probe_media(clip)
+    assert len(calls) == 1
+    assert first == second
+    assert first["sha256"] is None
+
+    clip.write_bytes(b"outro video")
+    os.utime(clip, ns=(1, 1))
+    probe_media(clip)
+    assert len(calls) == 2
+
+
+def test_probe_uses_known_content_hash(tmp_path, monkeypatch):
+    """Com o hash do upload, cópias do mesmo conteúdo compartilham a sondagem"""
+    calls = fake_ffprobe(monkeypatch)
+    original = tmp_path / "a.mp4"
+    copy = tmp_path / "b.mp4"
+    original.write_bytes(b"mesmo conteudo")
+    copy.write_bytes(b"mesmo conteudo")
+    for path in (original, copy):
+        artifact_cache.remember_hash(path, "hash-compartilhado")
+
+    assert probe_media(original)["sha256"] == "hash-compartilhado"
+    info = probe_media(copy)
+    assert info["filename"] == "b.mp4"
+    assert len(calls) == 1
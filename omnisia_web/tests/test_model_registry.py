@@ -0,0 +1,77 @@
+"""
+Testes do registro de modelos com orçamento de memória
+"""
+
+import threading
+import time
+
+from backend.services.model_registry import ModelRegistry
+
+MB = 1024 ** 2
+
+
+def make_registry(budget_mb=250, loads=None, delay=0.0):
+    """Registro cujos modelos ocupam 100 MB e registram cada carga"""
+    loads = [] if loads is None else loads
+
+    def loader(name):
+        time.sleep(delay)
+        loads.append(name)
+        return f"modelo-{name}"
+
+    return ModelRegistry(
+        "teste", loader, budget_mb * MB, estimate_bytes=lambda name: 100 * MB, measure_bytes=lambda model: 0
+    )
+
+
+def test_concurrent_requests_share_one_load():
+    """Threads pedindo o mesmo modelo aguardam uma única carga"""
+    loads = []
+    registry = make_registry(loads=loads, delay=0.05)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("base"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ["base"]
+    assert results == ["modelo-base"] * 5
+
+
+def test_least_recently_used_model_is_evicted():
+    """Acima do orçamento sai o modelo ocioso usado há mais tempo"""
+    registry = make_registry(budget_mb=250)
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")
+    registry.get("c")
+    assert registry.is_loaded("a") and registry.is_loaded("c")
+    assert not registry.is_loaded("b")
+    assert registry.stats()["evictions"] == 1
+
+
+def test_models_in_use_are_never_evicted():
+    """Um modelo em uso fica carregado mesmo estourando o orçamento"""
+    registry = make_registry(budget_mb=150)
+    with registry.use("a") as model:
+        assert model == "modelo-a"
+        registry.get("b")
+        assert registry.is_loaded("a")
+        assert registry.unload("a") is False
+    # Liberado, o modelo volta a ser candidato ao despejo
+    assert not registry.is_loaded("a")
+    assert registry.is_loaded("b")
+
+
+def test_reservations_count_against_the_budget():
+    """Reservas concedem as unidades que cabem e despejam modelos ociosos"""
+    registry = make_registry(budget_mb=950)
+    registry.get("a")
+    with registry.reserve("whisper", 300 * MB, max_units=4) as units:
+        assert units == 3
+        assert not registry.is_loaded("a")
+        assert registry.used_bytes() == 900 * MB
+        with registry.reserve("whisper", 300 * MB, max_units=4) as extra:
+            assert extra == 1
+    assert registry.used_bytes() == 0
+    assert registry.stats()["reserved"] == {}
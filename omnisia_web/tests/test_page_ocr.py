@@ -0,0 +1,67 @@
+"""
+Testes do OCR de PDFs por página
+"""
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from backend.services.artifact_cache import ArtifactCache  # noqa: E402
+from backend.services.page_ocr import PAGE_ARTIFACT_KIND, PageOCREngine, format_page  # noqa: E402
+
+
+def make_pdf(path, pages):
+    """PDF com uma página por item; None gera uma página sem camada de texto"""
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        if text:
+            page.insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+def test_text_layer_pages_skip_ocr(tmp_path):
+    """Páginas com camada de texto são extraídas sem iniciar o pool de OCR"""
+    pdf = make_pdf(tmp_path / "doc.pdf", ["Primeira página com texto", "Segunda página com texto"])
+    engine = PageOCREngine(workers=1)
+    progress = []
+
+    pages = list(engine.iter_pages(pdf, "por", progress=lambda p, m: progress.append(p)))
+
+    assert [page["page"] for page in pages] == [1, 2]
+    assert all(page["source"] == "text" for page in pages)
+    assert "Segunda" in pages[1]["text"]
+    assert progress == [0.5, 1.0]
+    assert engine.stats()["started"] is False
+
+
+def test_image_pages_come_from_the_page_cache(tmp_path):
+    """Páginas de imagem já reconhecidas saem do cache, na ordem do documento"""
+    pdf = make_pdf(tmp_path / "doc.pdf", ["Página com camada de texto", None])
+    engine = PageOCREngine(workers=1)
+    cache = ArtifactCache(tmp_path / "cache", max_bytes=10_000)
+    cached = {"page": 2, "text": "reconhecido", "confidence": 0.9, "source": "ocr"}
+    cache.put_json("hash", PAGE_ARTIFACT_KIND, engine._cache_params(2, "por"), cached)
+
+    pages = list(engine.iter_pages(pdf, "por", cache=cache, content_hash="hash"))
+
+    assert [page["source"] for page in pages] == ["text", "cache"]
+    assert pages[1]["text"] == "reconhecido"
+    assert engine.stats()["started"] is False
+    assert format_page(pages[1]) == "--- Página 2 ---\nreconhecido\n"
+
+
+def test_ocr_service_extracts_text_layer_without_ocrmypdf(tmp_path):
+    """O serviço de OCR importa e extrai PDFs sem depender do ocrmypdf"""
+    from backend.services import ocr_service
+
+    assert not hasattr(ocr_service, "ocrmypdf")
+    pdf = make_pdf(tmp_path / "doc.pdf", ["Texto da primeira página", "Texto da segunda página"])
+    output = tmp_path / "doc.txt"
+
+    text = ocr_service.ocr_to_file(pdf, output, "por")
+
+    assert "primeira" in text and "segunda" in text
+    assert output.read_text(encoding="utf-8") == text
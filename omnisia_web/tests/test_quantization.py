@@ -0,0 +1,59 @@
+"""
+Testes da escolha de backend de inferência e da comparação de vetores
+"""
+
+import numpy as np
+import pytest
+
+from backend.services.quantization import (
+    TORCH_BACKENDS,
+    check_backend,
+    load_sentence_transformer,
+    quantize_int8,
+    vector_agreement,
+)
+
+
+def test_check_backend_normalizes_and_validates():
+    """Nomes são normalizados; backends sem suporte para o modelo são recusados"""
+    assert check_backend("INT8") == "int8"
+    assert check_backend("") == "fp32"
+    assert check_backend("onnx-int8") == "onnx-int8"
+    with pytest.raises(ValueError):
+        check_backend("onnx", TORCH_BACKENDS, "Whisper")
+    with pytest.raises(ValueError):
+        check_backend("fp16")
+
+
+def test_vector_agreement_of_identical_and_perturbed_vectors():
+    """Vetores iguais concordam por completo; ruído pequeno mantém cosseno alto"""
+    rng = np.random.default_rng(0)
+    reference = rng.normal(size=(50, 16)).astype("float32")
+    same = vector_agreement(reference, reference * 3, k=5)
+    assert same == {"cosine_mean": 1.0, "cosine_min": 1.0, "recall@5": 1.0}
+
+    noisy = vector_agreement(reference, reference + rng.normal(scale=0.01, size=reference.shape), k=5)
+    assert noisy["cosine_min"] > 0.99
+    assert noisy["recall@5"] > 0.9
+
+
+def test_vector_agreement_single_vector_has_no_recall():
+    """Com um único vetor não há vizinhos para comparar"""
+    assert vector_agreement(np.ones((1, 4)), np.ones((1, 4)))["recall@0"] is None
+
+
+def test_quantize_int8_keeps_outputs_close():
+    """A quantização dinâmica troca as camadas Linear sem mudar muito a saída"""
+    torch = pytest.importorskip("torch")
+    model = torch.nn.Sequential(torch.nn.Linear(16, 32), torch.nn.ReLU(), torch.nn.Linear(32, 4))
+    inputs = torch.randn(8, 16)
+    expected = model(inputs)
+    quantized = quantize_int8(model)
+    assert torch.allclose(quantized(inputs), expected, atol=0.1)
+
+
+def test_onnx_backends_need_a_cache_dir():
+    """Os backends ONNX exportam o modelo e exigem onde guardá-lo"""
+    pytest.importorskip("sentence_transformers")
+    with pytest.raises(ValueError):
+        load_sentence_transformer("modelo", "onnx", cache_dir=None)
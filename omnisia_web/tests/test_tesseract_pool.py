@@ -0,0 +1,77 @@
+"""
+Testes do pool de engines Tesseract
+"""
+
+import time
+
+import numpy as np
+
+from backend.services import tesseract_pool
+from backend.services.tesseract_pool import TesseractPool, parse_tesseract_config, words_to_result
+
+
+def test_parse_tesseract_config():
+    """Opções da linha de comando viram parâmetros da engine"""
+    assert parse_tesseract_config("--oem 1 --psm 6 -c preserve_interword_spaces=1") == (
+        1,
+        6,
+        {"preserve_interword_spaces": "1"},
+    )
+    assert parse_tesseract_config("") == (None, None, {})
+
+
+def test_words_to_result_groups_lines_and_blocks():
+    """Palavras viram linhas, blocos ganham linha em branco e a confiança é a média"""
+    data = {
+        "text": ["Olá", "mundo", "", "fim"],
+        "conf": [90, 70, -1, 80],
+        "block_num": [1, 1, 1, 2],
+        "par_num": [1, 1, 1, 1],
+        "line_num": [1, 1, 1, 1],
+        "left": [0, 10, 0, 0],
+        "top": [0, 0, 0, 20],
+        "width": [5, 5, 0, 5],
+        "height": [5, 5, 0, 5],
+    }
+    result = words_to_result(data)
+    assert result["text"] == "Olá mundo\n\nfim"
+    assert result["confidence"] == 0.8
+    assert result["words"] == 3
+    assert result["boxes"][1] == {"text": "mundo", "confidence": 0.7, "box": [10, 0, 5, 5]}
+    assert "boxes" not in words_to_result(data, with_boxes=False)
+
+
+def test_map_keeps_input_order(monkeypatch):
+    """Resultados saem na ordem de entrada mesmo quando terminam fora de ordem"""
+
+    def fake_recognize(image, language, config="", with_boxes=True):
+        time.sleep(0.01 * (5 - int(image[0, 0])))
+        return {"text": str(int(image[0, 0])), "confidence": 1.0, "words": 1}
+
+    monkeypatch.setattr(tesseract_pool, "recognize", fake_recognize)
+    pool = TesseractPool(workers=3)
+    images = (np.full((2, 2), i, dtype=np.uint8) for i in range(6))
+    try:
+        texts = [result["text"] for result in pool.map(images, "por")]
+    finally:
+        pool.shutdown()
+    assert texts == [str(i) for i in range(6)]
+    assert pool.stats()["completed"] == 6
+
+
+def test_map_with_task_keeps_order_and_counts():
+    """Um task próprio roda nas threads do pool, na ordem de entrada"""
+    pool = TesseractPool(workers=3, config="--psm 6")
+    try:
+        results = list(
+            pool.map(
+                range(10),
+                "por",
+                False,
+                task=lambda item, language, config, with_boxes: {"text": f"{item}:{language}:{config}"},
+            )
+        )
+    finally:
+        pool.shutdown()
+    assert [result["text"] for result in results] == [f"{i}:por:--psm 6" for i in range(10)]
+    assert pool.stats()["completed"] == 10
@@ -0,0 +1,99 @@
+"""
+Testes da gravação em streaming e dos uploads retomáveis
+"""
+
+import asyncio
+import hashlib
+
+import pytest
+
+from backend.services.upload_store import (
+    ResumableUploads,
+    UploadOffsetMismatch,
+    UploadSessionNotFound,
+    UploadTooLarge,
+    safe_filename,
+    stream_to_path,
+)
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def test_safe_filename_strips_directories():
+    """Componentes de diretório e nomes ocultos não chegam ao disco"""
+    assert safe_filename("../../etc/passwd") == "passwd"
+    with pytest.raises(ValueError):
+        safe_filename("..")
+    with pytest.raises(ValueError):
+        safe_filename(".env")
+
+
+def test_stream_to_path_hashes_and_limits(tmp_path):
+    """O arquivo é gravado com hash; acima do limite nada fica no destino"""
+    dest = tmp_path / "a.bin"
+    result = asyncio.run(stream_to_path(chunks(b"abc", b"def"), dest, max_size=10))
+    assert dest.read_bytes() == b"abcdef"
+    assert result["sha256"] == hashlib.sha256(b"abcdef").hexdigest()
+
+    big = tmp_path / "b.bin"
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(stream_to_path(chunks(b"x" * 6, b"y" * 6), big, max_size=10))
+    assert not big.exists()
+    assert not list((tmp_path / ".partial").iterdir())
+
+
+def test_resumable_upload_in_parts(tmp_path):
+    """O upload continua do offset gravado e finaliza ao atingir o tamanho"""
+    uploads = ResumableUploads(tmp_path, max_size=100)
+    session = uploads.create("doc.txt", 6)
+
+    partial = asyncio.run(uploads.append(session["id"], 0, chunks(b"abc")))
+    assert partial["offset"] == 3
+    with pytest.raises(UploadOffsetMismatch) as error:
+        asyncio.run(uploads.append(session["id"], 0, chunks(b"abc")))
+    assert error.value.expected == 3
+
+    done = asyncio.run(uploads.append(session["id"], 3, chunks(b"def")))
+    assert done["completed"] is True
+    assert (tmp_path / "doc.txt").read_bytes() == b"abcdef"
+    assert done["sha256"] == hashlib.sha256(b"abcdef").hexdigest()
+    with pytest.raises(UploadSessionNotFound):
+        uploads.get(session["id"])
+
+
+def test_resume_after_restart_rehashes(tmp_path):
+    """Uma nova instância retoma a sessão e calcula o hash lendo o arquivo"""
+    session = ResumableUploads(tmp_path, max_size=100).create("doc.txt", 4)
+    first = ResumableUploads(tmp_path, max_size=100)
+    asyncio.run(first.append(session["id"], 0, chunks(b"ab")))
+
+    restarted = ResumableUploads(tmp_path, max_size=100)
+    assert restarted.get(session["id"])["offset"] == 2
+    done = asyncio.run(restarted.append(session["id"], 2, chunks(b"cd")))
+    assert done["sha256"] == hashlib.sha256(b"abcd").hexdigest()
+
+
+def test_data_beyond_declared_length_is_rejected(tmp_path):
+    """Bytes além do tamanho declarado são recusados"""
+    uploads = ResumableUploads(tmp_path, max_size=100)
+    session = uploads.create("doc.txt", 2)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(uploads.append(session["id"], 0, chunks(b"abc")))
+    with pytest.raises(UploadTooLarge):
+        uploads.create("big.bin", 1000)
+
+
+def test_abort_and_cleanup(tmp_path):
+    """Sessões abortadas ou expiradas deixam de existir"""
+    uploads = ResumableUploads(tmp_path, max_size=100, ttl_seconds=-1)
+    aborted = uploads.create("a.txt", 4)
+    uploads.abort(aborted["id"])
+    with pytest.raises(UploadSessionNotFound):
+        uploads.get(aborted["id"])
+
+    uploads.create("b.txt", 4)
+    assert uploads.cleanup_expired() == 1
+    assert not list(uploads.partial_dir.iterdir())
@@ -0,0 +1,73 @@
+"""
+Testes da ingestão de vídeo em uma única passada
+"""
+
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+
+from backend.services.long_audio import SAMPLE_RATE
+from backend.services.video_ingest import VideoIngest, frame_filter, frame_size
+
+INFO = {"has_audio": True, "has_video": True, "video": {"width": 4, "height": 2}}
+
+# Substituto do ffmpeg: PCM no stdout, quadros no pipe extra e showinfo no stderr
+FAKE_FFMPEG = textwrap.dedent(
+    """
+    import os, sys
+    fd = int(sys.argv[1])
+    for moment in (0.5, 1.7, 2.9):
+        sys.stderr.write(f"[Parsed_showinfo_2] n: 0 pts: 1 pts_time:{moment} duration: 1\\n")
+        sys.stderr.flush()
+        os.write(fd, bytes([int(moment * 10)]) * (4 * 2 * 3))
+    os.close(fd)
+    sys.stdout.buffer.write(b"\\x00\\x40" * 16000)
+    """
+)
+
+
+def test_frame_size_keeps_aspect_and_even_dimensions():
+    """Dimensões limitadas à largura máxima, sempre pares"""
+    assert frame_size({"video": {"width": 1920, "height": 1080}}, 1280) == (1280, 720)
+    assert frame_size({"video": {"width": 641, "height": 361}}, 1280) == (640, 360)
+
+
+def test_frame_filter_and_command():
+    """Cena ou fps fixo; os quadros saem sem duplicação nem descarte"""
+    assert frame_filter(2.0, None, 640, 360) == "fps=2.0,scale=640:360,showinfo"
+    assert frame_filter(1.0, 0.3, 640, 360).startswith("select='gt(scene,0.3)'")
+
+    command = VideoIngest().command("clip.mp4", INFO, frames_fd=5)
+    assert command[command.index("-fps_mode") + 1] == "passthrough"
+    assert command[-1] == "pipe:5"
+    assert "pipe:1" in command
+    assert "-map" not in VideoIngest().command("clip.mp4", {"has_audio": False}, frames_fd=None)
+
+
+def test_run_pairs_each_frame_with_its_timestamp(tmp_path, monkeypatch):
+    """Cada quadro recebe o instante da sua linha do showinfo, mesmo em intervalos irregulares"""
+    script = tmp_path / "ffmpeg.py"
+    script.write_text(FAKE_FFMPEG)
+    monkeypatch.setattr(
+        VideoIngest, "command", lambda self, path, info, fd: [sys.executable, str(script), str(fd)]
+    )
+
+    result = VideoIngest(fps=1.0, scene_threshold=0.3).run(
+        tmp_path / "clip.mp4",
+        INFO,
+        on_audio=lambda blocks: float(np.concatenate(list(blocks)).mean()),
+        on_frames=lambda frames: [(frame.index, frame.time, int(frame.pixels[0, 0, 0])) for frame in frames],
+    )
+
+    assert result["frames"] == [(0, 0.5, 5), (1, 1.7, 17), (2, 2.9, 29)]
+    assert result["audio"] == pytest.approx(0.5)
+    assert result["audio_seconds"] == pytest.approx(16000 / SAMPLE_RATE)
+    assert result["frame_count"] == 3
+
+
+def test_run_requires_a_requested_track(tmp_path):
+    """Sem trilhas pedidas que existam no arquivo, nada é executado"""
+    with pytest.raises(Exception):
+        VideoIngest().run(tmp_path / "clip.mp4", {"has_audio": False, "has_video": False}, on_audio=list)
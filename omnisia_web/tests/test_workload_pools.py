@@ -0,0 +1,122 @@
+"""
+Testes dos pools por classe de carga
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from backend.services.workload_pools import (
+    PoolSaturatedError,
+    PoolTimeoutError,
+    WorkloadPools,
+)
+
+
+def make_pools(workers=1, queue_size=0, max_concurrent=4, queue_timeout=0.1):
+    return WorkloadPools(
+        {"ocr": {"workers": workers, "queue_size": queue_size}},
+        max_concurrent=max_concurrent,
+        queue_timeout=queue_timeout,
+    )
+
+
+def test_run_executes_on_pool_thread():
+    """A função roda no executor do pool e as métricas são atualizadas"""
+    pools = make_pools()
+    name = asyncio.run(pools.run("ocr", lambda: threading.current_thread().name))
+    assert name.startswith("ocr")
+    assert pools["ocr"].stats()["completed"] == 1
+    assert pools["ocr"].inflight == 0
+    pools.shutdown()
+
+
+def test_full_queue_is_rejected():
+    """Com workers + fila ocupados, a próxima chamada recebe 429"""
+    pools = make_pools(workers=1, queue_size=0)
+    release = threading.Event()
+
+    async def main():
+        busy = asyncio.ensure_future(pools.run("ocr", release.wait, 5))
+        await asyncio.sleep(0.05)
+        try:
+            with pytest.raises(PoolSaturatedError) as error:
+                await pools.run("ocr", lambda: None)
+        finally:
+            release.set()
+            await busy
+        return error.value
+
+    error = asyncio.run(main())
+    assert error.status_code == 429
+    assert pools["ocr"].stats()["rejected"] == 1
+    pools.shutdown()
+
+
+def test_global_limit_times_out():
+    """Sem vaga global dentro do tempo de espera, a chamada recebe 503"""
+    pools = make_pools(workers=2, max_concurrent=1, queue_timeout=0.05)
+    release = threading.Event()
+
+    async def main():
+        busy = asyncio.ensure_future(pools.run("ocr", release.wait, 5))
+        await asyncio.sleep(0.02)
+        try:
+            with pytest.raises(PoolTimeoutError) as error:
+                await pools.run("ocr", lambda: None)
+        finally:
+            release.set()
+            await busy
+        return error.value
+
+    assert asyncio.run(main()).status_code == 503
+    assert pools["ocr"].inflight == 0
+    pools.shutdown()
+
+
+def test_failures_are_counted_and_propagated():
+    """Exceções da função chegam ao chamador e contam como falha"""
+    pools = make_pools()
+
+    def fail():
+        raise ValueError("entrada inválida")
+
+    with pytest.raises(ValueError):
+        asyncio.run(pools.run("ocr", fail))
+    assert pools["ocr"].stats()["failed"] == 1
+    pools.shutdown()
+
+
+def test_session_holds_the_slot_across_steps():
+    """Uma sessão admite uma vez, roda cada passo no pool e ocupa a vaga até o fim"""
+    pools = make_pools(workers=1, queue_size=0)
+
+    async def main():
+        async with pools.session("ocr") as pool:
+            names = [await pool.execute(lambda: threading.current_thread().name) for _ in range(3)]
+            assert pools["ocr"].inflight == 1
+            with pytest.raises(PoolSaturatedError):
+                await pools.run("ocr", lambda: None)
+        return names
+
+    names = asyncio.run(main())
+    assert all(name.startswith("ocr") for name in names)
+    assert pools["ocr"].inflight == 0
+    assert pools["ocr"].stats()["completed"] == 3
+    pools.shutdown()
+
+
+def test_session_releases_on_error():
+    """Uma falha dentro da sessão libera a vaga para as próximas chamadas"""
+    pools = make_pools(workers=1, max_concurrent=1)
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            async with pools.session("ocr"):
+                raise RuntimeError("cliente desconectou")
+        return await pools.run("ocr", lambda: "ok")
+
+    assert asyncio.run(main()) == "ok"
+    assert pools["ocr"].inflight == 0
+    pools.shutdown()
@@ -0,0 +1,52 @@
+"""Divisão de textos em trechos por tokens, com sobreposição.
+
+Os trechos respeitam frases e páginas (o caractere "\\f" separa páginas,
+como na saída do pdftotext e do Tesseract) e guardam a posição no texto de
+origem. A entrada pode ser uma string ou qualquer iterável de pedaços
+(linhas de um arquivo, páginas de OCR, segmentos de transcrição): nada além
+do trecho em montagem fica em memória.
+
+A implementação é a do backend (omnisia_web.backend.services.chunking);
+aqui o texto de cada trecho passa por `clean_text` por padrão.
+"""
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+from omnisia_web.backend.services.chunking import (  # noqa: F401
+    MAX_SENTENCE_CHARS,
+    PAGE_BREAK,
+    Chunk,
+    Chunker,
+    iter_sentences,
+    join_pages,
+    token_counter,
+)
+from omnisia_web.backend.services.chunking import iter_chunks as _iter_chunks
+
+from .limpeza import clean_text
+
+
+def iter_chunks(
+    source: Union[str, Iterable[str]],
+    max_tokens: int = 256,
+    overlap_tokens: int = 32,
+    tokenizer: Any = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    clean: bool = True,
+    respect_pages: bool = True,
+) -> Iterator[Chunk]:
+    """Gera trechos de até `max_tokens` tokens, sem cortar frases.
+
+    Trechos consecutivos repetem as últimas frases do anterior, até
+    `overlap_tokens`. Com `respect_pages`, um trecho nunca atravessa uma
+    quebra de página. `start`/`end` apontam para o texto original; com
+    `clean`, o texto do trecho passa por `clean_text`.
+    """
+    return _iter_chunks(
+        source,
+        max_tokens,
+        overlap_tokens,
+        tokenizer,
+        metadata,
+        respect_pages,
+        clean=clean_text if clean else str.strip,
+    )
@@ -1,23 +1,65 @@
-"""Vetorização de textos e armazenamento em FAISS."""
-from typing import List
+"""Vetorização de textos e armazenamento em FAISS.
+
+Os índices (Flat, HNSW, IVF-Flat, IVF-PQ) vêm da fábrica do backend
+(omnisia_web.backend.services.ann_index): mesmas strings do
+`faiss.index_factory`, mesmos limiares e mesma amostra de treino.
+"""
+from typing import Dict, List, Optional
 from sentence_transformers import SentenceTransformer
-import faiss
 import numpy as np
 
+from omnisia_web.backend.services.ann_index import (
+    TRAINED_INDEX_TYPES,
+    ReservoirSampler,
+    build_index,
+    index_kind,
+    iter_vectors,
+    training_sample_size,
+    training_threshold,
+)
+
 
 class VectorStore:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        index_config: Optional[Dict] = None,
+        batch_size: int = 32,
+    ):
         self.model = SentenceTransformer(model_name)
+        self.config = dict(index_config or {"index_type": "flat"})
+        self.index_type = self.config.get("index_type", "flat")
+        self.batch_size = batch_size
         dim = self.model.get_sentence_embedding_dimension()
-        self.index = faiss.IndexFlatL2(dim)
+        # Índices IVF exigem treino: começa em Flat e migra ao atingir o limiar
+        inicial = "flat" if self.index_type in TRAINED_INDEX_TYPES else self.index_type
+        self.index = build_index(inicial, dim, self.config)
         self.texts: List[str] = []
 
     def add_texts(self, texts: List[str]):
-        embeddings = self.model.encode(texts, show_progress_bar=False)
+        embeddings = self.model.encode(
+            texts, batch_size=self.batch_size, show_progress_bar=False
+        )
         self.index.add(np.array(embeddings, dtype="float32"))
         self.texts.extend(texts)
+        if index_kind(self.index) != self.index_type and self.index.ntotal >= training_threshold(
+            self.index_type, self.config, self.index.ntotal
+        ):
+            self._migrar_indice()
+
+    def _migrar_indice(self):
+        """Treina o índice configurado com uma amostra dos vetores e substitui o Flat."""
+        total = self.index.ntotal
+        amostra = ReservoirSampler(training_sample_size(self.index_type, self.config, total))
+        for lote in iter_vectors(self.index):
+            amostra.add(lote)
+        novo = build_index(self.index_type, self.index.d, self.config, total)
+        novo.train(amostra.get())
+        for lote in iter_vectors(self.index):
+            novo.add(lote)
+        self.index = novo
 
     def query(self, text: str, k: int = 5) -> List[str]:
         emb = self.model.encode([text])
         D, I = self.index.search(np.array(emb, dtype="float32"), k)
-        return [self.texts[i] for i in I[0]]
+        return [self.texts[i] for i in I[0] if i >= 0]
@@ -14,6 +14,7 @@ Autor: Roberto Dantas de Castro
 Email: robertodantasdecastro@gmail.com
 """
 
+import asyncio
 import logging
 import time
 import traceback
@@ -29,6 +30,7 @@ from fastapi import (
     File,
     Form,
     BackgroundTasks,
+    Query,
 )
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
@@ -61,11 +63,52 @@ from config import (
     TRAINING_DIR,
     CHECKPOINTS_DIR,
     is_file_allowed,
+    MAX_FILE_SIZE,
+)
+from omnisia_web.backend.config import JOB_SUPERVISE_INTERVAL
+from omnisia_web.backend.services.artifact_cache import artifact_cache
+from omnisia_web.backend.services.file_catalog import SORT_FIELDS, FileCatalog
+from omnisia_web.backend.services.jobs import (
+    job_queue,
+    job_workers,
+    start_training_workers,
+    submit_job,
+    supervise_workers,
+)
+from omnisia_web.backend.services.upload_store import (
+    UploadTooLarge,
+    safe_filename,
+    save_upload_file,
 )
 
 # Configurar logging
 logger = setup_logging()
 
+# Catálogo indexado dos arquivos enviados (mesmo formato do backend web)
+file_catalog = FileCatalog(UPLOAD_DIR, UPLOAD_DIR.parent / "file_catalog.db")
+
+# Treinamento roda nos workers da fila de jobs do backend web (jobs "train")
+
+
+async def periodic_job_supervision():
+    """Reinicia workers de treinamento que morreram (OOM, falha do driver)"""
+    while True:
+        await asyncio.sleep(JOB_SUPERVISE_INTERVAL)
+        try:
+            await asyncio.to_thread(supervise_workers)
+        except Exception as e:
+            logger.error(f"Erro na supervisão dos workers de jobs: {str(e)}")
+
+
+# Status da fila -> status exposto em TrainingStatus
+TRAINING_STATUS_MAP = {
+    "queued": "pending",
+    "running": "running",
+    "succeeded": "completed",
+    "failed": "failed",
+    "cancelled": "cancelled",
+}
+
 # ============================================================================
 # MODELOS PYDANTIC / PYDANTIC MODELS
 # ============================================================================
@@ -106,7 +149,7 @@ class TrainingRequest(BaseModel):
 
 class TrainingStatus(BaseModel):
     job_id: str
-    status: str  # "running", "completed", "failed", "pending"
+    status: str  # "running", "completed", "failed", "pending", "cancelled"
     progress: float = Field(ge=0.0, le=100.0)
     current_epoch: int = 0
     total_epochs: int = 0
@@ -186,9 +229,18 @@ async def lifespan(app: FastAPI):
         for error in errors:
             logger.warning(f"  • {error}")
 
+    # Catálogo de uploads: reconcilia com o disco e acompanha alterações
+    file_catalog.start_watcher()
+    # Workers de treinamento da fila de jobs (processos separados)
+    start_training_workers()
+    supervision_task = asyncio.create_task(periodic_job_supervision())
+
     yield
 
     logger.info("🛑 Encerrando OmnisIA API")
+    supervision_task.cancel()
+    job_workers.stop()
+    file_catalog.stop_watcher()
 
 
 # Criar aplicação FastAPI
@@ -391,23 +443,22 @@ async def upload_file(
     check_file_type(file.filename)
 
     try:
-        # Salvar arquivo
-        file_path = UPLOAD_DIR / file.filename
+        # Salvar arquivo em blocos (temporário + rename atômico)
+        file_path = UPLOAD_DIR / safe_filename(file.filename)
         file_path.parent.mkdir(parents=True, exist_ok=True)
 
-        content = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
+        saved = await save_upload_file(file, file_path, MAX_FILE_SIZE)
+        file_catalog.add_file(file_path, sha256=saved["sha256"])
 
         file_info = FileInfo(
-            filename=file.filename,
-            size=len(content),
+            filename=file_path.name,
+            size=saved["size"],
             type=file.content_type or "unknown",
             upload_time=time.time(),
             processed=False,
         )
 
-        logger.info(f"Arquivo enviado: {file.filename} ({len(content)} bytes)")
+        logger.info(f"Arquivo enviado: {file_path.name} ({saved['size']} bytes)")
 
         # Processar imediatamente se solicitado
         if process_immediately:
@@ -416,31 +467,38 @@ async def upload_file(
 
         return file_info
 
+    except (UploadTooLarge, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erro no upload: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao fazer upload: {str(e)}")
 
 
 @app.get("/files")
-async def list_files(user=Depends(get_current_user)):
-    """Lista arquivos enviados"""
+async def list_files(
+    limit: int = Query(1000, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+    sort: str = Query("upload_date", description=f"Ordenação: {', '.join(SORT_FIELDS)}"),
+    user=Depends(get_current_user),
+):
+    """Lista arquivos enviados (consulta ao catálogo indexado)"""
     try:
-        files = []
-        if UPLOAD_DIR.exists():
-            for file_path in UPLOAD_DIR.iterdir():
-                if file_path.is_file():
-                    stat = file_path.stat()
-                    files.append(
-                        {
-                            "filename": file_path.name,
-                            "size": stat.st_size,
-                            "modified": stat.st_mtime,
-                            "path": str(file_path),
-                        }
-                    )
-
-        return {"files": files, "total": len(files)}
-
+        entries, total = file_catalog.list(sort=sort, limit=limit, offset=offset)
+        files = [
+            {
+                "filename": entry["name"],
+                "size": entry["size"],
+                "modified": entry["modified_at"],
+                "path": str(UPLOAD_DIR / entry["name"]),
+                "sha256": entry["sha256"],
+            }
+            for entry in entries
+        ]
+
+        return {"files": files, "total": total}
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erro ao listar arquivos: {e}")
         raise HTTPException(
@@ -452,16 +510,20 @@ async def list_files(user=Depends(get_current_user)):
 async def delete_file(filename: str, user=Depends(get_current_user)):
     """Remove arquivo"""
     try:
-        file_path = UPLOAD_DIR / filename
+        file_path = UPLOAD_DIR / safe_filename(filename)
 
         if not file_path.exists():
             raise HTTPException(status_code=404, detail="Arquivo não encontrado")
 
         file_path.unlink()
+        file_catalog.remove(file_path.name)
+        artifact_cache.forget_hash(file_path)
         logger.info(f"Arquivo removido: {filename}")
 
         return {"message": f"Arquivo {filename} removido com sucesso"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao remover arquivo: {e}")
         raise HTTPException(
@@ -477,7 +539,6 @@ async def delete_file(filename: str, user=Depends(get_current_user)):
 @app.post("/training/start", response_model=Dict[str, str])
 async def start_training(
     request: TrainingRequest,
-    background_tasks: BackgroundTasks,
     user=Depends(get_current_user),
 ):
     """Iniciar treinamento LoRA"""
@@ -501,8 +562,16 @@ async def start_training(
                 detail=f"Dataset não encontrado: {request.dataset_path}",
             )
 
-        # Iniciar treinamento em background
-        background_tasks.add_task(run_training_job, job_id, request, user["user_id"])
+        # Enfileirar o job; um worker de treinamento o executa com os hiperparâmetros
+        submit_job(
+            "train",
+            {
+                **request.dict(),
+                "output_dir": str(TRAINING_DIR / job_id),
+                "user_id": user["user_id"],
+            },
+            job_id=job_id,
+        )
 
         logger.info(
             f"Treinamento iniciado - Job ID: {job_id}, Modelo: {request.model_name}"
@@ -510,10 +579,12 @@ async def start_training(
 
         return {
             "job_id": job_id,
-            "status": "started",
-            "message": "Treinamento iniciado com sucesso",
+            "status": "pending",
+            "message": "Treinamento enfileirado com sucesso",
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro ao iniciar treinamento: {e}")
         raise HTTPException(
@@ -524,46 +595,34 @@ async def start_training(
 @app.get("/training/{job_id}", response_model=TrainingStatus)
 async def get_training_status(job_id: str, user=Depends(get_current_user)):
     """Status do treinamento"""
-    # TODO: Implementar storage persistente de jobs
-    # Por enquanto, retornar status mockado
+    job = job_queue.get(job_id)
+    if job is None or job["kind"] != "train":
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+
+    total_epochs = job["params"].get("epochs", 0)
     return TrainingStatus(
         job_id=job_id,
-        status="running",
-        progress=45.0,
-        current_epoch=2,
-        total_epochs=3,
-        loss=0.234,
-        estimated_time_remaining=1200,
+        status=TRAINING_STATUS_MAP.get(job["status"], job["status"]),
+        progress=job["progress"] * 100,
+        current_epoch=int(job["progress"] * total_epochs),
+        total_epochs=total_epochs,
+        estimated_time_remaining=(
+            int(job["eta_seconds"]) if job["eta_seconds"] is not None else None
+        ),
     )
 
 
 @app.get("/training")
 async def list_training_jobs(user=Depends(get_current_user)):
     """Lista todos os jobs de treinamento"""
-    # TODO: Implementar listagem real de jobs
-    return {"jobs": [], "active": 0, "completed": 0, "failed": 0}
-
-
-async def run_training_job(job_id: str, request: TrainingRequest, user_id: str):
-    """Executa job de treinamento (background task)"""
-    try:
-        logger.info(f"Executando treinamento - Job: {job_id}")
-
-        # Importar módulo de treinamento
-        from modelos.treinamento import iniciar_treinamento_lora
-
-        # Executar treinamento
-        await iniciar_treinamento_lora(
-            model_name=request.model_name,
-            dataset_path=request.dataset_path,
-            epochs=request.epochs,
-            batch_size=request.batch_size,
-        )
-
-        logger.info(f"Treinamento concluído - Job: {job_id}")
-
-    except Exception as e:
-        logger.error(f"Erro no treinamento - Job: {job_id}, Erro: {e}")
+    jobs, _ = job_queue.list(kind="train", limit=100)
+    counts = job_queue.counts(kind="train")
+    return {
+        "jobs": jobs,
+        "active": counts["queued"] + counts["running"],
+        "completed": counts["succeeded"],
+        "failed": counts["failed"],
+    }
 
 
 # ============================================================================